@@ -0,0 +1,568 @@
+"""
+Motor analítico - Sistema Logística JIT
+Perguntas de safra (ciclo por hora × faixa de distância, ranking de fazendas,
+utilização da frota) em um DuckDB local, colunar, alimentado pelo SQLite
+(banco principal + partições diárias) e pelo arquivo frio em Parquet.
+Sem DuckDB instalado, as mesmas consultas rodam no SQLite (só o banco principal)
+"""
+
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+sys.path.append(str(Path(__file__).parent.parent / "database"))
+from connection import criar_conexao
+from epoch import para_ms, garantir_colunas_epoca, _existe
+from partitions import pasta_particoes, particoes_do_periodo, particionar, FIM_ABERTO_MS, _colunas
+from archive import pasta_arquivo, dias_arquivados, arquivar, tabela_arrow
+
+TABELAS_ANALITICAS = ['transporte_detalhado', 'colheitabilidade_detalhada', 'estado_frota']
+
+# Faixas de docs/query.md (perto < 50 km, longe 50-80 km), com as pontas separadas
+FAIXAS_DISTANCIA = [
+    ('<30km', 30),
+    ('30-50km', 50),
+    ('50-80km', 80),
+    ('80km+', None),
+]
+
+INTERVALO_SINCRONIZACAO_S = 60    # Consultas reaproveitam a última cópia por esse tempo
+LOTE_SINCRONIZACAO = 50000
+
+SQL_FONTES = """
+    CREATE TABLE IF NOT EXISTS fontes_importadas (
+        tabela VARCHAR NOT NULL,
+        origem VARCHAR NOT NULL,           -- principal | particao | arquivo
+        dia VARCHAR NOT NULL,              -- '' para o banco principal
+        marca BIGINT NOT NULL,             -- Maior id copiado (principal) ou linhas no catálogo
+        PRIMARY KEY (tabela, origem, dia)
+    )
+"""
+
+
+def _faixa_distancia(coluna='DISTANCIA_PIMS_MEDIA'):
+    casos = " ".join(f"WHEN {coluna} < {limite} THEN '{nome}'" for nome, limite in FAIXAS_DISTANCIA if limite)
+    return f"CASE {casos} ELSE '{FAIXAS_DISTANCIA[-1][0]}' END"
+
+
+# SQL comum aos dois motores (substr/CASE/AVG existem no SQLite e no DuckDB).
+# Viagens com T_4 fora de (0, 50) h são descartadas como em docs/query.md (4.1)
+SQL_CICLO_HORA_DISTANCIA = f"""
+    SELECT CAST(substr(HR_ENTRADA_PIMS, 12, 2) AS INTEGER) AS hora,
+           {_faixa_distancia()} AS faixa_distancia,
+           COUNT(*) AS viagens,
+           ROUND(AVG(T_1 + 2.0 + T_3 + T_4), 2) AS ciclo_medio_h,
+           ROUND(AVG(T_4), 2) AS t4_medio_h,
+           ROUND(AVG(QT_LIQUIDO_PESAGEM / (T_1 + 2.0 + T_3 + T_4)), 0) AS kg_por_hora
+    FROM transporte_detalhado
+    WHERE ts_ms >= ? AND HR_ENTRADA_PIMS IS NOT NULL AND DISTANCIA_PIMS_MEDIA IS NOT NULL
+      AND T_4 > 0 AND T_4 < 50
+    GROUP BY 1, 2
+    ORDER BY 1, 2
+"""
+
+SQL_RANKING_FAZENDAS = """
+    SELECT FAZENDA AS fazenda,
+           COUNT(*) AS registros,
+           COUNT(DISTINCT SETOR) AS setores,
+           ROUND(AVG(TON_HORA), 2) AS ton_hora_media,
+           ROUND(MAX(TON_HORA), 2) AS ton_hora_max
+    FROM colheitabilidade_detalhada
+    WHERE ts_ms >= ? AND FAZENDA IS NOT NULL AND TON_HORA IS NOT NULL
+    GROUP BY FAZENDA
+    ORDER BY ton_hora_media DESC, fazenda
+    LIMIT ?
+"""
+
+SQL_UTILIZACAO_HORA = """
+    SELECT CAST(substr(timestamp, 12, 2) AS INTEGER) AS hora,
+           COUNT(*) AS amostras,
+           ROUND(AVG(caminhoes_t1_voltando), 1) AS t1_voltando,
+           ROUND(AVG(caminhoes_t2_carregando), 1) AS t2_carregando,
+           ROUND(AVG(caminhoes_t3_indo), 1) AS t3_indo,
+           ROUND(AVG(caminhoes_t4_patio), 1) AS t4_patio,
+           ROUND(100.0 * AVG((caminhoes_t1_voltando + caminhoes_t2_carregando + caminhoes_t3_indo)
+                             * 1.0 / caminhoes_total), 1) AS utilizacao_percent,
+           ROUND(100.0 * AVG(caminhoes_t4_patio * 1.0 / caminhoes_total), 1) AS patio_percent
+    FROM estado_frota
+    WHERE ts_ms >= ? AND caminhoes_total > 0 AND timestamp IS NOT NULL
+    GROUP BY 1
+    ORDER BY 1
+"""
+
+SQL_UTILIZACAO_CAMINHOES = """
+    SELECT NO_PLACA AS placa,
+           COUNT(*) AS viagens,
+           ROUND(SUM(QT_LIQUIDO_PESAGEM) / 1000.0, 1) AS toneladas,
+           ROUND(AVG(T_1 + 2.0 + T_3 + T_4), 2) AS ciclo_medio_h,
+           ROUND(SUM(T_1 + 2.0 + T_3 + T_4), 1) AS horas_em_ciclo
+    FROM transporte_detalhado
+    WHERE ts_ms >= ? AND NO_PLACA IS NOT NULL AND T_4 > 0 AND T_4 < 50
+    GROUP BY NO_PLACA
+    ORDER BY toneladas DESC, placa
+    LIMIT ?
+"""
+
+
+def arquivo_analitico(db_path):
+    """database/logistics.db -> database/logistics_analitico.duckdb"""
+    db_path = Path(db_path)
+    return db_path.parent / f"{db_path.stem}_analitico.duckdb"
+
+
+def _tipo_duckdb(declarado):
+    """Tipo da coluna no DuckDB pela afinidade do tipo declarado no SQLite"""
+    declarado = (declarado or "").upper()
+    if 'INT' in declarado:
+        return 'BIGINT'
+    if any(t in declarado for t in ('CHAR', 'CLOB', 'TEXT', 'DATE', 'TIME')):
+        return 'VARCHAR'
+    if 'BLOB' in declarado:
+        return 'BLOB'
+    return 'DOUBLE'
+
+
+class MotorAnalitico:
+    """
+    Consultas analíticas da safra
+
+    - DuckDB em database/<banco>_analitico.duckdb: cópia colunar que acumula a
+      safra (linhas apagadas pela retenção continuam aqui)
+    - Sincronização incremental: ids novos do banco principal, dias novos (ou
+      alterados) das partições e do arquivo frio; id duplicado é ignorado
+    - Sem duckdb/pyarrow, ou com o arquivo aberto por outro processo, as mesmas
+      consultas rodam no SQLite (somente o banco principal, mais lento)
+    """
+
+    def __init__(self, db_path, caminho_duckdb=None, intervalo_sincronizacao_s=INTERVALO_SINCRONIZACAO_S,
+                 usar_duckdb=True):
+        self.db_path = Path(db_path)
+        self.caminho_duckdb = Path(caminho_duckdb) if caminho_duckdb else arquivo_analitico(db_path)
+        self.intervalo_sincronizacao_s = intervalo_sincronizacao_s
+        self.usar_duckdb = usar_duckdb
+        self.duckdb = None
+        self.motor = None                  # Decidido na primeira consulta
+        self.trava = threading.Lock()
+        self.ultima_sincronizacao = None
+        self.ultimo_resumo = None
+
+    def _preparar(self):
+        """Abre o DuckDB na primeira consulta (API que não usa análises não trava o arquivo)"""
+        if self.motor:
+            return
+        with self.trava:
+            if self.motor:
+                return
+            if self.usar_duckdb:
+                try:
+                    import duckdb
+                    import pyarrow  # noqa: F401 - lotes do SQLite entram no DuckDB via Arrow
+                    self.duckdb = duckdb.connect(str(self.caminho_duckdb))
+                    self.duckdb.execute(SQL_FONTES)
+                    self.motor = 'duckdb'
+                    return
+                except ImportError:
+                    print("⚠️ duckdb/pyarrow não instalados: análises no SQLite (pip install duckdb pyarrow)")
+                except Exception as e:
+                    print(f"⚠️ DuckDB indisponível ({e}): análises no SQLite")
+            self.motor = 'sqlite'
+
+    def _marca(self, tabela, origem, dia=''):
+        linha = self.duckdb.execute(
+            "SELECT marca FROM fontes_importadas WHERE tabela = ? AND origem = ? AND dia = ?",
+            [tabela, origem, dia]).fetchone()
+        return linha[0] if linha else None
+
+    def _registrar(self, tabela, origem, dia, marca):
+        self.duckdb.execute("""
+            INSERT INTO fontes_importadas VALUES (?, ?, ?, ?)
+            ON CONFLICT DO UPDATE SET marca = excluded.marca
+        """, [tabela, origem, dia, marca])
+
+    def _garantir_tabela(self, tabela, tipos):
+        """Cria a tabela no DuckDB (chave id) ou acrescenta colunas novas do SQLite"""
+        existentes = {c for (c,) in self.duckdb.execute(
+            "SELECT column_name FROM information_schema.columns WHERE table_name = ?", [tabela]).fetchall()}
+        if not existentes:
+            colunas = ", ".join(f"{c} {_tipo_duckdb(t)}{' PRIMARY KEY' if c == 'id' else ''}"
+                                for c, t in tipos.items())
+            self.duckdb.execute(f"CREATE TABLE {tabela} ({colunas})")
+            return
+        for coluna, tipo in tipos.items():
+            if coluna not in existentes:
+                self.duckdb.execute(f"ALTER TABLE {tabela} ADD COLUMN {coluna} {_tipo_duckdb(tipo)}")
+
+    def _copiar(self, tabela, tipos, cursor):
+        """Linhas de um cursor do SQLite -> DuckDB em lotes Arrow. Retorna (inseridas, maior id)"""
+        colunas = [d[0] for d in cursor.description]
+        posicao_id = colunas.index('id')
+        inseridas, maior_id = 0, None
+        while True:
+            linhas = cursor.fetchmany(LOTE_SINCRONIZACAO)
+            if not linhas:
+                return inseridas, maior_id
+            self.duckdb.register('lote_sqlite', tabela_arrow(colunas, tipos, linhas))
+            try:
+                inseridas += self.duckdb.execute(
+                    f"INSERT OR IGNORE INTO {tabela} BY NAME SELECT * FROM lote_sqlite").fetchone()[0]
+            finally:
+                self.duckdb.unregister('lote_sqlite')
+            maior_id = max(maior_id or 0, max(linha[posicao_id] for linha in linhas))
+
+    def _sincronizar_tabela(self, cursor, tabela):
+        tipos = _colunas(cursor, 'main', tabela)
+        self._garantir_tabela(tabela, tipos)
+        inseridas = 0
+
+        # Arquivo frio: Parquet lido direto pelo DuckDB
+        pasta = pasta_arquivo(self.db_path)
+        for dia, arquivo, _, _ in dias_arquivados(cursor, tabela, -FIM_ABERTO_MS):
+            linhas = cursor.execute("SELECT linhas FROM catalogo_arquivo WHERE tabela = ? AND dia = ?",
+                                    (tabela, dia)).fetchone()[0]
+            caminho = pasta / arquivo
+            if self._marca(tabela, 'arquivo', dia) == linhas or not caminho.exists():
+                continue
+            colunas_arquivo = {c for c, *_ in self.duckdb.execute(
+                "DESCRIBE SELECT * FROM read_parquet(?)", [str(caminho)]).fetchall()}
+            comuns = ", ".join(c for c in tipos if c in colunas_arquivo)
+            inseridas += self.duckdb.execute(
+                f"INSERT OR IGNORE INTO {tabela} BY NAME SELECT {comuns} FROM read_parquet(?)",
+                [str(caminho)]).fetchone()[0]
+            self._registrar(tabela, 'arquivo', dia, linhas)
+
+        # Partições diárias: SQLite anexado, um dia por vez
+        pasta = pasta_particoes(self.db_path)
+        for dia, arquivo, _, _ in particoes_do_periodo(cursor, -FIM_ABERTO_MS):
+            linhas = cursor.execute("SELECT linhas FROM catalogo_particoes WHERE dia = ?", (dia,)).fetchone()[0]
+            caminho = pasta / arquivo
+            if self._marca(tabela, 'particao', dia) == linhas or not caminho.exists():
+                continue
+            cursor.execute("ATTACH DATABASE ? AS particao", (str(caminho),))
+            try:
+                existentes = _colunas(cursor, 'particao', tabela)
+                if existentes:
+                    cursor.execute(f"SELECT {', '.join(c for c in tipos if c in existentes)} "
+                                   f"FROM particao.{tabela}")
+                    inseridas += self._copiar(tabela, tipos, cursor)[0]
+            finally:
+                cursor.execute("DETACH DATABASE particao")
+            self._registrar(tabela, 'particao', dia, linhas)
+
+        # Banco principal: ids acima do maior já copiado dele (AUTOINCREMENT não reutiliza ids)
+        desde_id = self._marca(tabela, 'principal') or 0
+        cursor.execute(f"SELECT {', '.join(tipos)} FROM main.{tabela} WHERE id > ? ORDER BY id", (desde_id,))
+        novas, maior_id = self._copiar(tabela, tipos, cursor)
+        inseridas += novas
+        if maior_id is not None:
+            self._registrar(tabela, 'principal', '', maior_id)
+        return inseridas
+
+    def sincronizar(self, verboso=False) -> Dict:
+        """Traz para o DuckDB o que mudou desde a última sincronização. Retorna {tabela: linhas novas}"""
+        self._preparar()
+        if self.motor != 'duckdb':
+            return {}
+        with self.trava:
+            inicio = time.perf_counter()
+            conn = criar_conexao(self.db_path, somente_leitura=True)
+            try:
+                cursor = conn.cursor()
+                resumo = {tabela: self._sincronizar_tabela(cursor, tabela)
+                          for tabela in TABELAS_ANALITICAS if _existe(cursor, tabela)}
+            finally:
+                conn.close()
+            self.ultima_sincronizacao = time.monotonic()
+            self.ultimo_resumo = {'linhas_novas': resumo, 'segundos': round(time.perf_counter() - inicio, 3),
+                                  'em': datetime.now().isoformat()}
+        if verboso:
+            for tabela, linhas in resumo.items():
+                print(f"   🦆 {tabela}: +{linhas:,} linhas")
+        return resumo
+
+    def _sincronizar_se_preciso(self):
+        if (self.ultima_sincronizacao is None
+                or time.monotonic() - self.ultima_sincronizacao >= self.intervalo_sincronizacao_s):
+            self.sincronizar()
+
+    def consultar(self, sql, params=()) -> List[Dict]:
+        """Executa `sql` no motor ativo; linhas como dicionários"""
+        self._preparar()
+        if self.motor == 'duckdb':
+            self._sincronizar_se_preciso()
+            cursor = self.duckdb.cursor()  # Conexão própria por consulta (threads da API)
+            try:
+                resultado = cursor.execute(sql, list(params))
+                colunas = [d[0] for d in resultado.description]
+                return [dict(zip(colunas, linha)) for linha in resultado.fetchall()]
+            finally:
+                cursor.close()
+
+        conn = criar_conexao(self.db_path, somente_leitura=True)
+        conn.row_factory = sqlite3.Row
+        try:
+            return [dict(linha) for linha in conn.execute(sql, params).fetchall()]
+        finally:
+            conn.close()
+
+    def _resposta(self, dias, inicio, **dados):
+        return {
+            'motor': self.motor,
+            'periodo_dias': dias,
+            **dados,
+            'segundos': round(time.perf_counter() - inicio, 3),
+            'timestamp': datetime.now().isoformat(),
+        }
+
+    @staticmethod
+    def _desde_ms(dias):
+        return para_ms(datetime.now() - timedelta(days=dias)) if dias else 0
+
+    def ciclo_hora_distancia(self, dias: Optional[int] = None) -> Dict:
+        """Matriz hora × faixa de distância do ciclo T1+T2+T3+T4 (docs/query.md, fases 3 e 4)"""
+        inicio = time.perf_counter()
+        celulas = self.consultar(SQL_CICLO_HORA_DISTANCIA, (self._desde_ms(dias),))
+        faixas = [nome for nome, _ in FAIXAS_DISTANCIA]
+        matriz = {faixa: {} for faixa in faixas}
+        for celula in celulas:
+            matriz[celula['faixa_distancia']][celula['hora']] = celula['ciclo_medio_h']
+        return self._resposta(dias, inicio, faixas=faixas, matriz=matriz, celulas=celulas,
+                              total_viagens=sum(c['viagens'] for c in celulas))
+
+    def ranking_fazendas(self, dias: Optional[int] = None, limite: int = 20) -> Dict:
+        """Fazendas por produtividade média (ton/h) na colheitabilidade"""
+        inicio = time.perf_counter()
+        fazendas = self.consultar(SQL_RANKING_FAZENDAS, (self._desde_ms(dias), limite))
+        for posicao, fazenda in enumerate(fazendas, 1):
+            fazenda['posicao'] = posicao
+        return self._resposta(dias, inicio, fazendas=fazendas, total=len(fazendas))
+
+    def utilizacao_frota(self, dias: Optional[int] = None, limite: int = 20) -> Dict:
+        """Distribuição T1-T4 por hora do dia e caminhões que mais transportaram"""
+        inicio = time.perf_counter()
+        desde_ms = self._desde_ms(dias)
+        return self._resposta(dias, inicio,
+                              por_hora=self.consultar(SQL_UTILIZACAO_HORA, (desde_ms,)),
+                              por_caminhao=self.consultar(SQL_UTILIZACAO_CAMINHOES, (desde_ms, limite)))
+
+    def status(self) -> Dict:
+        self._preparar()
+        status = {'motor': self.motor, 'ultima_sincronizacao': self.ultimo_resumo}
+        if self.motor == 'duckdb':
+            status['arquivo'] = str(self.caminho_duckdb)
+            status['bytes'] = self.caminho_duckdb.stat().st_size if self.caminho_duckdb.exists() else 0
+            cursor = self.duckdb.cursor()
+            try:
+                existentes = {t for (t,) in cursor.execute("SELECT table_name FROM information_schema.tables").fetchall()}
+                status['linhas'] = {t: cursor.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+                                    for t in TABELAS_ANALITICAS if t in existentes}
+            finally:
+                cursor.close()
+        return status
+
+    def fechar(self):
+        if self.duckdb is not None:
+            self.duckdb.close()
+            self.duckdb = None
+            self.motor = None
+
+
+def _popular_safra(conn, viagens, dias):
+    """Viagens, colheitabilidade e estado da frota sintéticos ao longo de `dias` dias"""
+    import random
+    aleatorio = random.Random(42)
+    agora = datetime.now().replace(microsecond=0)
+    inicio = agora - timedelta(days=dias)
+    passo = timedelta(seconds=dias * 86400 / viagens)
+    placas = [f"ABC{n:04d}" for n in range(300)]
+
+    def lote_viagens(primeira, ultima):
+        for i in range(primeira, ultima):
+            t = inicio + passo * i
+            distancia = aleatorio.uniform(10, 95)
+            t1 = distancia / 40 * (1.6 if 13 <= t.hour <= 16 else 1.0)
+            t3 = distancia / 35 * (1.6 if 13 <= t.hour <= 16 else 1.0)
+            t4 = aleatorio.uniform(0.3, 4.5) if i % 500 else 80.0  # Outlier de vez em quando
+            yield (t, t, placas[i % len(placas)], round(t1, 2), round(t3, 2), round(t4, 2),
+                   aleatorio.randint(60000, 75000), round(distancia, 1), round(t1 + 2 + t3 + t4, 2), 'T4')
+
+    sql = ("INSERT INTO transporte_detalhado (timestamp, HR_ENTRADA_PIMS, NO_PLACA, T_1, T_3, T_4, "
+           "QT_LIQUIDO_PESAGEM, DISTANCIA_PIMS_MEDIA, ciclo_total, status_caminhao) "
+           "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+    for primeira in range(0, viagens, 100000):
+        conn.executemany(sql, lote_viagens(primeira, min(viagens, primeira + 100000)))
+
+    minutos = dias * 24 * 60
+    conn.executemany(
+        "INSERT INTO colheitabilidade_detalhada (timestamp, HORA_ELEVADOR_TIME, FAZENDA, SETOR, TON_HORA) "
+        "VALUES (?, ?, ?, ?, ?)",
+        ((t, t, f"Fazenda {n % 40:02d}", "ABCDE"[n % 5], round(aleatorio.uniform(20, 60) + n % 40 / 4, 2))
+         for m in range(0, minutos, 5) for t in [inicio + timedelta(minutes=m)] for n in range(m % 7, 40, 7)))
+    conn.executemany(
+        "INSERT INTO estado_frota (timestamp, caminhoes_t1_voltando, caminhoes_t2_carregando, "
+        "caminhoes_t3_indo, caminhoes_t4_patio, caminhoes_total) VALUES (?, ?, ?, ?, ?, 46)",
+        ((t, 16 - k, 8, 14, 8 + k) for m in range(minutos)
+         for t in [inicio + timedelta(minutes=m)] for k in [aleatorio.randint(-3, 3)]))
+    conn.commit()
+
+
+def _iguais(a, b):
+    """
+    Resultados dos dois motores: mesmas linhas; números podem diferir no último
+    dígito do ROUND (somas em ordem diferente)
+    """
+    if len(a) != len(b):
+        return False
+    for x, y in zip(a, b):
+        if x.keys() != y.keys():
+            return False
+        for chave in x:
+            if isinstance(x[chave], float) or isinstance(y[chave], float):
+                if abs((x[chave] or 0) - (y[chave] or 0)) > max(0.011, abs(x[chave] or 0) * 1.1e-4):
+                    return False
+            elif x[chave] != y[chave]:
+                return False
+    return True
+
+
+def testar_motor_analitico(viagens=600000, dias=30):
+    """
+    Safra sintética (600 mil viagens, como em docs/query.md) espalhada entre
+    banco principal, partições e Parquet: o DuckDB vê tudo, responde igual ao
+    SQLite sobre os dados originais e em menos de 1 s por análise
+    """
+    print("🧪 Teste do motor analítico")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as pasta:
+        db_path = Path(pasta) / "analitico.db"
+        conn = criar_conexao(db_path)
+        conn.executescript("""
+            CREATE TABLE transporte_detalhado (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp DATETIME,
+                HR_ENTRADA_PIMS DATETIME, NO_PLACA TEXT, T_1 REAL, T_3 REAL, T_4 REAL,
+                QT_LIQUIDO_PESAGEM INTEGER, DISTANCIA_PIMS_MEDIA REAL, ciclo_total REAL, status_caminhao TEXT);
+            CREATE TABLE colheitabilidade_detalhada (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp DATETIME,
+                HORA_ELEVADOR_TIME DATETIME, FAZENDA TEXT, SETOR TEXT, TON_HORA REAL);
+            CREATE TABLE estado_frota (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp DATETIME,
+                caminhoes_t1_voltando INTEGER, caminhoes_t2_carregando INTEGER, caminhoes_t3_indo INTEGER,
+                caminhoes_t4_patio INTEGER, caminhoes_total INTEGER DEFAULT 46);
+        """)
+        garantir_colunas_epoca(conn.cursor(), TABELAS_ANALITICAS)
+        t0 = time.perf_counter()
+        _popular_safra(conn, viagens, dias)
+        t_carga = time.perf_counter() - t0
+
+        # Referência: SQLite com todos os dados ainda no banco principal
+        sqlite = MotorAnalitico(db_path, usar_duckdb=False)
+        referencia, tempos_sqlite = {}, {}
+        analises = {
+            'ciclo': lambda m: m.ciclo_hora_distancia()['celulas'],
+            'fazendas': lambda m: m.ranking_fazendas(limite=40)['fazendas'],
+            'frota': lambda m: (lambda r: r['por_hora'] + r['por_caminhao'])(m.utilizacao_frota(limite=50)),
+        }
+        for nome, analise in analises.items():
+            t0 = time.perf_counter()
+            referencia[nome] = analise(sqlite)
+            tempos_sqlite[nome] = time.perf_counter() - t0
+
+        # Três camadas: 2 dias no principal, partições até 10 dias, Parquet antes disso
+        particionar(conn, db_path, dias_quentes=2, pausa_s=0, verboso=False)
+        arquivar(conn, db_path, dias=10, pausa_s=0, verboso=False)
+        principal = conn.execute("SELECT COUNT(*) FROM transporte_detalhado").fetchone()[0]
+
+        duck = MotorAnalitico(db_path, caminho_duckdb=Path(pasta) / "analitico.duckdb")
+        t0 = time.perf_counter()
+        primeira = duck.sincronizar()
+        t_sincronizacao = time.perf_counter() - t0
+        repetida = duck.sincronizar()
+
+        iguais, tempos_duckdb = True, {}
+        for nome, analise in analises.items():
+            analise(duck)  # Aquecimento
+            t0 = time.perf_counter()
+            resultado = analise(duck)
+            tempos_duckdb[nome] = time.perf_counter() - t0
+            iguais = iguais and _iguais(resultado, referencia[nome])
+
+        # Viagem nova no banco principal: só ela é copiada
+        conn.execute("INSERT INTO transporte_detalhado (timestamp, HR_ENTRADA_PIMS, NO_PLACA, T_1, T_3, T_4, "
+                     "QT_LIQUIDO_PESAGEM, DISTANCIA_PIMS_MEDIA) VALUES (?, ?, 'NOV0001', 1, 1, 1, 70000, 20)",
+                     (datetime.now(), datetime.now()))
+        conn.commit()
+        incremental = duck.sincronizar()
+        status = duck.status()
+        duck.fechar()
+        conn.close()
+
+    print(f"   Safra: {viagens:,} viagens em {dias} dias (carga {t_carga:.1f}s) | "
+          f"{principal:,} no banco principal, o resto em partições e Parquet")
+    print(f"   Sincronização: {sum(primeira.values()):,} linhas em {t_sincronizacao:.1f}s "
+          f"(repetida: {sum(repetida.values())}, com 1 viagem nova: {sum(incremental.values())})")
+    for nome in analises:
+        print(f"   {nome:<9} DuckDB {tempos_duckdb[nome] * 1000:7.1f} ms | "
+              f"SQLite {tempos_sqlite[nome] * 1000:7.1f} ms")
+    print(f"   DuckDB (3 camadas) = SQLite (dados originais): {'sim' if iguais else 'não'}")
+    print(f"   Arquivo DuckDB: {status['bytes'] / 1024 / 1024:.1f} MB")
+
+    aprovado = (iguais and sum(repetida.values()) == 0 and sum(incremental.values()) == 1
+                and status['linhas']['transporte_detalhado'] == viagens + 1
+                and all(t < 1.0 for t in tempos_duckdb.values()))
+    print(f"\n{'✅ APROVADO' if aprovado else '❌ FALHOU'}")
+    return aprovado
+
+
+def main():
+    args = sys.argv[1:]
+    if "--help" in args or "-h" in args:
+        print(f"""
+🦆 Motor analítico - Sistema Logística JIT
+
+USO:
+  python backend/analytics.py --sincronizar          # Copia para o DuckDB o que mudou
+  python backend/analytics.py --status               # Motor, linhas e tamanho do DuckDB
+  python backend/analytics.py --db caminho.db ...    # Outro banco
+  python backend/analytics.py --teste                # 600 mil viagens em 3 camadas, DuckDB x SQLite
+
+Análises (também em /api/analytics/*): ciclo hora × faixa de distância,
+ranking de fazendas, utilização da frota. Requer duckdb e pyarrow; sem eles
+as consultas rodam no SQLite. O DuckDB ({arquivo_analitico('logistics.db').name})
+aceita um processo por vez: pare a API antes de sincronizar pela linha de comando.
+""")
+        return
+
+    if "--teste" in args:
+        sys.exit(0 if testar_motor_analitico() else 1)
+
+    db_path = Path(__file__).parent.parent / "database" / "logistics.db"
+    if "--db" in args:
+        try:
+            db_path = Path(args[args.index("--db") + 1])
+        except IndexError:
+            print("❌ Erro: --db precisa de um caminho")
+            return
+    if not db_path.exists():
+        print(f"❌ Banco não encontrado: {db_path}")
+        return
+
+    motor = MotorAnalitico(db_path)
+    try:
+        if "--sincronizar" in args:
+            print(f"🦆 Sincronizando {db_path} → {motor.caminho_duckdb}")
+            motor.sincronizar(verboso=True)
+            print(f"✅ Sincronizado em {motor.ultimo_resumo['segundos'] if motor.ultimo_resumo else 0}s")
+        status = motor.status()
+        print(f"📋 Motor: {status['motor']}")
+        for tabela, linhas in status.get('linhas', {}).items():
+            print(f"   - {tabela}: {linhas:,} linhas")
+        if status.get('bytes'):
+            print(f"   Arquivo: {status['arquivo']} ({status['bytes'] / 1024 / 1024:.1f} MB)")
+    finally:
+        motor.fechar()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,13 +4,21 @@ Conexão e queries do banco SQLite - Sistema Logística JIT
 
 import sqlite3
 import json
+import sys
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import List, Dict, Optional, Tuple
 from contextlib import contextmanager
 
+# Fábrica de conexões compartilhada (pasta database)
+sys.path.append(str(Path(__file__).parent.parent / "database"))
+from connection import criar_conexao
+from epoch import para_ms, agora_ms
+from archive import consultar_periodo
+from replica import abrir_replica, ler_info
+
 class DatabaseManager:
-    def __init__(self, db_path: str = None):
+    def __init__(self, db_path: str = None, replica: str = None):
         if db_path is None:
             # Caminho correto baseado na estrutura
             base_dir = Path(__file__).parent.parent
@@ -20,24 +28,57 @@ class DatabaseManager:
         
         if not self.db_path.exists():
             raise FileNotFoundError(f"Banco não encontrado: {self.db_path}")
+        
+        # Snapshot somente leitura (database/replica.py): leituras saem dele em vez do
+        # banco do gerador. Partições e arquivo frio continuam ao lado de db_path
+        self.replica = None
+        if replica:
+            self.usar_replica(replica)
+    
+    def usar_replica(self, replica: str):
+        """Aponta as leituras para o snapshot (enquanto ele não existir, lê o banco principal)"""
+        self.replica = Path(replica)
+    
+    def conectar(self) -> sqlite3.Connection:
+        """Conexão de leitura: snapshot (immutable) se houver réplica, senão o banco principal"""
+        if self.replica and self.replica.exists():
+            return abrir_replica(self.replica)
+        return criar_conexao(self.db_path)
     
     @contextmanager
     def get_connection(self):
         """Context manager para conexão com o banco"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.conectar()
         conn.row_factory = sqlite3.Row  # Para acessar colunas por nome
         try:
             yield conn
         finally:
             conn.close()
     
+    def consultar_periodo(self, tabela: str, inicio: Optional[datetime] = None,
+                          fim: Optional[datetime] = None, filtro: str = "", params: Tuple = (),
+                          decrescente: bool = False, limite: Optional[int] = None) -> List[Dict]:
+        """
+        Linhas de `tabela` no período, do banco principal, das partições diárias e
+        do arquivo frio em Parquet (só os dias que o período cruza são lidos).
+        Sem `inicio`: todo o histórico
+        """
+        with self.get_connection() as conn:
+            linhas = consultar_periodo(
+                conn, self.db_path, tabela,
+                para_ms(inicio) if inicio else 0,
+                para_ms(fim) if fim else None,
+                filtro, params, decrescente=decrescente, limite=limite
+            )
+            return [dict(row) for row in linhas]
+    
     def get_dados_tempo_real_atual(self) -> Optional[Dict]:
         """Obtém os dados mais recentes das 3 curvas"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 SELECT * FROM dados_tempo_real 
-                ORDER BY timestamp DESC 
+                ORDER BY ts_ms DESC 
                 LIMIT 1
             """)
             row = cursor.fetchone()
@@ -45,17 +86,8 @@ class DatabaseManager:
     
     def get_historico_tres_curvas(self, horas: int = 24) -> List[Dict]:
         """Obtém histórico das 3 curvas das últimas X horas"""
-        limite = datetime.now() - timedelta(hours=horas)
-        
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT * FROM dados_tempo_real 
-                WHERE timestamp >= ?
-                ORDER BY timestamp ASC
-            """, (limite,))
-            
-            return [dict(row) for row in cursor.fetchall()]
+        # Até uma semana (/api/historico): dias antigos podem estar em partições
+        return self.consultar_periodo('dados_tempo_real', datetime.now() - timedelta(hours=horas))
     
     def get_estado_frota_atual(self) -> Optional[Dict]:
         """Obtém estado atual da frota"""
@@ -63,7 +95,7 @@ class DatabaseManager:
             cursor = conn.cursor()
             cursor.execute("""
                 SELECT * FROM estado_frota 
-                ORDER BY timestamp DESC 
+                ORDER BY ts_ms DESC 
                 LIMIT 1
             """)
             row = cursor.fetchone()
@@ -75,25 +107,45 @@ class DatabaseManager:
             cursor = conn.cursor()
             cursor.execute("""
                 SELECT * FROM transporte_detalhado 
-                ORDER BY timestamp DESC 
+                ORDER BY ts_ms DESC 
                 LIMIT ?
             """, (limit,))
             
             return [dict(row) for row in cursor.fetchall()]
     
+    def get_estado_caminhao(self, placa: str) -> Optional[Dict]:
+        """Estado atual de um caminhão (busca pela chave primária)"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM estado_caminhao WHERE NO_PLACA = ?", (placa,))
+            row = cursor.fetchone()
+            return dict(row) if row else None
+    
+    def get_historico_caminhao(self, placa: str, horas: Optional[int] = None,
+                               limit: int = 100) -> List[Dict]:
+        """
+        Viagens de um caminhão, mais recentes primeiro (índice placa/ts_ms);
+        segue para as partições diárias mais antigas só se faltar viagem para o limite
+        """
+        inicio = datetime.now() - timedelta(hours=horas) if horas is not None else None
+        return self.consultar_periodo('transporte_detalhado', inicio, filtro="NO_PLACA = ?",
+                                      params=(placa,), decrescente=True, limite=limit)
+    
     def get_colheitabilidade_por_fazenda(self, limit: int = 50) -> List[Dict]:
         """Obtém dados de colheitabilidade por fazenda"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
+            # +FAZENDA: agrupar pela chave (FAZENDA, SETOR, ...) varreria a tabela inteira;
+            # assim o período vem do índice ts_ms/fazenda, que cobre a consulta
             cursor.execute("""
                 SELECT FAZENDA, SETOR, AVG(TON_HORA) as media_ton_hora,
                        COUNT(*) as registros, MAX(timestamp) as ultimo_update
                 FROM colheitabilidade_detalhada 
-                WHERE timestamp >= datetime('now', '-2 hours')
-                GROUP BY FAZENDA, SETOR
+                WHERE ts_ms >= ?
+                GROUP BY +FAZENDA, SETOR
                 ORDER BY media_ton_hora DESC
                 LIMIT ?
-            """, (limit,))
+            """, (para_ms(datetime.now() - timedelta(hours=2)), limit))
             
             return [dict(row) for row in cursor.fetchall()]
     
@@ -110,9 +162,9 @@ class DatabaseManager:
                 cursor.execute(f"SELECT COUNT(*) FROM {tabela}")
                 stats[f"{tabela}_count"] = cursor.fetchone()[0]
                 
-                cursor.execute(f"SELECT MAX(timestamp) FROM {tabela}")
-                ultimo = cursor.fetchone()[0]
-                stats[f"{tabela}_ultimo"] = ultimo
+                cursor.execute(f"SELECT timestamp FROM {tabela} ORDER BY ts_ms DESC LIMIT 1")
+                ultimo = cursor.fetchone()
+                stats[f"{tabela}_ultimo"] = ultimo[0] if ultimo else None
             
             # Dados da última hora
             cursor.execute("""
@@ -122,8 +174,8 @@ class DatabaseManager:
                     AVG(estoque_total_ton) as estoque_medio,
                     COUNT(*) as registros_ultima_hora
                 FROM dados_tempo_real 
-                WHERE timestamp >= datetime('now', '-1 hour')
-            """)
+                WHERE ts_ms >= ?
+            """, (para_ms(datetime.now() - timedelta(hours=1)),))
             
             row = cursor.fetchone()
             if row:
@@ -140,9 +192,9 @@ class DatabaseManager:
             cursor.execute("""
                 SELECT estoque_total_ton, timestamp 
                 FROM dados_tempo_real 
-                WHERE timestamp >= ?
-                ORDER BY timestamp ASC
-            """, (limite,))
+                WHERE ts_ms >= ?
+                ORDER BY ts_ms ASC
+            """, (para_ms(limite),))
             
             dados = cursor.fetchall()
             
@@ -263,6 +315,20 @@ class DatabaseManager:
         
         return recomendacoes
     
+    def status_replica(self) -> Dict:
+        """Idade do snapshot em uso: quanto as leituras estão atrás do gerador"""
+        info = ler_info(self.replica)
+        if not info:
+            return {"ativa": False, "arquivo": str(self.replica), "lendo_de": str(self.db_path)}
+        return {
+            "ativa": True,
+            "arquivo": str(self.replica),
+            "gerada_em": info["gerada_em"],
+            "idade_s": info["idade_s"],
+            "intervalo_s": info["intervalo_s"],
+            "atrasada": info["atrasada"],
+        }
+    
     def health_check(self) -> Dict:
         """Verifica saúde do banco de dados"""
         try:
@@ -271,23 +337,27 @@ class DatabaseManager:
                 cursor.execute("SELECT 1")
                 
                 # Verificar última atualização
-                cursor.execute("SELECT MAX(timestamp) FROM dados_tempo_real")
-                ultimo_dado = cursor.fetchone()[0]
+                cursor.execute("SELECT timestamp, ts_ms FROM dados_tempo_real ORDER BY ts_ms DESC LIMIT 1")
+                ultimo = cursor.fetchone()
+                ultimo_dado = ultimo[0] if ultimo else None
                 
-                if ultimo_dado:
-                    ultimo_dt = datetime.fromisoformat(ultimo_dado.replace('Z', '+00:00'))
-                    minutos_desde_ultimo = (datetime.now() - ultimo_dt).total_seconds() / 60
+                if ultimo:
+                    minutos_desde_ultimo = (agora_ms() - ultimo[1]) / 60000
                 else:
                     minutos_desde_ultimo = 999
                 
-                return {
+                health = {
                     "status": "healthy",
                     "banco_conectado": True,
                     "ultimo_dado": ultimo_dado,
                     "minutos_desde_ultimo": round(minutos_desde_ultimo, 1),
                     "dados_recentes": minutos_desde_ultimo < 5  # Menos de 5 min
                 }
-                
+        
+            if self.replica:
+                health["replica"] = self.status_replica()
+            return health
+        
         except Exception as e:
             return {
                 "status": "error",
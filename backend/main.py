@@ -8,6 +8,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 import asyncio
 import json
+import os
 import sqlite3 
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
@@ -18,9 +19,12 @@ from pathlib import Path
 # Adicionar o diretório database ao path
 sys.path.append(str(Path(__file__).parent.parent / "database"))
 from prediction_model import PredictionModel
+from epoch import para_ms, agora_ms
+from replica import ServicoReplica
 
 # Imports locais
 from database import DatabaseManager
+from analytics import MotorAnalitico
 from models import (
     TresCurvasBase, EstadoFrota, CaminhaoDetalhado, 
     ResumoOperacional, HistoricoResponse, StatusSistema,
@@ -46,7 +50,12 @@ app.add_middleware(
 )
 
 # Instância do gerenciador de banco
-db_manager = DatabaseManager()
+# LOGISTICA_REPLICA=<arquivo>: leituras no snapshot mantido por database/replica.py
+# (vários workers/máquinas, cada um com sua cópia local)
+db_manager = DatabaseManager(replica=os.environ.get("LOGISTICA_REPLICA"))
+
+# Análises de safra (DuckDB ao lado do banco; SQLite se o DuckDB não estiver instalado)
+motor_analitico = MotorAnalitico(db_manager.db_path)
 
 # Lista de conexões WebSocket ativas
 websocket_connections: List[WebSocket] = []
@@ -81,6 +90,7 @@ async def root():
             "frota": "/api/estado-frota",
             "caminhoes": "/api/caminhoes",
             "resumo": "/api/resumo-operacional",
+            "analytics": "/api/analytics/status",
             "docs": "/docs"
         }
     }
@@ -184,6 +194,56 @@ async def get_caminhoes(limit: int = 20):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao buscar caminhões: {str(e)}")
 
+@app.get("/api/caminhoes/{placa}",
+    summary="Estado atual de um caminhão",
+    description="Último status, tempos T1/T3/T4, carga e última vez visto (tabela estado_caminhao)")
+async def get_caminhao(placa: str):
+    """
+    Estado atual de um caminhão
+    """
+    try:
+        estado = db_manager.get_estado_caminhao(placa.upper())
+        
+        if not estado:
+            raise HTTPException(status_code=404, detail=f"Caminhão {placa} não encontrado")
+        
+        return estado
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao buscar caminhão: {str(e)}")
+
+@app.get("/api/caminhoes/{placa}/historico",
+    summary="Histórico de viagens de um caminhão",
+    description="Viagens mais recentes primeiro; opcionalmente só as últimas X horas")
+async def get_historico_caminhao(placa: str, horas: Optional[int] = None, limit: int = 100):
+    """
+    Histórico de viagens de um caminhão
+    """
+    try:
+        if limit < 1 or limit > 1000:
+            raise HTTPException(status_code=400, detail="Limit deve estar entre 1 e 1000")
+        if horas is not None and horas < 1:
+            raise HTTPException(status_code=400, detail="Horas deve ser maior que 0")
+        
+        viagens = db_manager.get_historico_caminhao(placa.upper(), horas, limit)
+        
+        if not viagens:
+            raise HTTPException(status_code=404, detail=f"Nenhuma viagem para o caminhão {placa}")
+        
+        return {
+            "placa": placa.upper(),
+            "viagens": viagens,
+            "total": len(viagens),
+            "timestamp": datetime.now().isoformat()
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao buscar histórico do caminhão: {str(e)}")
+
 @app.get("/api/colheitabilidade-fazendas")
 async def get_colheitabilidade_fazendas():
     """
@@ -407,37 +467,40 @@ async def get_estoque_patio_consolidado():
     """
     try:
         # Usar a conexão diretamente
-        conn = sqlite3.connect(db_manager.db_path)
+        conn = db_manager.conectar()
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
         # Histórico das últimas 12 horas
         limite_historico = datetime.now() - timedelta(hours=12)
+        # (estoque_patio_consolidado: entrada e ofensor já calculados na inserção)
         cursor.execute("""
             SELECT 
                 timestamp,
-                estoque_patio_ton,
-                COALESCE(estoque_patio_fisico_ton, estoque_patio_ton * 0.7) as estoque_fisico,
-                COALESCE(taxa_entrada_patio_ton_h, 0) as taxa_entrada,
-                COALESCE(taxa_saida_patio_ton_h, moagem_ton_h) as taxa_saida,
+                estoque_sobre_rodas_patio,
+                estoque_fisico_patio,
+                COALESCE(taxa_entrada_patio, 0) as taxa_entrada,
+                COALESCE(taxa_saida_patio, moagem_ton_h) as taxa_saida,
                 moagem_ton_h,
-                colheitabilidade_ton_h
-            FROM dados_tempo_real 
-            WHERE timestamp >= ?
-            ORDER BY timestamp ASC
-        """, (limite_historico,))
+                colheitabilidade_ton_h,
+                ofensor_principal
+            FROM estoque_patio_consolidado 
+            WHERE ts_ms >= ?
+            ORDER BY ts_ms ASC
+        """, (para_ms(limite_historico),))
         
         historico = []
         rows = cursor.fetchall()
         for row in rows:
             historico.append({
                 'timestamp': row['timestamp'],
-                'estoque_patio': row['estoque_patio_ton'],
-                'estoque_fisico': row['estoque_fisico'],
+                'estoque_patio': row['estoque_sobre_rodas_patio'],
+                'estoque_fisico': row['estoque_fisico_patio'],
                 'taxa_entrada': row['taxa_entrada'],
                 'taxa_saida': row['taxa_saida'],
                 'moagem': row['moagem_ton_h'],
-                'colheitabilidade': row['colheitabilidade_ton_h']
+                'colheitabilidade': row['colheitabilidade_ton_h'],
+                'ofensor': row['ofensor_principal']
             })
         
         # Buscar última predição
@@ -453,8 +516,8 @@ async def get_estoque_patio_consolidado():
                 ofensor_principal,
                 ofensor_valor
             FROM predicoes_estoque_patio
-            WHERE timestamp_predicao = (
-                SELECT MAX(timestamp_predicao) FROM predicoes_estoque_patio
+            WHERE ts_ms = (
+                SELECT MAX(ts_ms) FROM predicoes_estoque_patio
             )
             ORDER BY hora_futura ASC
         """)
@@ -558,16 +621,20 @@ async def get_eventos_alertas(horas: int = 2):
             raise HTTPException(status_code=400, detail="Horas deve estar entre 1 e 24")
         
         limite = datetime.now() - timedelta(hours=horas)
-        conn = sqlite3.connect(db_manager.db_path)
+        conn = db_manager.conectar()
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
+        # Inclui alertas ainda abertos, mesmo que tenham começado antes do período
         cursor.execute("""
             SELECT * FROM eventos_sistema
-            WHERE timestamp >= ?
-            ORDER BY timestamp DESC
+            WHERE ts_ms >= ?
+            UNION
+            SELECT * FROM eventos_sistema
+            WHERE resolvido = 0
+            ORDER BY ts_ms DESC
             LIMIT 100
-        """, (limite,))
+        """, (para_ms(limite),))
         
         eventos = []
         resumo = {"INFO": 0, "AVISO": 0, "CRITICO": 0}
@@ -601,7 +668,7 @@ async def get_analise_ofensores():
     Analisa principais ofensores nas últimas horas
     """
     try:
-        conn = sqlite3.connect(db_manager.db_path)
+        conn = db_manager.conectar()
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
@@ -612,11 +679,11 @@ async def get_analise_ofensores():
                 COUNT(*) as ocorrencias,
                 AVG(ofensor_valor) as valor_medio
             FROM predicoes_estoque_patio
-            WHERE timestamp_predicao > datetime('now', '-6 hours')
+            WHERE ts_ms > ?
                 AND ofensor_principal IS NOT NULL
             GROUP BY ofensor_principal
             ORDER BY ocorrencias DESC
-        """)
+        """, (para_ms(datetime.now() - timedelta(hours=6)),))
         
         ofensores = []
         for row in cursor.fetchall():
@@ -681,7 +748,7 @@ async def websocket_estoque_patio(websocket: WebSocket):
     try:
         while True:
             # Buscar dados atuais
-            conn = sqlite3.connect(db_manager.db_path)
+            conn = db_manager.conectar()
             conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
             
@@ -693,16 +760,16 @@ async def websocket_estoque_patio(websocket: WebSocket):
                     COALESCE(taxa_entrada_patio_ton_h, 0) as taxa_entrada,
                     COALESCE(taxa_saida_patio_ton_h, moagem_ton_h) as taxa_saida
                 FROM dados_tempo_real
-                ORDER BY timestamp DESC
+                ORDER BY ts_ms DESC
                 LIMIT 1
             """)
             
             atual = cursor.fetchone()
             
-            # Verificar alertas
+            # Verificar alertas abertos (um evento por excursão)
             cursor.execute("""
                 SELECT COUNT(*) FROM eventos_sistema
-                WHERE timestamp > datetime('now', '-5 minutes')
+                WHERE resolvido = 0
                 AND severidade IN ('AVISO', 'CRITICO')
             """)
             
@@ -754,7 +821,7 @@ async def get_status_v2():
             "componentes": {}
         }
         
-        conn = sqlite3.connect(db_manager.db_path)
+        conn = db_manager.conectar()
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
@@ -789,14 +856,15 @@ async def get_status_v2():
         
         # 3. Verificar última predição
         cursor.execute("""
-            SELECT MAX(timestamp_predicao) FROM predicoes_estoque_patio
+            SELECT timestamp_predicao, ts_ms FROM predicoes_estoque_patio
+            ORDER BY ts_ms DESC LIMIT 1
         """)
-        ultima_predicao = cursor.fetchone()[0]
+        ultima_predicao = cursor.fetchone()
         
         if ultima_predicao:
-            minutos_desde_predicao = (datetime.now() - datetime.fromisoformat(ultima_predicao.replace('Z', '+00:00'))).total_seconds() / 60
+            minutos_desde_predicao = (agora_ms() - ultima_predicao[1]) / 60000
             status["componentes"]["predicao"] = {
-                "ultima": ultima_predicao,
+                "ultima": ultima_predicao[0],
                 "minutos_atras": round(minutos_desde_predicao, 1),
                 "status": "OK" if minutos_desde_predicao < 10 else "ATRASADA"
             }
@@ -811,8 +879,8 @@ async def get_status_v2():
                 MAX(timestamp) as ultimo,
                 COUNT(*) as total
             FROM dados_tempo_real
-            WHERE timestamp > datetime('now', '-1 hour')
-        """)
+            WHERE ts_ms > ?
+        """, (para_ms(datetime.now() - timedelta(hours=1)),))
         dados_recentes = cursor.fetchone()
         
         status["componentes"]["dados_tempo_real"] = {
@@ -841,6 +909,73 @@ async def get_status_v2():
             "timestamp": datetime.now().isoformat()
         }
 
+# ============================================================================
+# ANÁLISES DE SAFRA (DuckDB)
+# ============================================================================
+
+def _validar_periodo_analise(dias: Optional[int], limit: Optional[int] = None):
+    if dias is not None and dias < 1:
+        raise HTTPException(status_code=400, detail="Dias deve ser maior que 0")
+    if limit is not None and (limit < 1 or limit > 500):
+        raise HTTPException(status_code=400, detail="Limit deve estar entre 1 e 500")
+
+@app.get("/api/analytics/ciclo-hora-distancia",
+    summary="Ciclo por hora × faixa de distância",
+    description="Ciclo médio T1+T2+T3+T4 por hora de entrada e faixa de distância (toda a safra ou últimos X dias)")
+async def get_analytics_ciclo(dias: Optional[int] = None):
+    """
+    Matriz hora × faixa de distância do tempo de ciclo
+    """
+    try:
+        _validar_periodo_analise(dias)
+        return motor_analitico.ciclo_hora_distancia(dias)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro na análise de ciclo: {str(e)}")
+
+@app.get("/api/analytics/ranking-fazendas",
+    summary="Ranking de fazendas",
+    description="Fazendas por produtividade média (ton/h) na colheitabilidade")
+async def get_analytics_fazendas(dias: Optional[int] = None, limit: int = 20):
+    """
+    Ranking de produtividade das fazendas
+    """
+    try:
+        _validar_periodo_analise(dias, limit)
+        return motor_analitico.ranking_fazendas(dias, limit)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro no ranking de fazendas: {str(e)}")
+
+@app.get("/api/analytics/utilizacao-frota",
+    summary="Utilização da frota",
+    description="Distribuição T1-T4 por hora do dia e caminhões que mais transportaram")
+async def get_analytics_frota(dias: Optional[int] = None, limit: int = 20):
+    """
+    Utilização da frota por hora e por caminhão
+    """
+    try:
+        _validar_periodo_analise(dias, limit)
+        return motor_analitico.utilizacao_frota(dias, limit)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro na utilização da frota: {str(e)}")
+
+@app.get("/api/analytics/status",
+    summary="Status do motor analítico",
+    description="Motor em uso (duckdb/sqlite), linhas copiadas e última sincronização")
+async def get_analytics_status():
+    """
+    Status do motor analítico
+    """
+    try:
+        return motor_analitico.status()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro no status do motor analítico: {str(e)}")
+
 # ============================================================================
 # INICIALIZAÇÃO
 # ============================================================================
@@ -854,6 +989,14 @@ if __name__ == "__main__":
     print("   Docs: http://localhost:8000/docs")
     print("   Health: http://localhost:8000/health")
     print("   3 Curvas: http://localhost:8000/api/tres-curvas")
+
+    # --replica: snapshot em thread neste processo; as leituras da API saem dele
+    if "--replica" in sys.argv:
+        servico_replica = ServicoReplica(db_manager.db_path, verboso=False)
+        servico_replica.atualizar(forcar=True)
+        servico_replica.iniciar()
+        db_manager.usar_replica(servico_replica.destino)
+        print(f"📸 Réplica: {servico_replica.destino} (snapshot a cada {servico_replica.intervalo_s}s)")
     print("=" * 50)
     
     uvicorn.run(
@@ -0,0 +1,141 @@
+"""
+Máquina de estados dos alertas de limite - Sistema Logística JIT
+Uma excursão fora dos limites gera UM evento, atualizado no lugar até ser resolvido
+"""
+
+from datetime import datetime
+
+# Estados internos por (variavel, severidade)
+NORMAL = "NORMAL"          # Dentro dos limites
+PENDENTE = "PENDENTE"      # Fora dos limites, aguardando duração mínima para abrir
+ABERTO = "ABERTO"          # Evento aberto / em andamento no banco
+RESOLVENDO = "RESOLVENDO"  # Voltou para dentro da banda de histerese, aguardando confirmação
+
+TIPO_EVENTO_LIMITE = "LIMITE_EXCEDIDO"
+
+
+def _para_datetime(valor):
+    """Converte timestamp vindo do banco (texto) para datetime"""
+    if isinstance(valor, datetime):
+        return valor
+    return datetime.fromisoformat(str(valor).replace('Z', '+00:00'))
+
+
+class MaquinaEstadosAlerta:
+    """
+    Ciclo de vida aberto -> em andamento -> resolvido por (variavel, severidade)
+
+    - Histerese: o alerta abre ao cruzar o limite, mas só resolve quando o valor
+      volta para dentro do limite com folga de `histerese` (fração da faixa)
+    - Durações mínimas: evita abrir alertas por picos de um ciclo e evita
+      resolver/reabrir quando o valor oscila em torno do limite
+    - Usa as colunas `resolvido` e `resolvido_em` de eventos_sistema
+    """
+
+    def __init__(self, histerese=0.05, duracao_minima_abertura_s=20, duracao_minima_resolucao_s=60):
+        self.histerese = histerese
+        self.duracao_minima_abertura_s = duracao_minima_abertura_s
+        self.duracao_minima_resolucao_s = duracao_minima_resolucao_s
+
+        # (variavel, severidade) -> {'estado', 'desde', 'pico'}
+        self.estados = {}
+        self.carregado = False
+
+    def carregar_abertos(self, cursor):
+        """Recupera eventos abertos do banco (ex: após reiniciar o gerador)"""
+        cursor.execute("""
+            SELECT variavel_afetada, severidade, MAX(timestamp)
+            FROM eventos_sistema
+            WHERE tipo_evento = ? AND resolvido = 0
+            GROUP BY variavel_afetada, severidade
+        """, (TIPO_EVENTO_LIMITE,))
+
+        for variavel, severidade, timestamp in cursor.fetchall():
+            self.estados[(variavel, severidade)] = {
+                'estado': ABERTO,
+                'desde': _para_datetime(timestamp),
+                'pico': None,
+            }
+
+        self.carregado = True
+
+    def _fora_dos_limites(self, valor, inferior, superior):
+        return valor < inferior or valor > superior
+
+    def _dentro_banda_saida(self, valor, inferior, superior):
+        folga = (superior - inferior) * self.histerese
+        return inferior + folga <= valor <= superior - folga
+
+    def avaliar(self, variavel, severidade, valor, inferior, superior, timestamp, descricao):
+        """
+        Avalia uma amostra e retorna as operações de escrita (lista de (comando, params))
+        com comandos de database/statements.py
+
+        `descricao` é uma função (valor, pico) -> texto, chamada só quando há escrita
+        """
+        chave = (variavel, severidade)
+        atual = self.estados.get(chave, {'estado': NORMAL, 'desde': timestamp, 'pico': None})
+        estado = atual['estado']
+        operacoes = []
+
+        fora = self._fora_dos_limites(valor, inferior, superior)
+        limite_violado = superior if valor > superior else inferior
+
+        if estado == NORMAL:
+            if fora:
+                atual = {'estado': PENDENTE, 'desde': timestamp, 'pico': valor}
+                estado = PENDENTE
+
+        if estado == PENDENTE:
+            if not fora:
+                atual = {'estado': NORMAL, 'desde': timestamp, 'pico': None}
+            else:
+                atual['pico'] = self._pico(atual['pico'], valor, inferior, superior)
+                if (timestamp - atual['desde']).total_seconds() >= self.duracao_minima_abertura_s:
+                    operacoes.append(('abrir_evento_limite', (
+                        atual['desde'],
+                        TIPO_EVENTO_LIMITE,
+                        severidade,
+                        variavel,
+                        valor,
+                        limite_violado,
+                        descricao(valor, atual['pico'])
+                    )))
+                    atual['estado'] = ABERTO
+
+        elif estado in (ABERTO, RESOLVENDO):
+            if self._dentro_banda_saida(valor, inferior, superior):
+                if estado == ABERTO:
+                    atual = {'estado': RESOLVENDO, 'desde': timestamp, 'pico': atual['pico']}
+                elif (timestamp - atual['desde']).total_seconds() >= self.duracao_minima_resolucao_s:
+                    operacoes.append(('resolver_evento_limite', (
+                        timestamp, TIPO_EVENTO_LIMITE, variavel, severidade
+                    )))
+                    atual = {'estado': NORMAL, 'desde': timestamp, 'pico': None}
+            else:
+                # Excursão em andamento: atualiza o mesmo evento no lugar
+                atual['estado'] = ABERTO
+                atual['pico'] = self._pico(atual['pico'], valor, inferior, superior)
+                if fora:
+                    operacoes.append(('atualizar_evento_limite', (
+                        valor,
+                        limite_violado,
+                        descricao(valor, atual['pico']),
+                        TIPO_EVENTO_LIMITE,
+                        variavel,
+                        severidade
+                    )))
+
+        self.estados[chave] = atual
+        return operacoes
+
+    def _pico(self, pico, valor, inferior, superior):
+        """Guarda o valor mais distante da faixa durante a excursão"""
+        if pico is None:
+            return valor
+        centro = (inferior + superior) / 2
+        return valor if abs(valor - centro) > abs(pico - centro) else pico
+
+    def abertos(self):
+        """Lista as chaves (variavel, severidade) com alerta aberto"""
+        return [chave for chave, atual in self.estados.items() if atual['estado'] in (ABERTO, RESOLVENDO)]
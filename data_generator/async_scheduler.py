@@ -0,0 +1,207 @@
+"""
+Agendador assíncrono de tarefas - Sistema Logística JIT
+Um único processo hospeda geração, retenção, recálculo de padrões e predições:
+cada tarefa roda em sua própria thread, então uma tarefa lenta não atrasa as outras
+"""
+
+import asyncio
+import random
+import signal
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+AMOSTRAS_DURACAO = 1000           # Janela das durações usadas nos percentis
+
+
+class EstatisticasTarefa:
+    """Contadores e tempos de uma tarefa"""
+
+    def __init__(self):
+        self.execucoes = 0
+        self.falhas = 0
+        self.sobreposicoes = 0        # Disparos pulados: a execução anterior não terminou
+        self.ticks_perdidos = 0       # Disparos que passaram sem o laço acordar (loop sobrecarregado)
+        self.atraso_max_ms = 0.0      # Maior atraso de início em relação ao horário agendado
+        self.duracoes_ms = deque(maxlen=AMOSTRAS_DURACAO)
+        self.ultimo_erro = None
+
+    def percentil(self, p):
+        if not self.duracoes_ms:
+            return 0.0
+        ordenadas = sorted(self.duracoes_ms)
+        return ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * p))]
+
+    def resumo(self):
+        return {
+            'execucoes': self.execucoes,
+            'falhas': self.falhas,
+            'sobreposicoes': self.sobreposicoes,
+            'ticks_perdidos': self.ticks_perdidos,
+            'p50_ms': self.percentil(0.50),
+            'p95_ms': self.percentil(0.95),
+            'max_ms': max(self.duracoes_ms) if self.duracoes_ms else 0.0,
+            'atraso_max_ms': self.atraso_max_ms,
+            'ultimo_erro': self.ultimo_erro,
+        }
+
+
+class Tarefa:
+    """
+    Tarefa periódica
+
+    - periodo_s: cadência fixa (o próximo disparo é início + n × período, sem deriva)
+    - jitter_s: atraso aleatório em [0, jitter_s] somado a cada disparo (não acumula)
+    - atraso_inicial_s: espera antes do primeiro disparo
+    """
+
+    def __init__(self, nome, funcao, periodo_s, jitter_s=0.0, atraso_inicial_s=0.0):
+        if periodo_s <= 0:
+            raise ValueError(f"Período inválido para a tarefa '{nome}': {periodo_s}")
+
+        self.nome = nome
+        self.funcao = funcao
+        self.periodo_s = periodo_s
+        self.jitter_s = jitter_s
+        self.atraso_inicial_s = atraso_inicial_s
+        self.em_execucao = False
+        self.estatisticas = EstatisticasTarefa()
+
+
+class AgendadorAssincrono:
+    """
+    Agendador de tarefas sobre asyncio
+
+    - Um laço de disparo por tarefa, com horário absoluto (loop.time())
+    - Funções síncronas rodam em um pool com uma thread por tarefa
+    - Sem sobreposição: se a execução anterior ainda roda, o disparo é pulado
+    """
+
+    def __init__(self, rng=None):
+        self.tarefas = []
+        # RNG próprio: o jitter não consome sorteios do gerador (replay com --seed)
+        self.rng = rng or random.Random()
+        self.executando = False
+        self._parada = None
+        self._execucoes = set()
+
+    def adicionar(self, nome, funcao, periodo_s, jitter_s=0.0, atraso_inicial_s=0.0):
+        tarefa = Tarefa(nome, funcao, periodo_s, jitter_s, atraso_inicial_s)
+        self.tarefas.append(tarefa)
+        return tarefa
+
+    def parar(self):
+        """Pede a parada; execuções em andamento terminam normalmente"""
+        self.executando = False
+        if self._parada:
+            self._parada.set()
+
+    async def _aguardar(self, segundos):
+        """Dorme até `segundos` ou até a parada; retorna False se parou"""
+        if segundos > 0:
+            try:
+                await asyncio.wait_for(self._parada.wait(), timeout=segundos)
+            except asyncio.TimeoutError:
+                pass
+        return self.executando
+
+    async def _rodar(self, tarefa, pool):
+        loop = asyncio.get_running_loop()
+        estatisticas = tarefa.estatisticas
+        inicio = time.perf_counter()
+        try:
+            await loop.run_in_executor(pool, tarefa.funcao)
+            estatisticas.execucoes += 1
+        except Exception as e:
+            estatisticas.falhas += 1
+            estatisticas.ultimo_erro = str(e)
+            print(f"❌ Erro na tarefa '{tarefa.nome}': {e}")
+        finally:
+            estatisticas.duracoes_ms.append((time.perf_counter() - inicio) * 1000)
+            tarefa.em_execucao = False
+
+    async def _laco(self, tarefa, pool):
+        loop = asyncio.get_running_loop()
+        estatisticas = tarefa.estatisticas
+        proximo = loop.time() + tarefa.atraso_inicial_s
+
+        while self.executando:
+            jitter = self.rng.uniform(0, tarefa.jitter_s) if tarefa.jitter_s else 0.0
+            if not await self._aguardar(proximo + jitter - loop.time()):
+                break
+
+            if tarefa.em_execucao:
+                estatisticas.sobreposicoes += 1
+            else:
+                atraso_ms = (loop.time() - proximo - jitter) * 1000
+                estatisticas.atraso_max_ms = max(estatisticas.atraso_max_ms, atraso_ms)
+                tarefa.em_execucao = True
+                execucao = asyncio.create_task(self._rodar(tarefa, pool))
+                self._execucoes.add(execucao)
+                execucao.add_done_callback(self._execucoes.discard)
+
+            # Horário absoluto: a duração da execução não desloca a grade
+            proximo += tarefa.periodo_s
+            atrasado = loop.time() - proximo
+            if atrasado > 0:
+                perdidos = int(atrasado // tarefa.periodo_s) + 1
+                estatisticas.ticks_perdidos += perdidos
+                proximo += perdidos * tarefa.periodo_s
+
+    async def executar(self, instalar_sinais=True):
+        """Roda todas as tarefas até parar()"""
+        self.executando = True
+        self._parada = asyncio.Event()
+        loop = asyncio.get_running_loop()
+
+        if instalar_sinais:
+            for sinal in (signal.SIGINT, signal.SIGTERM):
+                loop.add_signal_handler(sinal, self.parar)
+
+        with ThreadPoolExecutor(max_workers=max(1, len(self.tarefas)),
+                                thread_name_prefix="tarefa") as pool:
+            await asyncio.gather(*(self._laco(tarefa, pool) for tarefa in self.tarefas))
+            if self._execucoes:
+                await asyncio.gather(*self._execucoes)
+
+        if instalar_sinais:
+            for sinal in (signal.SIGINT, signal.SIGTERM):
+                loop.remove_signal_handler(sinal)
+
+    def mostrar_estatisticas(self):
+        """Tabela de tempos por tarefa"""
+        print("   Tarefa          | Execuções | Falhas | Puladas | p50 ms  | p95 ms  | max ms  | Atraso máx")
+        print("   " + "-" * 88)
+        for tarefa in self.tarefas:
+            r = tarefa.estatisticas.resumo()
+            print(f"   {tarefa.nome:<15} | {r['execucoes']:9d} | {r['falhas']:6d} | "
+                  f"{r['sobreposicoes'] + r['ticks_perdidos']:7d} | {r['p50_ms']:7.1f} | "
+                  f"{r['p95_ms']:7.1f} | {r['max_ms']:7.1f} | {r['atraso_max_ms']:7.1f} ms")
+
+
+def testar_agendador(segundos=5):
+    """Teste rápido: tarefa lenta não atrasa a rápida; sobreposições são puladas"""
+    print("🧪 Teste do Agendador Assíncrono")
+    print("=" * 40)
+
+    agendador = AgendadorAssincrono()
+    agendador.adicionar("rapida", lambda: time.sleep(0.01), periodo_s=0.1)
+    agendador.adicionar("lenta", lambda: time.sleep(0.75), periodo_s=0.5)
+    agendador.adicionar("com_jitter", lambda: None, periodo_s=0.5, jitter_s=0.2)
+
+    async def rodar():
+        asyncio.get_running_loop().call_later(segundos, agendador.parar)
+        await agendador.executar(instalar_sinais=False)
+
+    asyncio.run(rodar())
+    agendador.mostrar_estatisticas()
+
+    rapida = agendador.tarefas[0].estatisticas
+    print(f"\n   Rápida: {rapida.execucoes} execuções (esperado ~{int(segundos / 0.1)}), "
+          f"atraso máx {rapida.atraso_max_ms:.1f} ms")
+    print(f"   Lenta: {agendador.tarefas[1].estatisticas.sobreposicoes} disparos pulados por sobreposição")
+    print("\n✅ Teste concluído")
+
+
+if __name__ == "__main__":
+    testar_agendador()
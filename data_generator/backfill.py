@@ -0,0 +1,255 @@
+"""
+Backfill com relógio simulado - Sistema Logística JIT
+Gera N dias de ciclos consistentes (curvas, frota, caminhões, fazendas, eventos)
+tão rápido quanto a CPU permitir, com inserções em massa
+"""
+
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+sys.path.append(str(Path(__file__).parent.parent / "database"))
+from mock_generator_v2 import MockDataGeneratorV2
+from fleet_simulator import SimuladorFrota
+from connection import criar_conexao, executar_checkpoint, PERFIL_CARGA
+from statements import executar_operacoes, executar_lote
+from epoch import garantir_colunas_epoca
+
+# Comandos cuja ordem importa (ciclo de vida do alerta): não podem ser agrupados
+COMANDOS_ORDENADOS = {'abrir_evento_limite', 'atualizar_evento_limite', 'resolver_evento_limite'}
+
+# Tamanhos pré-definidos de fixture (intervalo maior nos maiores para caber em disco)
+PRESETS_FIXTURE = {
+    '1dia': {'dias': 1, 'intervalo_s': 10},       # ~8.6k ciclos, intervalo do scheduler
+    '30dias': {'dias': 30, 'intervalo_s': 60},    # ~43k ciclos
+    'safra': {'dias': 240, 'intervalo_s': 300},   # abril-novembro, ~69k ciclos
+}
+
+PASTA_FIXTURES = Path(__file__).parent.parent / "database" / "fixtures"
+
+
+class RelogioSimulado:
+    """Relógio injetável no gerador: avança um passo fixo por ciclo"""
+
+    def __init__(self, inicio, passo_s=10):
+        self.agora = inicio
+        self.passo = timedelta(seconds=passo_s)
+
+    def __call__(self):
+        return self.agora
+
+    def avancar(self):
+        self.agora += self.passo
+
+
+def agrupar_operacoes(operacoes):
+    """
+    Agrupa as inserções de vários ciclos por comando (um executemany grande por tabela)
+    Operações de alerta mantêm a ordem original e vão no final
+    """
+    insercoes = {}
+    ordenadas = []
+
+    for operacao in operacoes:
+        if operacao[0] in COMANDOS_ORDENADOS:
+            ordenadas.append(operacao)
+        else:
+            insercoes.setdefault(operacao[0], []).append(operacao)
+
+    return [op for lista in insercoes.values() for op in lista] + ordenadas
+
+
+class Backfill:
+    """
+    Gera histórico com o MockDataGeneratorV2 dirigido por um relógio simulado
+
+    - Cada ciclo avança o relógio `intervalo_s` segundos (sem esperar)
+    - As operações de `ciclos_por_transacao` ciclos são gravadas em uma transação
+    - Vetorizado (padrão): blocos de ciclos gerados em colunas pela API em lote;
+      escalar: um montar_ciclo() por ciclo
+    """
+
+    def __init__(self, db_path="database/logistics.db", dias=1, intervalo_s=10,
+                 fim=None, ciclos_por_transacao=2000, vetorizado=True, frota_simulada=False,
+                 semente=None):
+        self.db_path = Path(db_path)
+        self.dias = dias
+        self.intervalo_s = intervalo_s
+        self.fim = fim or datetime.now().replace(microsecond=0)
+        self.ciclos_por_transacao = ciclos_por_transacao
+        # A simulação de frota avança ciclo a ciclo: usa o caminho escalar
+        self.frota_simulada = frota_simulada
+        self.vetorizado = vetorizado and not frota_simulada
+        self.semente = semente
+
+        if not self.db_path.exists():
+            raise FileNotFoundError(f"Banco não encontrado: {self.db_path}")
+
+    def executar(self):
+        """Roda o backfill e retorna as métricas"""
+        inicio = self.fim - timedelta(days=self.dias)
+        total_ciclos = int(self.dias * 86400 / self.intervalo_s)
+
+        relogio = RelogioSimulado(inicio, self.intervalo_s)
+        gerador = MockDataGeneratorV2(self.db_path, relogio=relogio, verboso=False, semente=self.semente)
+        simulador = None
+        if self.frota_simulada:
+            simulador = SimuladorFrota(inicio, rng=random.Random(gerador.rng.getrandbits(64)),
+                                       padroes=gerador.padroes)
+            gerador.simulador = simulador
+            # estado_caminhao/distribuicao_frota passam a conter só a frota simulada
+            gerador.garantir_tabelas_caminhoes()
+
+        print(f"⏩ Backfill: {self.dias} dia(s), {total_ciclos} ciclos de {self.intervalo_s}s")
+        print(f"   Período: {inicio:%Y-%m-%d %H:%M} → {self.fim:%Y-%m-%d %H:%M}")
+        print(f"   Banco: {self.db_path}")
+        print(f"   Modo: {'vetorizado (lote)' if self.vetorizado else 'escalar'}"
+              f"{' + frota simulada' if simulador else ''}"
+              f"{f' | semente {self.semente}' if self.semente is not None else ''}")
+
+        conn = criar_conexao(self.db_path, perfil=PERFIL_CARGA)
+        cursor = conn.cursor()
+        garantir_colunas_epoca(cursor)
+        conn.commit()
+
+        total_operacoes = 0
+        t_inicio = time.perf_counter()
+
+        try:
+            feitos = 0
+            while feitos < total_ciclos:
+                k = min(self.ciclos_por_transacao, total_ciclos - feitos)
+
+                if self.vetorizado:
+                    timestamps = [relogio.agora + relogio.passo * i for i in range(k)]
+                    linhas, alertas, _ = gerador.montar_lote(timestamps)
+                    relogio.agora += relogio.passo * k
+                    total_operacoes += executar_lote(cursor, linhas)
+                    total_operacoes += executar_operacoes(cursor, alertas)
+                else:
+                    pendentes = []
+                    for _ in range(k):
+                        _, operacoes = gerador.montar_ciclo()
+                        pendentes += operacoes
+                        relogio.avancar()
+                    total_operacoes += executar_operacoes(cursor, agrupar_operacoes(pendentes))
+
+                conn.commit()
+                feitos += k
+
+                decorrido = time.perf_counter() - t_inicio
+                print(f"   📅 {relogio.agora:%Y-%m-%d %H:%M} | {feitos}/{total_ciclos} ciclos "
+                      f"| {feitos / decorrido:.0f} ciclos/s")
+
+            executar_checkpoint(conn, 'TRUNCATE')
+        finally:
+            conn.close()
+
+        decorrido = time.perf_counter() - t_inicio
+        metricas = {
+            'ciclos': total_ciclos,
+            'operacoes': total_operacoes,
+            'segundos': decorrido,
+            'ciclos_por_s': total_ciclos / decorrido if decorrido else 0.0,
+            'operacoes_por_s': total_operacoes / decorrido if decorrido else 0.0,
+            'aceleracao': self.dias * 86400 / decorrido if decorrido else 0.0,
+            'tamanho_mb': self.db_path.stat().st_size / 1024 / 1024,
+        }
+
+        print(f"\n✅ Backfill concluído em {decorrido:.1f}s")
+        print(f"   🔄 {metricas['ciclos']} ciclos ({metricas['ciclos_por_s']:.0f} ciclos/s)")
+        print(f"   💾 {metricas['operacoes']} operações ({metricas['operacoes_por_s']:.0f} operações/s)")
+        print(f"   ⏱️ {metricas['aceleracao']:.0f}x mais rápido que o tempo real")
+        print(f"   📦 Banco: {metricas['tamanho_mb']:.1f} MB")
+
+        return metricas
+
+
+def criar_fixture(preset, pasta=PASTA_FIXTURES):
+    """Cria um banco de fixture do zero com o tamanho pré-definido"""
+    from init_db import create_database
+    from run_database_update import executar_atualizacao
+
+    db_path = Path(pasta) / f"logistics_{preset}.db"
+
+    # Fixture é gerada: sempre recriada do zero
+    for arquivo in [db_path, Path(f"{db_path}-wal"), Path(f"{db_path}-shm")]:
+        if arquivo.exists():
+            arquivo.unlink()
+
+    print(f"🧱 Fixture '{preset}': {db_path}")
+    create_database(db_path)
+    executar_atualizacao(str(db_path))
+    print()
+
+    Backfill(db_path, **PRESETS_FIXTURE[preset]).executar()
+    return db_path
+
+
+def main():
+    """Função principal"""
+    args = sys.argv[1:]
+
+    if "--help" in args or "-h" in args:
+        print(f"""
+⏩ Backfill com relógio simulado - Sistema Logística JIT
+
+USO:
+  python data_generator/backfill.py --dias 7                  # 7 dias até agora no banco padrão
+  python data_generator/backfill.py --dias 7 --intervalo 30   # Ciclos de 30s simulados
+  python data_generator/backfill.py --dias 1 --db outro.db    # Banco específico
+  python data_generator/backfill.py --dias 1 --escalar        # Um ciclo por vez (sem API em lote)
+  python data_generator/backfill.py --dias 7 --frota-simulada # Frota por eventos discretos
+  python data_generator/backfill.py --dias 1 --seed 42        # Reprodutível (mesmos dados a cada execução)
+  python data_generator/backfill.py --fixture 1dia            # Fixture em database/fixtures/
+  python data_generator/backfill.py --fixture todas           # {', '.join(PRESETS_FIXTURE)}
+""")
+        return
+
+    if "--fixture" in args:
+        try:
+            preset = args[args.index("--fixture") + 1]
+        except IndexError:
+            print("❌ Erro: --fixture precisa de um valor")
+            return
+
+        presets = list(PRESETS_FIXTURE) if preset == "todas" else [preset]
+        for nome in presets:
+            if nome not in PRESETS_FIXTURE:
+                print(f"❌ Fixture desconhecida: {nome} (opções: {', '.join(PRESETS_FIXTURE)}, todas)")
+                return
+            criar_fixture(nome)
+            print()
+        return
+
+    opcoes = {}
+    for flag, chave in [("--dias", "dias"), ("--intervalo", "intervalo_s"), ("--db", "db_path")]:
+        if flag in args:
+            try:
+                valor = args[args.index(flag) + 1]
+                opcoes[chave] = valor if chave == "db_path" else float(valor)
+            except (IndexError, ValueError):
+                print(f"❌ Erro: {flag} precisa de um valor válido")
+                return
+
+    if "--seed" in args:
+        try:
+            opcoes["semente"] = int(args[args.index("--seed") + 1])
+        except (IndexError, ValueError):
+            print("❌ Erro: --seed precisa de um inteiro")
+            return
+
+    opcoes["vetorizado"] = "--escalar" not in args
+    opcoes["frota_simulada"] = "--frota-simulada" in args
+
+    try:
+        Backfill(**opcoes).executar()
+    except FileNotFoundError as e:
+        print(f"❌ {e}")
+
+
+if __name__ == "__main__":
+    main()
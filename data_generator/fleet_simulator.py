@@ -0,0 +1,472 @@
+"""
+Simulador de eventos discretos da frota - Sistema Logística JIT
+Cada caminhão percorre T1 -> T2 -> T3 -> T4 com tempos dependentes da distância
+e da hora (padrões de docs/query.md); a fila de eventos é um heap
+"""
+
+import heapq
+import random
+import sys
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+# Fases do ciclo (mesma convenção de estado_frota)
+T1, T2, T3, T4 = "T1", "T2", "T3", "T4"
+PROXIMA_FASE = {T1: T2, T2: T3, T3: T4, T4: T1}
+
+# Distribuição média observada (16 T1 + 8 T2 + 14 T3 + 8 T4), usada no estado inicial
+DISTRIBUICAO_INICIAL = {T1: 16, T2: 8, T3: 14, T4: 8}
+
+# Carregamento (horas). Pela lei de Little, 8 de 46 caminhões em T2 com ciclo médio
+# de ~7h (90% perto a 6.5h, 10% longe a 11.8h) dá ~1.2h; o 2.0 de docs/query.md é a
+# convenção das consultas (T_1 + 2.0 + T_3 + T_4), não tempo medido
+T2_MEDIO_H = 1.2
+
+# Ida + volta (T1 + T3) cresce exponencialmente com a distância:
+# viagem_h = A * d * exp(B * d), calibrado para ciclo 6.5h (<50km) e 11.8h (50-80km)
+VIAGEM_A = 0.1265
+VIAGEM_B = 0.0063
+FRACAO_T3 = 0.466                 # 14 T3 para 16 T1 na distribuição média
+
+# Fator de trânsito por hora, médio ao longo do trajeto: madrugada e manhã livres
+# (longe saindo às 6h fecha o ciclo em 6.8h), pico à tarde
+FATOR_HORARIO = [(0, 0.4), (6, 0.3), (10, 0.4), (13, 1.2), (15, 2.0), (18, 1.6), (21, 0.6), (24, 0.4)]
+PONTOS_TRAJETO = 4                # Amostras do fator ao longo de T1/T3
+
+# Fazendas >50km despachadas às 15h: ciclo de 22.7h contra 11.8h na média
+DISTANCIA_LONGE_KM = 50.0
+HORA_PENALIDADE = 15
+PENALIDADE_LONGE_15H_H = 7.0
+
+# T4 (tempo na usina) por hora de chegada: 0.58h às 7h até 4.41h à 0h; o pico da
+# madrugada é estreito para 8 caminhões no pátio na média (T4 ~1.2h, como T2)
+T4_HORARIO = [(0, 4.41), (2, 1.1), (5, 0.65), (7, 0.58), (12, 0.65), (15, 0.75), (20, 0.85), (22, 1.2),
+              (24, 4.41)]
+T4_MIN_H = 0.1                    # Faixa válida após remoção de outliers
+T4_MAX_H = 10.0
+
+PROPORCAO_VIAGENS_PERTO = 0.9     # 90% das viagens em fazendas <50km
+
+
+def _interpolar(curva, hora):
+    """Interpolação linear em uma curva [(hora, valor), ...] de 0h a 24h"""
+    for (h0, v0), (h1, v1) in zip(curva, curva[1:]):
+        if h0 <= hora <= h1:
+            return v0 + (v1 - v0) * (hora - h0) / (h1 - h0)
+    return curva[-1][1]
+
+
+def tempo_viagem_h(distancia_km):
+    """Tempo de ida + volta (T1 + T3) sem efeito de horário"""
+    return VIAGEM_A * distancia_km * 2.718281828459045 ** (VIAGEM_B * distancia_km)
+
+
+class Caminhao:
+    """Estado de um caminhão na simulação"""
+
+    __slots__ = ('placa', 'categoria', 'fase', 'inicio_fase', 'fim_fase',
+                 'fazenda', 'distancia', 'carga_kg', 't1', 't2', 't3', 't4', 'descarga_min')
+
+    def __init__(self, placa, categoria):
+        self.placa = placa
+        self.categoria = categoria
+        self.fase = T1
+        self.inicio_fase = 0.0
+        self.fim_fase = 0.0
+        self.fazenda = None
+        self.distancia = 0.0
+        self.carga_kg = 0
+        self.t1 = self.t2 = self.t3 = self.t4 = 0.0
+        self.descarga_min = 0.0
+
+
+class SimuladorFrota:
+    """
+    Simulação de eventos discretos da frota
+
+    - Um evento por caminhão no heap: o fim da fase atual
+    - Tempo interno em segundos desde `inicio`; `avancar_ate` processa os eventos
+    - Chegadas e descargas alimentam as taxas do pátio (janela de 1h)
+    - Cada chegada ao pátio gera uma linha de transporte_detalhado
+    - Aquecimento: a simulação começa `aquecimento_h` antes de `inicio`, para
+      o pátio e as taxas já estarem em regime quando o gerador começa a ler
+    """
+
+    def __init__(self, inicio, num_caminhoes=46, fazendas=None, rng=None, padroes=None, aquecimento_h=24,
+                 prefixo_placa=""):
+        self.rng = rng or random.Random()
+        self.inicio = inicio - timedelta(hours=aquecimento_h)
+        self.agora_s = 0.0
+
+        # Reaproveita tipos, cargas e nomes do gerador de padrões
+        if padroes is None:
+            from patterns import PadroesNaturais
+            padroes = PadroesNaturais()
+        self.padroes = padroes
+
+        self.fazendas_perto, self.fazendas_longe = self._distribuir_fazendas(fazendas or padroes.FAZENDAS)
+        # FATOR_HORARIO tabelado por minuto (consultado várias vezes por viagem)
+        self.fator_minuto = [_interpolar(FATOR_HORARIO, minuto / 60) for minuto in range(24 * 60)]
+
+        self.caminhoes = []
+        self.heap = []
+        self.sequencia = 0
+        self.contagem = {T1: 0, T2: 0, T3: 0, T4: 0}
+        self.carga_patio_kg = 0
+
+        self.chegadas = deque()          # (instante_s, carga_kg)
+        self.descargas = deque()         # (instante_s, carga_kg)
+        self.viagens = []                # linhas de transporte_detalhado pendentes
+        self.mudancas_status = []        # mudanças de fase pendentes (atualizar_status_caminhao)
+        self.eventos_processados = 0
+
+        # Prefixo identifica usina/frota na placa (ex: "ABC" -> ABC1234)
+        placas = set()
+        for _ in range(num_caminhoes):
+            placa = prefixo_placa + padroes.gerar_placa()[len(prefixo_placa):]
+            while placa in placas:
+                placa = prefixo_placa + padroes.gerar_placa()[len(prefixo_placa):]
+            placas.add(placa)
+            self.caminhoes.append(Caminhao(placa, self.rng.choice(padroes.TIPOS_CAMINHAO)))
+
+        self._estado_inicial()
+
+        # Descarta o aquecimento; o estado de partida vira uma mudança por caminhão
+        self.avancar_ate(inicio)
+        self.viagens = []
+        self.mudancas_status = [self._status(caminhao, self.agora_s) for caminhao in self.caminhoes]
+        self.eventos_processados = 0
+
+    # ------------------------------------------------------------------
+    # Modelo de tempos
+    # ------------------------------------------------------------------
+
+    def _distribuir_fazendas(self, nomes):
+        """
+        Fixa uma distância por fazenda: ~80% perto (<50km), o resto longe (50-80km)
+        As distâncias são estratificadas na faixa: com poucas fazendas longe (uma, com
+        as 9 de patterns.py), um sorteio livre mudaria o ciclo médio longe de 9h a 16h
+        """
+        longe = [nome for i, nome in enumerate(nomes) if i % 5 == 4]
+        perto = [nome for nome in nomes if nome not in longe]
+
+        def espalhar(fazendas, minimo, maximo):
+            passo = (maximo - minimo) / len(fazendas)
+            return [(nome, round(minimo + passo * (i + self.rng.uniform(0.45, 0.55)), 1))
+                    for i, nome in enumerate(fazendas)]
+
+        perto = espalhar(perto, 25.0, 50.0)
+        return perto, espalhar(longe, 50.0, 80.0) if longe else perto
+
+    def _hora(self, instante_s):
+        """Hora do dia (fracionária) de um instante da simulação"""
+        momento = self.inicio + timedelta(seconds=instante_s)
+        return momento.hour + momento.minute / 60
+
+    def _escolher_fazenda(self):
+        if self.rng.random() < PROPORCAO_VIAGENS_PERTO:
+            return self.rng.choice(self.fazendas_perto)
+        return self.rng.choice(self.fazendas_longe)
+
+    def _fator_trajeto(self, hora, base_h):
+        """Fator de trânsito médio ao longo do trajeto (não só o da hora de saída)"""
+        fator = self.fator_minuto
+        return sum(fator[int((hora + base_h * (k + 0.5) / PONTOS_TRAJETO) % 24 * 60)]
+                   for k in range(PONTOS_TRAJETO)) / PONTOS_TRAJETO
+
+    def _duracao_t1(self, caminhao, instante_s):
+        base = tempo_viagem_h(caminhao.distancia) * (1 - FRACAO_T3)
+        return base * self._fator_trajeto(self._hora(instante_s), base) * self.rng.uniform(0.85, 1.15)
+
+    def _duracao_t3(self, caminhao, instante_s):
+        hora = self._hora(instante_s)
+        duracao = tempo_viagem_h(caminhao.distancia) * FRACAO_T3
+        duracao *= self._fator_trajeto(hora, duracao) * self.rng.uniform(0.85, 1.15)
+        if caminhao.distancia > DISTANCIA_LONGE_KM and int(hora) == HORA_PENALIDADE:
+            duracao += PENALIDADE_LONGE_15H_H * self.rng.uniform(0.8, 1.2)
+        return duracao
+
+    def _duracao_t4(self, instante_s):
+        t4 = _interpolar(T4_HORARIO, self._hora(instante_s)) * self.rng.lognormvariate(0, 0.3)
+        return max(T4_MIN_H, min(T4_MAX_H, t4))
+
+    def _duracao_fase(self, caminhao, fase, instante_s):
+        if fase == T1:
+            return self._duracao_t1(caminhao, instante_s)
+        if fase == T2:
+            return T2_MEDIO_H * self.rng.uniform(0.8, 1.2)
+        if fase == T3:
+            return self._duracao_t3(caminhao, instante_s)
+        return self._duracao_t4(instante_s)
+
+    # ------------------------------------------------------------------
+    # Motor de eventos
+    # ------------------------------------------------------------------
+
+    def _agendar(self, caminhao, indice, duracao_h):
+        caminhao.fim_fase = caminhao.inicio_fase + duracao_h * 3600
+        self.sequencia += 1
+        heapq.heappush(self.heap, (caminhao.fim_fase, self.sequencia, indice))
+
+    def _entrar_fase(self, caminhao, indice, fase, instante_s):
+        """Coloca o caminhão em uma fase e agenda o fim dela"""
+        caminhao.fase = fase
+        caminhao.inicio_fase = instante_s
+        self.contagem[fase] += 1
+
+        if fase == T1:
+            caminhao.fazenda, caminhao.distancia = self._escolher_fazenda()
+        elif fase == T2:
+            caminhao.carga_kg = self.rng.randint(self.padroes.CARGA_MEDIA_MIN, self.padroes.CARGA_MEDIA_MAX)
+        elif fase == T4:
+            self.carga_patio_kg += caminhao.carga_kg
+
+        duracao = self._duracao_fase(caminhao, fase, instante_s)
+        setattr(caminhao, fase.lower(), duracao)
+        self._agendar(caminhao, indice, duracao)
+        self.mudancas_status.append(self._status(caminhao, instante_s))
+
+    def _estado_inicial(self):
+        """Espalha a frota pelas fases (distribuição média) com tempo já decorrido aleatório"""
+        fases = list(DISTRIBUICAO_INICIAL)
+        pesos = list(DISTRIBUICAO_INICIAL.values())
+
+        for indice, caminhao in enumerate(self.caminhoes):
+            fase = self.rng.choices(fases, pesos)[0]
+            caminhao.fazenda, caminhao.distancia = self._escolher_fazenda()
+            caminhao.carga_kg = self.rng.randint(self.padroes.CARGA_MEDIA_MIN, self.padroes.CARGA_MEDIA_MAX)
+            caminhao.t1 = self._duracao_t1(caminhao, 0.0)
+            caminhao.t2 = self._duracao_fase(caminhao, T2, 0.0)
+            caminhao.t3 = self._duracao_t3(caminhao, 0.0)
+
+            duracao = self._duracao_fase(caminhao, fase, 0.0)
+            caminhao.fase = fase
+            caminhao.inicio_fase = -duracao * 3600 * self.rng.random()
+            setattr(caminhao, fase.lower(), duracao)
+            self.contagem[fase] += 1
+            if fase == T4:
+                self.carga_patio_kg += caminhao.carga_kg
+            self._agendar(caminhao, indice, duracao)
+
+    def _finalizar_fase(self, indice, instante_s):
+        """Trata o fim de fase de um caminhão e o coloca na próxima"""
+        caminhao = self.caminhoes[indice]
+        fase = caminhao.fase
+        self.contagem[fase] -= 1
+
+        if fase == T3:
+            # Chegada ao pátio: a duração de T4 já é sorteada na entrada
+            self.chegadas.append((instante_s, caminhao.carga_kg))
+            self._entrar_fase(caminhao, indice, T4, instante_s)
+            self._registrar_viagem(caminhao, instante_s)
+            return
+
+        if fase == T4:
+            self.carga_patio_kg -= caminhao.carga_kg
+            self.descargas.append((instante_s, caminhao.carga_kg))
+
+        self._entrar_fase(caminhao, indice, PROXIMA_FASE[fase], instante_s)
+
+    def _status(self, caminhao, instante_s):
+        """Mudança de fase (mesma ordem de atualizar_status_caminhao)"""
+        return (caminhao.placa, caminhao.fase, caminhao.carga_kg, caminhao.categoria,
+                self.inicio + timedelta(seconds=instante_s))
+
+    def _registrar_viagem(self, caminhao, instante_s):
+        """Linha de transporte_detalhado (mesma ordem de inserir_transporte_detalhado)"""
+        chegada = self.inicio + timedelta(seconds=instante_s)
+        caminhao.descarga_min = min(caminhao.t4 * 60, self.rng.uniform(20, 60))
+
+        self.viagens.append((
+            chegada,
+            chegada,
+            caminhao.placa,
+            round(caminhao.t1, 2),
+            round(caminhao.t3, 2),
+            round(caminhao.t4, 2),
+            caminhao.carga_kg,
+            caminhao.distancia,
+            caminhao.categoria,
+            round(caminhao.t1 + caminhao.t2 + caminhao.t3 + caminhao.t4, 2),
+            T4,
+            round(caminhao.distancia / caminhao.t3, 1),
+            round(caminhao.descarga_min, 1),
+            chegada
+        ))
+
+    def avancar_ate(self, instante):
+        """Processa todos os eventos até `instante` (datetime)"""
+        limite_s = (instante - self.inicio).total_seconds()
+        heap = self.heap
+
+        while heap and heap[0][0] <= limite_s:
+            instante_s, _, indice = heapq.heappop(heap)
+            self._finalizar_fase(indice, instante_s)
+            self.eventos_processados += 1
+
+        self.agora_s = max(self.agora_s, limite_s)
+
+    # ------------------------------------------------------------------
+    # Saídas para o gerador
+    # ------------------------------------------------------------------
+
+    def _janela_hora(self, eventos):
+        """Descarta eventos com mais de 1h e retorna (quantidade, toneladas)"""
+        while eventos and eventos[0][0] < self.agora_s - 3600:
+            eventos.popleft()
+        return len(eventos), sum(carga for _, carga in eventos) / 1000
+
+    def estado(self):
+        """Estado atual da frota e do pátio (campos de estado_frota / dados_tempo_real)"""
+        chegadas, ton_entrada = self._janela_hora(self.chegadas)
+        _, ton_saida = self._janela_hora(self.descargas)
+
+        # Previsão: caminhões em T3 que chegam na próxima hora (conhecido pelo heap)
+        horizonte = self.agora_s + 3600
+        previsao = sum(1 for c in self.caminhoes if c.fase == T3 and c.fim_fase <= horizonte)
+
+        em_movimento = [c.carga_kg for c in self.caminhoes if c.fase in (T3, T4)]
+        carga_media = sum(em_movimento) / len(em_movimento) if em_movimento else 70000
+
+        return {
+            'distribuicao_frota': {
+                't1_voltando': self.contagem[T1],
+                't2_carregando': self.contagem[T2],
+                't3_indo': self.contagem[T3],
+                't4_patio': self.contagem[T4]
+            },
+            'carga_media_kg': round(carga_media),
+            # Pátio = carga dos caminhões em T4 (docs/Calculos.md); o mesmo valor para
+            # o estoque dos alertas e o físico, entradas e saídas fecham o balanço
+            'estoque_patio_ton': round(self.carga_patio_kg / 1000, 1),
+            'estoque_patio_fisico_ton': round(self.carga_patio_kg / 1000, 1),
+            'taxa_entrada_patio_ton_h': round(ton_entrada, 1),
+            'taxa_saida_patio_ton_h': round(ton_saida, 1),
+            'taxa_chegada_caminhoes_hora': float(chegadas),
+            'previsao_chegadas_prox_hora': previsao
+        }
+
+    def drenar_viagens(self):
+        """Retorna e limpa as linhas de transporte_detalhado geradas desde a última chamada"""
+        viagens, self.viagens = self.viagens, []
+        return viagens
+
+    def drenar_status(self):
+        """Retorna e limpa as mudanças de fase dos caminhões desde a última chamada"""
+        mudancas, self.mudancas_status = self.mudancas_status, []
+        return mudancas
+
+
+# Referências de docs/query.md e tolerância relativa aceita pelo autoteste
+REFERENCIAS_CICLO = {
+    'perto': (6.5, 0.10),
+    'longe': (11.8, 0.10),
+    'longe_15h': (22.7, 0.15),
+    'longe_6h': (6.8, 0.15),
+}
+TOLERANCIA_FROTA = 2.0            # Caminhões por fase (escala com a frota), média horária
+
+
+def testar_simulador(num_caminhoes=46, dias=30, semente=2025):
+    """
+    Roda a simulação e confere os tempos de ciclo e a distribuição média da frota
+    com os padrões de docs/query.md; retorna True se tudo ficou na tolerância
+    """
+    print("🧪 Simulador de eventos discretos da frota")
+    print(f"   {num_caminhoes} caminhões, {dias} dias simulados, semente {semente}")
+    print("=" * 60)
+
+    inicio = datetime(2025, 4, 1)
+    simulador = SimuladorFrota(inicio, num_caminhoes=num_caminhoes, rng=random.Random(semente))
+
+    # Avança de hora em hora para a distribuição média da frota
+    t_inicio = time.perf_counter()
+    viagens = []
+    soma_frota = {T1: 0, T2: 0, T3: 0, T4: 0}
+    for hora in range(1, dias * 24 + 1):
+        simulador.avancar_ate(inicio + timedelta(hours=hora))
+        for fase in soma_frota:
+            soma_frota[fase] += simulador.contagem[fase]
+        if hora % 24 == 0:
+            viagens += simulador.drenar_viagens()
+    decorrido = time.perf_counter() - t_inicio
+
+    print(f"⏱️ {simulador.eventos_processados} eventos em {decorrido:.2f}s "
+          f"({simulador.eventos_processados / decorrido:,.0f} eventos/s, {dias / decorrido:.1f} dias/s)")
+    print(f"🚚 {len(viagens)} viagens registradas")
+
+    # Índices da linha de transporte_detalhado
+    def media(linhas):
+        return sum(v[9] for v in linhas) / len(linhas) if linhas else 0.0
+
+    # Hora de saída da fazenda (início de T3) = chegada - T3
+    def hora_saida(v):
+        return (v[0] - timedelta(hours=v[4])).hour
+
+    perto = [v for v in viagens if v[7] < DISTANCIA_LONGE_KM]
+    longe = [v for v in viagens if v[7] >= DISTANCIA_LONGE_KM]
+    faixas = [
+        ('perto', "Perto (<50km)", perto),
+        ('longe', "Longe (50-80km)", longe),
+        ('longe_15h', "Longe, saída 15h", [v for v in longe if hora_saida(v) == HORA_PENALIDADE]),
+        ('longe_6h', "Longe, saída 6h", [v for v in longe if hora_saida(v) == 6]),
+    ]
+
+    aprovado = True
+    print(f"\n{'Faixa':<22} {'Viagens':>8} {'Ciclo médio':>12} {'Referência':>11}")
+    print("-" * 58)
+    for chave, nome, linhas in faixas:
+        referencia, tolerancia = REFERENCIAS_CICLO[chave]
+        ok = bool(linhas) and abs(media(linhas) - referencia) <= referencia * tolerancia
+        aprovado = aprovado and ok
+        print(f"{nome:<22} {len(linhas):>8} {media(linhas):>11.1f}h {referencia:>9.1f}h {'✅' if ok else '❌'}")
+
+    # Distribuição média por hora contra 16/8/14/8 (escalada para o tamanho da frota)
+    escala = num_caminhoes / sum(DISTRIBUICAO_INICIAL.values())
+    print(f"\n{'Fase':<6} {'Média':>7} {'Referência':>11}")
+    for fase, referencia in DISTRIBUICAO_INICIAL.items():
+        observado = soma_frota[fase] / (dias * 24)
+        ok = abs(observado - referencia * escala) <= TOLERANCIA_FROTA * escala
+        aprovado = aprovado and ok
+        print(f"{fase:<6} {observado:>7.1f} {referencia * escala:>11.1f} {'✅' if ok else '❌'}")
+
+    aprovado = aprovado and sum(simulador.contagem.values()) == num_caminhoes
+    print(f"\n{'✅ APROVADO' if aprovado else '❌ FALHOU'}")
+    return aprovado
+
+
+def main():
+    """Função principal"""
+    args = sys.argv[1:]
+
+    if "--help" in args or "-h" in args:
+        print(f"""
+🚛 Simulador de eventos discretos da frota - Sistema Logística JIT
+
+USO:
+  python data_generator/fleet_simulator.py                          # 46 caminhões, 30 dias
+  python data_generator/fleet_simulator.py --caminhoes 46 --dias 60
+  python data_generator/fleet_simulator.py --semente 7              # Outra semente (padrão 2025)
+
+Roda a simulação e confere com docs/query.md: ciclo médio perto 6.5h, longe 11.8h,
+longe saindo às 15h 22.7h e às 6h 6.8h, e a frota média 16/8/14/8 (±{TOLERANCIA_FROTA:.0f}
+caminhões por fase). Sai com código 1 se algum valor ficar fora da tolerância.
+Uso pelo gerador: python data_generator/scheduler_v2.py --frota-simulada
+""")
+        return
+
+    opcoes = {}
+    for flag, chave in [("--caminhoes", "num_caminhoes"), ("--dias", "dias"), ("--semente", "semente")]:
+        if flag in args:
+            try:
+                opcoes[chave] = int(args[args.index(flag) + 1])
+            except (IndexError, ValueError):
+                print(f"❌ Erro: {flag} precisa de um valor válido")
+                sys.exit(1)
+
+    sys.exit(0 if testar_simulador(**opcoes) else 1)
+
+
+if __name__ == "__main__":
+    main()
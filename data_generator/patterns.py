@@ -6,13 +6,23 @@ Valores dentro das zonas de segurança na maioria do tempo
 import random
 from datetime import datetime
 
+import numpy as np
+
 class PadroesNaturais:
     """
     Versão REALISTA - baseada nas zonas de segurança dos gráficos.
     Os valores ficam DENTRO dos limites seguros 80% do tempo.
     """
     
-    def __init__(self):
+    def __init__(self, relogio=None, rng=None):
+        # Relógio injetável: datetime.now em produção, relógio simulado no backfill
+        self.relogio = relogio or datetime.now
+        
+        # RNG explícito (random.Random) para execuções reproduzíveis com semente;
+        # o gerador NumPy da API em lote é derivado dele
+        self.rng = rng or random.Random()
+        self.rng_lote = np.random.default_rng(self.rng.getrandbits(64))
+        
         # FAIXAS REALISTAS baseadas nas linhas de segurança dos gráficos
         
         # COLHEITABILIDADE: zona segura entre 40-80 ton/h (gráfico simple_chart)
@@ -92,8 +102,8 @@ class PadroesNaturais:
             variacao_max = valor_anterior * self.VARIACAO_MAXIMA_POR_CICLO
             
             # 90% do tempo: variação pequena
-            if random.random() < 0.9:
-                variacao = random.uniform(-variacao_max, variacao_max)
+            if self.rng.random() < 0.9:
+                variacao = self.rng.uniform(-variacao_max, variacao_max)
                 novo_valor = valor_anterior + variacao
                 
                 # Garantir que está dentro dos limites absolutos
@@ -101,17 +111,17 @@ class PadroesNaturais:
                 return round(novo_valor, 2)
         
         # Decidir se fica na zona segura (85% do tempo)
-        if random.random() < self.PROBABILIDADE_ZONA_SEGURA:
+        if self.rng.random() < self.PROBABILIDADE_ZONA_SEGURA:
             # Zona segura
-            return round(random.uniform(zona_min, zona_max), 2)
+            return round(self.rng.uniform(zona_min, zona_max), 2)
         else:
             # Fora da zona segura (15% do tempo)
-            if random.random() < 0.5:
+            if self.rng.random() < 0.5:
                 # Abaixo da zona segura
-                return round(random.uniform(absoluto_min, zona_min), 2)
+                return round(self.rng.uniform(absoluto_min, zona_min), 2)
             else:
                 # Acima da zona segura
-                return round(random.uniform(zona_max, absoluto_max), 2)
+                return round(self.rng.uniform(zona_max, absoluto_max), 2)
     
     def gerar_colheitabilidade(self):
         """Gera colheitabilidade REALISTA - na zona segura 85% do tempo"""
@@ -190,9 +200,9 @@ class PadroesNaturais:
             t4_anterior = frota_anterior.get('t4_patio', 7)
             
             # Variações pequenas (máximo ±2 caminhões por vez)
-            t1 = max(8, min(16, t1_anterior + random.randint(-2, 2)))
-            t2_fixo = max(6, min(10, t2_anterior + random.randint(-1, 1)))
-            t4 = max(5, min(10, t4_anterior + random.randint(-2, 2)))
+            t1 = max(8, min(16, t1_anterior + self.rng.randint(-2, 2)))
+            t2_fixo = max(6, min(10, t2_anterior + self.rng.randint(-1, 1)))
+            t4 = max(5, min(10, t4_anterior + self.rng.randint(-2, 2)))
             t3 = self.FROTA_TOTAL - t2_fixo - t1 - t4
             
             # Garantir que T3 fique razoável
@@ -212,7 +222,7 @@ class PadroesNaturais:
         Calcula estoque baseado na distribuição da frota
         Mas respeitando o estoque total desejado
         """
-        carga_media = random.randint(self.CARGA_MEDIA_MIN, self.CARGA_MEDIA_MAX)
+        carga_media = self.rng.randint(self.CARGA_MEDIA_MIN, self.CARGA_MEDIA_MAX)
         
         # Calcular proporções realistas
         total_caminhoes = sum(distribuicao_frota.values())
@@ -238,53 +248,64 @@ class PadroesNaturais:
     
     def gerar_placa(self):
         """Gera placa realística"""
-        letras = ''.join(random.choices('ABCDEFGHIJKLMNOPQRSTUVWXYZ', k=3))
-        numeros = random.randint(1000, 9999)
+        letras = ''.join(self.rng.choices('ABCDEFGHIJKLMNOPQRSTUVWXYZ', k=3))
+        numeros = self.rng.randint(1000, 9999)
         return f"{letras}{numeros}"
     
     def gerar_tempos_transporte_estaveis(self):
         """Gera tempos mais estáveis"""
         return {
-            "T_1": round(random.uniform(self.T1_MIN, self.T1_MAX), 2),
-            "T_3": round(random.uniform(self.T3_MIN, self.T3_MAX), 2), 
-            "T_4": round(random.uniform(self.T4_MIN, self.T4_MAX), 2)
+            "T_1": round(self.rng.uniform(self.T1_MIN, self.T1_MAX), 2),
+            "T_3": round(self.rng.uniform(self.T3_MIN, self.T3_MAX), 2), 
+            "T_4": round(self.rng.uniform(self.T4_MIN, self.T4_MAX), 2)
         }
     
     def gerar_caminhao_detalhado(self):
         """Gera dados completos de um caminhão (versão estável)"""
         tempos = self.gerar_tempos_transporte_estaveis()
-        carga = random.randint(self.CARGA_MEDIA_MIN, self.CARGA_MEDIA_MAX)
+        carga = self.rng.randint(self.CARGA_MEDIA_MIN, self.CARGA_MEDIA_MAX)
         
         return {
-            "HR_ENTRADA_PIMS": datetime.now(),
+            "HR_ENTRADA_PIMS": self.relogio(),
             "NO_PLACA": self.gerar_placa(),
             "T_1": tempos["T_1"],
             "T_3": tempos["T_3"], 
             "T_4": tempos["T_4"],
             "QT_LIQUIDO_PESAGEM": carga,
-            "DISTANCIA_PIMS_MEDIA": round(random.uniform(self.DISTANCIA_MIN, self.DISTANCIA_MAX), 1),
-            "de_categ_oper": random.choice(self.TIPOS_CAMINHAO),
+            "DISTANCIA_PIMS_MEDIA": round(self.rng.uniform(self.DISTANCIA_MIN, self.DISTANCIA_MAX), 1),
+            "de_categ_oper": self.rng.choice(self.TIPOS_CAMINHAO),
             "ciclo_total": tempos["T_1"] + self.T2_FIXO + tempos["T_3"] + tempos["T_4"],
-            "status_caminhao": random.choice(["T1", "T2", "T3", "T4"])
+            "status_caminhao": self.rng.choice(["T1", "T2", "T3", "T4"])
         }
     
-    def gerar_colheitabilidade_detalhada(self):
+    def sortear_fazendas_setores(self, quantidade):
+        """
+        Pares (fazenda, setor) distintos, sem reposição: as leituras de um mesmo
+        instante não colidem na chave natural (FAZENDA, SETOR, HORA_ELEVADOR_TIME)
+        """
+        pares = [(fazenda, setor) for fazenda in self.FAZENDAS for setor in self.SETORES]
+        return self.rng.sample(pares, min(quantidade, len(pares)))
+    
+    def gerar_colheitabilidade_detalhada(self, fazenda=None, setor=None):
         """Gera dados detalhados de colheita (versão estável)"""
         # Colheitabilidade individual um pouco menor que a geral
-        ton_hora = self.gerar_colheitabilidade() * random.uniform(0.3, 0.8)
+        ton_hora = self.gerar_colheitabilidade() * self.rng.uniform(0.3, 0.8)
+        
+        agora = self.relogio()
         
         return {
-            "HORA_ELEVADOR_TIME": datetime.now(),
-            "FAZENDA": random.choice(self.FAZENDAS),
-            "SETOR": random.choice(self.SETORES),
+            "HORA_ELEVADOR_TIME": agora,
+            "FAZENDA": fazenda or self.rng.choice(self.FAZENDAS),
+            "SETOR": setor or self.rng.choice(self.SETORES),
             "TON_HORA": round(ton_hora, 2),
-            "data_origem": datetime.now().date()
+            "data_origem": agora.date()
         }
     
-    def gerar_dados_completos(self):
+    def gerar_dados_completos(self, frota=None):
         """
         Gera um conjunto completo de dados REALISTAS
         Valores ficam na zona segura 85% do tempo
+        `frota`: distribuição T1-T4 externa (simulador de frota) em vez do passeio aleatório
         """
         # Dados principais das 3 curvas
         colheitabilidade = self.gerar_colheitabilidade()
@@ -292,16 +313,17 @@ class PadroesNaturais:
         estoque_total_desejado = self.gerar_estoque_total_base()
         
         # Distribuição da frota (estável)
-        frota = self.gerar_distribuicao_frota_estavel()
+        if frota is None:
+            frota = self.gerar_distribuicao_frota_estavel()
         
         # Calcular estoque detalhado
         estoque_detalhado = self.calcular_estoque_detalhado_realista(frota, estoque_total_desejado)
         
         # Montar dados finais
         dados = {
-            "timestamp": datetime.now(),
+            "timestamp": self.relogio(),
             "colheitabilidade_ton_h": colheitabilidade,
-            "fazendas_ativas": random.randint(10, 14),  # Mais estável
+            "fazendas_ativas": self.rng.randint(10, 14),  # Mais estável
             "moagem_ton_h": moagem,
             "capacidade_moagem": self.MOAGEM_CAPACIDADE,
             "estoque_total_ton": estoque_detalhado["estoque_voltando"] + estoque_detalhado["estoque_indo"] + estoque_detalhado["estoque_patio"],
@@ -321,18 +343,272 @@ class PadroesNaturais:
         """
         Aplica influências sutis baseadas no horário
         """
-        hora_atual = datetime.now().hour
+        hora_atual = self.relogio().hour
         
         # Período noturno (22h-6h): colheita reduzida
         if 22 <= hora_atual or hora_atual <= 6:
-            dados["colheitabilidade_ton_h"] *= random.uniform(0.7, 0.9)
+            dados["colheitabilidade_ton_h"] *= self.rng.uniform(0.7, 0.9)
         
         # Período de pico (8h-16h): moagem mais intensa
         elif 8 <= hora_atual <= 16:
-            dados["moagem_ton_h"] *= random.uniform(1.0, 1.1)
+            dados["moagem_ton_h"] *= self.rng.uniform(1.0, 1.1)
         
         # Arredondar valores
         dados["colheitabilidade_ton_h"] = round(dados["colheitabilidade_ton_h"], 2)
         dados["moagem_ton_h"] = round(dados["moagem_ton_h"], 2)
         
-        return dados
\ No newline at end of file
+        return dados
+    
+    # ------------------------------------------------------------------
+    # API em lote (NumPy): K ciclos / K registros de uma vez, em colunas
+    # Mesmas distribuições e mesma suavização das funções escalares acima
+    # ------------------------------------------------------------------
+    
+    def _sorteios_realistas_lote(self, k, zona_min, zona_max, absoluto_min, absoluto_max):
+        """Sorteios vetorizados usados por _gerar_valor_realista"""
+        rng = self.rng_lote
+        
+        suave = rng.random(k) < 0.9
+        variacao = rng.uniform(-1.0, 1.0, k) * self.VARIACAO_MAXIMA_POR_CICLO
+        
+        na_zona = rng.random(k) < self.PROBABILIDADE_ZONA_SEGURA
+        abaixo = rng.random(k) < 0.5
+        fora = np.where(abaixo,
+                        rng.uniform(absoluto_min, zona_min, k),
+                        rng.uniform(zona_max, absoluto_max, k))
+        novo = np.where(na_zona, rng.uniform(zona_min, zona_max, k), fora).round(2)
+        
+        return suave, variacao, novo
+    
+    def _serie_realista_lote(self, k, zona_min, zona_max, absoluto_min, absoluto_max, valor_anterior=None):
+        """
+        K valores encadeados (cada um suaviza o anterior), como K chamadas de _gerar_valor_realista
+        Os sorteios são vetorizados; a recorrência da suavização fica em laço
+        """
+        suave, variacao, novo = self._sorteios_realistas_lote(k, zona_min, zona_max, absoluto_min, absoluto_max)
+        suave, variacao, novo = suave.tolist(), variacao.tolist(), novo.tolist()
+        
+        valores = [0.0] * k
+        anterior = valor_anterior
+        for i in range(k):
+            if anterior is not None and suave[i]:
+                anterior = round(max(absoluto_min, min(absoluto_max, anterior * (1 + variacao[i]))), 2)
+            else:
+                anterior = novo[i]
+            valores[i] = anterior
+        
+        return np.array(valores)
+    
+    def _valores_realistas_lote(self, anteriores, zona_min, zona_max, absoluto_min, absoluto_max):
+        """Um valor independente por elemento de `anteriores` (sem encadear)"""
+        anteriores = np.asarray(anteriores, dtype=float)
+        suave, variacao, novo = self._sorteios_realistas_lote(
+            len(anteriores), zona_min, zona_max, absoluto_min, absoluto_max
+        )
+        suavizado = np.clip(anteriores * (1 + variacao), absoluto_min, absoluto_max).round(2)
+        return np.where(suave & ~np.isnan(anteriores), suavizado, novo)
+    
+    def _frota_lote(self, k):
+        """Passeio aleatório da distribuição da frota para K ciclos (T1, T2, T3, T4)"""
+        rng = self.rng_lote
+        d1 = rng.integers(-2, 3, k).tolist()
+        d2 = rng.integers(-1, 2, k).tolist()
+        d4 = rng.integers(-2, 3, k).tolist()
+        
+        frota = np.empty((k, 4), dtype=np.int64)
+        anterior = self.estado_anterior.get('distribuicao_frota', {}) if self.estado_anterior else None
+        if anterior is not None:
+            anterior = (anterior.get('t1_voltando', 12), anterior.get('t2_carregando', 8),
+                        anterior.get('t3_indo', 19), anterior.get('t4_patio', 7))
+        
+        for i in range(k):
+            if anterior is None:
+                t1, t2, t4 = 12, 8, 7
+                t3 = self.FROTA_TOTAL - t2 - t1 - t4
+            else:
+                t1 = max(8, min(16, anterior[0] + d1[i]))
+                t2 = max(6, min(10, anterior[1] + d2[i]))
+                t4 = max(5, min(10, anterior[3] + d4[i]))
+                t3 = self.FROTA_TOTAL - t2 - t1 - t4
+                if t3 < 10:
+                    t3 = 10
+                    t1 = self.FROTA_TOTAL - t2 - t3 - t4
+            anterior = (max(1, t1), max(1, t2), max(1, t3), max(1, t4))
+            frota[i] = anterior
+        
+        return frota
+    
+    def gerar_ciclos_lote(self, timestamps):
+        """
+        Equivalente a gerar_dados_completos + aplicar_influencia_horario para
+        len(timestamps) ciclos consecutivos. Retorna dict de colunas NumPy
+        """
+        rng = self.rng_lote
+        k = len(timestamps)
+        anterior = self.estado_anterior or {}
+        
+        colheita = self._serie_realista_lote(
+            k, self.COLHEITABILIDADE_ZONA_SEGURA_MIN, self.COLHEITABILIDADE_ZONA_SEGURA_MAX,
+            self.COLHEITABILIDADE_MIN_ABSOLUTO, self.COLHEITABILIDADE_MAX_ABSOLUTO,
+            anterior.get('colheitabilidade_ton_h')
+        )
+        moagem = self._serie_realista_lote(
+            k, self.MOAGEM_ZONA_SEGURA_MIN, self.MOAGEM_ZONA_SEGURA_MAX,
+            self.MOAGEM_MIN_ABSOLUTO, self.MOAGEM_MAX_ABSOLUTO,
+            anterior.get('moagem_ton_h')
+        )
+        frota = self._frota_lote(k)
+        carga_media = rng.integers(self.CARGA_MEDIA_MIN, self.CARGA_MEDIA_MAX + 1, k)
+        estoque_patio = self._serie_realista_lote(
+            k, self.ESTOQUE_PATIO_ZONA_SEGURA_MIN, self.ESTOQUE_PATIO_ZONA_SEGURA_MAX,
+            self.ESTOQUE_PATIO_MIN_ABSOLUTO, self.ESTOQUE_PATIO_MAX_ABSOLUTO,
+            anterior.get('estoque_patio_ton')
+        )
+        
+        # Estoque total encadeia sobre o total do ciclo anterior (após os mínimos de 100 ton)
+        suave, variacao, novo = self._sorteios_realistas_lote(
+            k, self.ESTOQUE_ZONA_SEGURA_MIN, self.ESTOQUE_ZONA_SEGURA_MAX,
+            self.ESTOQUE_MIN_ABSOLUTO, self.ESTOQUE_MAX_ABSOLUTO
+        )
+        suave, variacao, novo = suave.tolist(), variacao.tolist(), novo.tolist()
+        prop_t1 = (frota[:, 0] / (frota[:, 0] + frota[:, 2])).tolist()
+        patio = estoque_patio.tolist()
+        
+        voltando = [0.0] * k
+        indo = [0.0] * k
+        total_anterior = anterior.get('estoque_total_ton')
+        for i in range(k):
+            if total_anterior is not None and suave[i]:
+                desejado = round(max(self.ESTOQUE_MIN_ABSOLUTO,
+                                     min(self.ESTOQUE_MAX_ABSOLUTO, total_anterior * (1 + variacao[i]))), 2)
+            else:
+                desejado = novo[i]
+            restante = desejado - patio[i]
+            voltando[i] = max(100, restante * prop_t1[i])
+            indo[i] = max(100, restante * (1 - prop_t1[i]))
+            total_anterior = voltando[i] + indo[i] + patio[i]
+        
+        voltando = np.array(voltando)
+        indo = np.array(indo)
+        
+        colunas = {
+            "timestamp": list(timestamps),
+            "colheitabilidade_ton_h": colheita,
+            "fazendas_ativas": rng.integers(10, 15, k),
+            "moagem_ton_h": moagem,
+            "capacidade_moagem": np.full(k, self.MOAGEM_CAPACIDADE),
+            "estoque_total_ton": voltando + indo + estoque_patio,
+            "estoque_voltando_ton": voltando,
+            "estoque_indo_ton": indo,
+            "estoque_patio_ton": estoque_patio,
+            "t1_voltando": frota[:, 0],
+            "t2_carregando": frota[:, 1],
+            "t3_indo": frota[:, 2],
+            "t4_patio": frota[:, 3],
+            "carga_media_kg": carga_media
+        }
+        
+        # Estado para o próximo ciclo (escalar ou lote): valores antes da influência do horário
+        self.estado_anterior = {
+            "colheitabilidade_ton_h": colheita[-1].item(),
+            "moagem_ton_h": moagem[-1].item(),
+            "estoque_total_ton": colunas["estoque_total_ton"][-1].item(),
+            "estoque_patio_ton": estoque_patio[-1].item(),
+            "distribuicao_frota": {
+                "t1_voltando": frota[-1, 0].item(),
+                "t2_carregando": frota[-1, 1].item(),
+                "t3_indo": frota[-1, 2].item(),
+                "t4_patio": frota[-1, 3].item()
+            }
+        }
+        colunas["colheita_base"] = colheita.copy()
+        
+        # Influência do horário (aplicar_influencia_horario vetorizado)
+        horas = np.array([t.hour for t in timestamps])
+        noturno = (horas >= 22) | (horas <= 6)
+        pico = (horas >= 8) & (horas <= 16)
+        colunas["colheitabilidade_ton_h"] = np.where(
+            noturno, colheita * rng.uniform(0.7, 0.9, k), colheita).round(2)
+        colunas["moagem_ton_h"] = np.where(
+            pico, moagem * rng.uniform(1.0, 1.1, k), moagem).round(2)
+        
+        return colunas
+    
+    def gerar_placas_lote(self, k):
+        """K placas no mesmo formato de gerar_placa"""
+        letras = np.array(list('ABCDEFGHIJKLMNOPQRSTUVWXYZ'))
+        indices = self.rng_lote.integers(0, 26, (k, 3))
+        numeros = self.rng_lote.integers(1000, 10000, k).astype(str)
+        prefixo = np.char.add(np.char.add(letras[indices[:, 0]], letras[indices[:, 1]]), letras[indices[:, 2]])
+        return np.char.add(prefixo, numeros)
+    
+    def gerar_caminhoes_lote(self, k, timestamps=None):
+        """K caminhões em colunas (mesmas distribuições de gerar_caminhao_detalhado)"""
+        rng = self.rng_lote
+        if timestamps is None:
+            timestamps = [self.relogio()] * k
+        
+        t1 = rng.uniform(self.T1_MIN, self.T1_MAX, k).round(2)
+        t3 = rng.uniform(self.T3_MIN, self.T3_MAX, k).round(2)
+        t4 = rng.uniform(self.T4_MIN, self.T4_MAX, k).round(2)
+        
+        return {
+            "HR_ENTRADA_PIMS": list(timestamps),
+            "NO_PLACA": self.gerar_placas_lote(k),
+            "T_1": t1,
+            "T_3": t3,
+            "T_4": t4,
+            "QT_LIQUIDO_PESAGEM": rng.integers(self.CARGA_MEDIA_MIN, self.CARGA_MEDIA_MAX + 1, k),
+            "DISTANCIA_PIMS_MEDIA": rng.uniform(self.DISTANCIA_MIN, self.DISTANCIA_MAX, k).round(1),
+            "de_categ_oper": rng.choice(self.TIPOS_CAMINHAO, k),
+            "ciclo_total": t1 + self.T2_FIXO + t3 + t4,
+            "status_caminhao": rng.choice(["T1", "T2", "T3", "T4"], k)
+        }
+    
+    def gerar_colheitabilidade_lote(self, colheita_referencia, timestamps=None):
+        """
+        Um registro de colheita para cada valor de `colheita_referencia` (a
+        colheitabilidade do ciclo, usada como valor anterior na suavização)
+        Registros com o mesmo timestamp recebem pares (fazenda, setor) distintos,
+        sorteados sem reposição do produto FAZENDAS x SETORES
+        """
+        rng = self.rng_lote
+        k = len(colheita_referencia)
+        if timestamps is None:
+            timestamps = [self.relogio()] * k
+        
+        # Posição de cada registro dentro do seu timestamp -> coluna de uma permutação por timestamp
+        grupos = {}
+        grupo = np.array([grupos.setdefault(t, len(grupos)) for t in timestamps], dtype=np.int64)
+        contagem = np.bincount(grupo, minlength=len(grupos))
+        ordem = np.argsort(grupo, kind='stable')
+        posicao = np.empty(k, dtype=np.int64)
+        posicao[ordem] = np.arange(k) - np.repeat(np.cumsum(contagem) - contagem, contagem)
+        num_setores = len(self.SETORES)
+        num_pares = len(self.FAZENDAS) * num_setores
+        pares = np.argsort(rng.random((len(grupos), num_pares)), axis=1)[grupo, posicao % num_pares]
+        
+        base = self._valores_realistas_lote(
+            colheita_referencia,
+            self.COLHEITABILIDADE_ZONA_SEGURA_MIN, self.COLHEITABILIDADE_ZONA_SEGURA_MAX,
+            self.COLHEITABILIDADE_MIN_ABSOLUTO, self.COLHEITABILIDADE_MAX_ABSOLUTO
+        )
+        
+        return {
+            "HORA_ELEVADOR_TIME": list(timestamps),
+            "FAZENDA": np.array(self.FAZENDAS)[pares // num_setores],
+            "SETOR": np.array(self.SETORES)[pares % num_setores],
+            "TON_HORA": (base * rng.uniform(0.3, 0.8, k)).round(2),
+            "data_origem": [t.date() for t in timestamps]
+        }
+
+
+def colunas_para_linhas(colunas, ordem):
+    """
+    Converte colunas (arrays NumPy ou listas) em linhas para executemany
+    tolist() devolve tipos Python nativos, que o sqlite3 aceita
+    """
+    return list(zip(*[
+        colunas[nome].tolist() if isinstance(colunas[nome], np.ndarray) else colunas[nome]
+        for nome in ordem
+    ]))
@@ -0,0 +1,173 @@
+"""
+Gravação e replay de ciclos - Sistema Logística JIT
+Uma execução do gerador vira um arquivo JSONL que pode ser reproduzido
+bit a bit contra o banco (e portanto contra a API e o serviço de predição)
+"""
+
+import json
+import sys
+import time
+from datetime import date, datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "database"))
+from connection import criar_conexao
+from statements import executar_operacoes, validar_operacao
+from epoch import garantir_colunas_epoca
+
+FORMATO_GRAVACAO = "logistica-jit/ciclos"
+VERSAO_GRAVACAO = 1
+
+
+def _serializar(valor):
+    """datetime/date com o mesmo texto que o adaptador do sqlite3 grava"""
+    if isinstance(valor, datetime):
+        return valor.isoformat(" ")
+    if isinstance(valor, date):
+        return valor.isoformat()
+    raise TypeError(f"Tipo não serializável: {type(valor).__name__}")
+
+
+class GravadorCiclos:
+    """
+    Grava cada lote atômico do gerador (um ciclo) como uma linha JSONL
+
+    Cabeçalho: {"formato", "versao", "semente", "inicio", "metadados"}
+    Ciclos:    {"ciclo": n, "t": segundos desde o início, "operacoes": [[comando, params], ...]}
+    """
+
+    def __init__(self, caminho, semente=None, metadados=None):
+        self.caminho = Path(caminho)
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)
+        self.arquivo = open(self.caminho, "w", encoding="utf-8")
+        self.inicio = time.monotonic()
+        self.ciclos = 0
+
+        self._escrever({
+            'formato': FORMATO_GRAVACAO,
+            'versao': VERSAO_GRAVACAO,
+            'semente': semente,
+            'inicio': datetime.now().isoformat(" "),
+            'metadados': metadados or {}
+        })
+
+    def _escrever(self, registro):
+        self.arquivo.write(json.dumps(registro, default=_serializar, ensure_ascii=False) + "\n")
+
+    def registrar(self, operacoes):
+        self.ciclos += 1
+        self._escrever({
+            'ciclo': self.ciclos,
+            't': round(time.monotonic() - self.inicio, 6),
+            'operacoes': operacoes
+        })
+        self.arquivo.flush()
+
+    def fechar(self):
+        if not self.arquivo.closed:
+            self.arquivo.close()
+
+
+def ler_gravacao(caminho):
+    """Retorna (cabecalho, iterador de ciclos) validando o formato"""
+    arquivo = open(caminho, encoding="utf-8")
+    cabecalho = json.loads(arquivo.readline())
+
+    if cabecalho.get('formato') != FORMATO_GRAVACAO:
+        arquivo.close()
+        raise ValueError(f"Arquivo não é uma gravação de ciclos: {caminho}")
+    if cabecalho.get('versao') != VERSAO_GRAVACAO:
+        arquivo.close()
+        raise ValueError(f"Versão de gravação não suportada: {cabecalho.get('versao')}")
+
+    def ciclos():
+        with arquivo:
+            for linha in arquivo:
+                registro = json.loads(linha)
+                registro['operacoes'] = [(nome, params) for nome, params in registro['operacoes']]
+                yield registro
+
+    return cabecalho, ciclos()
+
+
+def _deslocar_valor(valor, delta):
+    """Desloca textos de datetime/date em `delta`; outros valores passam intactos"""
+    if not isinstance(valor, str) or len(valor) < 10 or valor[4] != '-' or valor[7] != '-':
+        return valor
+    try:
+        if len(valor) == 10:
+            return (date.fromisoformat(valor) + delta).isoformat()
+        return (datetime.fromisoformat(valor) + delta).isoformat(" ")
+    except ValueError:
+        return valor
+
+
+def reproduzir(caminho, db_path="database/logistics.db", escritor=None, velocidade=1.0, deslocar=False):
+    """
+    Reproduz uma gravação no banco (ou no processo escritor)
+
+    - velocidade: 1.0 = cadência original, 2.0 = 2x mais rápido, 0 = sem espera
+    - deslocar: move os timestamps para que o primeiro ciclo seja "agora"
+      (a API consulta as últimas horas); sem deslocar, o replay é bit a bit
+    """
+    cabecalho, ciclos = ler_gravacao(caminho)
+
+    print(f"⏯️ Replay: {caminho}")
+    print(f"   Gravado em {cabecalho['inicio']} | semente: {cabecalho['semente']}")
+    print(f"   Velocidade: {'máxima' if not velocidade else f'{velocidade}x'}"
+          f"{' | timestamps deslocados para agora' if deslocar else ''}")
+
+    conn = None if escritor else criar_conexao(db_path)
+    if conn:
+        garantir_colunas_epoca(conn.cursor())
+        conn.commit()
+    delta = None
+    latencias = []
+    total_ciclos = 0
+    total_operacoes = 0
+    t_inicio = time.monotonic()
+
+    try:
+        for registro in ciclos:
+            if velocidade:
+                espera = registro['t'] / velocidade - (time.monotonic() - t_inicio)
+                if espera > 0:
+                    time.sleep(espera)
+
+            operacoes = registro['operacoes']
+            if deslocar:
+                if delta is None:
+                    primeiro = datetime.fromisoformat(operacoes[0][1][0])
+                    delta = datetime.now() - primeiro
+                operacoes = [(nome, [_deslocar_valor(v, delta) for v in params]) for nome, params in operacoes]
+
+            for nome, params in operacoes:
+                validar_operacao(nome, params)
+
+            inicio = time.perf_counter()
+            if escritor:
+                escritor.enviar(operacoes)
+            else:
+                executar_operacoes(conn.cursor(), operacoes)
+                conn.commit()
+            latencias.append((time.perf_counter() - inicio) * 1000)
+
+            total_ciclos += 1
+            total_operacoes += len(operacoes)
+    finally:
+        if conn:
+            conn.close()
+
+    decorrido = time.monotonic() - t_inicio
+    latencias.sort()
+    metricas = {
+        'ciclos': total_ciclos,
+        'operacoes': total_operacoes,
+        'segundos': decorrido,
+        'p50_ms': latencias[len(latencias) // 2] if latencias else 0.0,
+        'p95_ms': latencias[min(len(latencias) - 1, int(len(latencias) * 0.95))] if latencias else 0.0,
+    }
+
+    print(f"\n✅ Replay concluído: {total_ciclos} ciclos, {total_operacoes} operações em {decorrido:.1f}s")
+    print(f"   ⏳ Gravação por ciclo: p50 {metricas['p50_ms']:.2f} ms | p95 {metricas['p95_ms']:.2f} ms")
+    return metricas
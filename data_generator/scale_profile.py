@@ -0,0 +1,290 @@
+"""
+Simulação em escala (várias usinas e frotas) - Sistema Logística JIT
+Teste de carga da camada SQLite: usinas × frotas × fazendas × taxa de ciclos,
+com geradores particionados (shards) em um pool de processos
+"""
+
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+sys.path.append(str(Path(__file__).parent.parent / "database"))
+from backfill import RelogioSimulado, PASTA_FIXTURES
+
+# Perfis pré-definidos (taxa = ciclos por segundo por frota; 0 = sem limite)
+PERFIS_ESCALA = {
+    'usina': {'usinas': 1, 'frotas': 1, 'caminhoes': 46, 'fazendas': 9, 'taxa': 0.1},
+    'regional': {'usinas': 6, 'frotas': 2, 'caminhoes': 46, 'fazendas': 30, 'taxa': 1.0},
+    'grupo': {'usinas': 30, 'frotas': 2, 'caminhoes': 46, 'fazendas': 20, 'taxa': 1.0},
+    'estresse': {'usinas': 30, 'frotas': 2, 'caminhoes': 46, 'fazendas': 20, 'taxa': 0},
+}
+
+INTERVALO_SIMULADO_S = 10         # Cada ciclo avança o relógio simulado como o scheduler
+LETRAS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+
+def codigo_usina(usina):
+    """Duas letras por usina (AA, AB, ...): até 676 usinas sem mudar o schema"""
+    return LETRAS[usina // 26 % 26] + LETRAS[usina % 26]
+
+
+def fazendas_usina(usina, quantidade):
+    """Nomes de fazenda com o código da usina"""
+    return [f"Fazenda {codigo_usina(usina)}-{i + 1:03d}" for i in range(quantidade)]
+
+
+def _percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+def executar_shard(indice, db_path, unidades, caminhoes, fazendas, taxa, segundos, caminho_socket=None):
+    """
+    Worker de um shard: um gerador + simulador de frota por (usina, frota)
+
+    Cada rodada gera um ciclo de todas as unidades do shard e grava em uma
+    transação (ou um lote no escritor). Retorna as métricas do shard, com a
+    duração do laço de gravação (`janela_s`, sem o tempo de preparo)
+    """
+    from mock_generator_v2 import MockDataGeneratorV2
+    from fleet_simulator import SimuladorFrota
+
+    escritor = None
+    if caminho_socket:
+        from writer_service import ClienteEscritor
+        escritor = ClienteEscritor(caminho_socket)
+
+    relogio = RelogioSimulado(datetime.now().replace(microsecond=0), INTERVALO_SIMULADO_S)
+    geradores = []
+    for usina, frota in unidades:
+        unidade = codigo_usina(usina) + LETRAS[frota % 26]
+        gerador = MockDataGeneratorV2(db_path, escritor=escritor, relogio=relogio, verboso=False,
+                                      unidade=unidade)
+        gerador.padroes.FAZENDAS = fazendas_usina(usina, fazendas)
+        # Frotas da mesma usina dividem fazendas e relógio: setores próprios por frota
+        # evitam colisão na chave natural (FAZENDA, SETOR, HORA_ELEVADOR_TIME)
+        gerador.padroes.SETORES = [f"{LETRAS[frota % 26]}{setor}" for setor in gerador.padroes.SETORES]
+        gerador.simulador = SimuladorFrota(
+            relogio(), num_caminhoes=caminhoes, padroes=gerador.padroes,
+            fazendas=gerador.padroes.FAZENDAS,
+            prefixo_placa=unidade
+        )
+        geradores.append(gerador)
+
+    metricas = {'shard': indice, 'unidades': len(unidades), 'rodadas': 0, 'ciclos': 0,
+                'operacoes': 0, 'erros_lock': 0, 'latencias_ms': []}
+    periodo = 1 / taxa if taxa else 0
+    inicio_laco = time.monotonic()
+    fim = inicio_laco + segundos
+    proxima = inicio_laco
+
+    while time.monotonic() < fim:
+        operacoes = []
+        for gerador in geradores:
+            _, ops = gerador.montar_ciclo()
+            operacoes += ops
+        relogio.avancar()
+
+        inicio = time.perf_counter()
+        try:
+            geradores[0].gravar(operacoes)
+            metricas['operacoes'] += len(operacoes)
+            metricas['ciclos'] += len(geradores)
+        except sqlite3.OperationalError:
+            metricas['erros_lock'] += 1
+        metricas['latencias_ms'].append((time.perf_counter() - inicio) * 1000)
+        metricas['rodadas'] += 1
+
+        if periodo:
+            proxima += periodo
+            espera = proxima - time.monotonic()
+            if espera > 0:
+                time.sleep(espera)
+
+    metricas['janela_s'] = time.monotonic() - inicio_laco
+
+    if escritor:
+        escritor.fechar()
+
+    return metricas
+
+
+class SimulacaoEscala:
+    """
+    Perfil de escala do gerador
+
+    - Unidade = (usina, frota): um MockDataGeneratorV2 com SimuladorFrota próprio
+    - Usina codificada na placa (2 letras + letra da frota), no nome da fazenda,
+      no setor (letra da frota) e nos alertas (variavel_afetada = 'estoque_patio_ton@<usina><frota>'):
+      cada unidade abre, atualiza e resolve só os próprios eventos
+    - dados_tempo_real e estado_frota não têm coluna de usina: as séries das
+      unidades se intercalam na mesma tabela. O perfil mede a carga de escrita
+      (linhas, índices, triggers), não leituras por usina
+    - Unidades distribuídas em `workers` processos; o processo principal
+      mede o crescimento do banco enquanto os workers gravam
+    """
+
+    def __init__(self, usinas=1, frotas=1, caminhoes=46, fazendas=9, taxa=0.1,
+                 segundos=60, workers=None, db_path=None, caminho_socket=None):
+        self.usinas = usinas
+        self.frotas = frotas
+        self.caminhoes = caminhoes
+        self.fazendas = fazendas
+        self.taxa = taxa
+        self.segundos = segundos
+        self.unidades = [(u, f) for u in range(usinas) for f in range(frotas)]
+        self.workers = max(1, min(workers or os.cpu_count() or 1, len(self.unidades)))
+        self.db_path = Path(db_path) if db_path else PASTA_FIXTURES / "logistics_escala.db"
+        self.caminho_socket = caminho_socket
+
+    def preparar_banco(self):
+        """Banco de teste de carga recriado do zero"""
+        from init_db import create_database
+        from run_database_update import executar_atualizacao
+
+        for arquivo in [self.db_path, Path(f"{self.db_path}-wal"), Path(f"{self.db_path}-shm")]:
+            if arquivo.exists():
+                arquivo.unlink()
+        create_database(self.db_path)
+        executar_atualizacao(str(self.db_path))
+
+    def tamanho_banco(self):
+        return sum(arquivo.stat().st_size for arquivo in
+                   [self.db_path, Path(f"{self.db_path}-wal")] if arquivo.exists())
+
+    def executar(self, intervalo_amostra=5):
+        """Roda os shards e retorna as métricas agregadas"""
+        shards = [self.unidades[i::self.workers] for i in range(self.workers)]
+
+        print(f"📈 Simulação em escala: {self.usinas} usinas × {self.frotas} frotas × "
+              f"{self.caminhoes} caminhões ({len(self.unidades) * self.caminhoes} no total)")
+        print(f"   {self.usinas * self.fazendas} fazendas | "
+              f"{'sem limite' if not self.taxa else f'{self.taxa} ciclos/s por frota'} | "
+              f"{self.workers} workers | {self.segundos}s")
+        print(f"   Banco: {self.db_path}")
+        if self.caminho_socket:
+            print(f"   Via escritor: {self.caminho_socket}")
+        print("=" * 60)
+
+        tamanho_inicial = self.tamanho_banco()
+        amostras = [(0.0, tamanho_inicial)]
+        t_inicio = time.monotonic()
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            futuros = [
+                pool.submit(executar_shard, i, str(self.db_path), shard, self.caminhoes,
+                            self.fazendas, self.taxa, self.segundos, self.caminho_socket)
+                for i, shard in enumerate(shards)
+            ]
+
+            while not all(f.done() for f in futuros):
+                time.sleep(min(intervalo_amostra, 0.5))
+                decorrido = time.monotonic() - t_inicio
+                if decorrido - amostras[-1][0] >= intervalo_amostra:
+                    tamanho = self.tamanho_banco()
+                    taxa_mb = (tamanho - amostras[-1][1]) / 1024 / 1024 / (decorrido - amostras[-1][0])
+                    amostras.append((decorrido, tamanho))
+                    print(f"   ⏱️ {decorrido:5.0f}s | 📦 {tamanho / 1024 / 1024:8.1f} MB | {taxa_mb:+.2f} MB/s")
+
+            resultados = [f.result() for f in futuros]
+
+        decorrido = time.monotonic() - t_inicio
+        crescimento = self.tamanho_banco() - tamanho_inicial
+        latencias = [lat for r in resultados for lat in r['latencias_ms']]
+        # Taxas pela janela do laço de cada shard: criar processos, importar e montar
+        # geradores/simuladores não entra na taxa sustentada
+        janela = max((r['janela_s'] for r in resultados), default=0.0) or decorrido
+        metricas = {
+            'ciclos': sum(r['ciclos'] for r in resultados),
+            'operacoes': sum(r['operacoes'] for r in resultados),
+            'erros_lock': sum(r['erros_lock'] for r in resultados),
+            'segundos': decorrido,
+            'janela_s': janela,
+            'p50_ms': _percentil(latencias, 0.50),
+            'p95_ms': _percentil(latencias, 0.95),
+            'max_ms': max(latencias) if latencias else 0.0,
+            'crescimento_mb': crescimento / 1024 / 1024,
+        }
+        metricas['operacoes_por_s'] = sum(r['operacoes'] / r['janela_s'] for r in resultados if r['janela_s'])
+        metricas['ciclos_por_s'] = sum(r['ciclos'] / r['janela_s'] for r in resultados if r['janela_s'])
+        metricas['gb_por_dia'] = metricas['crescimento_mb'] / janela * 86400 / 1024
+
+        ciclos_alvo = len(self.unidades) * self.taxa
+        print(f"\n📊 RESULTADO ({decorrido:.0f}s, {janela:.1f}s gravando):")
+        print(f"   🔄 Ciclos: {metricas['ciclos']} ({metricas['ciclos_por_s']:.1f}/s"
+              f"{f', alvo {ciclos_alvo:.1f}/s' if self.taxa else ''})")
+        print(f"   💾 Inserções sustentadas: {metricas['operacoes_por_s']:,.0f} operações/s")
+        print(f"   ⏳ Gravação por rodada: p50 {metricas['p50_ms']:.1f} ms | "
+              f"p95 {metricas['p95_ms']:.1f} ms | max {metricas['max_ms']:.0f} ms")
+        print(f"   🔒 Rodadas perdidas por lock: {metricas['erros_lock']}")
+        print(f"   📦 Crescimento: {metricas['crescimento_mb']:.1f} MB "
+              f"(~{metricas['gb_por_dia']:.1f} GB/dia neste ritmo)")
+
+        if self.taxa and metricas['ciclos_por_s'] < ciclos_alvo * 0.95:
+            print("   ⚠️ Taxa alvo não sustentada: limite da camada SQLite (ou de CPU) atingido")
+
+        return metricas
+
+
+def main():
+    """Função principal"""
+    args = sys.argv[1:]
+
+    if "--help" in args or "-h" in args:
+        print(f"""
+📈 Simulação em escala - Sistema Logística JIT
+
+USO:
+  python data_generator/scale_profile.py --perfil grupo             # {', '.join(PERFIS_ESCALA)}
+  python data_generator/scale_profile.py --perfil grupo --segundos 120 --workers 8
+  python data_generator/scale_profile.py --usinas 10 --frotas 3 --caminhoes 60 --fazendas 40 --taxa 0.5
+  python data_generator/scale_profile.py --perfil estresse --escritor  # Via processo escritor único
+
+O banco de teste é recriado em database/fixtures/logistics_escala.db (ou --db).
+Com --escritor o banco não é recriado: inicie antes o escritor apontando para ele
+  python database/writer_service.py --db database/fixtures/logistics_escala.db
+""")
+        return
+
+    perfil = "usina"
+    if "--perfil" in args:
+        perfil = args[args.index("--perfil") + 1]
+        if perfil not in PERFIS_ESCALA:
+            print(f"❌ Perfil desconhecido: {perfil} (opções: {', '.join(PERFIS_ESCALA)})")
+            return
+
+    opcoes = dict(PERFIS_ESCALA[perfil])
+    for flag, chave, tipo in [("--usinas", "usinas", int), ("--frotas", "frotas", int),
+                              ("--caminhoes", "caminhoes", int), ("--fazendas", "fazendas", int),
+                              ("--taxa", "taxa", float), ("--segundos", "segundos", float),
+                              ("--workers", "workers", int), ("--db", "db_path", str)]:
+        if flag in args:
+            try:
+                opcoes[chave] = tipo(args[args.index(flag) + 1])
+            except (IndexError, ValueError):
+                print(f"❌ Erro: {flag} precisa de um valor válido")
+                return
+
+    if "--escritor" in args:
+        from writer_service import SOCKET_PADRAO
+        opcoes["caminho_socket"] = str(SOCKET_PADRAO)
+
+    simulacao = SimulacaoEscala(**opcoes)
+    if "caminho_socket" not in opcoes:
+        simulacao.preparar_banco()
+        print()
+    elif not simulacao.db_path.exists():
+        print(f"❌ Banco não encontrado: {simulacao.db_path}")
+        return
+    simulacao.executar()
+
+
+if __name__ == "__main__":
+    main()
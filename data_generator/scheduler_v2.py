@@ -3,25 +3,42 @@ Scheduler V2 - Sistema Logística JIT
 Usa o novo gerador com variáveis de predição
 """
 
+import asyncio
+import random
 import time
 import signal
 import sys
-from datetime import datetime
+import threading
+from datetime import datetime, timedelta
 from pathlib import Path
 
 # Adicionar path para importar mock_generator_v2
 sys.path.append(str(Path(__file__).parent))
 from mock_generator_v2 import MockDataGeneratorV2
+from connection import PoliticaCheckpoint
+from epoch import para_ms
+from retention import ServicoRetencao, politicas_com_horas
 
 class LogisticaSchedulerV2:
     """
     Scheduler V2 com suporte às novas variáveis
     """
     
-    def __init__(self, intervalo_segundos=10):
+    def __init__(self, intervalo_segundos=10, escritor=None, frota_simulada=False,
+                 semente=None, arquivo_gravacao=None, filtro_qualidade=False, frota_caminhoes=False):
         self.intervalo = intervalo_segundos
+        self.escritor = escritor
+        # Frota/estoque derivados dos caminhões precisam de placas estáveis: usa o simulador
+        self.frota_caminhoes = frota_caminhoes
+        self.frota_simulada = frota_simulada or frota_caminhoes
+        self.semente = semente
+        self.arquivo_gravacao = arquivo_gravacao
+        self.filtro_qualidade = filtro_qualidade
         self.executando = False
         self.generator = None
+        self.politica_checkpoint = None
+        self.retencao = None
+        self.thread_retencao = None
         self.contador_ciclos = 0
         
         # Configurar handler para parada graceful (Ctrl+C)
@@ -31,37 +48,101 @@ class LogisticaSchedulerV2:
     def inicializar(self):
         """Inicializa o gerador V2"""
         try:
-            self.generator = MockDataGeneratorV2()
+            filtro = None
+            if self.filtro_qualidade:
+                from data_quality import FiltroQualidade
+                filtro = FiltroQualidade()
+            
+            self.generator = MockDataGeneratorV2(escritor=self.escritor, semente=self.semente,
+                                                 filtro_qualidade=filtro,
+                                                 frota_caminhoes=self.frota_caminhoes)
+            
+            simulador = None
+            if self.frota_simulada:
+                from fleet_simulator import SimuladorFrota
+                # RNG derivado da semente do gerador: a frota também é reprodutível
+                simulador = SimuladorFrota(datetime.now(), padroes=self.generator.padroes,
+                                           rng=random.Random(self.generator.rng.getrandbits(64)))
+                self.generator.simulador = simulador
+                # Mudanças de fase vão para estado_caminhao (só a frota simulada fica nela)
+                self.generator.garantir_tabelas_caminhoes()
+            
+            if self.arquivo_gravacao:
+                from replay import GravadorCiclos
+                self.generator.gravador = GravadorCiclos(
+                    self.arquivo_gravacao, semente=self.semente,
+                    metadados={'intervalo_s': self.intervalo, 'frota_simulada': self.frota_simulada}
+                )
+            
+            self.politica_checkpoint = PoliticaCheckpoint(self.generator.db_path)
+            # estado_frota/colheitabilidade: 2h; predições: 7 dias; estado_caminhao: 48h.
+            # dados_tempo_real, transporte_detalhado e eventos_sistema: hoje e ontem no banco
+            # principal, dias fechados em partições diárias apagadas após 30 dias (database/retention.py)
+            self.retencao = ServicoRetencao(self.generator.db_path, politicas=politicas_com_horas(2),
+                                            relogio=self.generator.relogio, particoes=True)
             print("✅ Mock Data Generator V2 inicializado")
             print("📊 Novas variáveis incluídas:")
             print("   - Taxa de entrada/saída do pátio")
             print("   - Velocidade dos caminhões")
             print("   - Previsão de chegadas")
             print("   - Alertas automáticos")
+            if self.escritor:
+                print(f"✍️ Gravando via processo escritor: {self.escritor.caminho_socket}")
+            if simulador:
+                print(f"🚛 Frota simulada por eventos discretos: {len(simulador.caminhoes)} caminhões")
+            if self.frota_caminhoes:
+                print("🧮 Estado da frota e estoque sobre rodas derivados dos caminhões (distribuicao_frota)")
+            if self.semente is not None:
+                print(f"🎲 Semente: {self.semente}")
+            if filtro:
+                print("🧪 Filtro de qualidade ativo (rejeitadas → quarentena_qualidade)")
+            if self.arquivo_gravacao:
+                print(f"⏺️ Gravando ciclos em: {self.arquivo_gravacao}")
             return True
             
         except Exception as e:
             print(f"❌ Erro ao inicializar: {e}")
             return False
     
-    def executar_ciclo(self):
+    def executar_ciclo(self, limpar=True):
         """Executa um ciclo de geração de dados V2"""
         try:
             dados = self.generator.gerar_ciclo_completo_v2()
             self.contador_ciclos += 1
             
-            # A cada 50 ciclos, limpar dados antigos
-            if self.contador_ciclos % 50 == 0:
-                self.generator.limpar_dados_antigos(horas=2)
+            # A cada 50 ciclos, limpar dados antigos em segundo plano
+            # (no modo assíncrono é uma tarefa própria)
+            if limpar and self.contador_ciclos % 50 == 0:
+                self.iniciar_retencao()
                 print(f"\n📊 Estatísticas após {self.contador_ciclos} ciclos:")
                 self.mostrar_estatisticas()
             
+            # Checkpoint do WAL (PASSIVE periódico, TRUNCATE se o log crescer demais)
+            conn = self.generator.conectar_banco()
+            modo = self.politica_checkpoint.verificar(conn)
+            conn.close()
+            if modo == 'TRUNCATE':
+                print("🗜️ Checkpoint TRUNCATE executado (WAL acima do limite)")
+            
             return True
             
         except Exception as e:
             print(f"❌ Erro no ciclo {self.contador_ciclos}: {e}")
             return False
     
+    def _passada_retencao(self):
+        try:
+            self.retencao.executar_passada()
+        except Exception as e:
+            print(f"❌ Erro na retenção: {e}")
+    
+    def iniciar_retencao(self):
+        """Passada de retenção em thread própria: o ciclo não espera a limpeza"""
+        if self.thread_retencao and self.thread_retencao.is_alive():
+            return  # Passada anterior ainda rodando
+        self.thread_retencao = threading.Thread(target=self._passada_retencao, name="retencao", daemon=True)
+        self.thread_retencao.start()
+    
     def mostrar_estatisticas(self):
         """Mostra estatísticas do sistema"""
         conn = self.generator.conectar_banco()
@@ -77,7 +158,7 @@ class LogisticaSchedulerV2:
                 MAX(estoque_patio_ton) as estoque_max
             FROM (
                 SELECT * FROM dados_tempo_real 
-                ORDER BY timestamp DESC LIMIT 10
+                ORDER BY ts_ms DESC LIMIT 10
             )
         """)
         
@@ -92,9 +173,9 @@ class LogisticaSchedulerV2:
         cursor.execute("""
             SELECT severidade, COUNT(*) 
             FROM eventos_sistema 
-            WHERE timestamp > datetime('now', '-1 hour')
+            WHERE ts_ms > ?
             GROUP BY severidade
-        """)
+        """, (para_ms(datetime.now() - timedelta(hours=1)),))
         
         alertas = cursor.fetchall()
         if alertas:
@@ -103,6 +184,9 @@ class LogisticaSchedulerV2:
                 print(f"      - {severidade}: {count}")
         
         conn.close()
+        
+        if self.retencao:
+            self.retencao.mostrar_metricas()
     
     def executar(self):
         """Loop principal do scheduler V2"""
@@ -139,6 +223,50 @@ class LogisticaSchedulerV2:
             print(f"❌ Erro crítico no scheduler: {e}")
             self.parar()
     
+    def executar_async(self, intervalo_predicao_min=5, intervalo_padroes_min=60):
+        """
+        Modo assíncrono: geração, retenção, recálculo de padrões e predição
+        no mesmo processo, cada um na sua cadência (AgendadorAssincrono)
+        """
+        if not self.inicializar():
+            return
+        
+        from async_scheduler import AgendadorAssincrono
+        from prediction_service import PredictionService
+        
+        servico = PredictionService(intervalo_minutos=intervalo_predicao_min, escritor=self.escritor)
+        servico.model.db_path = self.generator.db_path
+        
+        def ciclo():
+            if not self.executar_ciclo(limpar=False):
+                raise RuntimeError(f"ciclo {self.contador_ciclos} falhou")
+        
+        def padroes():
+            self.generator.cache_padroes = {}
+            servico.model.recalcular_padroes()
+        
+        agendador = AgendadorAssincrono()
+        agendador.adicionar("ciclo", ciclo, periodo_s=self.intervalo)
+        agendador.adicionar("retencao", self.retencao.executar_passada, periodo_s=self.intervalo * 50,
+                            jitter_s=self.intervalo * 5, atraso_inicial_s=self.intervalo * 50)
+        agendador.adicionar("padroes", padroes, periodo_s=intervalo_padroes_min * 60,
+                            jitter_s=intervalo_padroes_min * 6)
+        agendador.adicionar("predicao", servico.executar_predicao,
+                            periodo_s=intervalo_predicao_min * 60, jitter_s=intervalo_predicao_min * 6,
+                            atraso_inicial_s=min(self.intervalo * 2, 30))
+        
+        self.executando = True
+        print(f"\n🚀 Scheduler V2 assíncrono - dados a cada {self.intervalo}s, "
+              f"predição a cada {intervalo_predicao_min} min, padrões a cada {intervalo_padroes_min} min")
+        print("💡 Pressione Ctrl+C para parar")
+        print("=" * 60)
+        
+        asyncio.run(agendador.executar())
+        
+        print("\n⏱️ Tempos por tarefa:")
+        agendador.mostrar_estatisticas()
+        self.parar_graceful(None, None)
+    
     def parar_graceful(self, signum, frame):
         """Para o scheduler de forma graciosa"""
         print("\n\n⏹️ Parando scheduler V2...")
@@ -155,7 +283,7 @@ class LogisticaSchedulerV2:
             cursor.execute("""
                 SELECT timestamp, descricao 
                 FROM eventos_sistema 
-                ORDER BY timestamp DESC 
+                ORDER BY ts_ms DESC 
                 LIMIT 5
             """)
             
@@ -167,6 +295,14 @@ class LogisticaSchedulerV2:
             
             conn.close()
         
+        if self.generator and self.generator.filtro_qualidade:
+            print("\n🧪 Qualidade dos dados:")
+            self.generator.filtro_qualidade.mostrar_resumo()
+        
+        if self.generator and self.generator.gravador:
+            self.generator.gravador.fechar()
+            print(f"⏺️ {self.generator.gravador.ciclos} ciclos gravados em {self.arquivo_gravacao}")
+        
         print(f"\n✅ Scheduler V2 parado após {self.contador_ciclos} ciclos")
 
 def main():
@@ -189,7 +325,21 @@ NOVIDADES V2:
 USO:
   python scheduler_v2.py              # Intervalo padrão (10s)
   python scheduler_v2.py --intervalo 5   # A cada 5 segundos
+  python scheduler_v2.py --intervalo 0.5 # Intervalos abaixo de 1 segundo
   python scheduler_v2.py --teste      # Modo teste (5 ciclos)
+  python scheduler_v2.py --escritor   # Gravar via processo escritor único
+                                      # (python database/writer_service.py)
+  python scheduler_v2.py --frota-simulada  # Frota por simulação de eventos discretos
+  python scheduler_v2.py --frota-caminhoes # estado_frota/estoque_* vindos dos caminhões
+                                           # (distribuicao_frota; implica --frota-simulada)
+  python scheduler_v2.py --filtro-qualidade  # Valida linhas antes de gravar (quarentena)
+  python scheduler_v2.py --async      # Geração + retenção + padrões + predição em um processo
+  python scheduler_v2.py --async --predicao 1 --padroes 30   # Intervalos em minutos
+  python scheduler_v2.py --seed 42    # Dados reprodutíveis (mesma semente = mesmos sorteios)
+  python scheduler_v2.py --seed 42 --gravar carga.jsonl   # Grava cada ciclo (JSONL)
+  python scheduler_v2.py --reproduzir carga.jsonl         # Replay na cadência original
+  python scheduler_v2.py --reproduzir carga.jsonl --velocidade 0 --deslocar
+                                      # Sem espera, timestamps movidos para agora
 """)
         return
     
@@ -198,19 +348,67 @@ USO:
     if "--intervalo" in args:
         try:
             idx = args.index("--intervalo")
-            intervalo = int(args[idx + 1])
+            intervalo = float(args[idx + 1])
         except (IndexError, ValueError):
             print("❌ Erro: --intervalo precisa de um número")
             return
     
+    semente = None
+    if "--seed" in args:
+        try:
+            semente = int(args[args.index("--seed") + 1])
+        except (IndexError, ValueError):
+            print("❌ Erro: --seed precisa de um inteiro")
+            return
+    
     # Modo teste
     if "--teste" in args:
         print("🧪 Modo teste V2")
         from mock_generator_v2 import testar_gerador_v2
         testar_gerador_v2()
     else:
-        scheduler = LogisticaSchedulerV2(intervalo_segundos=intervalo)
-        scheduler.executar()
+        escritor = None
+        if "--escritor" in args:
+            from writer_service import ClienteEscritor
+            escritor = ClienteEscritor()
+        
+        if "--reproduzir" in args:
+            from replay import reproduzir
+            try:
+                arquivo = args[args.index("--reproduzir") + 1]
+                velocidade = float(args[args.index("--velocidade") + 1]) if "--velocidade" in args else 1.0
+            except (IndexError, ValueError):
+                print("❌ Erro: --reproduzir precisa de um arquivo e --velocidade de um número")
+                return
+            reproduzir(arquivo, escritor=escritor, velocidade=velocidade, deslocar="--deslocar" in args)
+            return
+        
+        arquivo_gravacao = None
+        if "--gravar" in args:
+            try:
+                arquivo_gravacao = args[args.index("--gravar") + 1]
+            except IndexError:
+                print("❌ Erro: --gravar precisa de um arquivo")
+                return
+        
+        scheduler = LogisticaSchedulerV2(intervalo_segundos=intervalo, escritor=escritor,
+                                         frota_simulada="--frota-simulada" in args,
+                                         semente=semente, arquivo_gravacao=arquivo_gravacao,
+                                         filtro_qualidade="--filtro-qualidade" in args,
+                                         frota_caminhoes="--frota-caminhoes" in args)
+        
+        if "--async" in args:
+            opcoes = {}
+            for flag, chave in [("--predicao", "intervalo_predicao_min"), ("--padroes", "intervalo_padroes_min")]:
+                if flag in args:
+                    try:
+                        opcoes[chave] = float(args[args.index(flag) + 1])
+                    except (IndexError, ValueError):
+                        print(f"❌ Erro: {flag} precisa de um número (minutos)")
+                        return
+            scheduler.executar_async(**opcoes)
+        else:
+            scheduler.executar()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
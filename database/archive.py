@@ -0,0 +1,529 @@
+"""
+Arquivo frio - Sistema Logística JIT
+Dias antigos de dados_tempo_real, transporte_detalhado, colheitabilidade_detalhada
+e predicoes_estoque_patio saem do banco principal (e das partições diárias) para
+Parquet comprimido, um arquivo por tabela e dia; catalogo_arquivo diz que faixa
+de ts_ms cada arquivo cobre e o roteador lê só os dias do período
+"""
+
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+from connection import criar_conexao
+from epoch import para_ms, garantir_colunas_epoca, _existe
+from partitions import (
+    FIM_ABERTO_MS, LOTE_REMOCAO, PAUSA_PADRAO_S, limites_dia, dias_com_linhas, remover_faixa,
+    pasta_particoes, particoes_do_periodo, particionar, _colunas, _condicao,
+    consultar_periodo as consultar_particoes,
+)
+
+TABELAS_ARQUIVADAS = [
+    'dados_tempo_real',
+    'transporte_detalhado',
+    'colheitabilidade_detalhada',
+    'predicoes_estoque_patio',
+]
+
+DIAS_ARQUIVO_PADRAO = 7           # Última semana fica no SQLite (banco principal + partições)
+COMPRESSAO = 'zstd'
+
+SQL_CATALOGO_ARQUIVO = """
+    CREATE TABLE IF NOT EXISTS catalogo_arquivo (
+        tabela TEXT NOT NULL,
+        dia DATE NOT NULL,
+        arquivo TEXT NOT NULL,             -- Relativo à pasta do arquivo
+        inicio_ms INTEGER NOT NULL,
+        fim_ms INTEGER NOT NULL,           -- Exclusivo (meia-noite seguinte)
+        linhas INTEGER DEFAULT 0,
+        bytes INTEGER DEFAULT 0,
+        arquivado_em DATETIME,
+        PRIMARY KEY (tabela, dia)
+    )
+"""
+
+
+def pasta_arquivo(db_path):
+    """database/logistics.db -> database/logistics_arquivo/"""
+    db_path = Path(db_path)
+    return db_path.parent / f"{db_path.stem}_arquivo"
+
+
+def garantir_catalogo_arquivo(cursor):
+    cursor.execute(SQL_CATALOGO_ARQUIVO)
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Arquivo frio requer pyarrow (pip install pyarrow)")
+    return pa, pq
+
+
+def _tipo_arrow(pa, declarado, valores):
+    """
+    Tipo da coluna no Parquet: pela afinidade do tipo declarado, para o mesmo
+    esquema em todos os dias; DATETIME/DATE continuam texto, como no SQLite
+    """
+    declarado = (declarado or "").upper()
+    tipos = {type(v) for v in valores if v is not None}
+    if (str in tipos or any(t in declarado for t in ('CHAR', 'CLOB', 'TEXT', 'DATE', 'TIME'))):
+        return pa.string(), str
+    if bytes in tipos:
+        return pa.binary(), bytes
+    if tipos <= {int} and ('INT' in declarado or (tipos and not any(
+            t in declarado for t in ('REAL', 'FLOA', 'DOUB')))):
+        return pa.int64(), int
+    return pa.float64(), float
+
+
+def tabela_arrow(colunas, tipos, linhas):
+    """Linhas do SQLite (tuplas) -> tabela Arrow, tipada pelos tipos declarados `tipos`"""
+    pa, _ = _pyarrow()
+    arrays = []
+    for i, coluna in enumerate(colunas):
+        valores = [linha[i] for linha in linhas]
+        tipo, converter = _tipo_arrow(pa, tipos.get(coluna), valores)
+        arrays.append(pa.array([None if v is None else converter(v) for v in valores], type=tipo))
+    return pa.Table.from_arrays(arrays, names=colunas)
+
+
+def _escrever_parquet(caminho, colunas, tipos, linhas):
+    """Grava as linhas (ordenadas por ts_ms) em um arquivo; troca atômica pelo anterior"""
+    _, pq = _pyarrow()
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    temporario = caminho.with_name(caminho.name + ".tmp")
+    pq.write_table(tabela_arrow(colunas, tipos, linhas), temporario, compression=COMPRESSAO)
+    temporario.replace(caminho)
+
+
+def _ler_parquet(caminho, inicio_ms=-FIM_ABERTO_MS, fim_ms=FIM_ABERTO_MS):
+    """(colunas, [tuplas]) das linhas com ts_ms em [inicio_ms, fim_ms)"""
+    _, pq = _pyarrow()
+    tabela = pq.read_table(caminho, filters=[('ts_ms', '>=', inicio_ms), ('ts_ms', '<', fim_ms)])
+    colunas = tabela.column_names
+    return colunas, list(zip(*(tabela.column(c).to_pylist() for c in colunas)))
+
+
+def _alinhar(colunas_origem, linhas, colunas):
+    """Reordena as linhas para `colunas`; colunas ausentes na origem viram NULL"""
+    indices = [colunas_origem.index(c) if c in colunas_origem else None for c in colunas]
+    return [tuple(None if i is None else linha[i] for i in indices) for linha in linhas]
+
+
+def dias_para_arquivar(cursor, db_path, dias=DIAS_ARQUIVO_PADRAO, agora=None):
+    """
+    {dia: [tabelas]} (mais antigos primeiro) com linhas no banco principal ou
+    nas partições diárias antes dos últimos `dias` dias
+    """
+    agora = agora or datetime.now()
+    corte_ms = para_ms(datetime(agora.year, agora.month, agora.day) - timedelta(days=dias - 1))
+
+    pendentes = {}
+    tabelas = [t for t in TABELAS_ARQUIVADAS if _existe(cursor, t)]
+    for tabela in tabelas:
+        for dia in dias_com_linhas(cursor, tabela, corte_ms):
+            pendentes.setdefault(dia, set()).add(tabela)
+
+    pasta = pasta_particoes(db_path)
+    for dia, arquivo, _, fim_ms in particoes_do_periodo(cursor, -FIM_ABERTO_MS, corte_ms):
+        if fim_ms > corte_ms or not (pasta / arquivo).exists():
+            continue
+        cursor.execute("ATTACH DATABASE ? AS particao", (str(pasta / arquivo),))
+        try:
+            for tabela in tabelas:
+                if _colunas(cursor, 'particao', tabela) and cursor.execute(
+                        f"SELECT 1 FROM particao.{tabela} LIMIT 1").fetchone():
+                    pendentes.setdefault(datetime.fromisoformat(dia).date(), set()).add(tabela)
+        finally:
+            cursor.execute("DETACH DATABASE particao")
+
+    return {dia: sorted(pendentes[dia]) for dia in sorted(pendentes)}
+
+
+def arquivar_dia(conn, db_path, tabela, dia, lote=LOTE_REMOCAO, pausa_s=PAUSA_PADRAO_S):
+    """
+    Move as linhas de `tabela` no dia para <banco>_arquivo/<tabela>/dia=AAAA-MM-DD.parquet
+
+    1. Lê o dia do banco principal e da partição (roteador das partições)
+    2. Junta com o arquivo existente sem duplicar pelo id e grava o Parquet
+    3. Registra no catálogo (o roteador passa a ler o arquivo)
+    4. Remove do banco principal e da partição em lotes curtos
+    Interrompido entre 3 e 4, o dia aparece duplicado até a próxima execução,
+    nunca some. Retorna as linhas do arquivo
+    """
+    cursor = conn.cursor()
+    garantir_catalogo_arquivo(cursor)
+    conn.commit()
+
+    inicio_ms, fim_ms = limites_dia(dia)
+    tipos = _colunas(cursor, 'main', tabela)
+    colunas = list(tipos)
+    linhas = [tuple(linha) for linha in
+              consultar_particoes(conn, db_path, tabela, inicio_ms, fim_ms, colunas=colunas)]
+
+    relativo = f"{tabela}/dia={dia.isoformat()}.parquet"
+    destino = pasta_arquivo(db_path) / relativo
+    if destino.exists():
+        # Rodada anterior (ou linha atrasada): o arquivo já tem parte do dia
+        colunas_arquivo, antigas = _ler_parquet(destino)
+        for coluna in colunas_arquivo:
+            if coluna not in colunas:  # Coluna que saiu do esquema: continua no arquivo
+                colunas.append(coluna)
+                linhas = [linha + (None,) for linha in linhas]
+        chave = colunas.index('id') if 'id' in colunas else None
+        vistas = {linha[chave] if chave is not None else linha for linha in linhas}
+        linhas += [linha for linha in _alinhar(colunas_arquivo, antigas, colunas)
+                   if (linha[chave] if chave is not None else linha) not in vistas]
+    if not linhas:
+        return 0
+
+    posicao_ts = colunas.index('ts_ms')
+    linhas.sort(key=lambda linha: linha[posicao_ts])
+    _escrever_parquet(destino, colunas, tipos, linhas)
+
+    cursor.execute("""
+        INSERT INTO catalogo_arquivo (tabela, dia, arquivo, inicio_ms, fim_ms, linhas, bytes, arquivado_em)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (tabela, dia) DO UPDATE SET
+            linhas = excluded.linhas, bytes = excluded.bytes, arquivado_em = excluded.arquivado_em
+    """, (tabela, dia.isoformat(), relativo, inicio_ms, fim_ms, len(linhas),
+          destino.stat().st_size, datetime.now()))
+    conn.commit()
+
+    remover_faixa(conn, 'main', tabela, inicio_ms, fim_ms, lote=lote, pausa_s=pausa_s)
+    for _, arquivo, _, _ in particoes_do_periodo(cursor, inicio_ms, fim_ms):
+        caminho = pasta_particoes(db_path) / arquivo
+        if not caminho.exists():
+            continue
+        cursor.execute("ATTACH DATABASE ? AS particao", (str(caminho),))
+        try:
+            if _colunas(cursor, 'particao', tabela):
+                remover_faixa(conn, 'particao', tabela, inicio_ms, fim_ms, lote=lote, pausa_s=pausa_s)
+        finally:
+            conn.rollback()
+            cursor.execute("DETACH DATABASE particao")
+
+    return len(linhas)
+
+
+def _recolher_particao(conn, db_path, dia):
+    """Partição que ficou vazia depois do arquivamento: sai do catálogo e do disco"""
+    cursor = conn.cursor()
+    if not _existe(cursor, 'catalogo_particoes'):
+        return False
+    cursor.execute("SELECT arquivo FROM catalogo_particoes WHERE dia = ?", (dia.isoformat(),))
+    registro = cursor.fetchone()
+    if not registro:
+        return False
+
+    caminho = pasta_particoes(db_path) / registro[0]
+    linhas = 0
+    if caminho.exists():
+        cursor.execute("ATTACH DATABASE ? AS particao", (str(caminho),))
+        try:
+            cursor.execute("SELECT name FROM particao.sqlite_master WHERE type = 'table' "
+                           "AND name NOT LIKE 'sqlite_%'")
+            for (tabela,) in cursor.fetchall():
+                linhas += cursor.execute(f"SELECT COUNT(*) FROM particao.{tabela}").fetchone()[0]
+        finally:
+            cursor.execute("DETACH DATABASE particao")
+
+    if linhas:
+        cursor.execute("UPDATE catalogo_particoes SET linhas = ? WHERE dia = ?", (linhas, dia.isoformat()))
+        conn.commit()
+        return False
+    # Catálogo primeiro: nenhuma consulta nova anexa um arquivo prestes a sumir
+    cursor.execute("DELETE FROM catalogo_particoes WHERE dia = ?", (dia.isoformat(),))
+    conn.commit()
+    caminho.unlink(missing_ok=True)
+    return True
+
+
+def arquivar(conn, db_path, dias=DIAS_ARQUIVO_PADRAO, lote=LOTE_REMOCAO, pausa_s=PAUSA_PADRAO_S,
+             verboso=True, agora=None):
+    """Arquiva todos os dias anteriores aos últimos `dias`. Retorna {dia: linhas arquivadas}"""
+    arquivados = {}
+    for dia, tabelas in dias_para_arquivar(conn.cursor(), db_path, dias, agora).items():
+        arquivados[dia] = sum(arquivar_dia(conn, db_path, tabela, dia, lote, pausa_s) for tabela in tabelas)
+        recolhida = _recolher_particao(conn, db_path, dia)
+        if verboso:
+            print(f"   🧊 {dia}: {arquivados[dia]:,} linhas ({', '.join(tabelas)})"
+                  f"{' | partição recolhida' if recolhida else ''}")
+    return arquivados
+
+
+def dias_arquivados(cursor, tabela, inicio_ms, fim_ms=FIM_ABERTO_MS, decrescente=False):
+    """[(dia, arquivo, inicio_ms, fim_ms)] dos arquivos de `tabela` que cruzam [inicio_ms, fim_ms)"""
+    if not _existe(cursor, 'catalogo_arquivo'):
+        return []
+    cursor.execute(f"""
+        SELECT dia, arquivo, inicio_ms, fim_ms FROM catalogo_arquivo
+        WHERE tabela = ? AND fim_ms > ? AND inicio_ms < ?
+        ORDER BY dia {'DESC' if decrescente else 'ASC'}
+    """, (tabela, inicio_ms, fim_ms))
+    return cursor.fetchall()
+
+
+def consultar_periodo(conn, db_path, tabela, inicio_ms, fim_ms=None, filtro="", params=(),
+                      colunas=None, decrescente=False, limite=None):
+    """
+    Linhas de `tabela` com ts_ms em [inicio_ms, fim_ms) no banco principal, nas
+    partições diárias e no arquivo frio, ordenadas por ts_ms. Mesma assinatura de
+    partitions.consultar_periodo: o filtro SQL vale também para os dias frios
+    (carregados em um SQLite em memória, um dia por vez); com `limite`, para de
+    ler arquivos quando os dias restantes não podem entrar no resultado
+    """
+    fim_ms = FIM_ABERTO_MS if fim_ms is None else fim_ms
+    cursor = conn.cursor()
+    colunas = list(colunas or _colunas(cursor, 'main', tabela))
+    if 'ts_ms' not in colunas:
+        colunas.append('ts_ms')
+    posicao_ts = colunas.index('ts_ms')
+
+    linhas = consultar_particoes(conn, db_path, tabela, inicio_ms, fim_ms, filtro, params,
+                                 colunas, decrescente, limite)
+    frios = dias_arquivados(cursor, tabela, inicio_ms, fim_ms, decrescente)
+    if not frios:
+        return linhas
+
+    pasta = pasta_arquivo(db_path)
+    # O filtro pode citar colunas fora da seleção: a tabela em memória tem todas
+    todas = colunas + [c for c in _colunas(cursor, 'main', tabela) if c not in colunas]
+    memoria = sqlite3.connect(":memory:")
+    memoria.row_factory = conn.row_factory  # Mesmo tipo de linha das camadas quentes
+    try:
+        memoria.execute(f"CREATE TABLE {tabela} ({', '.join(todas)})")
+        inserir = f"INSERT INTO {tabela} VALUES ({', '.join('?' * len(todas))})"
+        selecionar = (f"SELECT {', '.join(colunas)} FROM {tabela} WHERE 1{_condicao(filtro)} "
+                      f"ORDER BY ts_ms {'DESC' if decrescente else 'ASC'}"
+                      f"{' LIMIT ?' if limite else ''}")
+
+        for _, arquivo, inicio_dia, fim_dia in frios:
+            if limite and len(linhas) >= limite:
+                # Resultado cheio: só continua se o próximo dia ainda cabe no corte
+                corte = linhas[-1][posicao_ts]
+                if (fim_dia <= corte) if decrescente else (inicio_dia > corte):
+                    break
+            caminho = pasta / arquivo
+            if not caminho.exists():  # Removido entre o catálogo e a leitura
+                continue
+
+            colunas_arquivo, dia = _ler_parquet(caminho, max(inicio_ms, inicio_dia), min(fim_ms, fim_dia))
+            memoria.executemany(inserir, _alinhar(colunas_arquivo, dia, todas))
+            linhas.extend(memoria.execute(selecionar, (*params, limite) if limite else params).fetchall())
+            memoria.execute(f"DELETE FROM {tabela}")
+
+            linhas.sort(key=lambda linha: linha[posicao_ts], reverse=decrescente)
+            if limite:
+                del linhas[limite:]
+    finally:
+        memoria.close()
+
+    return linhas
+
+
+def executar_arquivamento(db_path="database/logistics.db", dias=DIAS_ARQUIVO_PADRAO,
+                          lote=LOTE_REMOCAO, pausa_s=PAUSA_PADRAO_S):
+    """Arquiva os dias antigos (linha de comando)"""
+    if not Path(db_path).exists():
+        print(f"❌ Banco não encontrado: {db_path}")
+        return False
+
+    print("🧊 ARQUIVO FRIO (PARQUET)")
+    print("=" * 60)
+    print(f"📊 Banco: {db_path} | últimos {dias} dia(s) no SQLite | {pasta_arquivo(db_path)}")
+
+    conn = criar_conexao(db_path)
+    try:
+        t_inicio = time.perf_counter()
+        garantir_colunas_epoca(conn.cursor(), TABELAS_ARQUIVADAS)
+        conn.commit()
+        arquivados = arquivar(conn, db_path, dias, lote, pausa_s)
+    finally:
+        conn.close()
+
+    print(f"\n✅ {len(arquivados)} dia(s) arquivado(s), {sum(arquivados.values()):,} linhas "
+          f"em {time.perf_counter() - t_inicio:.1f}s")
+    return True
+
+
+def mostrar_status(db_path="database/logistics.db", dias=DIAS_ARQUIVO_PADRAO):
+    conn = criar_conexao(db_path, somente_leitura=True)
+    cursor = conn.cursor()
+    print(f"📋 Arquivo frio em {pasta_arquivo(db_path)}:")
+    if _existe(cursor, 'catalogo_arquivo'):
+        cursor.execute("""
+            SELECT tabela, COUNT(*), MIN(dia), MAX(dia), SUM(linhas), SUM(bytes)
+            FROM catalogo_arquivo GROUP BY tabela ORDER BY tabela
+        """)
+        for tabela, total_dias, primeiro, ultimo, linhas, tamanho in cursor.fetchall():
+            print(f"   🧊 {tabela}: {total_dias} dia(s) ({primeiro} a {ultimo}), {linhas:,} linhas, "
+                  f"{tamanho / 1024 / 1024:.1f} MB")
+    else:
+        print("   (vazio)")
+    pendentes = list(dias_para_arquivar(cursor, db_path, dias))
+    print(f"⏳ Dias a arquivar (mais de {dias} dias): {len(pendentes)}"
+          f"{f' ({pendentes[0]} a {pendentes[-1]})' if pendentes else ''}")
+    conn.close()
+
+
+def testar_arquivo(dias=10):
+    """
+    Banco temporário com `dias` dias nas três camadas (principal, partições, Parquet):
+    o roteador devolve exatamente as linhas originais
+    """
+    print("🧪 Teste do arquivo frio")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as pasta:
+        db_path = Path(pasta) / "arquivo.db"
+        conn = criar_conexao(db_path)
+        conn.executescript("""
+            CREATE TABLE dados_tempo_real (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp DATETIME,
+                                           estoque_patio_ton REAL, zona_operacao TEXT);
+            CREATE TABLE transporte_detalhado (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp DATETIME,
+                                               NO_PLACA TEXT, status_caminhao TEXT, QT_LIQUIDO_PESAGEM REAL);
+            CREATE TABLE colheitabilidade_detalhada (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp DATETIME,
+                                                     FAZENDA TEXT, TON_HORA REAL, data_origem DATE);
+            CREATE TABLE predicoes_estoque_patio (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                                  timestamp_predicao DATETIME, hora_futura INTEGER,
+                                                  estoque_patio_previsto_ton REAL, ofensor_principal TEXT);
+        """)
+        garantir_colunas_epoca(conn.cursor(), TABELAS_ARQUIVADAS)
+
+        agora = datetime.now().replace(microsecond=0)
+        inicio = agora - timedelta(days=dias)
+        instantes = [inicio + timedelta(minutes=10 * i) for i in range(dias * 144)]
+        conn.executemany("INSERT INTO dados_tempo_real (timestamp, estoque_patio_ton, zona_operacao) "
+                         "VALUES (?, ?, ?)",
+                         [(t, 1000.0 + i % 500 + 0.25, None if i % 7 else 'SEGURA') for i, t in enumerate(instantes)])
+        conn.executemany("INSERT INTO transporte_detalhado (timestamp, NO_PLACA, status_caminhao, "
+                         "QT_LIQUIDO_PESAGEM) VALUES (?, ?, 'T4', ?)",
+                         [(t, f"P{i % 5}", 30 + i % 9) for i, t in enumerate(instantes[::3])])
+        conn.executemany("INSERT INTO colheitabilidade_detalhada (timestamp, FAZENDA, TON_HORA, data_origem) "
+                         "VALUES (?, ?, ?, ?)",
+                         [(t, f"Fazenda {i % 3}", 60.5, t.date()) for i, t in enumerate(instantes[::6])])
+        conn.executemany("INSERT INTO predicoes_estoque_patio (timestamp_predicao, hora_futura, "
+                         "estoque_patio_previsto_ton, ofensor_principal) VALUES (?, ?, ?, ?)",
+                         [(t, h, 1200.0 + h, None) for t in instantes[::30] for h in range(1, 4)])
+        conn.commit()
+
+        originais = {
+            tabela: [tuple(linha) for linha in conn.execute(f"SELECT * FROM {tabela} ORDER BY ts_ms, id")]
+            for tabela in TABELAS_ARQUIVADAS
+        }
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        bytes_sqlite = db_path.stat().st_size
+
+        # Três camadas: 2 dias no principal, partições até 5 dias, Parquet antes disso
+        particionar(conn, db_path, dias_quentes=2, pausa_s=0, verboso=False)
+        particoes_antes = len(list(pasta_particoes(db_path).glob("*.db")))
+        arquivados = arquivar(conn, db_path, dias=5, pausa_s=0, verboso=False)
+        repetido = arquivar(conn, db_path, dias=5, pausa_s=0, verboso=False)
+        particoes_depois = len(list(pasta_particoes(db_path).glob("*.db")))
+
+        def todas(tabela):
+            colunas = [c for c in _colunas(conn.cursor(), 'main', tabela)]
+            linhas = consultar_periodo(conn, db_path, tabela, -FIM_ABERTO_MS, colunas=colunas)
+            return sorted((tuple(linha) for linha in linhas), key=lambda l: (l[colunas.index('ts_ms')], l[0]))
+
+        iguais = all(todas(tabela) == originais[tabela] for tabela in TABELAS_ARQUIVADAS)
+
+        # Linha atrasada de um dia já arquivado: a próxima execução junta sem duplicar
+        dia_frio = min(arquivados)
+        conn.execute("INSERT INTO dados_tempo_real (timestamp, estoque_patio_ton) VALUES (?, ?)",
+                     (datetime(dia_frio.year, dia_frio.month, dia_frio.day, 12, 0, 1), 999.0))
+        conn.commit()
+        atrasada = arquivar(conn, db_path, dias=5, pausa_s=0, verboso=False)
+        juntou = (len(todas('dados_tempo_real')) == len(originais['dados_tempo_real']) + 1
+                  and conn.execute("SELECT COUNT(*) FROM dados_tempo_real WHERE ts_ms < ?",
+                                   (limites_dia(dia_frio)[1],)).fetchone()[0] == 0)
+
+        # Filtro e limite atravessando as camadas
+        ultimas = consultar_periodo(conn, db_path, 'transporte_detalhado', -FIM_ABERTO_MS,
+                                    filtro="NO_PLACA = ?", params=('P3',), colunas=['id'],
+                                    decrescente=True, limite=5)
+        primeiras = consultar_periodo(conn, db_path, 'transporte_detalhado', -FIM_ABERTO_MS,
+                                      filtro="NO_PLACA = ?", params=('P3',), colunas=['id'], limite=5)
+        esperadas_p3 = [linha[0] for linha in originais['transporte_detalhado'] if linha[2] == 'P3']
+        filtro_ok = ([l[0] for l in ultimas] == esperadas_p3[::-1][:5]
+                     and [l[0] for l in primeiras] == esperadas_p3[:5])
+
+        recente_ms = para_ms(agora - timedelta(hours=6))
+        frios_recente = len(dias_arquivados(conn.cursor(), 'dados_tempo_real', recente_ms))
+        bytes_parquet = sum(p.stat().st_size for p in pasta_arquivo(db_path).rglob("*.parquet"))
+        conn.close()
+
+    print(f"   Linhas: {sum(len(l) for l in originais.values()):,} em {dias} dias, 4 tabelas")
+    print(f"   Dias arquivados: {len(arquivados)} (segunda execução: {len(repetido)})")
+    print(f"   Partições: {particoes_antes} → {particoes_depois} (dias arquivados recolhidos)")
+    print(f"   Roteador (principal + partições + Parquet) = dados originais: {'sim' if iguais else 'não'}")
+    print(f"   Linha atrasada juntada ao dia frio sem duplicar: {'sim' if juntou and len(atrasada) == 1 else 'não'}")
+    print(f"   Filtro por placa com limite (mais novas e mais antigas): {'ok' if filtro_ok else 'erro'}")
+    print(f"   Arquivos frios lidos para as últimas 6h: {frios_recente}")
+    print(f"   Parquet ({COMPRESSAO}): {bytes_parquet / 1024:.0f} KB | banco original {bytes_sqlite / 1024:.0f} KB")
+
+    aprovado = (iguais and juntou and len(atrasada) == 1 and filtro_ok and not repetido
+                and frios_recente == 0 and len(arquivados) >= dias - 5
+                and particoes_depois < particoes_antes)
+    print(f"\n{'✅ APROVADO' if aprovado else '❌ FALHOU'}")
+    return aprovado
+
+
+def main():
+    args = sys.argv[1:]
+    if "--help" in args or "-h" in args:
+        print(f"""
+🧊 Arquivo frio (Parquet) - Sistema Logística JIT
+
+USO:
+  python database/archive.py                      # Arquiva dias com mais de {DIAS_ARQUIVO_PADRAO} dias
+  python database/archive.py --db caminho.db      # Outro banco
+  python database/archive.py --dias 30            # Mantém 30 dias no SQLite
+  python database/archive.py --lote 2000 --pausa 0.1   # Remoção em lotes menores
+  python database/archive.py --status             # Catálogo e dias a arquivar
+  python database/archive.py --teste              # Três camadas em banco temporário
+
+Tabelas: {', '.join(TABELAS_ARQUIVADAS)}.
+Arquivos: <banco>_arquivo/<tabela>/dia=AAAA-MM-DD.parquet ({COMPRESSAO}). Requer pyarrow.
+Pode rodar com o gerador e a API no ar; interromper não perde linhas.
+""")
+        return
+
+    if "--teste" in args:
+        sys.exit(0 if testar_arquivo() else 1)
+
+    opcoes = {}
+    for flag, chave, tipo in [("--db", "db_path", str), ("--dias", "dias", int),
+                              ("--lote", "lote", int), ("--pausa", "pausa_s", float)]:
+        if flag in args:
+            try:
+                opcoes[chave] = tipo(args[args.index(flag) + 1])
+            except (IndexError, ValueError):
+                print(f"❌ Erro: {flag} precisa de um valor válido")
+                return
+
+    if opcoes.get("dias", DIAS_ARQUIVO_PADRAO) < 1:
+        print("❌ Erro: --dias precisa ser pelo menos 1 (o dia atual)")
+        return
+
+    if "--status" in args:
+        mostrar_status(opcoes.get("db_path", "database/logistics.db"),
+                       opcoes.get("dias", DIAS_ARQUIVO_PADRAO))
+        return
+
+    try:
+        executar_arquivamento(**opcoes)
+    except KeyboardInterrupt:
+        print("\n⏹️ Interrompido: rode de novo para continuar (nenhuma linha se perde)")
+
+
+if __name__ == "__main__":
+    main()
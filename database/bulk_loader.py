@@ -0,0 +1,435 @@
+"""
+Carga em massa de exportações históricas (PIMS / cubo) - Sistema Logística JIT
+Importa CSV ou Parquet no formato de transporte_detalhado, colheitabilidade_detalhada
+e moagem_detalhada em blocos: memória limitada e uma transação por bloco
+"""
+
+import csv
+import io
+import sys
+import time
+from datetime import datetime, date
+from itertools import islice
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+from connection import criar_conexao, executar_checkpoint, PERFIL_CARGA
+from data_quality import FiltroQualidade, garantir_tabela_quarentena
+from statements import COMANDOS_ESCRITA, CHAVES_NATURAIS
+from run_database_update import aplicar_chaves_naturais
+from epoch import INDICES_EPOCA, SQL_EPOCA_MS, garantir_colunas_epoca
+
+TAMANHO_BLOCO_PADRAO = 50000
+MAX_ERROS_EXIBIDOS = 5
+
+T2_FIXO_H = 2.0                   # Tempo de carregamento fixo (patterns.py)
+
+
+def _ciclo_total(valores):
+    """ciclo_total = T_1 + T2 + T_3 + T_4, como o gerador calcula"""
+    tempos = [valores.get('T_1'), valores.get('T_3'), valores.get('T_4')]
+    if any(t is None for t in tempos):
+        return None
+    return tempos[0] + T2_FIXO_H + tempos[1] + tempos[2]
+
+
+# Tipos: 'datetime', 'date', 'real', 'int', 'texto'
+# `tempo` = coluna de origem que também preenche `timestamp` da tabela
+# `derivadas` = colunas calculadas quando o arquivo não as traz
+ESQUEMAS_IMPORTACAO = {
+    'transporte_detalhado': {
+        'tempo': 'HR_ENTRADA_PIMS',
+        'colunas': {
+            'HR_ENTRADA_PIMS': 'datetime',
+            'NO_PLACA': 'texto',
+            'T_1': 'real',
+            'T_3': 'real',
+            'T_4': 'real',
+            'QT_LIQUIDO_PESAGEM': 'int',
+            'DISTANCIA_PIMS_MEDIA': 'real',
+            'de_categ_oper': 'texto',
+        },
+        'obrigatorias': ['HR_ENTRADA_PIMS', 'NO_PLACA'],
+        'derivadas': {'ciclo_total': _ciclo_total},
+    },
+    'colheitabilidade_detalhada': {
+        'tempo': 'HORA_ELEVADOR_TIME',
+        'colunas': {
+            'HORA_ELEVADOR_TIME': 'datetime',
+            'FAZENDA': 'texto',
+            'SETOR': 'texto',
+            'TON_HORA': 'real',
+            'data_origem': 'date',
+        },
+        'obrigatorias': ['HORA_ELEVADOR_TIME', 'TON_HORA'],
+    },
+    'moagem_detalhada': {
+        'tempo': 'DATA',
+        'colunas': {
+            'DATA': 'datetime',
+            'ORR_DESCRI': 'texto',
+            'VAR_RESULT_DIA': 'real',
+        },
+        'obrigatorias': ['DATA', 'VAR_RESULT_DIA'],
+    },
+}
+
+ALIASES_TABELA = {
+    'transporte': 'transporte_detalhado',
+    'colheitabilidade': 'colheitabilidade_detalhada',
+    'moagem': 'moagem_detalhada',
+}
+
+FORMATOS_DATA = ['%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M', '%d/%m/%Y']
+
+
+def converter_datetime(valor):
+    """ISO (espaço ou T, com ou sem fração/fuso) ou dd/mm/aaaa; texto no formato do adaptador sqlite3"""
+    if isinstance(valor, datetime):
+        return valor.replace(tzinfo=None).isoformat(" ")
+    if isinstance(valor, date):
+        return datetime(valor.year, valor.month, valor.day).isoformat(" ")
+
+    texto = valor.strip()
+    try:
+        return datetime.fromisoformat(texto.replace('Z', '+00:00')).replace(tzinfo=None).isoformat(" ")
+    except ValueError:
+        for formato in FORMATOS_DATA:
+            try:
+                return datetime.strptime(texto, formato).isoformat(" ")
+            except ValueError:
+                continue
+    raise ValueError(f"data/hora inválida: {valor!r}")
+
+
+def converter_date(valor):
+    if isinstance(valor, (datetime, date)):
+        return (valor.date() if isinstance(valor, datetime) else valor).isoformat()
+    return converter_datetime(valor)[:10]
+
+
+def converter_real(valor):
+    """Aceita decimal com ponto ou vírgula (1234.5, 1234,5, 1.234,5)"""
+    if isinstance(valor, (int, float)):
+        return float(valor)
+
+    texto = valor.strip()
+    if ',' in texto:
+        texto = texto.replace('.', '').replace(',', '.')
+    return float(texto)
+
+
+def converter_int(valor):
+    if isinstance(valor, int):
+        return valor
+    return int(round(converter_real(valor)))
+
+
+def converter_texto(valor):
+    return str(valor).strip()
+
+
+CONVERSORES = {
+    'datetime': converter_datetime,
+    'date': converter_date,
+    'real': converter_real,
+    'int': converter_int,
+    'texto': converter_texto,
+}
+
+
+def _vazio(valor):
+    return valor is None or (isinstance(valor, str) and not valor.strip())
+
+
+def ler_csv(caminho, tamanho_bloco, separador=None):
+    """Gera (blocos de dicionários, fração lida do arquivo) sem carregar o arquivo inteiro"""
+    tamanho = Path(caminho).stat().st_size or 1
+    with open(caminho, 'rb') as binario:
+        texto = io.TextIOWrapper(binario, encoding='utf-8-sig', newline='')
+        if separador is None:
+            cabecalho = texto.readline()
+            separador = ';' if cabecalho.count(';') > cabecalho.count(',') else ','
+            texto.seek(0)
+
+        leitor = csv.DictReader(texto, delimiter=separador)
+        while True:
+            bloco = list(islice(leitor, tamanho_bloco))
+            if not bloco:
+                break
+            yield bloco, binario.tell() / tamanho
+
+
+def ler_parquet(caminho, tamanho_bloco):
+    """Blocos de linhas de um Parquet (requer pyarrow)"""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Leitura de Parquet requer pyarrow (pip install pyarrow)")
+
+    arquivo = pq.ParquetFile(caminho)
+    total = arquivo.metadata.num_rows or 1
+    lidas = 0
+    for lote in arquivo.iter_batches(batch_size=tamanho_bloco):
+        bloco = lote.to_pylist()
+        lidas += len(bloco)
+        yield bloco, lidas / total
+
+
+class CargaEmMassa:
+    """
+    Importa um arquivo para uma tabela histórica
+
+    - Colunas do arquivo casadas com o esquema sem diferenciar maiúsculas
+    - Conversão de tipos por bloco; linhas inválidas são contadas e descartadas
+    - Índices da tabela removidos durante a carga e recriados no final
+      (exceto o único da chave natural: linhas já existentes são ignoradas
+      ou, com `atualizar`, sobrescritas - reimportar não duplica; e os de ts_ms,
+      usados pelos triggers, pela API e pelo roteador de partições durante a carga)
+    - Uma transação por bloco (perfil de carga: synchronous OFF)
+    - Filtro de qualidade (faixas + mediana/MAD): rejeitadas vão para a quarentena
+    """
+
+    def __init__(self, tabela, caminho, db_path="database/logistics.db",
+                 tamanho_bloco=TAMANHO_BLOCO_PADRAO, separador=None, adiar_indices=True,
+                 filtro=True, atualizar=False):
+        self.tabela = ALIASES_TABELA.get(tabela, tabela)
+        if self.tabela not in ESQUEMAS_IMPORTACAO:
+            raise ValueError(f"Tabela não suportada: {tabela} "
+                             f"(opções: {', '.join(ALIASES_TABELA)})")
+
+        self.caminho = Path(caminho)
+        self.db_path = Path(db_path)
+        self.tamanho_bloco = tamanho_bloco
+        self.separador = separador
+        self.adiar_indices = adiar_indices
+        self.esquema = ESQUEMAS_IMPORTACAO[self.tabela]
+        self.filtro = FiltroQualidade() if filtro is True else (filtro or None)
+        self.atualizar = atualizar
+
+        if not self.caminho.exists():
+            raise FileNotFoundError(f"Arquivo não encontrado: {self.caminho}")
+        if not self.db_path.exists():
+            raise FileNotFoundError(f"Banco não encontrado: {self.db_path}")
+
+    def blocos(self):
+        if self.caminho.suffix.lower() in ('.parquet', '.pq'):
+            return ler_parquet(self.caminho, self.tamanho_bloco)
+        return ler_csv(self.caminho, self.tamanho_bloco, self.separador)
+
+    def mapear_colunas(self, chaves):
+        """Coluna do esquema -> nome no arquivo"""
+        por_nome = {chave.strip().lower(): chave for chave in chaves}
+        mapa = {coluna: por_nome[coluna.lower()] for coluna in self.esquema['colunas']
+                if coluna.lower() in por_nome}
+
+        faltando = [c for c in self.esquema['obrigatorias'] if c not in mapa]
+        if faltando:
+            raise ValueError(f"Colunas obrigatórias ausentes no arquivo: {', '.join(faltando)}")
+        return mapa
+
+    def converter_bloco(self, bloco, mapa, erros):
+        """Linhas do arquivo -> tuplas prontas para o executemany"""
+        colunas = self.esquema['colunas']
+        conversao = [(mapa[c], CONVERSORES[colunas[c]], c in self.esquema['obrigatorias'])
+                     for c in mapa]
+        nomes = list(mapa)
+        indice_tempo = nomes.index(self.esquema['tempo'])
+        derivadas = list(self.esquema.get('derivadas', {}).values())
+
+        linhas = []
+        for registro in bloco:
+            try:
+                valores = []
+                for origem, conversor, obrigatoria in conversao:
+                    valor = registro[origem]
+                    if _vazio(valor):
+                        if obrigatoria:
+                            raise ValueError(f"{origem} vazio")
+                        valores.append(None)
+                    else:
+                        valores.append(conversor(valor))
+                if derivadas:
+                    por_nome = dict(zip(nomes, valores))
+                    valores += [calcular(por_nome) for calcular in derivadas]
+                linhas.append((valores[indice_tempo], *valores))
+            except (ValueError, TypeError) as e:
+                erros.append(str(e))
+        return linhas
+
+    def sql_insercao(self, destino):
+        """INSERT idempotente pela chave natural (ignora ou atualiza linhas existentes)"""
+        # ts_ms calculado do mesmo parâmetro do timestamp (?1)
+        colunas = ['timestamp', 'ts_ms'] + destino
+        valores = ['?1', SQL_EPOCA_MS.format('?1')] + [f"?{i}" for i in range(2, len(destino) + 2)]
+        sql = (f"INSERT INTO {self.tabela} ({', '.join(colunas)}) "
+               f"VALUES ({', '.join(valores)}) ")
+
+        chave = CHAVES_NATURAIS[self.tabela]
+        if not self.atualizar:
+            return sql + f"ON CONFLICT ({', '.join(chave)}) DO NOTHING"
+
+        atualizadas = [c for c in colunas if c not in chave]
+        return sql + (f"ON CONFLICT ({', '.join(chave)}) DO UPDATE SET "
+                      + ", ".join(f"{c} = excluded.{c}" for c in atualizadas))
+
+    def indices_tabela(self, cursor):
+        """Índices adiados: os secundários antigos (fora da chave natural e dos de ts_ms)"""
+        cursor.execute("""
+            SELECT name, sql FROM sqlite_master
+            WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL
+              AND sql NOT LIKE 'CREATE UNIQUE%'
+        """, (self.tabela,))
+        mantidos = set(INDICES_EPOCA) | {f"idx_{self.tabela}_ts_ms"}
+        return [(nome, sql) for nome, sql in cursor.fetchall() if nome not in mantidos]
+
+    def executar(self):
+        """Roda a importação e retorna as métricas"""
+        print(f"📥 Carga em massa: {self.caminho} → {self.tabela}")
+        print(f"   Banco: {self.db_path} | blocos de {self.tamanho_bloco} linhas")
+
+        conn = criar_conexao(self.db_path, perfil=PERFIL_CARGA)
+        cursor = conn.cursor()
+
+        garantir_colunas_epoca(cursor, [self.tabela])
+        if self.filtro:
+            garantir_tabela_quarentena(cursor)
+
+        duplicatas = aplicar_chaves_naturais(cursor, [self.tabela])[self.tabela]
+        if duplicatas:
+            print(f"   🔑 {duplicatas} duplicatas antigas removidas ao criar a chave natural")
+
+        indices = self.indices_tabela(cursor) if self.adiar_indices else []
+        for nome, _ in indices:
+            cursor.execute(f"DROP INDEX IF EXISTS {nome}")
+        conn.commit()
+        if indices:
+            print(f"   🗂️ {len(indices)} índices adiados: {', '.join(nome for nome, _ in indices)}")
+
+        mapa = None
+        sql = None
+        destino = None
+        inseridas = 0
+        ignoradas = 0
+        quarentena = 0
+        lidas = 0
+        erros = []
+        t_inicio = time.perf_counter()
+
+        try:
+            for bloco, fracao in self.blocos():
+                if mapa is None:
+                    mapa = self.mapear_colunas(bloco[0].keys())
+                    destino = list(mapa) + list(self.esquema.get('derivadas', {}))
+                    sql = self.sql_insercao(destino)
+                    ausentes = [c for c in self.esquema['colunas'] if c not in mapa]
+                    if ausentes:
+                        print(f"   ℹ️ Colunas ausentes (ficam NULL): {', '.join(ausentes)}")
+
+                linhas = self.converter_bloco(bloco, mapa, erros)
+                if self.filtro:
+                    colunas = ['timestamp'] + destino
+                    linhas, rejeitadas = self.filtro.filtrar(self.tabela, colunas, linhas)
+                    if rejeitadas:
+                        cursor.executemany(COMANDOS_ESCRITA['inserir_quarentena'], [
+                            params for _, params in
+                            self.filtro.operacoes_quarentena(self.tabela, colunas, rejeitadas)
+                        ])
+                        quarentena += len(rejeitadas)
+                cursor.executemany(sql, linhas)
+                conn.commit()
+
+                lidas += len(bloco)
+                # rowcount: inseridas (ou atualizadas); conflitos ignorados não contam
+                inseridas += cursor.rowcount
+                ignoradas += len(linhas) - cursor.rowcount
+                decorrido = time.perf_counter() - t_inicio
+                print(f"   📦 {inseridas:,} linhas ({fracao * 100:5.1f}%) | "
+                      f"{inseridas / decorrido:,.0f} linhas/s | "
+                      f"{lidas - inseridas - ignoradas - quarentena} rejeitadas | {quarentena} em quarentena"
+                      f"{f' | {ignoradas:,} já existentes' if ignoradas else ''}")
+        finally:
+            if indices:
+                t_indices = time.perf_counter()
+                for _, sql_indice in indices:
+                    cursor.execute(sql_indice)
+                conn.commit()
+                print(f"   🗂️ Índices recriados em {time.perf_counter() - t_indices:.1f}s")
+
+            cursor.execute("ANALYZE")
+            executar_checkpoint(conn, 'TRUNCATE')
+            conn.close()
+
+        decorrido = time.perf_counter() - t_inicio
+        metricas = {
+            'lidas': lidas,
+            'inseridas': inseridas,
+            'ignoradas': ignoradas,
+            'rejeitadas': lidas - inseridas - ignoradas - quarentena,
+            'quarentena': quarentena,
+            'segundos': decorrido,
+            'linhas_por_s': inseridas / decorrido if decorrido else 0.0,
+        }
+
+        print(f"\n✅ Carga concluída em {decorrido:.1f}s: {inseridas:,} linhas "
+              f"({metricas['linhas_por_s']:,.0f} linhas/s)")
+        if ignoradas:
+            print(f"   🔑 {ignoradas:,} linhas já existiam (chave natural) e foram ignoradas")
+        if erros:
+            print(f"   ⚠️ {len(erros)} linhas rejeitadas, por exemplo:")
+            for erro in erros[:MAX_ERROS_EXIBIDOS]:
+                print(f"      - {erro}")
+        if self.filtro:
+            self.filtro.mostrar_resumo()
+
+        return metricas
+
+
+def main():
+    """Função principal"""
+    args = sys.argv[1:]
+
+    if "--help" in args or "-h" in args or len(args) < 2:
+        print(f"""
+📥 Carga em massa de histórico - Sistema Logística JIT
+
+USO:
+  python database/bulk_loader.py transporte transporte_2021_2023.csv
+  python database/bulk_loader.py colheitabilidade colheita_abr2025.parquet   # Requer pyarrow
+  python database/bulk_loader.py moagem moagem.csv --separador ";"
+  python database/bulk_loader.py transporte arquivo.csv --db outro.db --bloco 100000
+  python database/bulk_loader.py transporte arquivo.csv --manter-indices      # Não adia os índices
+  python database/bulk_loader.py transporte arquivo.csv --sem-filtro          # Sem filtro de qualidade
+  python database/bulk_loader.py transporte arquivo.csv --atualizar           # Sobrescreve linhas já importadas
+
+TABELAS: {', '.join(f'{alias} ({tabela})' for alias, tabela in ALIASES_TABELA.items())}
+
+As colunas do arquivo usam os nomes do datalake (HR_ENTRADA_PIMS, NO_PLACA, T_1, ...).
+Decimais com vírgula e datas dd/mm/aaaa são aceitos. Pare o scheduler durante a carga.
+Reimportar o mesmo arquivo não duplica linhas (chave natural, ex.: NO_PLACA + HR_ENTRADA_PIMS).
+Linhas fora das faixas válidas (ex.: T4 negativo ou > 50h) vão para quarentena_qualidade.
+""")
+        return
+
+    tabela, caminho = args[0], args[1]
+    opcoes = {}
+    for flag, chave, tipo in [("--db", "db_path", str), ("--bloco", "tamanho_bloco", int),
+                              ("--separador", "separador", str)]:
+        if flag in args:
+            try:
+                opcoes[chave] = tipo(args[args.index(flag) + 1])
+            except (IndexError, ValueError):
+                print(f"❌ Erro: {flag} precisa de um valor válido")
+                return
+    opcoes["adiar_indices"] = "--manter-indices" not in args
+    opcoes["filtro"] = "--sem-filtro" not in args
+    opcoes["atualizar"] = "--atualizar" in args
+
+    try:
+        CargaEmMassa(tabela, caminho, **opcoes).executar()
+    except (FileNotFoundError, ValueError, RuntimeError) as e:
+        print(f"❌ {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""
+Fábrica de conexões SQLite - Sistema Logística JIT
+Perfil de concorrência compartilhado pelo gerador, serviço de predição e API
+"""
+
+import math
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Perfil ajustado para um escritor (gerador) e vários leitores (API, predição)
+PERFIL_PADRAO = {
+    'journal_mode': 'WAL',          # Leitores não bloqueiam o escritor (e vice-versa)
+    'busy_timeout': 5000,           # ms esperando lock antes de "database is locked"
+    'synchronous': 'NORMAL',        # Seguro em WAL, evita fsync a cada commit
+    'mmap_size': 268435456,         # 256 MB de leitura via mmap
+    'cache_size': -32000,           # ~32 MB de cache de páginas (valor negativo = KiB)
+    'temp_store': 'MEMORY',         # Ordenações/tabelas temporárias em memória
+    'wal_autocheckpoint': 1000,     # Checkpoint automático a cada ~1000 páginas (~4 MB)
+}
+
+# Carga em massa (backfill, fixtures): banco recriável, sem fsync
+PERFIL_CARGA = {
+    **PERFIL_PADRAO,
+    'synchronous': 'OFF',
+    'wal_autocheckpoint': 10000,
+}
+
+# Perfil padrão do SQLite, usado só para comparação no teste de estresse
+PERFIL_ROLLBACK = {
+    'journal_mode': 'DELETE',
+    'busy_timeout': 0,
+    'synchronous': 'FULL',
+}
+
+
+def _sqlite_tem_sqrt():
+    try:
+        sqlite3.connect(":memory:").execute("SELECT sqrt(4)")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+# Triggers de padroes_horarios usam sqrt(); builds do SQLite sem as funções
+# matemáticas (SQLITE_ENABLE_MATH_FUNCTIONS) recebem a versão em Python
+SQLITE_TEM_SQRT = _sqlite_tem_sqrt()
+
+
+def _sqrt(valor):
+    return math.sqrt(valor) if valor is not None and valor >= 0 else None
+
+
+def aplicar_perfil(conn, perfil=None):
+    """Aplica os PRAGMAs do perfil em uma conexão aberta"""
+    perfil = PERFIL_PADRAO if perfil is None else perfil
+
+    # busy_timeout primeiro: trocar o journal_mode também precisa de lock
+    if 'busy_timeout' in perfil:
+        conn.execute(f"PRAGMA busy_timeout = {int(perfil['busy_timeout'])}")
+
+    for pragma, valor in perfil.items():
+        if pragma == 'busy_timeout':
+            continue
+        if pragma == 'journal_mode':
+            # Persistente no arquivo: só troca se necessário (a troca pede lock exclusivo)
+            atual = conn.execute("PRAGMA journal_mode").fetchone()[0]
+            if atual.upper() == str(valor).upper():
+                continue
+        conn.execute(f"PRAGMA {pragma} = {valor}")
+
+    return conn
+
+
+def criar_conexao(db_path, somente_leitura=False, perfil=None, imutavel=False, **kwargs):
+    """
+    Abre uma conexão com o perfil de concorrência aplicado
+
+    Todos os componentes devem usar esta função em vez de sqlite3.connect
+    `imutavel`: somente leitura sem locks nem checagem de mudanças (immutable=1),
+    só para arquivos que nunca são alterados no lugar (snapshots da réplica)
+    """
+    perfil = PERFIL_PADRAO if perfil is None else perfil
+    timeout = perfil.get('busy_timeout', 5000) / 1000
+
+    if somente_leitura or imutavel:
+        uri = f"file:{Path(db_path).absolute()}?mode=ro{'&immutable=1' if imutavel else ''}"
+        conn = sqlite3.connect(uri, uri=True, timeout=timeout, **kwargs)
+        # journal_mode é do arquivo, não dá para trocar em modo leitura
+        perfil = {k: v for k, v in perfil.items() if k not in ('journal_mode', 'wal_autocheckpoint')}
+    else:
+        conn = sqlite3.connect(str(db_path), timeout=timeout, **kwargs)
+
+    if not SQLITE_TEM_SQRT:
+        conn.create_function("sqrt", 1, _sqrt, deterministic=True)
+
+    return aplicar_perfil(conn, perfil)
+
+
+def executar_checkpoint(conn, modo='PASSIVE'):
+    """
+    Executa checkpoint do WAL
+
+    PASSIVE não espera leitores; TRUNCATE espera e zera o arquivo -wal
+    Retorna (ocupado, paginas_wal, paginas_copiadas)
+    """
+    return conn.execute(f"PRAGMA wal_checkpoint({modo})").fetchone()
+
+
+class PoliticaCheckpoint:
+    """
+    Política de checkpoint complementar ao wal_autocheckpoint
+
+    - A cada `intervalo_s`: checkpoint PASSIVE (não bloqueia ninguém)
+    - Se o arquivo -wal passar de `limite_wal_bytes` (leitores longos impediram
+      o autocheckpoint de reciclar o log): checkpoint TRUNCATE
+    """
+
+    def __init__(self, db_path, intervalo_s=60, limite_wal_bytes=64 * 1024 * 1024):
+        self.db_path = Path(db_path)
+        self.wal_path = Path(str(self.db_path) + "-wal")
+        self.intervalo_s = intervalo_s
+        self.limite_wal_bytes = limite_wal_bytes
+        self.ultimo_checkpoint = time.monotonic()
+        self.total_checkpoints = 0
+
+    def tamanho_wal(self):
+        return self.wal_path.stat().st_size if self.wal_path.exists() else 0
+
+    def verificar(self, conn):
+        """Executa checkpoint se necessário. Retorna o modo usado ou None"""
+        if self.tamanho_wal() > self.limite_wal_bytes:
+            modo = 'TRUNCATE'
+        elif time.monotonic() - self.ultimo_checkpoint >= self.intervalo_s:
+            modo = 'PASSIVE'
+        else:
+            return None
+
+        executar_checkpoint(conn, modo)
+        self.ultimo_checkpoint = time.monotonic()
+        self.total_checkpoints += 1
+        return modo
+
+
+def _percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+def _rodar_estresse(db_path, perfil, segundos, escritores, leitores):
+    """Roda escritores e leitores concorrentes e mede a latência das leituras"""
+    conn = criar_conexao(db_path, perfil=perfil)
+    conn.executescript("""
+        DROP TABLE IF EXISTS dados_tempo_real;
+        CREATE TABLE dados_tempo_real (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME,
+            estoque_patio_ton REAL
+        );
+        CREATE INDEX idx_dados_tempo_real_timestamp ON dados_tempo_real(timestamp);
+    """)
+    conn.commit()
+    conn.close()
+
+    parar = threading.Event()
+    latencias = []
+    erros = {'leitura': 0, 'escrita': 0}
+    escritas = [0]
+    trava = threading.Lock()
+
+    def escritor(conn):
+        while not parar.is_set():
+            try:
+                # Ciclo típico do gerador: várias linhas por commit
+                conn.executemany(
+                    "INSERT INTO dados_tempo_real (timestamp, estoque_patio_ton) VALUES (datetime('now'), ?)",
+                    [(1000 + i,) for i in range(20)]
+                )
+                conn.commit()
+                with trava:
+                    escritas[0] += 1
+            except sqlite3.OperationalError:
+                conn.rollback()
+                with trava:
+                    erros['escrita'] += 1
+        conn.close()
+
+    def leitor(conn):
+        while not parar.is_set():
+            inicio = time.perf_counter()
+            try:
+                conn.execute("""
+                    SELECT AVG(estoque_patio_ton), COUNT(*) FROM (
+                        SELECT estoque_patio_ton FROM dados_tempo_real
+                        ORDER BY timestamp DESC LIMIT 500
+                    )
+                """).fetchone()
+                with trava:
+                    latencias.append((time.perf_counter() - inicio) * 1000)
+            except sqlite3.OperationalError:
+                with trava:
+                    erros['leitura'] += 1
+        conn.close()
+
+    # Conexões abertas antes de iniciar as threads (abrir também disputa lock)
+    threads = [
+        threading.Thread(target=escritor, args=(criar_conexao(db_path, perfil=perfil, check_same_thread=False),))
+        for _ in range(escritores)
+    ]
+    threads += [
+        threading.Thread(target=leitor, args=(criar_conexao(db_path, perfil=perfil, check_same_thread=False),))
+        for _ in range(leitores)
+    ]
+    for t in threads:
+        t.start()
+    time.sleep(segundos)
+    parar.set()
+    for t in threads:
+        t.join()
+
+    return {
+        'leituras': len(latencias),
+        'commits': escritas[0],
+        'p50_ms': _percentil(latencias, 0.50),
+        'p95_ms': _percentil(latencias, 0.95),
+        'max_ms': max(latencias) if latencias else 0.0,
+        'erros_leitura': erros['leitura'],
+        'erros_escrita': erros['escrita'],
+    }
+
+
+def testar_concorrencia(segundos=5, escritores=2, leitores=4):
+    """Teste de estresse: latência de leitura com escritores ativos, rollback vs WAL"""
+    print("🧪 Teste de concorrência SQLite")
+    print(f"   {escritores} escritores, {leitores} leitores, {segundos}s por perfil")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as pasta:
+        resultados = {}
+        for nome, perfil in [('ROLLBACK (padrão)', PERFIL_ROLLBACK), ('WAL (perfil)', PERFIL_PADRAO)]:
+            db_path = Path(pasta) / f"estresse_{perfil['journal_mode'].lower()}.db"
+            resultados[nome] = _rodar_estresse(db_path, perfil, segundos, escritores, leitores)
+
+    print(f"{'Perfil':<20} {'Leituras':>9} {'Commits':>8} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'max ms':>8} {'Erros L/E':>10}")
+    print("-" * 80)
+    for nome, r in resultados.items():
+        print(f"{nome:<20} {r['leituras']:>9} {r['commits']:>8} {r['p50_ms']:>8.2f} "
+              f"{r['p95_ms']:>8.2f} {r['max_ms']:>8.1f} {r['erros_leitura']:>4}/{r['erros_escrita']:<4}")
+
+    wal = resultados['WAL (perfil)']
+    aprovado = wal['erros_leitura'] == 0 and wal['erros_escrita'] == 0
+    print(f"\n{'✅ APROVADO' if aprovado else '⚠️ ERROS COM PERFIL WAL'}")
+    return aprovado
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if "--teste" in args:
+        segundos = 5
+        if "--segundos" in args:
+            segundos = float(args[args.index("--segundos") + 1])
+        sys.exit(0 if testar_concorrencia(segundos=segundos) else 1)
+    else:
+        print("USO: python database/connection.py --teste [--segundos N]")
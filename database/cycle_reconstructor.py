@@ -0,0 +1,454 @@
+"""
+Reconstrução de ciclos a partir de eventos brutos do PIMS - Sistema Logística JIT
+Máquina de estados por caminhão sobre eventos de mudança de status (T1 -> T2 -> T3 -> T4),
+com atraso limitado: cada ciclo completo vira uma linha de transporte_detalhado
+"""
+
+import heapq
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+from connection import criar_conexao, executar_checkpoint
+from statements import executar_operacoes
+from epoch import garantir_colunas_epoca
+from bulk_loader import T2_FIXO_H, FORMATOS_DATA, TAMANHO_BLOCO_PADRAO, converter_real, _vazio, ler_csv, ler_parquet
+
+JANELA_ATRASO_S = 600             # Eventos fora de ordem aceitos até 10 min atrás da maior hora vista
+MAX_ERROS_EXIBIDOS = 5
+
+T1, T2, T3, T4 = "T1", "T2", "T3", "T4"
+PROXIMA_FASE = {T1: T2, T2: T3, T3: T4, T4: T1}
+
+# Colunas do evento bruto (primeiro nome encontrado no arquivo, sem diferenciar maiúsculas)
+COLUNAS_EVENTO = {
+    'placa': ('NO_PLACA', 'PLACA'),
+    'status': ('status_caminhao', 'STATUS', 'FASE'),
+    'instante': ('HR_EVENTO', 'DT_EVENTO', 'instante', 'timestamp'),
+    'carga': ('QT_LIQUIDO_PESAGEM',),
+    'distancia': ('DISTANCIA_PIMS_MEDIA',),
+    'categoria': ('de_categ_oper',),
+}
+OBRIGATORIAS_EVENTO = ('placa', 'status', 'instante')
+
+EPOCA = datetime(1970, 1, 1)
+
+
+def segundos(instante):
+    """datetime (sem fuso) ou texto -> segundos desde EPOCA"""
+    if not isinstance(instante, datetime):
+        texto = str(instante).strip()
+        try:
+            instante = datetime.fromisoformat(texto.replace('Z', '+00:00'))
+        except ValueError:
+            for formato in FORMATOS_DATA:
+                try:
+                    instante = datetime.strptime(texto, formato)
+                    break
+                except ValueError:
+                    continue
+            else:
+                raise ValueError(f"data/hora inválida: {texto!r}")
+    return (instante.replace(tzinfo=None) - EPOCA).total_seconds()
+
+
+def instante(segundos_epoca):
+    return EPOCA + timedelta(seconds=segundos_epoca)
+
+
+class EstadoCiclo:
+    """Estado de um caminhão: fase atual e início de cada fase do ciclo em curso"""
+
+    __slots__ = ('fase', 'inicio_t1', 'inicio_t2', 'inicio_t3', 'inicio_t4',
+                 'carga_kg', 'distancia', 'categoria')
+
+    def __init__(self):
+        self.fase = None
+        self.inicio_t1 = self.inicio_t2 = self.inicio_t3 = self.inicio_t4 = None
+        self.carga_kg = None
+        self.distancia = None
+        self.categoria = None
+
+    def reiniciar(self, fase, instante_s):
+        """Começa um ciclo parcial na fase informada"""
+        self.inicio_t1 = self.inicio_t2 = self.inicio_t3 = self.inicio_t4 = None
+        setattr(self, 'inicio_' + fase.lower(), instante_s)
+
+
+class ReconstrutorCiclos:
+    """
+    Reconstrói ciclos T1-T4 a partir de mudanças de status por caminhão
+
+    - Eventos entram em um heap; a marca d'água é a maior hora vista menos
+      `janela_atraso_s`. Eventos abaixo da marca saem do heap em ordem de hora
+      e alimentam a máquina de estados; eventos que chegam abaixo dela são
+      descartados (contados em `atrasados`)
+    - Ciclo completo: T1 -> (T2) -> T3 -> T4 -> T1. Sem o evento de T2, o
+      carregamento é o fixo de 2h (mesma convenção de ciclo_total)
+    - Status repetido é ignorado; transição fora da sequência descarta o ciclo
+      parcial e recomeça na nova fase
+    - Saídas: linhas de transporte_detalhado (uma por ciclo, na chegada ao
+      pátio) e mudanças de status para estado_caminhao
+    """
+
+    def __init__(self, janela_atraso_s=JANELA_ATRASO_S):
+        self.janela_atraso_s = janela_atraso_s
+        self.pendentes = []              # heap (instante_s, sequencia, placa, status, carga, distancia, categoria)
+        self.sequencia = 0
+        self.caminhoes = {}              # placa -> EstadoCiclo
+        self.maior_instante_s = float('-inf')
+        self.marca_dagua_s = float('-inf')
+
+        self.ciclos = []                 # linhas de inserir_transporte_detalhado pendentes
+        self.mudancas_status = []        # linhas de atualizar_status_caminhao pendentes
+
+        self.eventos = 0
+        self.atrasados = 0
+        self.repetidos = 0
+        self.fora_de_sequencia = 0
+        self.status_invalidos = 0
+        self.ciclos_emitidos = 0
+
+    def adicionar(self, instante_s, placa, status, carga_kg=None, distancia=None, categoria=None):
+        """Recebe um evento (instante em segundos desde EPOCA); retorna False se chegou atrasado demais"""
+        self.eventos += 1
+        if instante_s < self.marca_dagua_s:
+            self.atrasados += 1
+            return False
+
+        self.sequencia += 1
+        heapq.heappush(self.pendentes, (instante_s, self.sequencia, placa, status, carga_kg, distancia, categoria))
+
+        if instante_s > self.maior_instante_s:
+            self.maior_instante_s = instante_s
+            self.marca_dagua_s = instante_s - self.janela_atraso_s
+            self._liberar(self.marca_dagua_s)
+        return True
+
+    def finalizar(self):
+        """Fim do fluxo: processa todos os eventos ainda na janela"""
+        self._liberar(float('inf'))
+
+    def _liberar(self, limite_s):
+        pendentes = self.pendentes
+        while pendentes and pendentes[0][0] <= limite_s:
+            self._aplicar(*heapq.heappop(pendentes))
+
+    def _aplicar(self, instante_s, _, placa, status, carga_kg, distancia, categoria):
+        if status not in PROXIMA_FASE:
+            self.status_invalidos += 1
+            return
+
+        estado = self.caminhoes.get(placa)
+        if estado is None:
+            estado = self.caminhoes[placa] = EstadoCiclo()
+
+        if carga_kg is not None:
+            estado.carga_kg = carga_kg
+        if distancia is not None:
+            estado.distancia = distancia
+        if categoria is not None:
+            estado.categoria = categoria
+
+        fase = estado.fase
+        if status == fase:
+            self.repetidos += 1
+            return
+
+        if fase is None:
+            estado.reiniciar(status, instante_s)
+        elif status == PROXIMA_FASE[fase] or (fase == T1 and status == T3):
+            if status == T1:
+                if estado.inicio_t1 is not None and estado.inicio_t3 is not None:
+                    self._emitir_ciclo(placa, estado, instante_s)
+                estado.reiniciar(T1, instante_s)
+            else:
+                setattr(estado, 'inicio_' + status.lower(), instante_s)
+        else:
+            self.fora_de_sequencia += 1
+            estado.reiniciar(status, instante_s)
+
+        estado.fase = status
+        self.mudancas_status.append((placa, status, estado.carga_kg, estado.categoria, instante(instante_s)))
+
+    def _emitir_ciclo(self, placa, estado, fim_s):
+        """Linha de transporte_detalhado (mesma ordem de inserir_transporte_detalhado)"""
+        ida_e_carregamento_h = (estado.inicio_t3 - estado.inicio_t1) / 3600
+        if estado.inicio_t2 is not None:
+            t1 = (estado.inicio_t2 - estado.inicio_t1) / 3600
+        else:
+            t1 = max(0.0, ida_e_carregamento_h - T2_FIXO_H)
+        t3 = (estado.inicio_t4 - estado.inicio_t3) / 3600
+        t4 = (fim_s - estado.inicio_t4) / 3600
+        chegada = instante(estado.inicio_t4)
+
+        velocidade = round(estado.distancia / t3, 1) if estado.distancia and t3 > 0 else None
+        self.ciclos.append((
+            chegada,
+            chegada,
+            placa,
+            round(t1, 2),
+            round(t3, 2),
+            round(t4, 2),
+            estado.carga_kg,
+            estado.distancia,
+            estado.categoria,
+            round((fim_s - estado.inicio_t1) / 3600, 2),
+            T4,
+            velocidade,
+            None,
+            chegada
+        ))
+        self.ciclos_emitidos += 1
+
+    def drenar_operacoes(self):
+        """Operações pendentes para o escritor/banco: mudanças de status, depois ciclos"""
+        operacoes = [('atualizar_status_caminhao', mudanca) for mudanca in self.mudancas_status]
+        operacoes += [('inserir_transporte_detalhado', ciclo) for ciclo in self.ciclos]
+        self.mudancas_status = []
+        self.ciclos = []
+        return operacoes
+
+    def resumo(self):
+        return {
+            'eventos': self.eventos,
+            'ciclos': self.ciclos_emitidos,
+            'atrasados': self.atrasados,
+            'repetidos': self.repetidos,
+            'fora_de_sequencia': self.fora_de_sequencia,
+            'status_invalidos': self.status_invalidos,
+            'na_janela': len(self.pendentes),
+            'caminhoes': len(self.caminhoes),
+        }
+
+
+def mapear_colunas_evento(chaves):
+    """Campo do evento -> nome da coluna no arquivo"""
+    por_nome = {chave.strip().lower(): chave for chave in chaves}
+    mapa = {}
+    for campo, nomes in COLUNAS_EVENTO.items():
+        for nome in nomes:
+            if nome.lower() in por_nome:
+                mapa[campo] = por_nome[nome.lower()]
+                break
+
+    faltando = [campo for campo in OBRIGATORIAS_EVENTO if campo not in mapa]
+    if faltando:
+        raise ValueError("Colunas obrigatórias ausentes no arquivo: "
+                         + ", ".join(COLUNAS_EVENTO[campo][0] for campo in faltando))
+    return mapa
+
+
+def reconstruir_arquivo(caminho, db_path="database/logistics.db", janela_atraso_s=JANELA_ATRASO_S,
+                        tamanho_bloco=TAMANHO_BLOCO_PADRAO, separador=None, escritor=None, filtro=None):
+    """
+    Lê eventos brutos (CSV/Parquet) em blocos, reconstrói os ciclos e grava
+    cada bloco em uma transação (ou via processo escritor). Retorna as métricas
+    """
+    caminho = Path(caminho)
+    db_path = Path(db_path)
+    if not caminho.exists():
+        raise FileNotFoundError(f"Arquivo não encontrado: {caminho}")
+    if not db_path.exists():
+        raise FileNotFoundError(f"Banco não encontrado: {db_path}")
+
+    print(f"🔄 Reconstrução de ciclos: {caminho} → transporte_detalhado")
+    print(f"   Banco: {db_path} | janela de atraso {janela_atraso_s:.0f}s | blocos de {tamanho_bloco} eventos")
+
+    conn = criar_conexao(db_path)
+    cursor = conn.cursor()
+    garantir_colunas_epoca(cursor)
+
+    # Mudanças de status vão para estado_caminhao (mesmo DDL de run_database_update)
+    from run_database_update import SQL_ESTADO_CAMINHAO, criar_distribuicao_frota
+    for sql in SQL_ESTADO_CAMINHAO:
+        cursor.execute(sql)
+    criar_distribuicao_frota(cursor)
+    if filtro:
+        from data_quality import garantir_tabela_quarentena
+        garantir_tabela_quarentena(cursor)
+    conn.commit()
+
+    reconstrutor = ReconstrutorCiclos(janela_atraso_s)
+    blocos = (ler_parquet(caminho, tamanho_bloco) if caminho.suffix.lower() in ('.parquet', '.pq')
+              else ler_csv(caminho, tamanho_bloco, separador))
+    mapa = None
+    erros = []
+    gravadas = 0
+    t_inicio = time.perf_counter()
+
+    def gravar(operacoes):
+        if filtro:
+            operacoes = filtro.filtrar_operacoes(operacoes)
+        if not operacoes:
+            return 0
+        if escritor:
+            escritor.enviar(operacoes)
+            return len(operacoes)
+        total = executar_operacoes(cursor, operacoes)
+        conn.commit()
+        return total
+
+    try:
+        for bloco, fracao in blocos:
+            if mapa is None:
+                mapa = mapear_colunas_evento(bloco[0].keys())
+            c_placa, c_status, c_instante = (mapa[campo] for campo in OBRIGATORIAS_EVENTO)
+            c_carga, c_distancia, c_categoria = (mapa.get(campo) for campo in ('carga', 'distancia', 'categoria'))
+
+            for registro in bloco:
+                try:
+                    placa = registro[c_placa]
+                    status = registro[c_status]
+                    if _vazio(placa) or _vazio(status) or _vazio(registro[c_instante]):
+                        raise ValueError("placa, status ou hora vazios")
+                    carga = registro[c_carga] if c_carga else None
+                    distancia = registro[c_distancia] if c_distancia else None
+                    categoria = registro[c_categoria] if c_categoria else None
+                    reconstrutor.adicionar(
+                        segundos(registro[c_instante]), str(placa).strip(), str(status).strip().upper(),
+                        None if _vazio(carga) else int(round(converter_real(carga))),
+                        None if _vazio(distancia) else converter_real(distancia),
+                        None if _vazio(categoria) else str(categoria).strip()
+                    )
+                except (ValueError, TypeError) as e:
+                    erros.append(str(e))
+
+            gravadas += gravar(reconstrutor.drenar_operacoes())
+            decorrido = time.perf_counter() - t_inicio
+            print(f"   📦 {reconstrutor.eventos:,} eventos ({fracao * 100:5.1f}%) | "
+                  f"{reconstrutor.eventos / decorrido:,.0f} eventos/s | "
+                  f"{reconstrutor.ciclos_emitidos:,} ciclos | {reconstrutor.atrasados} atrasados")
+
+        reconstrutor.finalizar()
+        gravadas += gravar(reconstrutor.drenar_operacoes())
+    finally:
+        executar_checkpoint(conn, 'PASSIVE')
+        conn.close()
+
+    decorrido = time.perf_counter() - t_inicio
+    metricas = reconstrutor.resumo()
+    metricas.update({
+        'operacoes': gravadas,
+        'invalidos': len(erros),
+        'segundos': decorrido,
+        'eventos_por_s': reconstrutor.eventos / decorrido if decorrido else 0.0,
+    })
+
+    print(f"\n✅ Reconstrução concluída em {decorrido:.1f}s: {metricas['ciclos']:,} ciclos de "
+          f"{metricas['eventos']:,} eventos ({metricas['eventos_por_s']:,.0f} eventos/s)")
+    print(f"   Atrasados (fora da janela): {metricas['atrasados']} | repetidos: {metricas['repetidos']} | "
+          f"fora de sequência: {metricas['fora_de_sequencia']} | status inválido: {metricas['status_invalidos']}")
+    if erros:
+        print(f"   ⚠️ {len(erros)} eventos inválidos, por exemplo:")
+        for erro in erros[:MAX_ERROS_EXIBIDOS]:
+            print(f"      - {erro}")
+    if filtro:
+        filtro.mostrar_resumo()
+
+    return metricas
+
+
+def testar_reconstrutor(num_caminhoes=46, dias=7, janela_atraso_s=JANELA_ATRASO_S):
+    """
+    Eventos do simulador de frota, embaralhados dentro da janela de atraso:
+    os ciclos reconstruídos devem bater com as viagens do simulador
+    """
+    sys.path.append(str(Path(__file__).parent.parent / "data_generator"))
+    from fleet_simulator import SimuladorFrota
+
+    print("🧪 Teste do Reconstrutor de Ciclos")
+    print(f"   {num_caminhoes} caminhões, {dias} dias simulados, janela {janela_atraso_s:.0f}s")
+    print("=" * 60)
+
+    rng = random.Random(7)
+    simulador = SimuladorFrota(datetime(2025, 4, 1), num_caminhoes=num_caminhoes, rng=random.Random(7))
+    simulador.avancar_ate(datetime(2025, 4, 1) + timedelta(days=dias))
+    # Sem o retrato inicial (um evento por caminhão no meio da fase)
+    mudancas = simulador.drenar_status()[num_caminhoes:]
+    viagens = {(v[2], v[1]): v for v in simulador.drenar_viagens()}
+
+    # Chegada ao sistema = hora do evento + atraso de até 90% da janela
+    eventos = sorted(
+        ((segundos(m[4]) + rng.uniform(0, janela_atraso_s * 0.9), m) for m in mudancas),
+        key=lambda evento: evento[0]
+    )
+    eventos = [(segundos(m[4]), m[0], m[1], m[2], None, m[3]) for _, m in eventos]
+
+    reconstrutor = ReconstrutorCiclos(janela_atraso_s)
+    t_inicio = time.perf_counter()
+    for evento in eventos:
+        reconstrutor.adicionar(*evento)
+    reconstrutor.finalizar()
+    decorrido = time.perf_counter() - t_inicio
+
+    ciclos = reconstrutor.drenar_operacoes()
+    ciclos = [params for nome, params in ciclos if nome == 'inserir_transporte_detalhado']
+    iguais = sum(
+        1 for c in ciclos
+        if (c[2], c[1]) in viagens and all(
+            abs(c[i] - viagens[(c[2], c[1])][i]) <= 0.011 for i in (3, 4, 5, 9))
+    )
+
+    resumo = reconstrutor.resumo()
+    print(f"   Eventos: {resumo['eventos']:,} em {decorrido * 1000:.0f} ms "
+          f"({resumo['eventos'] / decorrido:,.0f} eventos/s)")
+    print(f"   Ciclos reconstruídos: {len(ciclos):,} | iguais ao simulador: {iguais:,}")
+    print(f"   Atrasados: {resumo['atrasados']} | fora de sequência: {resumo['fora_de_sequencia']}")
+    print("\n✅ Teste concluído" if ciclos and iguais == len(ciclos) else "\n❌ Ciclos divergentes")
+
+
+def main():
+    """Função principal"""
+    args = sys.argv[1:]
+
+    if "--teste" in args:
+        testar_reconstrutor()
+        return
+
+    if "--help" in args or "-h" in args or not args:
+        print(f"""
+🔄 Reconstrução de ciclos a partir de eventos do PIMS - Sistema Logística JIT
+
+USO:
+  python database/cycle_reconstructor.py eventos.csv
+  python database/cycle_reconstructor.py eventos.parquet --janela 1800   # Atraso aceito (s)
+  python database/cycle_reconstructor.py eventos.csv --escritor          # Via processo escritor
+  python database/cycle_reconstructor.py eventos.csv --filtro-qualidade  # Ciclos inválidos → quarentena
+  python database/cycle_reconstructor.py --teste                         # Compara com o simulador de frota
+
+Colunas: NO_PLACA, status_caminhao (T1-T4) e HR_EVENTO (hora da mudança de status);
+opcionais QT_LIQUIDO_PESAGEM, DISTANCIA_PIMS_MEDIA e de_categ_oper.
+Eventos fora de ordem são aceitos até {JANELA_ATRASO_S}s (padrão) atrás do mais recente.
+Reprocessar o mesmo arquivo não duplica ciclos (chave NO_PLACA + HR_ENTRADA_PIMS).
+""")
+        return
+
+    caminho = args[0]
+    opcoes = {}
+    for flag, chave, tipo in [("--db", "db_path", str), ("--bloco", "tamanho_bloco", int),
+                              ("--separador", "separador", str), ("--janela", "janela_atraso_s", float)]:
+        if flag in args:
+            try:
+                opcoes[chave] = tipo(args[args.index(flag) + 1])
+            except (IndexError, ValueError):
+                print(f"❌ Erro: {flag} precisa de um valor válido")
+                return
+    if "--escritor" in args:
+        from writer_service import ClienteEscritor
+        opcoes["escritor"] = ClienteEscritor()
+    if "--filtro-qualidade" in args:
+        from data_quality import FiltroQualidade
+        opcoes["filtro"] = FiltroQualidade()
+
+    try:
+        reconstruir_arquivo(caminho, **opcoes)
+    except (FileNotFoundError, ValueError, RuntimeError) as e:
+        print(f"❌ {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+"""
+Qualidade de dados na ingestão - Sistema Logística JIT
+Etapa de validação plugável (carga em massa e gerador): faixas válidas
+vetorizadas, outliers por mediana/MAD em janela móvel e quarentena
+"""
+
+import hashlib
+import json
+import re
+import sys
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent))
+from statements import COMANDOS_ESCRITA
+from epoch import garantir_colunas_epoca
+
+# Regras por tabela
+# - faixa: {'coluna', 'min', 'max'} (limites inclusivos; NULL passa)
+# - robusta: {'coluna', 'robusta': True, 'limite_z'} z modificado = 0.6745·|x - mediana| / MAD
+# Faixas de transporte do levantamento no datalake (docs/query.md): T4 entre 0 e 50 h, sem tempos negativos.
+# T4 não tem regra robusta: a cauda longa (T4 > 6 h, ~5% das viagens) é sinal de gargalo, não erro
+REGRAS_QUALIDADE = {
+    'transporte_detalhado': [
+        {'nome': 't1_negativo_ou_extremo', 'coluna': 'T_1', 'min': 0, 'max': 24},
+        {'nome': 't3_negativo_ou_extremo', 'coluna': 'T_3', 'min': 0, 'max': 24},
+        {'nome': 't4_fora_0_50h', 'coluna': 'T_4', 'min': 0, 'max': 50},
+        {'nome': 'peso_invalido', 'coluna': 'QT_LIQUIDO_PESAGEM', 'min': 1, 'max': 120000},
+        {'nome': 'distancia_invalida', 'coluna': 'DISTANCIA_PIMS_MEDIA', 'min': 0, 'max': 300},
+        {'nome': 'peso_outlier', 'coluna': 'QT_LIQUIDO_PESAGEM', 'robusta': True, 'limite_z': 8.0},
+    ],
+    'colheitabilidade_detalhada': [
+        {'nome': 'ton_hora_negativa_ou_extrema', 'coluna': 'TON_HORA', 'min': 0, 'max': 1000},
+        {'nome': 'ton_hora_outlier', 'coluna': 'TON_HORA', 'robusta': True, 'limite_z': 8.0},
+    ],
+    'moagem_detalhada': [
+        {'nome': 'moagem_negativa', 'coluna': 'VAR_RESULT_DIA', 'min': 0, 'max': None},
+    ],
+}
+
+JANELA_ROBUSTA = 5000             # Últimos valores aceitos usados na mediana/MAD
+MIN_AMOSTRAS_ROBUSTA = 200        # Abaixo disso a regra robusta não rejeita
+RECALCULAR_A_CADA = 100           # Novos valores aceitos entre recálculos da mediana/MAD
+CONSTANTE_MAD = 0.6745            # MAD → desvio padrão (distribuição normal)
+
+SQL_QUARENTENA = """
+    CREATE TABLE IF NOT EXISTS quarentena_qualidade (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp DATETIME NOT NULL,
+        tabela TEXT NOT NULL,
+        regra TEXT NOT NULL,
+        coluna TEXT,
+        valor REAL,
+        registro TEXT NOT NULL,
+        registro_hash TEXT,
+        ts_ms INTEGER
+    )
+"""
+
+# Chave natural: a mesma linha rejeitada pela mesma regra entra uma vez só
+# (reimportar o arquivo ou repetir um lote não duplica a quarentena)
+INDICE_CHAVE_QUARENTENA = "ux_quarentena_qualidade_chave"
+
+SQL_INDICE_QUARENTENA = """
+    CREATE INDEX IF NOT EXISTS idx_quarentena_tabela_regra
+    ON quarentena_qualidade(tabela, regra, timestamp)
+"""
+
+
+def colunas_comando(nome):
+    """(tabela, colunas) de um INSERT nomeado do registro de comandos"""
+    encontrado = re.search(r'INSERT\s+INTO\s+(\w+)\s*\(([^)]*)\)', COMANDOS_ESCRITA[nome])
+    return encontrado.group(1), [c.strip() for c in encontrado.group(2).split(',')]
+
+
+# Comandos do gerador que passam pelo filtro: comando -> (tabela, colunas)
+COMANDOS_FILTRADOS = {
+    nome: colunas_comando(nome)
+    for nome in ('inserir_transporte_detalhado', 'inserir_colheitabilidade_detalhada')
+}
+
+
+def hash_registro(registro):
+    """Hash do registro JSON (chave natural da quarentena sem indexar o texto inteiro)"""
+    return hashlib.sha1(registro.encode('utf-8')).hexdigest()
+
+
+def garantir_tabela_quarentena(cursor):
+    """
+    Cria a quarentena com a chave (tabela, regra, registro_hash). Tabelas
+    anteriores à chave ganham a coluna, o hash das linhas existentes e
+    perdem as repetidas (mantém a primeira gravada)
+    """
+    cursor.execute(SQL_QUARENTENA)
+    cursor.execute(SQL_INDICE_QUARENTENA)
+    garantir_colunas_epoca(cursor, ['quarentena_qualidade'])
+
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (INDICE_CHAVE_QUARENTENA,))
+    if cursor.fetchone():
+        return
+
+    cursor.execute("PRAGMA table_info(quarentena_qualidade)")
+    if 'registro_hash' not in {coluna[1] for coluna in cursor.fetchall()}:
+        cursor.execute("ALTER TABLE quarentena_qualidade ADD COLUMN registro_hash TEXT")
+    cursor.execute("SELECT id, registro FROM quarentena_qualidade WHERE registro_hash IS NULL")
+    cursor.executemany("UPDATE quarentena_qualidade SET registro_hash = ? WHERE id = ?",
+                       [(hash_registro(registro), identificador) for identificador, registro in cursor.fetchall()])
+    cursor.execute("""
+        DELETE FROM quarentena_qualidade
+        WHERE id NOT IN (SELECT MIN(id) FROM quarentena_qualidade GROUP BY tabela, regra, registro_hash)
+    """)
+    cursor.execute(f"CREATE UNIQUE INDEX {INDICE_CHAVE_QUARENTENA} "
+                   f"ON quarentena_qualidade(tabela, regra, registro_hash)")
+
+
+class EstatisticaRobusta:
+    """Mediana e MAD de uma janela móvel de valores aceitos"""
+
+    def __init__(self, janela=JANELA_ROBUSTA, recalcular_a_cada=RECALCULAR_A_CADA):
+        self.valores = deque(maxlen=janela)
+        self.recalcular_a_cada = recalcular_a_cada
+        self.novos = 0
+        self.mediana = None
+        self.mad = None
+
+    def calcular(self, extras=None):
+        """Recalcula quando a janela mudou o bastante; `extras` completa janelas curtas"""
+        if len(self.valores) >= MIN_AMOSTRAS_ROBUSTA:
+            if self.mediana is None or self.novos >= self.recalcular_a_cada:
+                base = np.fromiter(self.valores, dtype=float, count=len(self.valores))
+                self.mediana = float(np.median(base))
+                self.mad = float(np.median(np.abs(base - self.mediana)))
+                self.novos = 0
+            return self.mediana, self.mad
+
+        # Início do fluxo: mediana/MAD também resistem aos outliers do próprio bloco
+        base = np.concatenate([np.fromiter(self.valores, dtype=float, count=len(self.valores)),
+                               extras if extras is not None else np.empty(0)])
+        base = base[~np.isnan(base)]
+        if len(base) < MIN_AMOSTRAS_ROBUSTA:
+            return None, None
+        mediana = float(np.median(base))
+        return mediana, float(np.median(np.abs(base - mediana)))
+
+    def adicionar(self, valores):
+        valores = valores[~np.isnan(valores)]
+        self.valores.extend(valores.tolist())
+        self.novos += len(valores)
+
+
+class FiltroQualidade:
+    """
+    Etapa de validação de linhas antes da gravação
+
+    - Regras avaliadas em ordem, vetorizadas por bloco; a linha é atribuída
+      à primeira regra que ela viola
+    - Regras robustas comparam com a janela dos valores já aceitos
+    - Contadores por regra (avaliadas / rejeitadas) durante a vida do filtro
+    """
+
+    def __init__(self, regras=None):
+        self.regras = regras or REGRAS_QUALIDADE
+        self.estatisticas = {}
+        self.contadores = {}
+        self.linhas_avaliadas = {}
+
+        for tabela, regras in self.regras.items():
+            self.linhas_avaliadas[tabela] = 0
+            for regra in regras:
+                self.contadores[(tabela, regra['nome'])] = 0
+                if regra.get('robusta'):
+                    self.estatisticas[(tabela, regra['nome'])] = EstatisticaRobusta()
+
+    def avaliar(self, tabela, colunas, linhas):
+        """Índice da primeira regra violada por linha (-1 = aceita)"""
+        regras = self.regras.get(tabela)
+        if not regras or not linhas:
+            return np.full(len(linhas), -1)
+
+        self.linhas_avaliadas[tabela] += len(linhas)
+        posicoes = {coluna: i for i, coluna in enumerate(colunas)}
+        vetores = {}
+        violada = np.full(len(linhas), -1)
+
+        for r, regra in enumerate(regras):
+            coluna = regra['coluna']
+            if coluna not in posicoes:
+                continue
+            if coluna not in vetores:
+                i = posicoes[coluna]
+                vetores[coluna] = np.array([linha[i] for linha in linhas], dtype=float)
+            valores = vetores[coluna]
+            livres = violada < 0
+
+            if regra.get('robusta'):
+                estatistica = self.estatisticas[(tabela, regra['nome'])]
+                mediana, mad = estatistica.calcular(valores[livres])
+                if mediana is None or not mad:
+                    continue
+                with np.errstate(invalid='ignore'):
+                    viola = CONSTANTE_MAD * np.abs(valores - mediana) / mad > regra['limite_z']
+            else:
+                viola = np.zeros(len(linhas), dtype=bool)
+                with np.errstate(invalid='ignore'):
+                    if regra.get('min') is not None:
+                        viola |= valores < regra['min']
+                    if regra.get('max') is not None:
+                        viola |= valores > regra['max']
+
+            novas = viola & livres
+            violada[novas] = r
+            self.contadores[(tabela, regra['nome'])] += int(novas.sum())
+
+        aceitas_mascara = violada < 0
+        for (tabela_regra, nome), estatistica in self.estatisticas.items():
+            if tabela_regra == tabela:
+                coluna = next(regra['coluna'] for regra in regras if regra['nome'] == nome)
+                if coluna in vetores:
+                    estatistica.adicionar(vetores[coluna][aceitas_mascara])
+
+        return violada
+
+    def filtrar(self, tabela, colunas, linhas):
+        """
+        Separa linhas (tuplas na ordem de `colunas`) em aceitas e rejeitadas
+        Rejeitadas: [(linha, regra, coluna, valor), ...]
+        """
+        violada = self.avaliar(tabela, colunas, linhas)
+        if (violada < 0).all():
+            return linhas, []
+
+        regras = self.regras[tabela]
+        posicao = {coluna: i for i, coluna in enumerate(colunas)}
+        aceitas = []
+        rejeitadas = []
+        for linha, r in zip(linhas, violada.tolist()):
+            if r < 0:
+                aceitas.append(linha)
+            else:
+                coluna = regras[r]['coluna']
+                rejeitadas.append((linha, regras[r]['nome'], coluna, linha[posicao[coluna]]))
+        return aceitas, rejeitadas
+
+    def operacoes_quarentena(self, tabela, colunas, rejeitadas, instante=None):
+        """Operações 'inserir_quarentena' das linhas rejeitadas"""
+        instante = instante or datetime.now()
+        operacoes = []
+        for linha, regra, coluna, valor in rejeitadas:
+            registro = json.dumps(dict(zip(colunas, linha)), default=str, ensure_ascii=False)
+            operacoes.append(('inserir_quarentena', [
+                instante, tabela, regra, coluna,
+                float(valor) if isinstance(valor, (int, float)) else None,
+                registro, hash_registro(registro)
+            ]))
+        return operacoes
+
+    def filtrar_operacoes(self, operacoes, instante=None):
+        """
+        Filtro no caminho do gerador: INSERTs filtrados saem da lista e
+        entram como quarentena no mesmo lote (mesma transação)
+        """
+        por_comando = {}
+        for i, (nome, params) in enumerate(operacoes):
+            if nome in COMANDOS_FILTRADOS:
+                por_comando.setdefault(nome, []).append(i)
+
+        if not por_comando:
+            return operacoes
+
+        descartadas = set()
+        quarentena = []
+        for nome, indices in por_comando.items():
+            tabela, colunas = COMANDOS_FILTRADOS[nome]
+            regras = self.regras.get(tabela, [])
+            linhas = [operacoes[i][1] for i in indices]
+            violada = self.avaliar(tabela, colunas, linhas)
+
+            rejeitadas = []
+            for i, linha, r in zip(indices, linhas, violada.tolist()):
+                if r >= 0:
+                    descartadas.add(i)
+                    coluna = regras[r]['coluna']
+                    rejeitadas.append((linha, regras[r]['nome'], coluna, linha[colunas.index(coluna)]))
+            quarentena += self.operacoes_quarentena(tabela, colunas, rejeitadas, instante)
+
+        if not descartadas:
+            return operacoes
+        return [op for i, op in enumerate(operacoes) if i not in descartadas] + quarentena
+
+    def resumo(self):
+        """Contadores por tabela e regra"""
+        return {
+            tabela: {
+                'avaliadas': self.linhas_avaliadas[tabela],
+                'rejeitadas': {regra['nome']: self.contadores[(tabela, regra['nome'])] for regra in regras},
+            }
+            for tabela, regras in self.regras.items()
+        }
+
+    def mostrar_resumo(self):
+        for tabela, dados in self.resumo().items():
+            if not dados['avaliadas']:
+                continue
+            total = sum(dados['rejeitadas'].values())
+            print(f"   🧪 {tabela}: {total} de {dados['avaliadas']} linhas em quarentena "
+                  f"({total / dados['avaliadas'] * 100:.2f}%)")
+            for regra, quantidade in dados['rejeitadas'].items():
+                if quantidade:
+                    print(f"      - {regra}: {quantidade}")
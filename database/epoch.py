@@ -0,0 +1,325 @@
+"""
+Instantes em milissegundos desde a época Unix - Sistema Logística JIT
+Coluna ts_ms (INTEGER, indexada) nas tabelas de série temporal, conversões
+e a migração em lotes, retomável, de bancos com timestamps só em texto
+"""
+
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+from connection import criar_conexao
+
+# Tabela -> coluna de texto que define o instante da linha
+TABELAS_EPOCA = {
+    'dados_tempo_real': 'timestamp',
+    'estado_frota': 'timestamp',
+    'transporte_detalhado': 'timestamp',
+    'colheitabilidade_detalhada': 'timestamp',
+    'moagem_detalhada': 'timestamp',
+    'predicoes_estoque_patio': 'timestamp_predicao',
+    'eventos_sistema': 'timestamp',
+    'quarentena_qualidade': 'timestamp',
+    'estoque_patio_consolidado': 'timestamp',
+}
+
+# Índices compostos: consultas por caminhão/status (substituem os equivalentes
+# sobre o texto do timestamp) e índices de cobertura das consultas por período
+# (verificados por database/query_plans.py). Nome -> (tabela, colunas, índice antigo)
+INDICES_EPOCA = {
+    'idx_transporte_placa_ts_ms': ('transporte_detalhado', 'NO_PLACA, ts_ms', 'idx_transporte_placa_timestamp'),
+    'idx_transporte_status_ts_ms': ('transporte_detalhado', 'status_caminhao, ts_ms', 'idx_transporte_status_timestamp'),
+    'idx_colheitabilidade_ts_ms_fazenda': ('colheitabilidade_detalhada',
+                                           'ts_ms, FAZENDA, SETOR, TON_HORA, timestamp', None),
+    'idx_predicoes_ts_ms_hora': ('predicoes_estoque_patio',
+                                 'ts_ms, hora_futura, ofensor_principal, ofensor_valor', None),
+}
+
+# Os textos gravados pelo Python são horário local sem fuso (datetime.now()):
+# 'utc' converte para UTC antes de contar os ms. Mesmo resultado de para_ms()
+SQL_EPOCA_MS = "CAST(ROUND((julianday({0}, 'utc') - 2440587.5) * 86400000) AS INTEGER)"
+
+LOTE_PADRAO = 5000
+PAUSA_PADRAO_S = 0.05             # Entre lotes: o escritor do gerador pega o lock
+
+
+def para_ms(instante):
+    """datetime local (sem fuso) -> ms desde a época"""
+    return int(round(instante.timestamp() * 1000))
+
+
+def de_ms(ms):
+    """ms desde a época -> datetime local (sem fuso)"""
+    return datetime.fromtimestamp(ms / 1000)
+
+
+def agora_ms():
+    return para_ms(datetime.now())
+
+
+def janelas_hora(hora, dias, agora=None):
+    """
+    [(inicio_ms, fim_ms)] da hora do dia `hora` em cada um dos últimos `dias`
+    dias: "hora H na última semana" vira faixas do índice em vez de strftime por linha
+    """
+    agora = agora or datetime.now()
+    inicio = agora - timedelta(days=dias)
+    janelas = []
+    dia = inicio.replace(hour=hora, minute=0, second=0, microsecond=0)
+    if dia + timedelta(hours=1) <= inicio:
+        dia += timedelta(days=1)
+    while dia < agora:
+        janelas.append((para_ms(max(dia, inicio)), para_ms(min(dia + timedelta(hours=1), agora))))
+        dia += timedelta(days=1)
+    return janelas
+
+
+def filtro_janelas(janelas, coluna='ts_ms'):
+    """(WHERE, parâmetros) de um OR de faixas semiabertas [inicio, fim)"""
+    if not janelas:
+        return "0", []
+    condicao = " OR ".join(f"({coluna} >= ? AND {coluna} < ?)" for _ in janelas)
+    return f"({condicao})", [valor for janela in janelas for valor in janela]
+
+
+def _existe(cursor, tabela):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (tabela,))
+    return cursor.fetchone() is not None
+
+
+def _tem_colunas(cursor, tabela, colunas, esquema='main'):
+    """Todas as colunas do índice existem na tabela (bancos de teste/antigos têm menos colunas)"""
+    cursor.execute(f"PRAGMA {esquema}.table_info({tabela})")
+    existentes = {linha[1].lower() for linha in cursor.fetchall()}
+    return all(coluna.strip().lower() in existentes for coluna in colunas.split(','))
+
+
+def garantir_colunas_epoca(cursor, tabelas=None):
+    """
+    Coluna ts_ms, índice e trigger de fallback (linhas inseridas sem ts_ms,
+    ex.: SQL manual ou produtores antigos) nas tabelas existentes. Idempotente
+    Retorna as tabelas em que a coluna foi criada agora
+    """
+    criadas = []
+    for tabela in tabelas or TABELAS_EPOCA:
+        if not _existe(cursor, tabela):
+            continue
+        coluna = TABELAS_EPOCA[tabela]
+        try:
+            cursor.execute(f"ALTER TABLE {tabela} ADD COLUMN ts_ms INTEGER")
+            criadas.append(tabela)
+        except sqlite3.OperationalError as e:
+            if "duplicate column name" not in str(e):
+                raise
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{tabela}_ts_ms ON {tabela}(ts_ms)")
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {tabela}_ts_ms
+            AFTER INSERT ON {tabela}
+            WHEN NEW.ts_ms IS NULL AND NEW.{coluna} IS NOT NULL
+            BEGIN
+                UPDATE {tabela} SET ts_ms = {SQL_EPOCA_MS.format(f'NEW.{coluna}')}
+                WHERE rowid = NEW.rowid;
+            END
+        """)
+
+    for indice, (tabela, colunas, antigo) in INDICES_EPOCA.items():
+        if tabelas and tabela not in tabelas or not _existe(cursor, tabela):
+            continue
+        if not _tem_colunas(cursor, tabela, colunas):
+            continue
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {indice} ON {tabela}({colunas})")
+        if antigo:
+            cursor.execute(f"DROP INDEX IF EXISTS {antigo}")
+
+    return criadas
+
+
+def contar_pendentes(cursor, tabelas=None):
+    """{tabela: linhas com instante em texto e sem ts_ms} (busca pelo índice de ts_ms)"""
+    pendentes = {}
+    for tabela in tabelas or TABELAS_EPOCA:
+        if _existe(cursor, tabela):
+            cursor.execute(f"SELECT COUNT(*) FROM {tabela} WHERE ts_ms IS NULL "
+                           f"AND {TABELAS_EPOCA[tabela]} IS NOT NULL")
+            pendentes[tabela] = cursor.fetchone()[0]
+    return pendentes
+
+
+def migrar_epoca(conn, lote=LOTE_PADRAO, pausa_s=PAUSA_PADRAO_S, tabelas=None, verboso=True):
+    """
+    Preenche ts_ms das linhas antigas em lotes de `lote` linhas, um commit por
+    lote (o lock de escrita dura um lote, não a tabela inteira). Linhas mais
+    recentes primeiro: as janelas consultadas pela API ficam corretas antes.
+    O próprio ts_ms IS NULL marca o progresso: interromper e rodar de novo continua
+    Retorna {tabela: linhas convertidas}
+    """
+    cursor = conn.cursor()
+    garantir_colunas_epoca(cursor, tabelas)
+    conn.commit()
+
+    convertidas = {}
+    for tabela in tabelas or TABELAS_EPOCA:
+        if not _existe(cursor, tabela):
+            continue
+        coluna = TABELAS_EPOCA[tabela]
+        total = 0
+        t_inicio = time.perf_counter()
+        while True:
+            cursor.execute(f"""
+                UPDATE {tabela} SET ts_ms = {SQL_EPOCA_MS.format(coluna)}
+                WHERE rowid IN (
+                    SELECT rowid FROM {tabela}
+                    WHERE ts_ms IS NULL AND {coluna} IS NOT NULL
+                    ORDER BY rowid DESC
+                    LIMIT ?
+                )
+            """, (lote,))
+            alteradas = cursor.rowcount
+            conn.commit()
+            total += alteradas
+            if alteradas < lote:
+                break
+            if verboso:
+                decorrido = time.perf_counter() - t_inicio
+                print(f"   ⏳ {tabela}: {total:,} linhas ({total / decorrido:,.0f} linhas/s)")
+            time.sleep(pausa_s)
+        convertidas[tabela] = total
+
+    return convertidas
+
+
+def executar_migracao(db_path="database/logistics.db", lote=LOTE_PADRAO, pausa_s=PAUSA_PADRAO_S):
+    """Migração de um banco existente (linha de comando)"""
+    if not Path(db_path).exists():
+        print(f"❌ Banco não encontrado: {db_path}")
+        return False
+
+    print("🕐 MIGRAÇÃO PARA ts_ms (ms desde a época)")
+    print("=" * 60)
+    print(f"📊 Banco: {db_path} | lotes de {lote} linhas | pausa {pausa_s}s")
+
+    conn = criar_conexao(db_path)
+    try:
+        t_inicio = time.perf_counter()
+        convertidas = migrar_epoca(conn, lote, pausa_s)
+        for tabela, total in convertidas.items():
+            print(f"   ✅ {tabela}: {total:,} linhas convertidas")
+        restantes = sum(contar_pendentes(conn.cursor()).values())
+    finally:
+        conn.close()
+
+    print(f"\n✅ Concluída em {time.perf_counter() - t_inicio:.1f}s"
+          f"{f' ({restantes} linhas chegaram sem ts_ms durante a migração; rode de novo)' if restantes else ''}")
+    return True
+
+
+def mostrar_status(db_path="database/logistics.db"):
+    conn = criar_conexao(db_path, somente_leitura=True)
+    cursor = conn.cursor()
+    print("📋 Linhas sem ts_ms por tabela:")
+    for tabela in TABELAS_EPOCA:
+        if not _existe(cursor, tabela):
+            continue
+        cursor.execute(f"PRAGMA table_info({tabela})")
+        if 'ts_ms' not in [coluna[1] for coluna in cursor.fetchall()]:
+            print(f"   ❌ {tabela}: sem coluna ts_ms")
+            continue
+        pendentes = contar_pendentes(cursor, [tabela])[tabela]
+        print(f"   {'✅' if not pendentes else '⏳'} {tabela}: {pendentes:,}")
+    conn.close()
+
+
+def testar_migracao(linhas=20000, lote=3000):
+    """Banco temporário com timestamps em texto: migração interrompida, retomada e conferida"""
+    print("🧪 Teste da migração ts_ms")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as pasta:
+        db_path = Path(pasta) / "epoca.db"
+        conn = criar_conexao(db_path)
+        conn.execute("CREATE TABLE dados_tempo_real (id INTEGER PRIMARY KEY, timestamp DATETIME, estoque_patio_ton REAL)")
+        base = datetime(2025, 7, 1, 0, 0, 0, 250000)
+        instantes = [base + timedelta(seconds=37 * i) for i in range(linhas)]
+        conn.executemany("INSERT INTO dados_tempo_real (timestamp, estoque_patio_ton) VALUES (?, ?)",
+                         [(t, 1000.0) for t in instantes])
+        conn.commit()
+
+        # Interrupção simulada: metade das linhas volta a NULL e a migração continua
+        parcial = migrar_epoca(conn, lote=lote, pausa_s=0, verboso=False, tabelas=['dados_tempo_real'])
+        conn.execute("UPDATE dados_tempo_real SET ts_ms = NULL WHERE id <= ?", (linhas // 2,))
+        conn.commit()
+        pendentes = contar_pendentes(conn.cursor(), ['dados_tempo_real'])['dados_tempo_real']
+        retomada = migrar_epoca(conn, lote=lote, pausa_s=0, verboso=False, tabelas=['dados_tempo_real'])
+
+        # Linha nova sem ts_ms: trigger de fallback
+        conn.execute("INSERT INTO dados_tempo_real (timestamp, estoque_patio_ton) VALUES (?, 1.0)",
+                     (base + timedelta(days=400),))
+        conn.commit()
+
+        gravados = dict(conn.execute("SELECT id, ts_ms FROM dados_tempo_real").fetchall())
+        esperados = {i + 1: para_ms(t) for i, t in enumerate(instantes)}
+        esperados[linhas + 1] = para_ms(base + timedelta(days=400))
+        divergentes = sum(1 for i, ms in esperados.items() if gravados.get(i) != ms)
+
+        plano = conn.execute("EXPLAIN QUERY PLAN SELECT * FROM dados_tempo_real WHERE ts_ms >= ?",
+                             (0,)).fetchall()
+        usa_indice = any('idx_dados_tempo_real_ts_ms' in linha[-1] for linha in plano)
+        conn.close()
+
+    print(f"   Primeira passada: {parcial['dados_tempo_real']:,} linhas")
+    print(f"   Retomada: {pendentes:,} pendentes → {retomada['dados_tempo_real']:,} convertidas")
+    print(f"   Divergências (SQL vs Python): {divergentes}")
+    print(f"   Faixa por ts_ms usa índice: {'sim' if usa_indice else 'não'}")
+
+    aprovado = divergentes == 0 and usa_indice and retomada['dados_tempo_real'] == pendentes
+    print(f"\n{'✅ APROVADO' if aprovado else '❌ FALHOU'}")
+    return aprovado
+
+
+def main():
+    args = sys.argv[1:]
+    if "--help" in args or "-h" in args:
+        print(f"""
+🕐 Migração para ts_ms - Sistema Logística JIT
+
+USO:
+  python database/epoch.py                    # Converte o banco padrão
+  python database/epoch.py --db caminho.db    # Outro banco
+  python database/epoch.py --lote 20000       # Linhas por transação (padrão {LOTE_PADRAO})
+  python database/epoch.py --pausa 0.2        # Pausa entre lotes em s (padrão {PAUSA_PADRAO_S})
+  python database/epoch.py --status           # Linhas ainda sem ts_ms
+  python database/epoch.py --teste            # Migração interrompida/retomada em banco temporário
+
+Pode rodar com o gerador e a API no ar: cada lote é uma transação curta,
+e interromper (Ctrl+C) não perde o que já foi convertido.
+""")
+        return
+
+    if "--teste" in args:
+        sys.exit(0 if testar_migracao() else 1)
+
+    opcoes = {}
+    for flag, chave, tipo in [("--db", "db_path", str), ("--lote", "lote", int), ("--pausa", "pausa_s", float)]:
+        if flag in args:
+            try:
+                opcoes[chave] = tipo(args[args.index(flag) + 1])
+            except (IndexError, ValueError):
+                print(f"❌ Erro: {flag} precisa de um valor válido")
+                return
+
+    if "--status" in args:
+        mostrar_status(opcoes.get("db_path", "database/logistics.db"))
+        return
+
+    try:
+        executar_migracao(**opcoes)
+    except KeyboardInterrupt:
+        print("\n⏹️ Interrompida: rode de novo para continuar de onde parou")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,18 +11,17 @@ import sqlite3
 import os
 from pathlib import Path
 
-def create_database():
+def create_database(db_path="database/logistics.db"):
     """Cria o banco SQLite e todas as tabelas"""
     
-    # Garantir que a pasta database existe
-    db_dir = Path("database")
-    db_dir.mkdir(exist_ok=True)
-    
-    db_path = db_dir / "logistics.db"
+    # Garantir que a pasta do banco existe
+    db_path = Path(db_path)
+    db_dir = db_path.parent
+    db_dir.mkdir(parents=True, exist_ok=True)
     
     # Se já existe, fazer backup
     if db_path.exists():
-        backup_path = db_dir / "logistics_backup.db"
+        backup_path = db_dir / f"{db_path.stem}_backup.db"
         os.rename(db_path, backup_path)
         print(f"✅ Backup criado: {backup_path}")
     
@@ -30,6 +29,10 @@ def create_database():
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
     
+    # Antes da primeira tabela: páginas liberadas pela retenção voltam ao sistema
+    # (PRAGMA incremental_vacuum em database/retention.py)
+    cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    
     print(f"🗄️ Criando banco: {db_path}")
     
     # Schema SQL
@@ -117,6 +120,11 @@ def create_database():
     CREATE INDEX idx_colheitabilidade_hora ON colheitabilidade_detalhada(HORA_ELEVADOR_TIME);
     CREATE INDEX idx_estado_frota_timestamp ON estado_frota(timestamp);
     CREATE INDEX idx_moagem_data ON moagem_detalhada(DATA);
+
+    -- Chaves naturais (ingestão idempotente, ver statements.CHAVES_NATURAIS)
+    CREATE UNIQUE INDEX ux_transporte_detalhado_chave ON transporte_detalhado(NO_PLACA, HR_ENTRADA_PIMS);
+    CREATE UNIQUE INDEX ux_colheitabilidade_detalhada_chave ON colheitabilidade_detalhada(FAZENDA, SETOR, HORA_ELEVADOR_TIME);
+    CREATE UNIQUE INDEX ux_moagem_detalhada_chave ON moagem_detalhada(DATA, ORR_DESCRI);
     """
     
     # Executar schema
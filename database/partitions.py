@@ -0,0 +1,477 @@
+"""
+Partições diárias - Sistema Logística JIT
+Dias fechados de dados_tempo_real, transporte_detalhado e eventos_sistema saem
+do banco principal para um arquivo SQLite por dia; catalogo_particoes diz que
+faixa de ts_ms cada arquivo cobre e o roteador anexa (ATTACH) só os do período
+"""
+
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+from connection import criar_conexao
+from epoch import INDICES_EPOCA, para_ms, de_ms, garantir_colunas_epoca, _existe, _tem_colunas
+
+# Tabela -> condição extra para sair do banco principal
+TABELAS_PARTICIONADAS = {
+    'dados_tempo_real': None,
+    'transporte_detalhado': None,
+    'eventos_sistema': 'resolvido = 1',   # Alertas abertos ficam (máquina de estados do gerador)
+}
+
+DIAS_QUENTES_PADRAO = 2           # Hoje e ontem ficam no banco principal
+LOTE_REMOCAO = 5000
+PAUSA_PADRAO_S = 0.05             # Entre lotes de remoção: o gerador pega o lock
+FIM_ABERTO_MS = 2 ** 62
+
+SQL_CATALOGO = """
+    CREATE TABLE IF NOT EXISTS catalogo_particoes (
+        dia DATE PRIMARY KEY,
+        arquivo TEXT NOT NULL,             -- Relativo à pasta de partições
+        inicio_ms INTEGER NOT NULL,
+        fim_ms INTEGER NOT NULL,           -- Exclusivo (meia-noite seguinte)
+        linhas INTEGER DEFAULT 0,
+        bytes INTEGER DEFAULT 0,
+        selada_em DATETIME
+    )
+"""
+
+
+def pasta_particoes(db_path):
+    """database/logistics.db -> database/logistics_particoes/"""
+    db_path = Path(db_path)
+    return db_path.parent / f"{db_path.stem}_particoes"
+
+
+def limites_dia(dia):
+    """(inicio_ms, fim_ms) do dia local [00:00, 00:00 do dia seguinte)"""
+    inicio = datetime(dia.year, dia.month, dia.day)
+    return para_ms(inicio), para_ms(inicio + timedelta(days=1))
+
+
+def garantir_catalogo(cursor):
+    cursor.execute(SQL_CATALOGO)
+
+
+def _colunas(cursor, esquema, tabela):
+    cursor.execute(f"PRAGMA {esquema}.table_info({tabela})")
+    return {coluna[1]: coluna[2] for coluna in cursor.fetchall()}
+
+
+def _condicao(filtro):
+    return f" AND ({filtro})" if filtro else ""
+
+
+def dias_para_selar(cursor, dias_quentes=DIAS_QUENTES_PADRAO, agora=None):
+    """Dias (mais antigos primeiro) com linhas no banco principal antes do período quente"""
+    agora = agora or datetime.now()
+    corte = datetime(agora.year, agora.month, agora.day) - timedelta(days=dias_quentes - 1)
+    corte_ms = para_ms(corte)
+
+    dias = set()
+    for tabela, filtro in TABELAS_PARTICIONADAS.items():
+        if _existe(cursor, tabela):
+            dias.update(dias_com_linhas(cursor, tabela, corte_ms, filtro))
+    return sorted(dias)
+
+
+def dias_com_linhas(cursor, tabela, ate_ms, filtro=None):
+    """Dias com linhas de `tabela` no banco principal antes de `ate_ms`"""
+    # Um MIN pelo índice de ts_ms por dia com dados (pula os intervalos vazios)
+    dias = []
+    desde = -FIM_ABERTO_MS
+    while True:
+        cursor.execute(f"SELECT MIN(ts_ms) FROM main.{tabela} WHERE ts_ms >= ? AND ts_ms < ?"
+                       f"{_condicao(filtro)}", (desde, ate_ms))
+        ms = cursor.fetchone()[0]
+        if ms is None:
+            return dias
+        dias.append(de_ms(ms).date())
+        desde = limites_dia(dias[-1])[1]
+
+
+def remover_faixa(conn, esquema, tabela, inicio_ms, fim_ms, filtro=None, lote=LOTE_REMOCAO,
+                  pausa_s=PAUSA_PADRAO_S):
+    """Remove as linhas com ts_ms em [inicio_ms, fim_ms) em lotes curtos (commit e pausa entre lotes)"""
+    cursor = conn.cursor()
+    total = 0
+    while True:
+        cursor.execute(f"""
+            DELETE FROM {esquema}.{tabela} WHERE rowid IN (
+                SELECT rowid FROM {esquema}.{tabela}
+                WHERE ts_ms >= ? AND ts_ms < ?{_condicao(filtro)}
+                LIMIT ?
+            )
+        """, (inicio_ms, fim_ms, lote))
+        removidas = cursor.rowcount
+        conn.commit()
+        total += removidas
+        if removidas < lote:
+            return total
+        time.sleep(pausa_s)
+
+
+def _preparar_tabela(cursor, tabela):
+    """Cria (ou completa com colunas novas) a tabela na partição anexada como `particao`"""
+    colunas_principal = _colunas(cursor, 'main', tabela)
+    colunas_particao = _colunas(cursor, 'particao', tabela)
+
+    if not colunas_particao:
+        # Mesmo DDL da tabela principal, sem triggers; só os índices de ts_ms
+        cursor.execute("SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = ?", (tabela,))
+        ddl = re.sub(r'^CREATE TABLE\s+(IF NOT EXISTS\s+)?["`\[]?\w+["`\]]?',
+                     f"CREATE TABLE IF NOT EXISTS particao.{tabela}", cursor.fetchone()[0])
+        cursor.execute(ddl)
+    else:
+        for coluna, tipo in colunas_principal.items():
+            if coluna not in colunas_particao:
+                cursor.execute(f"ALTER TABLE particao.{tabela} ADD COLUMN {coluna} {tipo}")
+
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS particao.idx_{tabela}_ts_ms ON {tabela}(ts_ms)")
+    for indice, (tabela_indice, colunas, _) in INDICES_EPOCA.items():
+        if tabela_indice == tabela and _tem_colunas(cursor, tabela, colunas, 'particao'):
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS particao.{indice} ON {tabela}({colunas})")
+
+    return list(colunas_principal)
+
+
+def selar_dia(conn, db_path, dia, lote=LOTE_REMOCAO, pausa_s=PAUSA_PADRAO_S):
+    """
+    Move as linhas do dia para database/<banco>_particoes/AAAA-MM-DD.db
+
+    1. Copia para a partição (INSERT OR IGNORE pelo id: rodar de novo não duplica)
+    2. Registra no catálogo (o roteador passa a ler a partição)
+    3. Remove do banco principal em lotes curtos pela faixa de ts_ms
+    Interrompido entre 2 e 3, o dia aparece duplicado até a próxima execução,
+    nunca some. Retorna as linhas copiadas
+    """
+    cursor = conn.cursor()
+    garantir_catalogo(cursor)
+    conn.commit()
+
+    inicio_ms, fim_ms = limites_dia(dia)
+    pasta = pasta_particoes(db_path)
+    pasta.mkdir(exist_ok=True)
+    arquivo = pasta / f"{dia.isoformat()}.db"
+
+    cursor.execute("ATTACH DATABASE ? AS particao", (str(arquivo),))
+    try:
+        copiadas = 0
+        tabelas = [t for t in TABELAS_PARTICIONADAS if _existe(cursor, t)]
+        for tabela in tabelas:
+            colunas = ", ".join(_preparar_tabela(cursor, tabela))
+            cursor.execute(f"""
+                INSERT OR IGNORE INTO particao.{tabela} ({colunas})
+                SELECT {colunas} FROM main.{tabela}
+                WHERE ts_ms >= ? AND ts_ms < ?{_condicao(TABELAS_PARTICIONADAS[tabela])}
+            """, (inicio_ms, fim_ms))
+            copiadas += cursor.rowcount
+        conn.commit()
+
+        linhas = sum(cursor.execute(f"SELECT COUNT(*) FROM particao.{t}").fetchone()[0] for t in tabelas)
+        cursor.execute("""
+            INSERT INTO catalogo_particoes (dia, arquivo, inicio_ms, fim_ms, linhas, bytes, selada_em)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (dia) DO UPDATE SET
+                linhas = excluded.linhas, bytes = excluded.bytes, selada_em = excluded.selada_em
+        """, (dia.isoformat(), arquivo.name, inicio_ms, fim_ms, linhas,
+              arquivo.stat().st_size, datetime.now()))
+        conn.commit()
+
+        for tabela in tabelas:
+            remover_faixa(conn, 'main', tabela, inicio_ms, fim_ms, TABELAS_PARTICIONADAS[tabela],
+                          lote, pausa_s)
+    finally:
+        conn.rollback()
+        cursor.execute("DETACH DATABASE particao")
+
+    return copiadas
+
+
+def particionar(conn, db_path, dias_quentes=DIAS_QUENTES_PADRAO, lote=LOTE_REMOCAO,
+                pausa_s=PAUSA_PADRAO_S, verboso=True, agora=None):
+    """Sela todos os dias anteriores ao período quente. Retorna {dia: linhas copiadas}"""
+    seladas = {}
+    for dia in dias_para_selar(conn.cursor(), dias_quentes, agora):
+        seladas[dia] = selar_dia(conn, db_path, dia, lote, pausa_s)
+        if verboso:
+            print(f"   📦 {dia}: {seladas[dia]:,} linhas → {pasta_particoes(db_path).name}/{dia}.db")
+    return seladas
+
+
+def descartar_particoes(conn, db_path, reter_dias, agora=None):
+    """Retenção: remove do catálogo e apaga os arquivos de dias com mais de `reter_dias`"""
+    cursor = conn.cursor()
+    if not _existe(cursor, 'catalogo_particoes'):
+        return []
+
+    limite = ((agora or datetime.now()) - timedelta(days=reter_dias)).date().isoformat()
+    cursor.execute("SELECT dia, arquivo FROM catalogo_particoes WHERE dia < ? ORDER BY dia", (limite,))
+    antigas = cursor.fetchall()
+    # Catálogo primeiro: nenhuma consulta nova anexa um arquivo prestes a sumir
+    cursor.execute("DELETE FROM catalogo_particoes WHERE dia < ?", (limite,))
+    conn.commit()
+
+    pasta = pasta_particoes(db_path)
+    for _, arquivo in antigas:
+        (pasta / arquivo).unlink(missing_ok=True)
+    return [dia for dia, _ in antigas]
+
+
+def particoes_do_periodo(cursor, inicio_ms, fim_ms=FIM_ABERTO_MS, decrescente=False):
+    """[(dia, arquivo, inicio_ms, fim_ms)] das partições que cruzam [inicio_ms, fim_ms)"""
+    if not _existe(cursor, 'catalogo_particoes'):
+        return []
+    cursor.execute(f"""
+        SELECT dia, arquivo, inicio_ms, fim_ms FROM catalogo_particoes
+        WHERE fim_ms > ? AND inicio_ms < ?
+        ORDER BY dia {'DESC' if decrescente else 'ASC'}
+    """, (inicio_ms, fim_ms))
+    return cursor.fetchall()
+
+
+def consultar_periodo(conn, db_path, tabela, inicio_ms, fim_ms=None, filtro="", params=(),
+                      colunas=None, decrescente=False, limite=None):
+    """
+    Linhas de `tabela` com ts_ms em [inicio_ms, fim_ms) no banco principal e nas
+    partições do período, ordenadas por ts_ms. Anexa só as partições que o período
+    cruza, em grupos do limite de ATTACH da conexão; com `limite`, para de anexar
+    quando as partições restantes não podem entrar no resultado
+    """
+    fim_ms = FIM_ABERTO_MS if fim_ms is None else fim_ms
+    cursor = conn.cursor()
+    colunas = list(colunas or _colunas(cursor, 'main', tabela))
+    if 'ts_ms' not in colunas:
+        colunas.append('ts_ms')
+    posicao_ts = colunas.index('ts_ms')
+
+    particoes = particoes_do_periodo(cursor, inicio_ms, fim_ms, decrescente)
+    pasta = pasta_particoes(db_path)
+    por_grupo = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+    ordem = f"ORDER BY ts_ms {'DESC' if decrescente else 'ASC'}"
+
+    def selecionar(esquema):
+        existentes = _colunas(cursor, esquema, tabela)
+        if not existentes:
+            return None
+        lista = ", ".join(c if c in existentes else f"NULL AS {c}" for c in colunas)
+        return (f"SELECT {lista} FROM {esquema}.{tabela} "
+                f"WHERE ts_ms >= ? AND ts_ms < ?{_condicao(filtro)}")
+
+    linhas = []
+    grupos = [particoes[i:i + por_grupo] for i in range(0, len(particoes), por_grupo)] or [[]]
+    for n, grupo in enumerate(grupos):
+        if limite and len(linhas) >= limite and grupo:
+            # Resultado cheio: só continua se a próxima partição ainda cabe no corte
+            corte = linhas[-1][posicao_ts]
+            _, _, inicio_grupo, fim_grupo = grupo[0]
+            if (fim_grupo <= corte) if decrescente else (inicio_grupo > corte):
+                break
+
+        esquemas = ['main'] if n == 0 else []
+        for i, (_, arquivo, _, _) in enumerate(grupo):
+            caminho = pasta / arquivo
+            if caminho.exists():  # Descartada entre o catálogo e o ATTACH
+                cursor.execute(f"ATTACH DATABASE ? AS p{i}", (str(caminho),))
+                esquemas.append(f"p{i}")
+        try:
+            partes = [(sql, (inicio_ms, fim_ms, *params))
+                      for sql in map(selecionar, esquemas) if sql]
+            if partes:
+                sql = " UNION ALL ".join(sql for sql, _ in partes) + f" {ordem}"
+                valores = [v for _, parametros in partes for v in parametros]
+                if limite:
+                    sql += " LIMIT ?"
+                    valores.append(limite)
+                cursor.execute(sql, valores)
+                linhas.extend(cursor.fetchall())
+        finally:
+            for esquema in esquemas:
+                if esquema != 'main':
+                    cursor.execute(f"DETACH DATABASE {esquema}")
+
+        linhas.sort(key=lambda linha: linha[posicao_ts], reverse=decrescente)
+        if limite:
+            del linhas[limite:]
+
+    return linhas
+
+
+def executar_particionamento(db_path="database/logistics.db", dias_quentes=DIAS_QUENTES_PADRAO,
+                             reter_dias=None, lote=LOTE_REMOCAO, pausa_s=PAUSA_PADRAO_S):
+    """Sela os dias fechados e aplica a retenção (linha de comando)"""
+    if not Path(db_path).exists():
+        print(f"❌ Banco não encontrado: {db_path}")
+        return False
+
+    print("🗂️ PARTIÇÕES DIÁRIAS")
+    print("=" * 60)
+    print(f"📊 Banco: {db_path} | {dias_quentes} dia(s) no banco principal"
+          f"{f' | retenção {reter_dias} dias' if reter_dias is not None else ''}")
+
+    conn = criar_conexao(db_path)
+    try:
+        t_inicio = time.perf_counter()
+        garantir_colunas_epoca(conn.cursor(), list(TABELAS_PARTICIONADAS))
+        conn.commit()
+        seladas = particionar(conn, db_path, dias_quentes, lote, pausa_s)
+        descartadas = descartar_particoes(conn, db_path, reter_dias) if reter_dias is not None else []
+    finally:
+        conn.close()
+
+    for dia in descartadas:
+        print(f"   🗑️ {dia}: partição descartada")
+    print(f"\n✅ {len(seladas)} dia(s) selado(s), {sum(seladas.values()):,} linhas, "
+          f"{len(descartadas)} partição(ões) descartada(s) em {time.perf_counter() - t_inicio:.1f}s")
+    return True
+
+
+def mostrar_status(db_path="database/logistics.db"):
+    conn = criar_conexao(db_path, somente_leitura=True)
+    cursor = conn.cursor()
+    particoes = particoes_do_periodo(cursor, -FIM_ABERTO_MS)
+    print(f"📋 Partições em {pasta_particoes(db_path)}:")
+    if _existe(cursor, 'catalogo_particoes'):
+        cursor.execute("SELECT dia, linhas, bytes, selada_em FROM catalogo_particoes ORDER BY dia")
+        for dia, linhas, tamanho, selada_em in cursor.fetchall():
+            print(f"   📦 {dia}: {linhas:,} linhas, {tamanho / 1024 / 1024:.1f} MB (selada em {selada_em[:19]})")
+    if not particoes:
+        print("   (nenhuma)")
+    pendentes = dias_para_selar(cursor)
+    print(f"⏳ Dias a selar no banco principal: {len(pendentes)}"
+          f"{f' ({pendentes[0]} a {pendentes[-1]})' if pendentes else ''}")
+    conn.close()
+
+
+def testar_particoes(dias=6):
+    """Banco temporário com `dias` dias de dados: sela, consulta pelo roteador e descarta"""
+    print("🧪 Teste das partições diárias")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as pasta:
+        db_path = Path(pasta) / "particoes.db"
+        conn = criar_conexao(db_path)
+        conn.executescript("""
+            CREATE TABLE dados_tempo_real (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp DATETIME,
+                                           estoque_patio_ton REAL);
+            CREATE TABLE transporte_detalhado (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp DATETIME,
+                                               NO_PLACA TEXT, status_caminhao TEXT);
+            CREATE TABLE eventos_sistema (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp DATETIME,
+                                          descricao TEXT, resolvido INTEGER DEFAULT 0);
+        """)
+        garantir_colunas_epoca(conn.cursor(), list(TABELAS_PARTICIONADAS))
+
+        agora = datetime.now().replace(microsecond=0)
+        inicio = agora - timedelta(days=dias)
+        instantes = [inicio + timedelta(minutes=10 * i) for i in range(dias * 144)]
+        conn.executemany("INSERT INTO dados_tempo_real (timestamp, estoque_patio_ton) VALUES (?, ?)",
+                         [(t, 1000.0 + i % 500) for i, t in enumerate(instantes)])
+        conn.executemany("INSERT INTO transporte_detalhado (timestamp, NO_PLACA, status_caminhao) VALUES (?, ?, 'T4')",
+                         [(t, f"P{i % 5}") for i, t in enumerate(instantes[::3])])
+        # Um alerta aberto antigo: precisa continuar no banco principal
+        conn.executemany("INSERT INTO eventos_sistema (timestamp, descricao, resolvido) VALUES (?, ?, ?)",
+                         [(t, f"evento {i}", 0 if i == 1 else 1) for i, t in enumerate(instantes[::12])])
+        conn.commit()
+
+        originais = {
+            tabela: conn.execute(f"SELECT id FROM {tabela} ORDER BY ts_ms").fetchall()
+            for tabela in TABELAS_PARTICIONADAS
+        }
+
+        # Limite baixo de ATTACH: força o roteador a consultar em grupos
+        conn.setlimit(sqlite3.SQLITE_LIMIT_ATTACHED, 2)
+        seladas = particionar(conn, db_path, dias_quentes=2, pausa_s=0, verboso=False)
+        repetida = particionar(conn, db_path, dias_quentes=2, pausa_s=0, verboso=False)
+
+        iguais = all(
+            [(linha[0],) for linha in consultar_periodo(conn, db_path, tabela, -FIM_ABERTO_MS, colunas=['id'])]
+            == originais[tabela]
+            for tabela in TABELAS_PARTICIONADAS
+        )
+        restantes = conn.execute("SELECT COUNT(*) FROM dados_tempo_real").fetchone()[0]
+        aberto_no_principal = conn.execute(
+            "SELECT COUNT(*) FROM eventos_sistema WHERE resolvido = 0").fetchone()[0] == 1
+
+        recente_ms = para_ms(agora - timedelta(hours=6))
+        anexadas_recente = len(particoes_do_periodo(conn.cursor(), recente_ms))
+        ultimas = consultar_periodo(conn, db_path, 'transporte_detalhado', -FIM_ABERTO_MS,
+                                    filtro="NO_PLACA = ?", params=('P3',), colunas=['id'],
+                                    decrescente=True, limite=5)
+        esperadas = conn.execute("SELECT COUNT(*) FROM transporte_detalhado WHERE NO_PLACA = 'P3'").fetchone()[0]
+
+        arquivos_antes = len(list(pasta_particoes(db_path).glob("*.db")))
+        descartadas = descartar_particoes(conn, db_path, reter_dias=3)
+        arquivos_depois = len(list(pasta_particoes(db_path).glob("*.db")))
+        conn.close()
+
+    print(f"   Linhas: {sum(len(ids) for ids in originais.values()):,} em {dias} dias")
+    print(f"   Dias selados: {len(seladas)} (segunda execução: {len(repetida)})")
+    print(f"   dados_tempo_real no banco principal: {restantes:,} de {len(originais['dados_tempo_real']):,}")
+    print(f"   Roteador (todo o período, grupos de 2 ATTACH) = dados originais: {'sim' if iguais else 'não'}")
+    print(f"   Alerta aberto antigo no banco principal: {'sim' if aberto_no_principal else 'não'}")
+    print(f"   Partições anexadas para as últimas 6h: {anexadas_recente}")
+    print(f"   Últimas 5 viagens de P3: {len(ultimas)} (P3 no banco principal: {esperadas})")
+    print(f"   Retenção de 3 dias: {len(descartadas)} partições, arquivos {arquivos_antes} → {arquivos_depois}")
+
+    aprovado = (iguais and aberto_no_principal and anexadas_recente == 0 and not repetida
+                and len(seladas) >= dias - 2 and len(ultimas) == 5
+                and arquivos_antes - arquivos_depois == len(descartadas) > 0)
+    print(f"\n{'✅ APROVADO' if aprovado else '❌ FALHOU'}")
+    return aprovado
+
+
+def main():
+    args = sys.argv[1:]
+    if "--help" in args or "-h" in args:
+        print(f"""
+🗂️ Partições diárias - Sistema Logística JIT
+
+USO:
+  python database/partitions.py                      # Sela os dias fechados do banco padrão
+  python database/partitions.py --db caminho.db      # Outro banco
+  python database/partitions.py --dias-quentes 7     # Dias que ficam no banco principal (padrão {DIAS_QUENTES_PADRAO})
+  python database/partitions.py --reter 180          # Apaga partições com mais de 180 dias
+  python database/partitions.py --lote 2000 --pausa 0.1   # Remoção em lotes menores
+  python database/partitions.py --status             # Catálogo e dias a selar
+  python database/partitions.py --teste              # Sela, consulta e descarta em banco temporário
+
+Tabelas: {', '.join(TABELAS_PARTICIONADAS)} (alertas abertos ficam no banco principal).
+Pode rodar com o gerador e a API no ar; interromper não perde linhas.
+""")
+        return
+
+    if "--teste" in args:
+        sys.exit(0 if testar_particoes() else 1)
+
+    opcoes = {}
+    for flag, chave, tipo in [("--db", "db_path", str), ("--dias-quentes", "dias_quentes", int),
+                              ("--reter", "reter_dias", int), ("--lote", "lote", int),
+                              ("--pausa", "pausa_s", float)]:
+        if flag in args:
+            try:
+                opcoes[chave] = tipo(args[args.index(flag) + 1])
+            except (IndexError, ValueError):
+                print(f"❌ Erro: {flag} precisa de um valor válido")
+                return
+
+    if opcoes.get("dias_quentes", DIAS_QUENTES_PADRAO) < 1:
+        print("❌ Erro: --dias-quentes precisa ser pelo menos 1 (o dia atual)")
+        return
+
+    if "--status" in args:
+        mostrar_status(opcoes.get("db_path", "database/logistics.db"))
+        return
+
+    try:
+        executar_particionamento(**opcoes)
+    except KeyboardInterrupt:
+        print("\n⏹️ Interrompido: rode de novo para continuar (nenhuma linha se perde)")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,27 +3,35 @@ Modelo de Predição de Estoque no Pátio
 Sistema Logística JIT - V2
 """
 
-import sqlite3
 import numpy as np
 from datetime import datetime, timedelta
 from typing import List, Dict, Tuple
 import math
 import statistics
+import sys
 from pathlib import Path
 
+sys.path.append(str(Path(__file__).parent))
+from connection import criar_conexao
+from statements import executar_operacoes
+from epoch import garantir_colunas_epoca, janelas_hora, filtro_janelas, para_ms
+
 class PredictionModel:
     """
     Modelo para prever estoque no pátio nas próximas 9 horas
     com níveis de confiabilidade decrescentes
     """
 class PredictionModel:
-    def __init__(self, db_path=None):
+    def __init__(self, db_path=None, escritor=None):
         if db_path is None:
             # Use caminho absoluto baseado na localização do arquivo
             self.db_path = Path(__file__).parent / "logistics.db"
         else:
             self.db_path = Path(db_path)
 
+        # Cliente do processo escritor único (None = grava direto no banco)
+        self.escritor = escritor
+
         # Configurações de confiabilidade por horizonte
         self.confiabilidade_por_hora = {
             1: 0.95,   # 95% para 1 hora
@@ -41,8 +49,8 @@ class PredictionModel:
         self.padroes_cache = {}
     
     def conectar_banco(self):
-        """Conecta ao banco SQLite"""
-        return sqlite3.connect(self.db_path)
+        """Conecta ao banco SQLite (perfil WAL compartilhado)"""
+        return criar_conexao(self.db_path)
     
     def obter_dados_atuais(self) -> Dict:
         """Obtém o estado atual do sistema"""
@@ -60,7 +68,7 @@ class PredictionModel:
                 moagem_ton_h,
                 estoque_indo_ton
             FROM dados_tempo_real
-            ORDER BY timestamp DESC
+            ORDER BY ts_ms DESC
             LIMIT 1
         """)
         
@@ -108,7 +116,9 @@ class PredictionModel:
         
         if not row:
             # Se não houver padrão, calcular dos dados históricos
-            cursor.execute("""
+            # (a hora H de cada um dos últimos 7 dias vira uma faixa do índice de ts_ms)
+            filtro, params = filtro_janelas(janelas_hora(hora, 7))
+            cursor.execute(f"""
                 SELECT 
                     AVG(taxa_entrada_patio_ton_h) as entrada_media,
                     AVG(taxa_saida_patio_ton_h) as saida_media,
@@ -116,9 +126,8 @@ class PredictionModel:
                     AVG(moagem_ton_h) as moagem_media,
                     COUNT(*) as amostras
                 FROM dados_tempo_real
-                WHERE CAST(strftime('%H', timestamp) AS INTEGER) = ?
-                AND timestamp > datetime('now', '-7 days')
-            """, (hora,))
+                WHERE {filtro}
+            """, params)
             
             historico = cursor.fetchone()
             
@@ -150,7 +159,21 @@ class PredictionModel:
         
         self.padroes_cache[cache_key] = padroes
         return padroes
-    
+
+    def recalcular_padroes(self, horizonte_horas: int = 9) -> int:
+        """
+        Descarta o cache de padrões e recalcula as horas do horizonte de predição
+        (a próxima predição não paga as consultas). Retorna quantas horas recalculou
+        """
+        agora = datetime.now()
+        self.padroes_cache = {}
+
+        for h in range(horizonte_horas + 1):
+            instante = agora + timedelta(hours=h)
+            self.obter_padroes_historicos(instante.hour, instante.weekday())
+
+        return len(self.padroes_cache)
+
     def calcular_tendencia_recente(self) -> Dict:
         """Calcula tendências das últimas 2 horas"""
         conn = self.conectar_banco()
@@ -163,9 +186,9 @@ class PredictionModel:
                 taxa_entrada_patio_ton_h,
                 taxa_saida_patio_ton_h
             FROM dados_tempo_real
-            WHERE timestamp > datetime('now', '-2 hours')
-            ORDER BY timestamp ASC
-        """)
+            WHERE ts_ms > ?
+            ORDER BY ts_ms ASC
+        """, (para_ms(datetime.now() - timedelta(hours=2)),))
         
         dados = cursor.fetchall()
         conn.close()
@@ -355,22 +378,12 @@ class PredictionModel:
         }
     
     def salvar_predicao(self, predicao_completa: Dict):
-        """Salva predição no banco de dados"""
-        conn = self.conectar_banco()
-        cursor = conn.cursor()
-        
+        """Salva predição no banco de dados (ou envia ao processo escritor)"""
         timestamp_pred = predicao_completa['timestamp_predicao']
         
+        operacoes = []
         for pred in predicao_completa['predicoes']:
-            cursor.execute("""
-                INSERT INTO predicoes_estoque_patio
-                (timestamp_predicao, hora_futura, timestamp_previsto,
-                 estoque_patio_previsto_ton, chegadas_previstas_ton,
-                 moagem_prevista_ton, estoque_limite_superior_ton,
-                 estoque_limite_inferior_ton, confiabilidade_percent,
-                 ofensor_principal, ofensor_valor, modelo_usado)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
+            operacoes.append(('inserir_predicao_estoque_patio', (
                 timestamp_pred,
                 pred['hora_futura'],
                 pred['timestamp_previsto'],
@@ -383,8 +396,15 @@ class PredictionModel:
                 pred['ofensor_principal'],
                 pred['ofensor_valor'],
                 predicao_completa['modelo_usado']
-            ))
+            )))
+        
+        if self.escritor:
+            self.escritor.enviar(operacoes)
+            return
         
+        conn = self.conectar_banco()
+        garantir_colunas_epoca(conn.cursor(), ['predicoes_estoque_patio'])
+        executar_operacoes(conn.cursor(), operacoes)
         conn.commit()
         conn.close()
     
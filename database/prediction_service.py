@@ -6,51 +6,61 @@ Executa predições periodicamente e salva no banco
 import time
 import signal
 import sys
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
 import threading
 
 # Adicionar path para importar prediction_model
 sys.path.append(str(Path(__file__).parent))
 from prediction_model import PredictionModel
+from epoch import para_ms
+from retention import ServicoRetencao
 
 class PredictionService:
     """
     Serviço que executa predições automaticamente
     """
     
-    def __init__(self, intervalo_minutos=5):
+    def __init__(self, intervalo_minutos=5, escritor=None):
         self.intervalo = intervalo_minutos * 60  # Converter para segundos
         self.executando = False
-        self.model = PredictionModel()
+        self.model = PredictionModel(escritor=escritor)
         self.contador_predicoes = 0
         
         # Handler para parada
         signal.signal(signal.SIGINT, self.parar_graceful)
         signal.signal(signal.SIGTERM, self.parar_graceful)
     
+    def executar_predicao(self):
+        """
+        Executa e salva uma predição. Erros sobem para quem chamou
+        (no agendador assíncrono contam como falha da tarefa)
+        """
+        resultado = self.model.executar_predicao(salvar=True)
+        self.contador_predicoes += 1
+        
+        # Verificar alertas críticos
+        alertas_criticos = []
+        for pred in resultado['predicoes'][:3]:  # Próximas 3 horas
+            if not pred['dentro_limites']:
+                alertas_criticos.append({
+                    'hora': pred['hora_futura'],
+                    'estoque': pred['estoque_previsto'],
+                    'ofensor': pred['ofensor_principal']
+                })
+        
+        if alertas_criticos:
+            print("\n🚨 ALERTAS CRÍTICOS:")
+            for alerta in alertas_criticos:
+                print(f"   +{alerta['hora']}h: Estoque {alerta['estoque']:.0f} ton - "
+                      f"Causa: {alerta['ofensor']}")
+        
+        return resultado
+    
     def executar_predicao_thread(self):
-        """Executa predição em thread separada"""
+        """Executa predição em thread separada (laço próprio: o erro é mostrado e o serviço continua)"""
         try:
-            resultado = self.model.executar_predicao(salvar=True)
-            self.contador_predicoes += 1
-            
-            # Verificar alertas críticos
-            alertas_criticos = []
-            for pred in resultado['predicoes'][:3]:  # Próximas 3 horas
-                if not pred['dentro_limites']:
-                    alertas_criticos.append({
-                        'hora': pred['hora_futura'],
-                        'estoque': pred['estoque_previsto'],
-                        'ofensor': pred['ofensor_principal']
-                    })
-            
-            if alertas_criticos:
-                print("\n🚨 ALERTAS CRÍTICOS:")
-                for alerta in alertas_criticos:
-                    print(f"   +{alerta['hora']}h: Estoque {alerta['estoque']:.0f} ton - "
-                          f"Causa: {alerta['ofensor']}")
-            
+            self.executar_predicao()
         except Exception as e:
             print(f"❌ Erro na predição #{self.contador_predicoes}: {e}")
     
@@ -105,17 +115,16 @@ class PredictionService:
         cursor.execute("""
             SELECT COUNT(DISTINCT timestamp_predicao) 
             FROM predicoes_estoque_patio
-            WHERE timestamp_predicao > datetime('now', '-1 day')
-        """)
+            WHERE ts_ms > ?
+        """, (para_ms(datetime.now() - timedelta(days=1)),))
         predicoes_24h = cursor.fetchone()[0]
         
         # Última predição
         cursor.execute("""
             SELECT timestamp_predicao, COUNT(*) 
             FROM predicoes_estoque_patio
+            WHERE ts_ms = (SELECT MAX(ts_ms) FROM predicoes_estoque_patio)
             GROUP BY timestamp_predicao
-            ORDER BY timestamp_predicao DESC
-            LIMIT 1
         """)
         ultima = cursor.fetchone()
         
@@ -130,18 +139,10 @@ class PredictionService:
         print("\n✅ Serviço finalizado")
     
     def limpar_predicoes_antigas(self, dias=7):
-        """Remove predições antigas do banco"""
-        conn = self.model.conectar_banco()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            DELETE FROM predicoes_estoque_patio
-            WHERE timestamp_predicao < datetime('now', '-{} days')
-        """.format(dias))
-        
-        deletados = cursor.rowcount
-        conn.commit()
-        conn.close()
+        """Remove predições antigas do banco (em lotes, pelo serviço de retenção)"""
+        servico = ServicoRetencao(self.model.db_path, verboso=False,
+                                  politicas={'predicoes_estoque_patio': {'horas': dias * 24}})
+        deletados = servico.executar_passada()['total']
         
         if deletados > 0:
             print(f"🧹 Removidas {deletados} predições antigas (>{dias} dias)")
@@ -181,6 +182,7 @@ USO:
   python prediction_service.py --intervalo 10  # A cada 10 minutos
   python prediction_service.py --teste      # Modo teste rápido
   python prediction_service.py --limpar     # Limpar predições antigas
+  python prediction_service.py --escritor   # Gravar via processo escritor único
 
 FUNCIONALIDADES:
   - Executa predição das próximas 9 horas
@@ -217,8 +219,14 @@ MODELO:
             print("❌ Erro: --intervalo precisa de um número")
             return
     
+    # Processo escritor único (database/writer_service.py)
+    escritor = None
+    if "--escritor" in args:
+        from writer_service import ClienteEscritor
+        escritor = ClienteEscritor()
+    
     # Executar serviço
-    service = PredictionService(intervalo_minutos=intervalo)
+    service = PredictionService(intervalo_minutos=intervalo, escritor=escritor)
     service.executar()
 
 
@@ -0,0 +1,646 @@
+"""
+Regressão de planos de consulta - Sistema Logística JIT
+EXPLAIN QUERY PLAN de cada consulta registrada contra um banco de fixture realista
+(1 dia de backfill + predições): falha em varredura completa ou B-tree temporária
+não prevista, em índice esperado fora do plano e em SQL novo sem registro
+"""
+
+import ast
+import contextlib
+import io
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+sys.path.append(str(Path(__file__).parent.parent / "data_generator"))
+from connection import criar_conexao, executar_checkpoint
+from epoch import janelas_hora, filtro_janelas, de_ms
+
+RAIZ = Path(__file__).parent.parent
+
+# Módulos cujo SQL precisa estar registrado abaixo (o gerador grava os alertas
+# pelos comandos de statements.py e lê os abertos em alert_state.py)
+ARQUIVOS_VERIFICADOS = [
+    'backend/database.py',
+    'backend/main.py',
+    'database/prediction_model.py',
+    'data_generator/mock_generator_v2.py',
+    'data_generator/alert_state.py',
+    'database/statements.py',
+]
+
+HORA_MS = 3600000
+
+# Predições gravadas na fixture: uma a cada 5 min no dia do backfill (serviço de predição)
+INTERVALO_PREDICOES_MIN = 5
+
+# Motivos das varreduras/B-trees aceitas (repetidos em várias consultas)
+ULTIMA_LINHA = "índice de ts_ms em ordem decrescente: para na primeira linha (LIMIT)"
+CONTAGEM = "contagem da tabela inteira: percorre o menor índice, sem ler as linhas"
+TABELA_PEQUENA = "tabela de configuração com poucas linhas, lida inteira"
+ORDEM_AGREGADO = "ordenação por valor agregado: só as linhas já agrupadas"
+
+TABELAS_ESTATISTICAS = ['dados_tempo_real', 'estado_frota', 'transporte_detalhado', 'colheitabilidade_detalhada']
+TABELAS_V2 = ['padroes_horarios', 'predicoes_estoque_patio', 'limites_operacionais', 'eventos_sistema']
+
+# Cada consulta: SQL como está no código (f-string com {}), parâmetros em função do
+# instante mais recente da fixture (ms), índices que o plano precisa usar e as
+# varreduras ({tabela: motivo}) / B-trees temporárias (motivo) aceitas
+CONSULTAS_REGISTRADAS = [
+    # backend/database.py
+    {
+        'nome': 'ultimo_dado',
+        'arquivo': 'backend/database.py',
+        'sql': "SELECT * FROM dados_tempo_real ORDER BY ts_ms DESC LIMIT 1",
+        'indices': ['idx_dados_tempo_real_ts_ms'],
+        'varreduras': {'dados_tempo_real': ULTIMA_LINHA},
+    },
+    {
+        'nome': 'ultimo_estado_frota',
+        'arquivo': 'backend/database.py',
+        'sql': "SELECT * FROM estado_frota ORDER BY ts_ms DESC LIMIT 1",
+        'indices': ['idx_estado_frota_ts_ms'],
+        'varreduras': {'estado_frota': ULTIMA_LINHA},
+    },
+    {
+        'nome': 'transportes_recentes',
+        'arquivo': 'backend/database.py',
+        'sql': "SELECT * FROM transporte_detalhado ORDER BY ts_ms DESC LIMIT ?",
+        'params': lambda ref: (100,),
+        'indices': ['idx_transporte_detalhado_ts_ms'],
+        'varreduras': {'transporte_detalhado': "índice de ts_ms em ordem decrescente: para no LIMIT"},
+    },
+    {
+        'nome': 'estado_caminhao',
+        'arquivo': 'backend/database.py',
+        'sql': "SELECT * FROM estado_caminhao WHERE NO_PLACA = ?",
+        'params': lambda ref: ('ABC1D23',),
+        'indices': ['sqlite_autoindex_estado_caminhao_1'],
+    },
+    {
+        'nome': 'colheitabilidade_por_fazenda',
+        'arquivo': 'backend/database.py',
+        'sql': """
+            SELECT FAZENDA, SETOR, AVG(TON_HORA) as media_ton_hora,
+                   COUNT(*) as registros, MAX(timestamp) as ultimo_update
+            FROM colheitabilidade_detalhada
+            WHERE ts_ms >= ?
+            GROUP BY +FAZENDA, SETOR
+            ORDER BY media_ton_hora DESC
+            LIMIT ?
+        """,
+        'params': lambda ref: (ref - 2 * HORA_MS, 50),
+        'indices': ['COVERING INDEX idx_colheitabilidade_ts_ms_fazenda'],
+        'btree_temp': "agrupamento das linhas do período (já lidas do índice) e " + ORDEM_AGREGADO,
+    },
+    {
+        'nome': 'estatisticas_contagem',
+        'arquivo': 'backend/database.py',
+        'sql': "SELECT COUNT(*) FROM {}",
+        'formatos': [(tabela,) for tabela in TABELAS_ESTATISTICAS],
+        'varreduras': {tabela: CONTAGEM for tabela in TABELAS_ESTATISTICAS},
+    },
+    {
+        'nome': 'estatisticas_ultimo',
+        'arquivo': 'backend/database.py',
+        'sql': "SELECT timestamp FROM {} ORDER BY ts_ms DESC LIMIT 1",
+        'formatos': [(tabela,) for tabela in TABELAS_ESTATISTICAS],
+        'varreduras': {tabela: ULTIMA_LINHA for tabela in TABELAS_ESTATISTICAS},
+    },
+    {
+        'nome': 'estatisticas_ultima_hora',
+        'arquivo': 'backend/database.py',
+        'sql': """
+            SELECT AVG(colheitabilidade_ton_h) as colheita_media, AVG(moagem_ton_h) as moagem_media,
+                   AVG(estoque_total_ton) as estoque_medio, COUNT(*) as registros_ultima_hora
+            FROM dados_tempo_real WHERE ts_ms >= ?
+        """,
+        'params': lambda ref: (ref - HORA_MS,),
+        'indices': ['idx_dados_tempo_real_ts_ms (ts_ms>?)'],
+    },
+    {
+        'nome': 'tendencia_estoque',
+        'arquivo': 'backend/database.py',
+        'sql': "SELECT estoque_total_ton, timestamp FROM dados_tempo_real WHERE ts_ms >= ? ORDER BY ts_ms ASC",
+        'params': lambda ref: (ref - 24 * HORA_MS,),
+        'indices': ['idx_dados_tempo_real_ts_ms (ts_ms>?)'],
+    },
+    {
+        'nome': 'health_ping',
+        'arquivo': 'backend/database.py',
+        'sql': "SELECT 1",
+    },
+    {
+        'nome': 'health_ultimo_dado',
+        'arquivo': 'backend/database.py',
+        'sql': "SELECT timestamp, ts_ms FROM dados_tempo_real ORDER BY ts_ms DESC LIMIT 1",
+        'indices': ['idx_dados_tempo_real_ts_ms'],
+        'varreduras': {'dados_tempo_real': ULTIMA_LINHA},
+    },
+
+    # backend/main.py
+    {
+        'nome': 'historico_estoque_patio',
+        'arquivo': 'backend/main.py',
+        'sql': """
+            SELECT timestamp, estoque_sobre_rodas_patio, estoque_fisico_patio,
+                   COALESCE(taxa_entrada_patio, 0) as taxa_entrada,
+                   COALESCE(taxa_saida_patio, moagem_ton_h) as taxa_saida,
+                   moagem_ton_h, colheitabilidade_ton_h, ofensor_principal
+            FROM estoque_patio_consolidado WHERE ts_ms >= ? ORDER BY ts_ms ASC
+        """,
+        'params': lambda ref: (ref - 24 * HORA_MS,),
+        'indices': ['idx_estoque_patio_consolidado_ts_ms (ts_ms>?)'],
+    },
+    {
+        'nome': 'predicao_mais_recente',
+        'arquivo': 'backend/main.py',
+        'sql': """
+            SELECT timestamp_predicao, hora_futura, timestamp_previsto, estoque_patio_previsto_ton,
+                   estoque_limite_superior_ton, estoque_limite_inferior_ton, confiabilidade_percent,
+                   ofensor_principal, ofensor_valor
+            FROM predicoes_estoque_patio
+            WHERE ts_ms = ( SELECT MAX(ts_ms) FROM predicoes_estoque_patio )
+            ORDER BY hora_futura ASC
+        """,
+        'indices': ['idx_predicoes_ts_ms_hora (ts_ms=?)'],
+    },
+    {
+        'nome': 'limite_estoque_patio',
+        'arquivo': 'backend/main.py',
+        'sql': """
+            SELECT limite_inferior, limite_superior, limite_critico_inferior, limite_critico_superior
+            FROM limites_operacionais WHERE variavel = 'estoque_patio_ton'
+        """,
+        'indices': ['sqlite_autoindex_limites_operacionais_1 (variavel=?)'],
+    },
+    {
+        'nome': 'eventos_recentes_e_abertos',
+        'arquivo': 'backend/main.py',
+        'sql': """
+            SELECT * FROM eventos_sistema WHERE ts_ms >= ?
+            UNION
+            SELECT * FROM eventos_sistema WHERE resolvido = 0
+            ORDER BY ts_ms DESC LIMIT 100
+        """,
+        'params': lambda ref: (ref - 2 * HORA_MS,),
+        'indices': ['idx_eventos_sistema_ts_ms (ts_ms>?)', '(resolvido=?)'],
+        'btree_temp': "UNION sem duplicatas: ordena só as linhas das duas faixas (período + abertos)",
+    },
+    {
+        'nome': 'analise_ofensores',
+        'arquivo': 'backend/main.py',
+        'sql': """
+            SELECT ofensor_principal, COUNT(*) as ocorrencias, AVG(ofensor_valor) as valor_medio
+            FROM predicoes_estoque_patio
+            WHERE ts_ms > ? AND ofensor_principal IS NOT NULL
+            GROUP BY ofensor_principal ORDER BY ocorrencias DESC
+        """,
+        'params': lambda ref: (ref - 6 * HORA_MS,),
+        'indices': ['COVERING INDEX idx_predicoes_ts_ms_hora (ts_ms>?)'],
+        'btree_temp': "agrupamento das predições do período (já lidas do índice) e " + ORDEM_AGREGADO,
+    },
+    {
+        'nome': 'ws_ultimo_dado',
+        'arquivo': 'backend/main.py',
+        'sql': """
+            SELECT timestamp, estoque_patio_ton,
+                   COALESCE(taxa_entrada_patio_ton_h, 0) as taxa_entrada,
+                   COALESCE(taxa_saida_patio_ton_h, moagem_ton_h) as taxa_saida
+            FROM dados_tempo_real ORDER BY ts_ms DESC LIMIT 1
+        """,
+        'indices': ['idx_dados_tempo_real_ts_ms'],
+        'varreduras': {'dados_tempo_real': ULTIMA_LINHA},
+    },
+    {
+        'nome': 'ws_alertas_abertos',
+        'arquivo': 'backend/main.py',
+        'sql': """
+            SELECT COUNT(*) FROM eventos_sistema
+            WHERE resolvido = 0 AND severidade IN ('AVISO', 'CRITICO')
+        """,
+        'indices': ['COVERING INDEX idx_eventos_abertos_severidade (resolvido=? AND severidade=?)'],
+    },
+    {
+        'nome': 'status_v2_contagem',
+        'arquivo': 'backend/main.py',
+        'sql': "SELECT COUNT(*) FROM {}",
+        'formatos': [(tabela,) for tabela in TABELAS_V2],
+        'varreduras': {tabela: CONTAGEM for tabela in TABELAS_V2},
+    },
+    {
+        'nome': 'status_v2_ultima_predicao',
+        'arquivo': 'backend/main.py',
+        'sql': "SELECT timestamp_predicao, ts_ms FROM predicoes_estoque_patio ORDER BY ts_ms DESC LIMIT 1",
+        'varreduras': {'predicoes_estoque_patio': ULTIMA_LINHA},
+    },
+    {
+        'nome': 'status_v2_dados_recentes',
+        'arquivo': 'backend/main.py',
+        'sql': "SELECT MAX(timestamp) as ultimo, COUNT(*) as total FROM dados_tempo_real WHERE ts_ms > ?",
+        'params': lambda ref: (ref - HORA_MS,),
+        'indices': ['idx_dados_tempo_real_ts_ms (ts_ms>?)'],
+    },
+
+    # database/prediction_model.py
+    {
+        'nome': 'modelo_dados_atuais',
+        'arquivo': 'database/prediction_model.py',
+        'sql': """
+            SELECT timestamp, estoque_patio_ton, estoque_patio_fisico_ton, taxa_entrada_patio_ton_h,
+                   taxa_saida_patio_ton_h, colheitabilidade_ton_h, moagem_ton_h, estoque_indo_ton
+            FROM dados_tempo_real ORDER BY ts_ms DESC LIMIT 1
+        """,
+        'indices': ['idx_dados_tempo_real_ts_ms'],
+        'varreduras': {'dados_tempo_real': ULTIMA_LINHA},
+    },
+    {
+        'nome': 'modelo_padrao_horario',
+        'arquivo': 'database/prediction_model.py',
+        'sql': """
+            SELECT colheita_media_ton_h, moagem_media_ton_h, chegadas_media_caminhoes,
+                   colheita_desvio_padrao, moagem_desvio_padrao, chegadas_desvio_padrao
+            FROM padroes_horarios WHERE hora_dia = ? AND dia_semana = ?
+        """,
+        'params': lambda ref: (de_ms(ref).hour, de_ms(ref).weekday()),
+        'indices': ['sqlite_autoindex_padroes_horarios_1 (hora_dia=? AND dia_semana=?)'],
+    },
+    {
+        'nome': 'modelo_padrao_historico',
+        'arquivo': 'database/prediction_model.py',
+        'sql': """
+            SELECT AVG(taxa_entrada_patio_ton_h) as entrada_media, AVG(taxa_saida_patio_ton_h) as saida_media,
+                   AVG(colheitabilidade_ton_h) as colheita_media, AVG(moagem_ton_h) as moagem_media,
+                   COUNT(*) as amostras
+            FROM dados_tempo_real WHERE {}
+        """,
+        # Hora H de cada um dos últimos 7 dias: uma faixa do índice por dia (MULTI-INDEX OR)
+        'formatos': lambda ref: [(filtro_janelas(janelas_hora(de_ms(ref).hour, 7, de_ms(ref)))[0],)],
+        'params': lambda ref: filtro_janelas(janelas_hora(de_ms(ref).hour, 7, de_ms(ref)))[1],
+        'indices': ['idx_dados_tempo_real_ts_ms (ts_ms>? AND ts_ms<?)'],
+    },
+    {
+        'nome': 'modelo_tendencia',
+        'arquivo': 'database/prediction_model.py',
+        'sql': """
+            SELECT timestamp, estoque_patio_ton, taxa_entrada_patio_ton_h, taxa_saida_patio_ton_h
+            FROM dados_tempo_real WHERE ts_ms > ? ORDER BY ts_ms ASC
+        """,
+        'params': lambda ref: (ref - 2 * HORA_MS,),
+        'indices': ['idx_dados_tempo_real_ts_ms (ts_ms>?)'],
+    },
+    {
+        'nome': 'modelo_limites',
+        'arquivo': 'database/prediction_model.py',
+        'sql': """
+            SELECT limite_inferior, limite_superior FROM limites_operacionais
+            WHERE variavel = 'estoque_patio_ton'
+        """,
+        'indices': ['sqlite_autoindex_limites_operacionais_1 (variavel=?)'],
+    },
+
+    # data_generator/mock_generator_v2.py
+    {
+        'nome': 'gerador_padrao_horario',
+        'arquivo': 'data_generator/mock_generator_v2.py',
+        'sql': """
+            SELECT colheita_media_ton_h, moagem_media_ton_h, chegadas_media_caminhoes, velocidade_media_kmh
+            FROM padroes_horarios WHERE hora_dia = ? AND dia_semana = ?
+        """,
+        'params': lambda ref: (de_ms(ref).hour, de_ms(ref).weekday()),
+        'indices': ['sqlite_autoindex_padroes_horarios_1 (hora_dia=? AND dia_semana=?)'],
+    },
+    {
+        'nome': 'gerador_limites',
+        'arquivo': 'data_generator/mock_generator_v2.py',
+        'sql': """
+            SELECT variavel, limite_inferior, limite_superior, limite_critico_inferior, limite_critico_superior
+            FROM limites_operacionais
+        """,
+        'varreduras': {'limites_operacionais': TABELA_PEQUENA},
+    },
+    {
+        'nome': 'gerador_distribuicao_frota',
+        'arquivo': 'data_generator/mock_generator_v2.py',
+        'sql': "SELECT status_caminhao, caminhoes, carga_kg FROM distribuicao_frota",
+        'varreduras': {'distribuicao_frota': "uma linha por status (T1-T4), mantida por trigger"},
+    },
+    {
+        'nome': 'gerador_placas_estado',
+        'arquivo': 'data_generator/mock_generator_v2.py',
+        'sql': "SELECT NO_PLACA FROM estado_caminhao",
+        'varreduras': {'estado_caminhao': "uma linha por placa ativa, só ao iniciar o simulador de frota"},
+    },
+    {
+        'nome': 'gerador_remover_placa',
+        'arquivo': 'data_generator/mock_generator_v2.py',
+        'sql': "DELETE FROM estado_caminhao WHERE NO_PLACA = ?",
+        'params': lambda ref: ('ABC1D23',),
+        'indices': ['sqlite_autoindex_estado_caminhao_1'],
+    },
+
+    # data_generator/alert_state.py e database/statements.py (alertas do gerador)
+    {
+        'nome': 'alertas_abertos_por_tipo',
+        'arquivo': 'data_generator/alert_state.py',
+        'sql': """
+            SELECT variavel_afetada, severidade, MAX(timestamp) FROM eventos_sistema
+            WHERE tipo_evento = ? AND resolvido = 0
+            GROUP BY variavel_afetada, severidade
+        """,
+        'params': lambda ref: ('LIMITE_EXCEDIDO',),
+        'indices': ['COVERING INDEX idx_eventos_abertos_tipo (resolvido=? AND tipo_evento=?)'],
+    },
+    {
+        'nome': 'atualizar_evento_limite',
+        'arquivo': 'database/statements.py',
+        'sql': """
+            UPDATE eventos_sistema SET valor_atual = ?, limite_violado = ?, descricao = ?
+            WHERE tipo_evento = ? AND variavel_afetada = ? AND severidade = ? AND resolvido = 0
+        """,
+        'params': lambda ref: (1.0, 1.0, '', 'LIMITE_EXCEDIDO', 'estoque_patio_ton', 'AVISO'),
+        'indices': ['idx_eventos_abertos_tipo (resolvido=? AND tipo_evento=? AND variavel_afetada=? '
+                    'AND severidade=?)'],
+    },
+    {
+        'nome': 'resolver_evento_limite',
+        'arquivo': 'database/statements.py',
+        'sql': """
+            UPDATE eventos_sistema SET resolvido = 1, resolvido_em = ?
+            WHERE tipo_evento = ? AND variavel_afetada = ? AND severidade = ? AND resolvido = 0
+        """,
+        'params': lambda ref: (de_ms(ref), 'LIMITE_EXCEDIDO', 'estoque_patio_ton', 'AVISO'),
+        'indices': ['idx_eventos_abertos_tipo (resolvido=? AND tipo_evento=? AND variavel_afetada=? '
+                    'AND severidade=?)'],
+    },
+]
+
+
+def normalizar(sql):
+    """Espaços colapsados: compara o SQL do registro com o do código"""
+    return ' '.join(sql.split())
+
+
+def extrair_sql(arquivo):
+    """
+    SQL literal do módulo (strings começando em SELECT/WITH/UPDATE/DELETE);
+    f-strings viram o texto com {} no lugar das expressões
+    """
+    arvore = ast.parse((RAIZ / arquivo).read_text(encoding='utf-8'))
+    partes_fstring = set()
+    encontrados = set()
+
+    for no in ast.walk(arvore):
+        if isinstance(no, ast.JoinedStr):
+            partes_fstring.update(id(valor) for valor in no.values)
+            texto = ''.join(valor.value if isinstance(valor, ast.Constant) else '{}' for valor in no.values)
+        elif isinstance(no, ast.Constant) and isinstance(no.value, str) and id(no) not in partes_fstring:
+            texto = no.value
+        else:
+            continue
+        texto = normalizar(texto)
+        if re.match(r'(SELECT|WITH|UPDATE|DELETE)\s', texto):
+            encontrados.add(texto)
+
+    return encontrados
+
+
+def verificar_registro(consultas=None, arquivos=None):
+    """Erros de cobertura: SQL do código sem registro e registro sem SQL no código"""
+    consultas = CONSULTAS_REGISTRADAS if consultas is None else consultas
+    erros = []
+
+    for arquivo in arquivos or ARQUIVOS_VERIFICADOS:
+        no_codigo = extrair_sql(arquivo)
+        registrados = {normalizar(c['sql']) for c in consultas if c['arquivo'] == arquivo}
+        for sql in sorted(no_codigo - registrados):
+            erros.append(f"{arquivo}: SQL sem registro em CONSULTAS_REGISTRADAS: {sql[:90]}")
+        for sql in sorted(registrados - no_codigo):
+            erros.append(f"{arquivo}: consulta registrada não existe mais no código: {sql[:90]}")
+
+    return erros
+
+
+def variantes(consulta, ref):
+    """[(sql concreto, params)] da consulta (uma por formato das f-strings)"""
+    formatos = consulta.get('formatos', [()])
+    if callable(formatos):
+        formatos = formatos(ref)
+    params = consulta.get('params', lambda ref: ())(ref)
+    return [(normalizar(consulta['sql']).format(*formato), params) for formato in formatos]
+
+
+def obter_plano(cursor, sql, params=()):
+    """Linhas de detalhe do EXPLAIN QUERY PLAN"""
+    cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+    return [linha[3] for linha in cursor.fetchall()]
+
+
+def avaliar_plano(consulta, plano):
+    """Problemas do plano frente às expectativas da consulta"""
+    problemas = []
+    varreduras = consulta.get('varreduras', {})
+
+    for linha in plano:
+        varredura = re.match(r'SCAN (\w+)', linha)
+        if varredura and varredura.group(1) != 'CONSTANT' and varredura.group(1) not in varreduras:
+            problemas.append(f"varredura não prevista: {linha}")
+        if 'USE TEMP B-TREE' in linha and not consulta.get('btree_temp'):
+            problemas.append(f"B-tree temporária não prevista: {linha}")
+        if 'AUTOMATIC' in linha:
+            problemas.append(f"índice automático (falta índice permanente): {linha}")
+
+    texto = '\n'.join(plano)
+    for indice in consulta.get('indices', []):
+        if indice not in texto:
+            problemas.append(f"índice esperado fora do plano: {indice}")
+
+    return problemas
+
+
+def referencia_ms(cursor):
+    """Instante mais recente da fixture: base dos parâmetros relativos"""
+    cursor.execute("SELECT MAX(ts_ms) FROM dados_tempo_real")
+    return cursor.fetchone()[0] or 0
+
+
+def verificar_planos(db_path, consultas=None, mostrar_planos=False):
+    """
+    EXPLAIN QUERY PLAN + execução (desfeita no final) de cada consulta registrada
+    Retorna [(nome, ms, problemas)]
+    """
+    consultas = CONSULTAS_REGISTRADAS if consultas is None else consultas
+    conn = criar_conexao(db_path)
+    cursor = conn.cursor()
+    ref = referencia_ms(cursor)
+    resultados = []
+
+    try:
+        for consulta in consultas:
+            problemas = []
+            decorrido_ms = 0.0
+            for sql, params in variantes(consulta, ref):
+                try:
+                    plano = obter_plano(cursor, sql, params)
+                    t = time.perf_counter()
+                    cursor.execute(sql, params)
+                    cursor.fetchall()
+                    decorrido_ms += (time.perf_counter() - t) * 1000
+                except sqlite3.Error as e:
+                    problemas.append(f"erro ao executar: {e}")
+                    continue
+                problemas += avaliar_plano(consulta, plano)
+                if mostrar_planos:
+                    print(f"\n   {consulta['nome']}: {sql[:100]}")
+                    for linha in plano:
+                        print(f"      {linha}")
+            resultados.append((consulta['nome'], decorrido_ms, problemas))
+    finally:
+        # UPDATEs registrados não alteram a fixture
+        conn.rollback()
+        conn.close()
+
+    return resultados
+
+
+def criar_fixture_planos(pasta, verboso=False):
+    """
+    Banco realista para os planos: schema completo (init_db + atualização V2),
+    1 dia de backfill e uma predição a cada INTERVALO_PREDICOES_MIN minutos
+    """
+    from backfill import criar_fixture
+    from prediction_model import PredictionModel
+
+    saida = sys.stdout if verboso else io.StringIO()
+    with contextlib.redirect_stdout(saida):
+        db_path = criar_fixture('1dia', pasta)
+
+        modelo = PredictionModel(db_path)
+        predicao = modelo.gerar_predicao_completa()
+        conn = criar_conexao(db_path)
+        fim = de_ms(referencia_ms(conn.cursor()))
+        conn.close()
+        for i in range(24 * 60 // INTERVALO_PREDICOES_MIN):
+            predicao['timestamp_predicao'] = fim - timedelta(minutes=INTERVALO_PREDICOES_MIN * i)
+            modelo.salvar_predicao(predicao)
+
+    conn = criar_conexao(db_path)
+    executar_checkpoint(conn, 'TRUNCATE')
+    conn.close()
+    return db_path
+
+
+def executar_verificacao(db_path=None, mostrar_planos=False):
+    """Cobertura do registro + planos; True se não houver regressão"""
+    print("🔍 REGRESSÃO DE PLANOS DE CONSULTA")
+    print("=" * 60)
+
+    erros_registro = verificar_registro()
+    print(f"📋 {len(CONSULTAS_REGISTRADAS)} consultas registradas em {len(ARQUIVOS_VERIFICADOS)} módulos")
+    for erro in erros_registro:
+        print(f"   ❌ {erro}")
+
+    with tempfile.TemporaryDirectory() as pasta:
+        if db_path is None:
+            t = time.perf_counter()
+            db_path = criar_fixture_planos(pasta)
+            print(f"🧱 Fixture: 1 dia de backfill + predições ({time.perf_counter() - t:.1f}s)")
+        else:
+            print(f"📊 Banco: {db_path}")
+
+        resultados = verificar_planos(db_path, mostrar_planos=mostrar_planos)
+
+    print()
+    falhas = 0
+    for nome, decorrido_ms, problemas in resultados:
+        print(f"   {'❌' if problemas else '✅'} {nome:<32} {decorrido_ms:8.2f} ms")
+        for problema in problemas:
+            print(f"      ↳ {problema}")
+        falhas += bool(problemas)
+
+    ok = not falhas and not erros_registro
+    print(f"\n{'✅ Planos sem regressão' if ok else f'❌ {falhas} consulta(s) com regressão'}"
+          f"{f', {len(erros_registro)} erro(s) de registro' if erros_registro else ''}")
+    return ok
+
+
+def testar_query_plans():
+    """
+    A fixture passa; sem os índices de cobertura as consultas deles falham;
+    SQL desconhecido no código é apontado
+    """
+    print("🧪 Teste da regressão de planos")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as pasta:
+        db_path = criar_fixture_planos(pasta)
+
+        resultados = verificar_planos(db_path)
+        passou_fixture = all(not problemas for _, _, problemas in resultados)
+        print(f"{'✅' if passou_fixture else '❌'} Fixture sem regressão ({len(resultados)} consultas)")
+        for nome, _, problemas in resultados:
+            for problema in problemas:
+                print(f"   ↳ {nome}: {problema}")
+
+        conn = criar_conexao(db_path)
+        conn.executescript("""
+            DROP INDEX idx_colheitabilidade_ts_ms_fazenda;
+            DROP INDEX idx_eventos_abertos_severidade;
+        """)
+        conn.close()
+        falharam = {nome for nome, _, problemas in verificar_planos(db_path) if problemas}
+        esperadas = {'colheitabilidade_por_fazenda', 'ws_alertas_abertos'}
+        detectou = esperadas <= falharam
+        print(f"{'✅' if detectou else '❌'} Índices removidos detectados: {', '.join(sorted(falharam)) or 'nenhum'}")
+
+    sem_registro = [c for c in CONSULTAS_REGISTRADAS if c['nome'] != 'ws_alertas_abertos']
+    erros = verificar_registro(sem_registro, ['backend/main.py'])
+    apontou = len(erros) == 1 and 'sem registro' in erros[0]
+    print(f"{'✅' if apontou else '❌'} SQL sem registro apontado ({len(erros)} erro(s))")
+
+    ok = passou_fixture and detectou and apontou and not verificar_registro()
+    print(f"\n{'✅ Teste concluído' if ok else '❌ Teste falhou'}")
+    return ok
+
+
+def main():
+    args = sys.argv[1:]
+    if "--help" in args or "-h" in args:
+        print("""
+🔍 Regressão de planos de consulta - Sistema Logística JIT
+
+USO:
+  python database/query_plans.py                  # Fixture temporária (1 dia) + todas as consultas
+  python database/query_plans.py --planos         # Mostra o plano de cada consulta
+  python database/query_plans.py --db caminho.db  # Planos em um banco existente
+  python database/query_plans.py --teste          # Verifica que a regressão é detectada
+
+Sai com código 1 se alguma consulta tiver varredura/B-tree temporária não prevista,
+perder o índice esperado, ou se houver SQL nos módulos verificados sem registro.
+""")
+        return
+
+    if "--teste" in args:
+        sys.exit(0 if testar_query_plans() else 1)
+
+    db_path = None
+    if "--db" in args:
+        try:
+            db_path = args[args.index("--db") + 1]
+        except IndexError:
+            print("❌ Erro: --db precisa de um valor")
+            sys.exit(2)
+        if not Path(db_path).exists():
+            print(f"❌ Banco não encontrado: {db_path}")
+            sys.exit(2)
+
+    sys.exit(0 if executar_verificacao(db_path, mostrar_planos="--planos" in args) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,388 @@
+"""
+Réplica de leitura (snapshot) - Sistema Logística JIT
+Cópia somente leitura do banco refeita a cada N segundos com a API de backup online
+do SQLite; a API lê dela (immutable) sem disputar o arquivo com o gerador
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+from connection import criar_conexao
+from epoch import agora_ms, de_ms, garantir_colunas_epoca, _existe
+
+INTERVALO_PADRAO_S = 30
+LIMITE_ATRASO_INTERVALOS = 3     # Snapshot com mais de 3 intervalos: réplica atrasada no /health
+
+# Gravada só na cópia: quando e de onde o snapshot foi tirado
+SQL_INFO_REPLICA = """
+    CREATE TABLE replica_info (
+        origem TEXT NOT NULL,
+        gerada_em_ms INTEGER NOT NULL,
+        ultimo_dado_ms INTEGER,
+        intervalo_s REAL NOT NULL,
+        duracao_ms REAL NOT NULL,
+        bytes INTEGER NOT NULL
+    )
+"""
+
+
+def caminho_replica(db_path):
+    """database/logistics.db -> database/logistics_replica.db"""
+    db_path = Path(db_path)
+    return db_path.with_name(f"{db_path.stem}_replica.db")
+
+
+def assinatura_origem(db_path):
+    """(mtime, tamanho) do arquivo principal e do -wal: muda a cada commit ou checkpoint"""
+    assinatura = []
+    for arquivo in [Path(db_path), Path(f"{db_path}-wal")]:
+        if arquivo.exists():
+            estado = arquivo.stat()
+            assinatura += [estado.st_mtime_ns, estado.st_size]
+        else:
+            assinatura += [None, None]
+    return tuple(assinatura)
+
+
+def gerar_snapshot(db_path, destino, intervalo_s=INTERVALO_PADRAO_S):
+    """
+    Um snapshot: backup online para <destino>.tmp, journal DELETE (o arquivo sozinho
+    é o banco inteiro), replica_info e troca atômica do arquivo. Conexões abertas na
+    réplica anterior continuam lendo o arquivo antigo até fechar
+    Retorna o replica_info gravado
+    """
+    destino = Path(destino)
+    temporario = destino.with_name(destino.name + ".tmp")
+    temporario.unlink(missing_ok=True)
+
+    t_inicio = time.perf_counter()
+    origem = criar_conexao(db_path, somente_leitura=True)
+    copia = sqlite3.connect(temporario)
+    try:
+        # Um passo só (pages=-1): uma transação de leitura, que em WAL não bloqueia o
+        # escritor. Em passos, cada commit do gerador reiniciaria a cópia
+        origem.backup(copia)
+        copia.execute("PRAGMA journal_mode = DELETE")
+
+        ultimo_dado_ms = None
+        if _existe(copia.cursor(), 'dados_tempo_real'):
+            ultimo_dado_ms = copia.execute("SELECT MAX(ts_ms) FROM dados_tempo_real").fetchone()[0]
+
+        info = {
+            'origem': str(Path(db_path).absolute()),
+            'gerada_em_ms': agora_ms(),
+            'ultimo_dado_ms': ultimo_dado_ms,
+            'intervalo_s': float(intervalo_s),
+            'duracao_ms': (time.perf_counter() - t_inicio) * 1000,
+            'bytes': temporario.stat().st_size,
+        }
+        copia.execute("DROP TABLE IF EXISTS replica_info")
+        copia.execute(SQL_INFO_REPLICA)
+        copia.execute(f"INSERT INTO replica_info ({', '.join(info)}) VALUES ({', '.join('?' * len(info))})",
+                      tuple(info.values()))
+        copia.commit()
+    finally:
+        copia.close()
+        origem.close()
+
+    os.replace(temporario, destino)
+    return info
+
+
+def abrir_replica(destino):
+    """Conexão de leitura no snapshot (immutable: sem locks nem arquivos -wal/-shm)"""
+    return criar_conexao(destino, imutavel=True)
+
+
+def ler_info(destino):
+    """
+    replica_info do snapshot + idade em segundos e se está atrasada
+    (mais de LIMITE_ATRASO_INTERVALOS intervalos). None se não houver réplica
+    """
+    destino = Path(destino)
+    if not destino.exists():
+        return None
+
+    conn = abrir_replica(destino)
+    conn.row_factory = sqlite3.Row
+    try:
+        linha = conn.execute("SELECT * FROM replica_info").fetchone()
+    except sqlite3.OperationalError:
+        return None  # Cópia sem replica_info: não foi gerada por este módulo
+    finally:
+        conn.close()
+    if not linha:
+        return None
+
+    info = dict(linha)
+    idade_s = (agora_ms() - info['gerada_em_ms']) / 1000
+    return {
+        **info,
+        'gerada_em': de_ms(info['gerada_em_ms']).isoformat(timespec='seconds'),
+        'idade_s': round(idade_s, 1),
+        'atrasada': idade_s > LIMITE_ATRASO_INTERVALOS * info['intervalo_s'],
+    }
+
+
+class ServicoReplica:
+    """
+    Mantém a réplica de leitura
+
+    - A cada `intervalo_s`: snapshot novo se o banco mudou (mtime/tamanho do
+      arquivo principal e do -wal); sem mudança, a réplica atual continua valendo
+    - Roda como processo (executar) ou thread de fundo na API (iniciar/parar)
+    """
+
+    def __init__(self, db_path="database/logistics.db", destino=None,
+                 intervalo_s=INTERVALO_PADRAO_S, verboso=True):
+        self.db_path = Path(db_path)
+        self.destino = Path(destino) if destino else caminho_replica(self.db_path)
+        self.intervalo_s = intervalo_s
+        self.verboso = verboso
+
+        self._assinatura = None
+        self._parar = threading.Event()
+        self._thread = None
+
+        self.trava_metricas = threading.Lock()
+        self.metricas = {
+            'snapshots': 0,
+            'sem_mudanca': 0,
+            'erros': 0,
+            'segundos_copia': 0.0,
+            'ultimo': None,
+        }
+
+    def atualizar(self, forcar=False):
+        """Snapshot se o banco mudou desde o último. Retorna o replica_info ou None"""
+        assinatura = assinatura_origem(self.db_path)
+        if not forcar and assinatura == self._assinatura and self.destino.exists():
+            with self.trava_metricas:
+                self.metricas['sem_mudanca'] += 1
+            return None
+
+        info = gerar_snapshot(self.db_path, self.destino, self.intervalo_s)
+        self._assinatura = assinatura
+
+        with self.trava_metricas:
+            self.metricas['snapshots'] += 1
+            self.metricas['segundos_copia'] += info['duracao_ms'] / 1000
+            self.metricas['ultimo'] = info
+
+        if self.verboso:
+            print(f"📸 Réplica: {info['bytes'] / 1024 / 1024:.1f} MB em {info['duracao_ms']:.0f} ms → {self.destino}")
+        return info
+
+    def _ciclo(self):
+        while not self._parar.is_set():
+            inicio = time.monotonic()
+            try:
+                self.atualizar()
+            except sqlite3.Error as e:
+                # Banco ocupado/ausente: a réplica anterior continua servindo
+                with self.trava_metricas:
+                    self.metricas['erros'] += 1
+                print(f"⚠️ Réplica não atualizada: {e}")
+            self._parar.wait(max(0, self.intervalo_s - (time.monotonic() - inicio)))
+
+    def iniciar(self):
+        """Thread de fundo (daemon) com um snapshot a cada `intervalo_s`"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._ciclo, name="replica", daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+        if self._thread:
+            self._thread.join()
+
+    def mostrar_metricas(self):
+        with self.trava_metricas:
+            m = dict(self.metricas)
+        media_ms = m['segundos_copia'] / m['snapshots'] * 1000 if m['snapshots'] else 0.0
+        print(f"   📸 Réplica: {m['snapshots']} snapshots ({media_ms:.0f} ms em média) | "
+              f"{m['sem_mudanca']} sem mudança | {m['erros']} erros")
+
+    def executar(self):
+        """Serviço contínuo: snapshot a cada `intervalo_s`"""
+        print(f"📸 Réplica de leitura: {self.db_path} → {self.destino} | a cada {self.intervalo_s}s")
+        try:
+            self._ciclo()
+        except KeyboardInterrupt:
+            print("\n⏹️ Serviço de réplica parado")
+            self.mostrar_metricas()
+
+
+def mostrar_status(destino):
+    info = ler_info(destino)
+    if not info:
+        print(f"📋 {destino}: sem réplica (rode python database/replica.py)")
+        return
+    ultimo = de_ms(info['ultimo_dado_ms']).isoformat(timespec='seconds') if info['ultimo_dado_ms'] else '-'
+    print(f"📋 {destino}: {info['bytes'] / 1024 / 1024:.1f} MB de {info['origem']}")
+    print(f"   Gerada em {info['gerada_em']} ({info['idade_s']:.0f}s atrás, intervalo {info['intervalo_s']:.0f}s)"
+          f"{' ⚠️ ATRASADA' if info['atrasada'] else ''} | último dado {ultimo} | cópia em {info['duracao_ms']:.0f} ms")
+
+
+def _percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+def testar_replica(segundos=3.0, intervalo_s=0.2):
+    """
+    Banco temporário com escritor contínuo e serviço de réplica em thread: leitores
+    na réplica (immutable) sempre veem um snapshot consistente, o escritor não erra
+    por lock, a idade fica perto do intervalo e banco parado não gera snapshot novo
+    """
+    print("🧪 Teste da réplica de leitura")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as pasta:
+        db_path = Path(pasta) / "replica_origem.db"
+        conn = criar_conexao(db_path)
+        conn.execute("CREATE TABLE dados_tempo_real (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                     "timestamp DATETIME, estoque_patio_ton REAL, carga TEXT)")
+        garantir_colunas_epoca(conn.cursor(), ['dados_tempo_real'])
+        conn.executemany("INSERT INTO dados_tempo_real (timestamp, estoque_patio_ton, carga) "
+                         "VALUES (datetime('now', 'localtime'), 1000.0, ?)", [("x" * 200,)] * 20000)
+        conn.commit()
+        conn.close()
+
+        servico = ServicoReplica(db_path, intervalo_s=intervalo_s, verboso=False)
+        servico.atualizar()
+        servico.iniciar()
+
+        parar = threading.Event()
+        latencias_escrita = []
+        erros = []
+        inconsistentes = [0]
+        leituras = [0]
+
+        def escritor():
+            c = criar_conexao(db_path)
+            while not parar.is_set():
+                t = time.perf_counter()
+                try:
+                    # Ciclo típico do gerador: várias linhas por commit
+                    c.executemany("INSERT INTO dados_tempo_real (timestamp, estoque_patio_ton) "
+                                  "VALUES (datetime('now', 'localtime'), ?)", [(1000.0 + i,) for i in range(20)])
+                    c.commit()
+                    latencias_escrita.append((time.perf_counter() - t) * 1000)
+                except sqlite3.OperationalError as e:
+                    erros.append(str(e))
+                time.sleep(0.005)
+            c.close()
+
+        def leitor():
+            while not parar.is_set():
+                try:
+                    c = abrir_replica(servico.destino)
+                    # Só inserções: snapshot consistente <=> COUNT = MAX(id)
+                    total, maximo = c.execute("SELECT COUNT(*), MAX(id) FROM dados_tempo_real").fetchone()
+                    c.close()
+                    inconsistentes[0] += total != maximo
+                    leituras[0] += 1
+                except sqlite3.Error as e:
+                    erros.append(f"leitura: {e}")
+
+        threads = [threading.Thread(target=escritor)] + [threading.Thread(target=leitor) for _ in range(3)]
+        for t in threads:
+            t.start()
+        time.sleep(segundos)
+        parar.set()
+        for t in threads:
+            t.join()
+
+        time.sleep(intervalo_s * 2)       # Último snapshot com o banco já parado
+        info = ler_info(servico.destino)
+        antes = servico.metricas['snapshots']
+        time.sleep(intervalo_s * 3)
+        servico.parar()
+        pulou = servico.metricas['snapshots'] == antes and servico.metricas['sem_mudanca'] > 0
+
+        conn = criar_conexao(db_path, somente_leitura=True)
+        linhas_origem = conn.execute("SELECT COUNT(*) FROM dados_tempo_real").fetchone()[0]
+        conn.close()
+        replica = abrir_replica(servico.destino)
+        linhas_replica = replica.execute("SELECT COUNT(*) FROM dados_tempo_real").fetchone()[0]
+        modo = replica.execute("PRAGMA journal_mode").fetchone()[0]
+        replica.close()
+        sem_wal = not Path(f"{servico.destino}-wal").exists()
+
+    m = servico.metricas
+    print(f"   Snapshots: {m['snapshots']} ({m['segundos_copia'] / max(m['snapshots'], 1) * 1000:.0f} ms em média), "
+          f"{m['sem_mudanca']} sem mudança, {m['erros']} erros")
+    print(f"   Escritor: {len(latencias_escrita)} commits, p95 {_percentil(latencias_escrita, 0.95):.2f} ms, "
+          f"{len(erros)} erros")
+    print(f"   Leitores na réplica: {leituras[0]} leituras, {inconsistentes[0]} inconsistentes")
+    print(f"   Réplica final: {linhas_replica:,} de {linhas_origem:,} linhas | journal {modo} | "
+          f"idade {info['idade_s'] if info else '-'}s | banco parado sem snapshot novo: {'sim' if pulou else 'não'}")
+
+    aprovado = (not erros and not inconsistentes[0] and leituras[0] > 0 and m['snapshots'] > 2
+                and linhas_replica == linhas_origem and modo == 'delete' and sem_wal
+                and info is not None and not info['atrasada'] and pulou)
+    print(f"\n{'✅ APROVADO' if aprovado else '❌ FALHOU'}")
+    return aprovado
+
+
+def main():
+    args = sys.argv[1:]
+    if "--help" in args or "-h" in args:
+        print(f"""
+📸 Réplica de leitura (snapshot) - Sistema Logística JIT
+
+USO:
+  python database/replica.py                       # Um snapshot: database/logistics_replica.db
+  python database/replica.py --intervalo 30        # Serviço contínuo (snapshot a cada 30s)
+  python database/replica.py --db caminho.db       # Outro banco de origem
+  python database/replica.py --destino /local/r.db # Cópia local (ex.: disco de outro worker)
+  python database/replica.py --status              # Idade e tamanho da réplica
+  python database/replica.py --teste               # Escritor + leitores na réplica em banco temporário
+
+API na réplica: LOGISTICA_REPLICA=database/logistics_replica.db (workers) ou
+python backend/main.py --replica (snapshot em thread, a cada {INTERVALO_PADRAO_S}s).
+Outras máquinas: copiar o arquivo da réplica (nunca é alterado no lugar).
+""")
+        return
+
+    if "--teste" in args:
+        sys.exit(0 if testar_replica() else 1)
+
+    opcoes = {}
+    for flag, chave, tipo in [("--db", "db_path", str), ("--destino", "destino", str),
+                              ("--intervalo", "intervalo_s", float)]:
+        if flag in args:
+            try:
+                opcoes[chave] = tipo(args[args.index(flag) + 1])
+            except (IndexError, ValueError):
+                print(f"❌ Erro: {flag} precisa de um valor válido")
+                return
+
+    servico = ServicoReplica(**opcoes)
+    if "--status" in args:
+        mostrar_status(servico.destino)
+        return
+
+    if not servico.db_path.exists():
+        print(f"❌ Banco não encontrado: {servico.db_path}")
+        return
+
+    if "--intervalo" in args:
+        servico.executar()
+    else:
+        servico.atualizar(forcar=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,444 @@
+"""
+Serviço de retenção - Sistema Logística JIT
+Remove linhas antigas por política de cada tabela em lotes curtos (um commit por
+lote, pausa entre lotes) e devolve as páginas livres com vacuum incremental.
+Tabelas particionadas (partitions.py) não entram nas políticas: os dias fechados
+são selados em arquivos diários e a retenção delas é apagar o arquivo
+"""
+
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+from connection import criar_conexao, executar_checkpoint
+from epoch import para_ms, garantir_colunas_epoca, _existe
+from partitions import DIAS_QUENTES_PADRAO, TABELAS_PARTICIONADAS, particionar, descartar_particoes
+
+# Tabelas cujo período mantido acompanha --horas / limpar_dados_antigos(horas)
+# (dados_tempo_real, transporte_detalhado e eventos_sistema: partições diárias)
+TABELAS_SERIE = ['estado_frota', 'colheitabilidade_detalhada']
+
+# Tabela -> horas mantidas e coluna do instante ('ts_ms' em ms; outras em texto)
+POLITICAS_RETENCAO = {
+    'estado_frota': {'horas': 2},
+    'colheitabilidade_detalhada': {'horas': 2},
+    'predicoes_estoque_patio': {'horas': 7 * 24},
+    # Placas sem viagem nem mudança de fase há mais que um ciclo longo (~23h)
+    'estado_caminhao': {'horas': 48, 'coluna': 'ultimo_visto'},
+}
+
+RETER_DIAS_PARTICOES = 30         # Partições diárias mais antigas são apagadas (arquivo inteiro)
+LOTE_PADRAO = 2000                # Linhas por transação de remoção
+PAUSA_PADRAO_S = 0.02             # Entre lotes: leitores e o gerador pegam o lock
+PAGINAS_VACUUM = 256              # Páginas devolvidas por transação de vacuum (~1 MB)
+MODOS_AUTO_VACUUM = {0: 'NONE', 1: 'FULL', 2: 'INCREMENTAL'}
+
+
+def politicas_com_horas(horas, tabelas=None):
+    """Políticas padrão com `horas` nas tabelas de série temporal; as demais nunca abaixo do padrão"""
+    return {
+        tabela: {**politica, 'horas': horas if tabela in TABELAS_SERIE else max(horas, politica['horas'])}
+        for tabela, politica in POLITICAS_RETENCAO.items()
+        if tabelas is None or tabela in tabelas
+    }
+
+
+def tamanho_banco(db_path):
+    """(bytes do arquivo principal, bytes do WAL)"""
+    db_path = Path(db_path)
+    wal = Path(str(db_path) + "-wal")
+    return db_path.stat().st_size, wal.stat().st_size if wal.exists() else 0
+
+
+def ativar_vacuum_incremental(db_path):
+    """
+    auto_vacuum = INCREMENTAL em banco existente: exige um VACUUM completo
+    (reescreve o arquivo com lock exclusivo; rodar com gerador e API parados)
+    """
+    conn = criar_conexao(db_path)
+    try:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        return MODOS_AUTO_VACUUM[conn.execute("PRAGMA auto_vacuum").fetchone()[0]]
+    finally:
+        conn.close()
+
+
+class ServicoRetencao:
+    """
+    Retenção em lotes
+
+    - Cada lote: as `lote` linhas mais antigas pelo índice do instante, removidas
+      pela chave primária (rowid) em uma transação curta
+    - Pausa de `pausa_s` entre lotes para não segurar o lock de escrita
+    - Com `particoes`: sela em arquivos diários os dias anteriores aos
+      `dias_quentes` e apaga as partições com mais de `reter_dias`
+      (retenção das tabelas particionadas, sem DELETE linha a linha)
+    - Ao final, vacuum incremental de `paginas_vacuum` páginas por transação
+      (só com auto_vacuum = INCREMENTAL; senão as páginas ficam livres para reuso)
+    """
+
+    def __init__(self, db_path="database/logistics.db", politicas=None, lote=LOTE_PADRAO,
+                 pausa_s=PAUSA_PADRAO_S, paginas_vacuum=PAGINAS_VACUUM, relogio=datetime.now,
+                 verboso=True, particoes=False, dias_quentes=DIAS_QUENTES_PADRAO,
+                 reter_dias=RETER_DIAS_PARTICOES):
+        self.db_path = Path(db_path)
+        self.politicas = POLITICAS_RETENCAO if politicas is None else politicas
+        self.particoes = particoes
+        self.dias_quentes = dias_quentes
+        self.reter_dias = reter_dias
+        self.lote = lote
+        self.pausa_s = pausa_s
+        self.paginas_vacuum = paginas_vacuum
+        self.relogio = relogio
+        self.verboso = verboso
+
+        self.trava_metricas = threading.Lock()
+        self.metricas = {
+            'passadas': 0,
+            'linhas_removidas': 0,
+            'lotes': 0,
+            'segundos_remocao': 0.0,
+            'paginas_devolvidas': 0,
+            'dias_selados': 0,
+            'particoes_descartadas': 0,
+            'por_tabela': {tabela: 0 for tabela in self.politicas},
+            'ultima_passada': None,
+        }
+
+    def _limite(self, politica):
+        limite = self.relogio() - timedelta(hours=politica['horas'])
+        return para_ms(limite) if politica.get('coluna', 'ts_ms') == 'ts_ms' else limite
+
+    def remover_tabela(self, conn, tabela, politica):
+        """Remove em lotes as linhas além da política. Retorna (linhas, lotes)"""
+        coluna = politica.get('coluna', 'ts_ms')
+        limite = self._limite(politica)
+        cursor = conn.cursor()
+        linhas = lotes = 0
+        while True:
+            cursor.execute(f"""
+                DELETE FROM {tabela} WHERE rowid IN (
+                    SELECT rowid FROM {tabela}
+                    WHERE {coluna} < ?
+                    ORDER BY {coluna}
+                    LIMIT ?
+                )
+            """, (limite, self.lote))
+            removidas = cursor.rowcount
+            conn.commit()
+            linhas += removidas
+            lotes += 1
+            if removidas < self.lote:
+                return linhas, lotes
+            time.sleep(self.pausa_s)
+
+    def vacuum_incremental(self, conn):
+        """Devolve as páginas livres ao sistema em transações de `paginas_vacuum` páginas"""
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            return 0
+        devolvidas = 0
+        while True:
+            livres = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if not livres:
+                return devolvidas
+            # executescript roda o PRAGMA até o fim (execute() só dá um passo = uma página)
+            conn.executescript(f"PRAGMA incremental_vacuum({min(livres, self.paginas_vacuum)})")
+            devolvidas += livres - conn.execute("PRAGMA freelist_count").fetchone()[0]
+            time.sleep(self.pausa_s)
+
+    def estado_arquivo(self, conn):
+        """Tamanho, páginas livres e modo de auto_vacuum"""
+        pagina = conn.execute("PRAGMA page_size").fetchone()[0]
+        livres = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        principal, wal = tamanho_banco(self.db_path)
+        return {
+            'bytes': principal,
+            'bytes_wal': wal,
+            'paginas': conn.execute("PRAGMA page_count").fetchone()[0],
+            'paginas_livres': livres,
+            'bytes_livres': livres * pagina,
+            'auto_vacuum': MODOS_AUTO_VACUUM[conn.execute("PRAGMA auto_vacuum").fetchone()[0]],
+        }
+
+    def executar_passada(self):
+        """Uma passada por todas as políticas + vacuum incremental. Retorna o resumo"""
+        conn = criar_conexao(self.db_path)
+        try:
+            garantir_colunas_epoca(conn.cursor())
+            conn.commit()
+            antes = self.estado_arquivo(conn)
+
+            removidas = {}
+            lotes = 0
+            t_inicio = time.perf_counter()
+            for tabela, politica in self.politicas.items():
+                if not _existe(conn.cursor(), tabela):
+                    continue
+                removidas[tabela], n = self.remover_tabela(conn, tabela, politica)
+                lotes += n
+
+            seladas, descartadas = {}, []
+            if self.particoes:
+                seladas = particionar(conn, self.db_path, self.dias_quentes, self.lote, self.pausa_s,
+                                      verboso=False, agora=self.relogio())
+                if self.reter_dias is not None:
+                    descartadas = descartar_particoes(conn, self.db_path, self.reter_dias,
+                                                      agora=self.relogio())
+            segundos = time.perf_counter() - t_inicio
+
+            devolvidas = self.vacuum_incremental(conn)
+            if devolvidas:
+                # O arquivo principal só encolhe quando o WAL volta para ele
+                executar_checkpoint(conn, 'PASSIVE')
+            depois = self.estado_arquivo(conn)
+        finally:
+            conn.close()
+
+        total = sum(removidas.values())
+        resumo = {
+            'removidas': removidas,
+            'total': total,
+            'lotes': lotes,
+            'segundos': segundos,
+            'linhas_s': total / segundos if segundos > 0 else 0.0,
+            'paginas_devolvidas': devolvidas,
+            'dias_selados': len(seladas),
+            'linhas_seladas': sum(seladas.values()),
+            'particoes_descartadas': len(descartadas),
+            'bytes_antes': antes['bytes'],
+            'bytes_depois': depois['bytes'],
+            'bytes_wal': depois['bytes_wal'],
+            'paginas_livres': depois['paginas_livres'],
+            'auto_vacuum': depois['auto_vacuum'],
+        }
+
+        with self.trava_metricas:
+            self.metricas['passadas'] += 1
+            self.metricas['linhas_removidas'] += total
+            self.metricas['lotes'] += lotes
+            self.metricas['segundos_remocao'] += segundos
+            self.metricas['paginas_devolvidas'] += devolvidas
+            self.metricas['dias_selados'] += len(seladas)
+            self.metricas['particoes_descartadas'] += len(descartadas)
+            for tabela, linhas in removidas.items():
+                self.metricas['por_tabela'][tabela] = self.metricas['por_tabela'].get(tabela, 0) + linhas
+            self.metricas['ultima_passada'] = resumo
+
+        if self.verboso and (total or devolvidas or seladas or descartadas):
+            print(f"🧹 Retenção: {total:,} linhas em {lotes} lotes ({resumo['linhas_s']:,.0f} linhas/s)"
+                  f" | {devolvidas} páginas devolvidas"
+                  f" | banco {antes['bytes'] / 1024 / 1024:.1f} → {depois['bytes'] / 1024 / 1024:.1f} MB")
+            if seladas or descartadas:
+                print(f"   📦 Partições: {len(seladas)} dia(s) selado(s) ({resumo['linhas_seladas']:,} linhas), "
+                      f"{len(descartadas)} arquivo(s) apagado(s)")
+        return resumo
+
+    def mostrar_metricas(self):
+        with self.trava_metricas:
+            m = dict(self.metricas)
+            ultima = m['ultima_passada']
+        taxa = m['linhas_removidas'] / m['segundos_remocao'] if m['segundos_remocao'] > 0 else 0.0
+        print(f"   🧹 Retenção: {m['passadas']} passadas | {m['linhas_removidas']:,} linhas em "
+              f"{m['lotes']} lotes ({taxa:,.0f} linhas/s) | {m['paginas_devolvidas']} páginas devolvidas")
+        if self.particoes:
+            print(f"      Partições: {m['dias_selados']} dias selados, {m['particoes_descartadas']} apagadas "
+                  f"({self.dias_quentes} dia(s) no banco principal, {self.reter_dias} dias em partições)")
+        if ultima:
+            print(f"      Banco: {ultima['bytes_depois'] / 1024 / 1024:.1f} MB "
+                  f"(WAL {ultima['bytes_wal'] / 1024 / 1024:.1f} MB) | "
+                  f"{ultima['paginas_livres']} páginas livres | auto_vacuum {ultima['auto_vacuum']}")
+
+    def executar(self, intervalo_s=300):
+        """Serviço contínuo: uma passada a cada `intervalo_s`"""
+        print(f"🧹 Serviço de retenção: {self.db_path} | passada a cada {intervalo_s}s | "
+              f"lotes de {self.lote} linhas")
+        for tabela, politica in self.politicas.items():
+            print(f"   - {tabela}: {politica['horas']}h ({politica.get('coluna', 'ts_ms')})")
+        if self.particoes:
+            print(f"   - {', '.join(TABELAS_PARTICIONADAS)}: partições diárias, "
+                  f"{self.reter_dias} dias (apaga o arquivo)")
+        try:
+            while True:
+                inicio = time.monotonic()
+                self.executar_passada()
+                time.sleep(max(0, intervalo_s - (time.monotonic() - inicio)))
+        except KeyboardInterrupt:
+            print("\n⏹️ Serviço de retenção parado")
+            self.mostrar_metricas()
+
+
+def _percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+def testar_retencao(linhas=60000, lote=2000):
+    """
+    Banco temporário (auto_vacuum incremental) com 10h de dados e política de 2h:
+    remoção com escritor e leitor concorrentes, vacuum e conferência
+    """
+    print("🧪 Teste do serviço de retenção")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as pasta:
+        db_path = Path(pasta) / "retencao.db"
+        conn = sqlite3.connect(db_path)
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")  # Antes da primeira tabela
+        conn.close()
+
+        conn = criar_conexao(db_path)
+        conn.execute("CREATE TABLE dados_tempo_real (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                     "timestamp DATETIME, estoque_patio_ton REAL, carga TEXT)")
+        garantir_colunas_epoca(conn.cursor(), ['dados_tempo_real'])
+        agora = datetime.now()
+        inicio = agora - timedelta(hours=10)
+        passo = timedelta(hours=10) / linhas
+        conn.executemany("INSERT INTO dados_tempo_real (timestamp, estoque_patio_ton, carga) VALUES (?, ?, ?)",
+                         [(inicio + passo * i, 1000.0, "x" * 200) for i in range(linhas)])
+        conn.commit()
+        recentes = conn.execute("SELECT COUNT(*) FROM dados_tempo_real WHERE ts_ms >= ?",
+                                (para_ms(agora - timedelta(hours=2)),)).fetchone()[0]
+        conn.close()
+
+        parar = threading.Event()
+        latencias = []
+        erros = []
+        escritas = [0]
+
+        def escritor():
+            c = criar_conexao(db_path)
+            while not parar.is_set():
+                try:
+                    c.execute("INSERT INTO dados_tempo_real (timestamp, estoque_patio_ton) VALUES (?, 1.0)",
+                              (datetime.now(),))
+                    c.commit()
+                    escritas[0] += 1
+                except sqlite3.OperationalError as e:
+                    erros.append(str(e))
+                time.sleep(0.005)
+            c.close()
+
+        def leitor():
+            c = criar_conexao(db_path)
+            while not parar.is_set():
+                t = time.perf_counter()
+                c.execute("SELECT * FROM dados_tempo_real ORDER BY ts_ms DESC LIMIT 50").fetchall()
+                latencias.append((time.perf_counter() - t) * 1000)
+            c.close()
+
+        threads = [threading.Thread(target=escritor), threading.Thread(target=leitor)]
+        for t in threads:
+            t.start()
+        servico = ServicoRetencao(db_path, politicas={'dados_tempo_real': {'horas': 2}},
+                                  lote=lote, relogio=lambda: agora, verboso=False)
+        resumo = servico.executar_passada()
+        parar.set()
+        for t in threads:
+            t.join()
+
+        conn = criar_conexao(db_path)
+        antigas = conn.execute("SELECT COUNT(*) FROM dados_tempo_real WHERE ts_ms < ?",
+                               (para_ms(agora - timedelta(hours=2)),)).fetchone()[0]
+        total = conn.execute("SELECT COUNT(*) FROM dados_tempo_real").fetchone()[0]
+        conn.close()
+
+    print(f"   Removidas: {resumo['total']:,} em {resumo['lotes']} lotes "
+          f"({resumo['linhas_s']:,.0f} linhas/s) | restam {antigas} além da política")
+    print(f"   Recentes preservadas: {total - escritas[0]:,} de {recentes:,} "
+          f"(+{escritas[0]} gravadas durante a passada)")
+    print(f"   Escritor concorrente: {escritas[0]} commits, {len(erros)} erros de lock")
+    print(f"   Leitor concorrente: p95 {_percentil(latencias, 0.95):.2f} ms, "
+          f"máx {max(latencias) if latencias else 0:.1f} ms")
+    print(f"   Vacuum incremental: {resumo['paginas_devolvidas']} páginas | "
+          f"banco {resumo['bytes_antes'] / 1024 / 1024:.1f} → {resumo['bytes_depois'] / 1024 / 1024:.1f} MB")
+
+    aprovado = (antigas == 0 and not erros and total - escritas[0] == recentes
+                and resumo['paginas_devolvidas'] > 0 and resumo['paginas_livres'] == 0)
+    print(f"\n{'✅ APROVADO' if aprovado else '❌ FALHOU'}")
+    return aprovado
+
+
+def main():
+    args = sys.argv[1:]
+    if "--help" in args or "-h" in args:
+        print(f"""
+🧹 Serviço de retenção - Sistema Logística JIT
+
+USO:
+  python database/retention.py                    # Uma passada no banco padrão
+  python database/retention.py --intervalo 300    # Serviço contínuo (passada a cada 300s)
+  python database/retention.py --horas 24         # Mantém 24h nas tabelas de série temporal
+  python database/retention.py --reter-particoes 90   # Partições diárias por 90 dias (padrão {RETER_DIAS_PARTICOES})
+  python database/retention.py --db caminho.db    # Outro banco
+  python database/retention.py --lote 500 --pausa 0.05   # Lotes menores (padrão {LOTE_PADRAO}, {PAUSA_PADRAO_S}s)
+  python database/retention.py --status           # Tamanho, páginas livres e auto_vacuum
+  python database/retention.py --ativar-vacuum    # auto_vacuum INCREMENTAL em banco existente
+                                                  # (VACUUM completo: pare gerador e API antes)
+  python database/retention.py --teste            # Remoção concorrente em banco temporário
+
+POLÍTICAS: {', '.join(f"{t} {p['horas']}h" for t, p in POLITICAS_RETENCAO.items())}
+PARTIÇÕES: {', '.join(TABELAS_PARTICIONADAS)} - dias fechados selados em arquivos diários,
+           retenção = apagar o arquivo (database/partitions.py)
+""")
+        return
+
+    if "--teste" in args:
+        sys.exit(0 if testar_retencao() else 1)
+
+    opcoes = {}
+    for flag, chave, tipo in [("--db", "db_path", str), ("--lote", "lote", int),
+                              ("--pausa", "pausa_s", float), ("--horas", "horas", float),
+                              ("--intervalo", "intervalo", float), ("--reter-particoes", "reter_dias", int)]:
+        if flag in args:
+            try:
+                opcoes[chave] = tipo(args[args.index(flag) + 1])
+            except (IndexError, ValueError):
+                print(f"❌ Erro: {flag} precisa de um valor válido")
+                return
+    if "horas" in opcoes:
+        opcoes["politicas"] = politicas_com_horas(opcoes.pop("horas"))
+    intervalo = opcoes.pop("intervalo", None)
+    opcoes["particoes"] = True
+
+    db_path = opcoes.get("db_path", "database/logistics.db")
+    if not Path(db_path).exists():
+        print(f"❌ Banco não encontrado: {db_path}")
+        return
+
+    if "--ativar-vacuum" in args:
+        antes = tamanho_banco(db_path)[0]
+        modo = ativar_vacuum_incremental(db_path)
+        print(f"✅ auto_vacuum = {modo} | banco {antes / 1024 / 1024:.1f} → "
+              f"{tamanho_banco(db_path)[0] / 1024 / 1024:.1f} MB")
+        return
+
+    servico = ServicoRetencao(**opcoes)
+    if "--status" in args:
+        conn = criar_conexao(db_path, somente_leitura=True)
+        estado = servico.estado_arquivo(conn)
+        conn.close()
+        print(f"📋 {db_path}: {estado['bytes'] / 1024 / 1024:.1f} MB (WAL {estado['bytes_wal'] / 1024 / 1024:.1f} MB), "
+              f"{estado['paginas']:,} páginas, "
+              f"{estado['paginas_livres']:,} livres ({estado['bytes_livres'] / 1024 / 1024:.1f} MB) | "
+              f"auto_vacuum {estado['auto_vacuum']}")
+        if estado['auto_vacuum'] != 'INCREMENTAL':
+            print("   ℹ️ Páginas livres são reaproveitadas, mas o arquivo não encolhe: --ativar-vacuum")
+        return
+
+    if intervalo:
+        servico.executar(intervalo)
+    else:
+        servico.executar_passada()
+        servico.mostrar_metricas()
+
+
+if __name__ == "__main__":
+    main()
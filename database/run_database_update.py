@@ -3,10 +3,556 @@ Script para executar as atualizações V2 no banco de dados
 Sistema Logística JIT - Estoque no Pátio
 """
 
+import math
 import sqlite3
 import sys
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timedelta
+
+sys.path.append(str(Path(__file__).parent))
+from statements import CHAVES_NATURAIS
+from epoch import SQL_EPOCA_MS, para_ms, garantir_colunas_epoca, migrar_epoca
+from retention import POLITICAS_RETENCAO
+
+def aplicar_chaves_naturais(cursor, tabelas=None):
+    """
+    Remove duplicatas pela chave natural (mantém a primeira linha gravada)
+    e cria o índice único. Linhas com chave NULL não são tocadas
+    Retorna {tabela: linhas removidas}
+    """
+    removidas = {}
+    for tabela in tabelas or CHAVES_NATURAIS:
+        chave = CHAVES_NATURAIS[tabela]
+        indice = f"ux_{tabela}_chave"
+        
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (indice,))
+        if cursor.fetchone():
+            removidas[tabela] = 0
+            continue
+        
+        nao_nulos = " AND ".join(f"{coluna} IS NOT NULL" for coluna in chave)
+        cursor.execute(f"""
+            DELETE FROM {tabela}
+            WHERE {nao_nulos}
+              AND id NOT IN (SELECT MIN(id) FROM {tabela} WHERE {nao_nulos} GROUP BY {', '.join(chave)})
+        """)
+        removidas[tabela] = cursor.rowcount
+        cursor.execute(f"CREATE UNIQUE INDEX {indice} ON {tabela}({', '.join(chave)})")
+    
+    return removidas
+
+# Tipo dos eventos da máquina de estados (data_generator/alert_state.py)
+TIPO_EVENTO_LIMITE = 'LIMITE_EXCEDIDO'
+
+def resolver_eventos_legados(cursor):
+    """
+    Fecha (resolvido = 1, resolvido_em = timestamp) os eventos de limite gravados antes
+    da máquina de estados: o gerador antigo inseria um por ciclo, todos com resolvido = 0,
+    e a máquina adotaria o mais antigo como alerta aberto
+
+    - Banco ainda sem o índice de alertas abertos (nunca migrado): todos os abertos
+    - Já migrado: só chaves (variável, severidade) com mais de um aberto; a máquina
+      mantém no máximo um por chave, então o resto é histórico que escapou
+    Retorna o número de eventos fechados
+    """
+    cursor.execute("""
+        SELECT 1 FROM sqlite_master WHERE type = 'index'
+        AND name IN ('idx_eventos_abertos', 'idx_eventos_abertos_tipo')
+    """)
+    if cursor.fetchone():
+        filtro = """
+          AND (variavel_afetada, severidade) IN (
+              SELECT variavel_afetada, severidade FROM eventos_sistema
+              WHERE tipo_evento = ? AND resolvido = 0
+              GROUP BY variavel_afetada, severidade HAVING COUNT(*) > 1
+          )"""
+        params = (TIPO_EVENTO_LIMITE, TIPO_EVENTO_LIMITE)
+    else:
+        filtro, params = "", (TIPO_EVENTO_LIMITE,)
+
+    cursor.execute(f"""
+        UPDATE eventos_sistema SET resolvido = 1, resolvido_em = timestamp
+        WHERE tipo_evento = ? AND resolvido = 0{filtro}
+    """, params)
+    return cursor.rowcount
+
+# Estado atual por caminhão, mantido a cada inserção em transporte_detalhado.
+# Linhas fora de ordem (carga de histórico) não regridem o estado. Dois portões
+# independentes: status/carga seguem ultimo_visto (também avançado pelas mudanças
+# de status de atualizar_status_caminhao) e os campos da viagem seguem
+# ultima_entrada_pims - a viagem reconstruída chega com timestamp da chegada ao
+# pátio, anterior ao último status, e ainda assim é a viagem mais recente
+SQL_ESTADO_CAMINHAO = [
+    """
+    CREATE TABLE IF NOT EXISTS estado_caminhao (
+        NO_PLACA TEXT PRIMARY KEY,
+        status_caminhao TEXT,
+        T_1 REAL,
+        T_3 REAL,
+        T_4 REAL,
+        QT_LIQUIDO_PESAGEM INTEGER,
+        DISTANCIA_PIMS_MEDIA REAL,
+        de_categ_oper TEXT,
+        ultima_entrada_pims DATETIME,
+        ultimo_visto DATETIME NOT NULL,
+        ultimo_transporte_id INTEGER
+    )
+    """,
+    # Bancos migrados antes dos dois portões têm o trigger antigo
+    "DROP TRIGGER IF EXISTS atualizar_estado_caminhao",
+    """
+    CREATE TRIGGER atualizar_estado_caminhao
+    AFTER INSERT ON transporte_detalhado
+    WHEN NEW.NO_PLACA IS NOT NULL
+    BEGIN
+        INSERT INTO estado_caminhao (
+            NO_PLACA, status_caminhao, T_1, T_3, T_4, QT_LIQUIDO_PESAGEM,
+            DISTANCIA_PIMS_MEDIA, de_categ_oper, ultima_entrada_pims,
+            ultimo_visto, ultimo_transporte_id
+        )
+        VALUES (
+            NEW.NO_PLACA, NEW.status_caminhao, NEW.T_1, NEW.T_3, NEW.T_4, NEW.QT_LIQUIDO_PESAGEM,
+            NEW.DISTANCIA_PIMS_MEDIA, NEW.de_categ_oper, NEW.HR_ENTRADA_PIMS,
+            COALESCE(NEW.timestamp, NEW.HR_ENTRADA_PIMS), NEW.id
+        )
+        ON CONFLICT (NO_PLACA) DO UPDATE SET
+            status_caminhao = CASE WHEN excluded.ultimo_visto >= estado_caminhao.ultimo_visto
+                THEN excluded.status_caminhao ELSE estado_caminhao.status_caminhao END,
+            QT_LIQUIDO_PESAGEM = CASE WHEN excluded.ultimo_visto >= estado_caminhao.ultimo_visto
+                THEN excluded.QT_LIQUIDO_PESAGEM ELSE estado_caminhao.QT_LIQUIDO_PESAGEM END,
+            de_categ_oper = CASE WHEN excluded.ultimo_visto >= estado_caminhao.ultimo_visto
+                THEN excluded.de_categ_oper ELSE estado_caminhao.de_categ_oper END,
+            ultimo_visto = CASE WHEN excluded.ultimo_visto >= estado_caminhao.ultimo_visto
+                THEN excluded.ultimo_visto ELSE estado_caminhao.ultimo_visto END,
+            T_1 = CASE WHEN excluded.ultima_entrada_pims >= COALESCE(estado_caminhao.ultima_entrada_pims, '')
+                THEN excluded.T_1 ELSE estado_caminhao.T_1 END,
+            T_3 = CASE WHEN excluded.ultima_entrada_pims >= COALESCE(estado_caminhao.ultima_entrada_pims, '')
+                THEN excluded.T_3 ELSE estado_caminhao.T_3 END,
+            T_4 = CASE WHEN excluded.ultima_entrada_pims >= COALESCE(estado_caminhao.ultima_entrada_pims, '')
+                THEN excluded.T_4 ELSE estado_caminhao.T_4 END,
+            DISTANCIA_PIMS_MEDIA = CASE WHEN excluded.ultima_entrada_pims >= COALESCE(estado_caminhao.ultima_entrada_pims, '')
+                THEN excluded.DISTANCIA_PIMS_MEDIA ELSE estado_caminhao.DISTANCIA_PIMS_MEDIA END,
+            ultima_entrada_pims = CASE WHEN excluded.ultima_entrada_pims >= COALESCE(estado_caminhao.ultima_entrada_pims, '')
+                THEN excluded.ultima_entrada_pims ELSE estado_caminhao.ultima_entrada_pims END,
+            ultimo_transporte_id = CASE WHEN excluded.ultima_entrada_pims >= COALESCE(estado_caminhao.ultima_entrada_pims, '')
+                THEN excluded.ultimo_transporte_id ELSE estado_caminhao.ultimo_transporte_id END
+        WHERE excluded.ultimo_visto >= estado_caminhao.ultimo_visto
+           OR excluded.ultima_entrada_pims >= COALESCE(estado_caminhao.ultima_entrada_pims, '');
+    END
+    """,
+]
+
+def criar_estado_caminhao(cursor, horas=None):
+    """
+    Cria estado_caminhao e o trigger e preenche o estado com a última
+    viagem de cada placa vista nas últimas `horas` (padrão: a retenção de
+    estado_caminhao). Placas mais antigas não são frota ativa: o histórico
+    do gerador sem simulador (uma placa sorteada por viagem) inflaria a
+    distribuição. Estados já gravados além da janela são removidos
+    Retorna quantos caminhões foram preenchidos
+    """
+    horas = horas or POLITICAS_RETENCAO['estado_caminhao']['horas']
+    desde = datetime.now() - timedelta(hours=horas)
+    for sql in SQL_ESTADO_CAMINHAO:
+        cursor.execute(sql)
+    
+    cursor.execute("DELETE FROM estado_caminhao WHERE ultimo_visto < ?", (desde,))
+    cursor.execute("""
+        INSERT OR IGNORE INTO estado_caminhao (
+            NO_PLACA, status_caminhao, T_1, T_3, T_4, QT_LIQUIDO_PESAGEM,
+            DISTANCIA_PIMS_MEDIA, de_categ_oper, ultima_entrada_pims,
+            ultimo_visto, ultimo_transporte_id
+        )
+        SELECT t.NO_PLACA, t.status_caminhao, t.T_1, t.T_3, t.T_4, t.QT_LIQUIDO_PESAGEM,
+               t.DISTANCIA_PIMS_MEDIA, t.de_categ_oper, t.HR_ENTRADA_PIMS,
+               COALESCE(t.timestamp, t.HR_ENTRADA_PIMS), t.id
+        FROM (SELECT DISTINCT NO_PLACA FROM transporte_detalhado
+              WHERE ts_ms >= ? AND NO_PLACA IS NOT NULL) p
+        JOIN transporte_detalhado t ON t.id = (
+            SELECT id FROM transporte_detalhado
+            WHERE NO_PLACA = p.NO_PLACA
+            ORDER BY ts_ms DESC, id DESC
+            LIMIT 1
+        )
+    """, (para_ms(desde),))
+    return cursor.rowcount
+
+# Distribuição da frota (T1-T4) agregada a partir de estado_caminhao: cada
+# mudança de status ou carga de um caminhão ajusta no máximo duas linhas
+# (status antigo e novo), sem GROUP BY sobre as viagens. Só representa a frota
+# quando estado_caminhao é alimentado por placas estáveis (simulador de frota,
+# reconstrutor de ciclos ou carga de histórico real); o gerador sem simulador
+# sorteia uma placa por viagem
+SQL_DISTRIBUICAO_FROTA = [
+    """
+    CREATE TABLE IF NOT EXISTS distribuicao_frota (
+        status_caminhao TEXT PRIMARY KEY,
+        caminhoes INTEGER NOT NULL DEFAULT 0,
+        carga_kg INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS distribuicao_frota_inserir
+    AFTER INSERT ON estado_caminhao
+    WHEN NEW.status_caminhao IS NOT NULL
+    BEGIN
+        INSERT INTO distribuicao_frota (status_caminhao, caminhoes, carga_kg)
+        VALUES (NEW.status_caminhao, 1, COALESCE(NEW.QT_LIQUIDO_PESAGEM, 0))
+        ON CONFLICT (status_caminhao) DO UPDATE SET
+            caminhoes = caminhoes + 1,
+            carga_kg = carga_kg + excluded.carga_kg;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS distribuicao_frota_atualizar
+    AFTER UPDATE OF status_caminhao, QT_LIQUIDO_PESAGEM ON estado_caminhao
+    WHEN OLD.status_caminhao IS NOT NEW.status_caminhao
+      OR OLD.QT_LIQUIDO_PESAGEM IS NOT NEW.QT_LIQUIDO_PESAGEM
+    BEGIN
+        UPDATE distribuicao_frota
+        SET caminhoes = caminhoes - 1,
+            carga_kg = carga_kg - COALESCE(OLD.QT_LIQUIDO_PESAGEM, 0)
+        WHERE status_caminhao = OLD.status_caminhao;
+        INSERT INTO distribuicao_frota (status_caminhao, caminhoes, carga_kg)
+        SELECT NEW.status_caminhao, 1, COALESCE(NEW.QT_LIQUIDO_PESAGEM, 0)
+        WHERE NEW.status_caminhao IS NOT NULL
+        ON CONFLICT (status_caminhao) DO UPDATE SET
+            caminhoes = caminhoes + 1,
+            carga_kg = carga_kg + excluded.carga_kg;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS distribuicao_frota_remover
+    AFTER DELETE ON estado_caminhao
+    WHEN OLD.status_caminhao IS NOT NULL
+    BEGIN
+        UPDATE distribuicao_frota
+        SET caminhoes = caminhoes - 1,
+            carga_kg = carga_kg - COALESCE(OLD.QT_LIQUIDO_PESAGEM, 0)
+        WHERE status_caminhao = OLD.status_caminhao;
+    END
+    """,
+]
+
+def criar_distribuicao_frota(cursor):
+    """
+    Cria distribuicao_frota e seus triggers e recalcula os agregados
+    a partir de estado_caminhao (corrige qualquer deriva anterior)
+    Retorna {status: caminhoes}
+    """
+    for sql in SQL_DISTRIBUICAO_FROTA:
+        cursor.execute(sql)
+    
+    cursor.execute("DELETE FROM distribuicao_frota")
+    cursor.execute("""
+        INSERT INTO distribuicao_frota (status_caminhao, caminhoes, carga_kg)
+        SELECT status_caminhao, COUNT(*), SUM(COALESCE(QT_LIQUIDO_PESAGEM, 0))
+        FROM estado_caminhao
+        WHERE status_caminhao IS NOT NULL
+        GROUP BY status_caminhao
+    """)
+    cursor.execute("SELECT status_caminhao, caminhoes FROM distribuicao_frota ORDER BY status_caminhao")
+    return dict(cursor.fetchall())
+
+# Padrões por (hora_dia, dia_semana) acumulados a cada amostra (Welford):
+# n, média e M2 = soma dos quadrados dos desvios; desvio padrão = sqrt(M2 / (n - 1)).
+# O(1) por inserção, no lugar do AVG sobre 30 dias do trigger antigo.
+# dia_semana segue datetime.weekday() (0 = segunda), como os leitores em Python
+COLUNAS_PADROES_INCREMENTAIS = [
+    ("colheita_m2", "REAL NOT NULL DEFAULT 0"),
+    ("moagem_m2", "REAL NOT NULL DEFAULT 0"),
+    ("chegadas_m2", "REAL NOT NULL DEFAULT 0"),
+    ("chegadas_amostras", "INTEGER NOT NULL DEFAULT 0"),
+]
+
+SQL_HORA_DIA = "CAST(strftime('%H', {0}) AS INTEGER)"
+SQL_DIA_SEMANA = "(CAST(strftime('%w', {0}) AS INTEGER) + 6) % 7"
+
+def _set_welford(media, m2, desvio, n):
+    """SET de um passo de Welford no UPSERT (o lado direito vê os valores antigos)"""
+    delta = f"(excluded.{media} - {media})"
+    incremento = f"{delta} * {delta} * {n} / ({n} + 1.0)"
+    return f"""
+            {m2} = {m2} + {incremento},
+            {desvio} = CASE WHEN {n} >= 1 THEN sqrt(({m2} + {incremento}) / {n}) ELSE {desvio} END,
+            {media} = {media} + {delta} / ({n} + 1.0),"""
+
+SQL_PADROES_INCREMENTAIS = [
+    # Trigger antigo de update_database_v2.sql: varredura de 30 dias por inserção
+    "DROP TRIGGER IF EXISTS atualizar_padroes_horarios",
+    f"""
+    CREATE TRIGGER IF NOT EXISTS acumular_padroes_horarios
+    AFTER INSERT ON dados_tempo_real
+    WHEN NEW.timestamp IS NOT NULL
+      AND NEW.colheitabilidade_ton_h IS NOT NULL
+      AND NEW.moagem_ton_h IS NOT NULL
+    BEGIN
+        INSERT INTO padroes_horarios (
+            hora_dia, dia_semana, colheita_media_ton_h, moagem_media_ton_h,
+            total_amostras, ultima_atualizacao
+        )
+        VALUES (
+            {SQL_HORA_DIA.format('NEW.timestamp')}, {SQL_DIA_SEMANA.format('NEW.timestamp')},
+            NEW.colheitabilidade_ton_h, NEW.moagem_ton_h, 1, NEW.timestamp
+        )
+        ON CONFLICT (hora_dia, dia_semana) DO UPDATE SET{
+            _set_welford('colheita_media_ton_h', 'colheita_m2', 'colheita_desvio_padrao', 'total_amostras')}{
+            _set_welford('moagem_media_ton_h', 'moagem_m2', 'moagem_desvio_padrao', 'total_amostras')}
+            total_amostras = total_amostras + 1,
+            ultima_atualizacao = excluded.ultima_atualizacao;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS acumular_chegadas_horarias
+    AFTER INSERT ON estado_frota
+    WHEN NEW.timestamp IS NOT NULL
+      AND NEW.taxa_chegada_caminhoes_hora IS NOT NULL
+    BEGIN
+        INSERT INTO padroes_horarios (
+            hora_dia, dia_semana, chegadas_media_caminhoes, chegadas_amostras, ultima_atualizacao
+        )
+        VALUES (
+            {SQL_HORA_DIA.format('NEW.timestamp')}, {SQL_DIA_SEMANA.format('NEW.timestamp')},
+            NEW.taxa_chegada_caminhoes_hora, 1, NEW.timestamp
+        )
+        ON CONFLICT (hora_dia, dia_semana) DO UPDATE SET{
+            _set_welford('chegadas_media_caminhoes', 'chegadas_m2', 'chegadas_desvio_padrao', 'chegadas_amostras')}
+            chegadas_amostras = chegadas_amostras + 1,
+            ultima_atualizacao = excluded.ultima_atualizacao;
+    END
+    """,
+]
+
+def criar_padroes_incrementais(cursor):
+    """Colunas M2/contagem em padroes_horarios e os triggers de acumulação"""
+    for coluna, tipo in COLUNAS_PADROES_INCREMENTAIS:
+        try:
+            cursor.execute(f"ALTER TABLE padroes_horarios ADD COLUMN {coluna} {tipo}")
+        except sqlite3.OperationalError as e:
+            if "duplicate column name" not in str(e):
+                raise
+    for sql in SQL_PADROES_INCREMENTAIS:
+        cursor.execute(sql)
+
+# Estoque do pátio consolidado materializado por linha de dados_tempo_real:
+# taxa de entrada (com fallback pelas chegadas T3 da última hora), balanço e
+# ofensor calculados uma vez na inserção, no lugar da subconsulta correlacionada
+# por linha da view antiga. O fallback conta só viagens até o instante da própria linha
+COLUNAS_ESTOQUE_PATIO_CONSOLIDADO = """
+    dados_id, timestamp, ts_ms, estoque_sobre_rodas_patio, estoque_fisico_patio,
+    moagem_ton_h, colheitabilidade_ton_h, taxa_entrada_patio, taxa_saida_patio,
+    balanco_ton_h, ofensor_principal
+"""
+
+# Colunas de dados_tempo_real que alteram a linha consolidada
+COLUNAS_ORIGEM_CONSOLIDADO = (
+    "timestamp, estoque_patio_ton, estoque_patio_fisico_ton, moagem_ton_h, "
+    "colheitabilidade_ton_h, taxa_entrada_patio_ton_h, taxa_saida_patio_ton_h"
+)
+
+def _linha_consolidada(d):
+    """Valores de estoque_patio_consolidado para a linha `d` de dados_tempo_real (NEW ou alias)"""
+    ms = f"COALESCE({d}.ts_ms, {SQL_EPOCA_MS.format(f'{d}.timestamp')})"
+    return f"""
+    {d}.id, {d}.timestamp, {ms}, {d}.estoque_patio_ton,
+    COALESCE({d}.estoque_patio_fisico_ton, {d}.estoque_patio_ton * 0.7),
+    {d}.moagem_ton_h, {d}.colheitabilidade_ton_h,
+    COALESCE({d}.taxa_entrada_patio_ton_h, (
+        SELECT COUNT(*) * 70 / 1000.0
+        FROM transporte_detalhado t
+        WHERE t.status_caminhao = 'T3'
+          AND t.ts_ms >= {ms} - 3600000
+          AND t.ts_ms <= {ms}
+    )),
+    {d}.taxa_saida_patio_ton_h,
+    COALESCE({d}.taxa_entrada_patio_ton_h, 0) - {d}.moagem_ton_h,
+    CASE
+        WHEN {d}.estoque_patio_ton > 1500 THEN
+            CASE
+                WHEN {d}.colheitabilidade_ton_h > 700 THEN 'COLHEITA_ALTA'
+                WHEN {d}.moagem_ton_h < 900 THEN 'MOAGEM_BAIXA'
+                ELSE 'CHEGADAS_EXCESSIVAS'
+            END
+        WHEN {d}.estoque_patio_ton < 800 THEN
+            CASE
+                WHEN {d}.colheitabilidade_ton_h < 500 THEN 'COLHEITA_BAIXA'
+                WHEN {d}.moagem_ton_h > 1050 THEN 'MOAGEM_ALTA'
+                ELSE 'POUCAS_CHEGADAS'
+            END
+        ELSE NULL
+    END
+"""
+
+SQL_ESTOQUE_PATIO_CONSOLIDADO = [
+    """
+    CREATE TABLE IF NOT EXISTS estoque_patio_consolidado (
+        dados_id INTEGER PRIMARY KEY,
+        timestamp DATETIME NOT NULL,
+        ts_ms INTEGER,
+        estoque_sobre_rodas_patio REAL,
+        estoque_fisico_patio REAL,
+        moagem_ton_h REAL,
+        colheitabilidade_ton_h REAL,
+        taxa_entrada_patio REAL,
+        taxa_saida_patio REAL,
+        balanco_ton_h REAL,
+        ofensor_principal TEXT
+    )
+    """,
+    "DROP INDEX IF EXISTS idx_estoque_consolidado_timestamp",
+    "DROP INDEX IF EXISTS idx_estoque_consolidado_ofensor",
+    "CREATE INDEX IF NOT EXISTS idx_estoque_patio_consolidado_ts_ms ON estoque_patio_consolidado(ts_ms)",
+    """
+    CREATE INDEX IF NOT EXISTS idx_estoque_consolidado_ofensor_ts_ms
+    ON estoque_patio_consolidado(ofensor_principal, ts_ms)
+    WHERE ofensor_principal IS NOT NULL
+    """,
+    "DROP TRIGGER IF EXISTS estoque_patio_consolidado_inserir",
+    f"""
+    CREATE TRIGGER estoque_patio_consolidado_inserir
+    AFTER INSERT ON dados_tempo_real
+    WHEN NEW.timestamp IS NOT NULL
+    BEGIN
+        INSERT OR REPLACE INTO estoque_patio_consolidado ({COLUNAS_ESTOQUE_PATIO_CONSOLIDADO})
+        VALUES ({_linha_consolidada('NEW')});
+    END
+    """,
+    # Só colunas de origem: o preenchimento de ts_ms (migração) não recalcula a linha
+    "DROP TRIGGER IF EXISTS estoque_patio_consolidado_atualizar",
+    f"""
+    CREATE TRIGGER estoque_patio_consolidado_atualizar
+    AFTER UPDATE OF {COLUNAS_ORIGEM_CONSOLIDADO} ON dados_tempo_real
+    WHEN NEW.timestamp IS NOT NULL
+    BEGIN
+        INSERT OR REPLACE INTO estoque_patio_consolidado ({COLUNAS_ESTOQUE_PATIO_CONSOLIDADO})
+        VALUES ({_linha_consolidada('NEW')});
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS estoque_patio_consolidado_remover
+    AFTER DELETE ON dados_tempo_real
+    BEGIN
+        DELETE FROM estoque_patio_consolidado WHERE dados_id = OLD.id;
+    END
+    """,
+    # Mesmo nome e colunas da view antiga, agora lendo a tabela materializada
+    "DROP VIEW IF EXISTS view_estoque_patio_consolidado",
+    """
+    CREATE VIEW view_estoque_patio_consolidado AS
+    SELECT timestamp, estoque_sobre_rodas_patio, estoque_fisico_patio, moagem_ton_h,
+           taxa_entrada_patio, taxa_saida_patio, balanco_ton_h, ofensor_principal
+    FROM estoque_patio_consolidado
+    ORDER BY ts_ms DESC
+    """,
+]
+
+def criar_estoque_patio_consolidado(cursor):
+    """
+    Cria estoque_patio_consolidado, os triggers e a view e preenche as
+    linhas de dados_tempo_real ainda não materializadas
+    Retorna quantas linhas foram preenchidas
+    """
+    for sql in SQL_ESTOQUE_PATIO_CONSOLIDADO:
+        cursor.execute(sql)
+
+    cursor.execute(f"""
+        INSERT INTO estoque_patio_consolidado ({COLUNAS_ESTOQUE_PATIO_CONSOLIDADO})
+        SELECT {_linha_consolidada('d')}
+        FROM dados_tempo_real d
+        WHERE d.timestamp IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM estoque_patio_consolidado c WHERE c.dados_id = d.id)
+    """)
+    return cursor.rowcount
+
+def _agregados_por_hora(cursor, tabela, colunas, desde):
+    """
+    {(hora, dia): (n, [(média, M2) por coluna])} em duas passadas (médias, depois M2)
+    Só linhas com todas as colunas preenchidas, como nos triggers
+    """
+    filtro = " AND ".join(f"{coluna} IS NOT NULL" for coluna in colunas)
+    if desde:
+        filtro += " AND ts_ms >= ?"
+    valores = ", ".join(f"{coluna} AS v{i}" for i, coluna in enumerate(colunas))
+    medias = ", ".join(f"AVG(v{i}) AS media{i}" for i in range(len(colunas)))
+    resultado = ", ".join(f"m.media{i}, SUM((a.v{i} - m.media{i}) * (a.v{i} - m.media{i}))"
+                          for i in range(len(colunas)))
+    cursor.execute(f"""
+        WITH amostras AS (
+            SELECT {SQL_HORA_DIA.format('timestamp')} AS hora_dia,
+                   {SQL_DIA_SEMANA.format('timestamp')} AS dia_semana, {valores}
+            FROM {tabela}
+            WHERE timestamp IS NOT NULL AND {filtro}
+        ),
+        medias AS (
+            SELECT hora_dia, dia_semana, COUNT(*) AS n, {medias}
+            FROM amostras GROUP BY hora_dia, dia_semana
+        )
+        SELECT a.hora_dia, a.dia_semana, m.n, {resultado}
+        FROM amostras a JOIN medias m USING (hora_dia, dia_semana)
+        GROUP BY a.hora_dia, a.dia_semana
+    """, (para_ms(desde),) if desde else ())
+    return {
+        (linha[0], linha[1]): (linha[2], [linha[3 + 2 * i: 5 + 2 * i] for i in range(len(colunas))])
+        for linha in cursor.fetchall()
+    }
+
+def _desvio(n, m2):
+    return math.sqrt(m2 / (n - 1)) if n > 1 else 0.0
+
+def reconstruir_padroes_horarios(cursor, dias=30):
+    """
+    Job offline: recalcula contagens, médias, M2 e desvios a partir do histórico
+    (últimos `dias`; None = todo o histórico). Horários sem amostras mantêm as
+    médias como valor inicial e voltam a zero amostras
+    Retorna quantos (hora, dia) têm amostras
+    """
+    criar_padroes_incrementais(cursor)
+    desde = datetime.now() - timedelta(days=dias) if dias else None
+
+    curvas = _agregados_por_hora(cursor, 'dados_tempo_real', ['colheitabilidade_ton_h', 'moagem_ton_h'], desde)
+    chegadas = _agregados_por_hora(cursor, 'estado_frota', ['taxa_chegada_caminhoes_hora'], desde)
+
+    cursor.execute("""
+        UPDATE padroes_horarios
+        SET total_amostras = 0, colheita_m2 = 0, moagem_m2 = 0,
+            chegadas_amostras = 0, chegadas_m2 = 0
+    """)
+
+    for (hora, dia), (n, [(colheita, colheita_m2), (moagem, moagem_m2)]) in curvas.items():
+        cursor.execute("""
+            INSERT INTO padroes_horarios (
+                hora_dia, dia_semana, colheita_media_ton_h, colheita_m2, colheita_desvio_padrao,
+                moagem_media_ton_h, moagem_m2, moagem_desvio_padrao, total_amostras, ultima_atualizacao
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT (hora_dia, dia_semana) DO UPDATE SET
+                colheita_media_ton_h = excluded.colheita_media_ton_h,
+                colheita_m2 = excluded.colheita_m2,
+                colheita_desvio_padrao = excluded.colheita_desvio_padrao,
+                moagem_media_ton_h = excluded.moagem_media_ton_h,
+                moagem_m2 = excluded.moagem_m2,
+                moagem_desvio_padrao = excluded.moagem_desvio_padrao,
+                total_amostras = excluded.total_amostras,
+                ultima_atualizacao = excluded.ultima_atualizacao
+        """, (hora, dia, colheita, colheita_m2, _desvio(n, colheita_m2),
+              moagem, moagem_m2, _desvio(n, moagem_m2), n))
+
+    for (hora, dia), (n, [(media, m2)]) in chegadas.items():
+        cursor.execute("""
+            INSERT INTO padroes_horarios (
+                hora_dia, dia_semana, chegadas_media_caminhoes, chegadas_m2,
+                chegadas_desvio_padrao, chegadas_amostras, ultima_atualizacao
+            )
+            VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT (hora_dia, dia_semana) DO UPDATE SET
+                chegadas_media_caminhoes = excluded.chegadas_media_caminhoes,
+                chegadas_m2 = excluded.chegadas_m2,
+                chegadas_desvio_padrao = excluded.chegadas_desvio_padrao,
+                chegadas_amostras = excluded.chegadas_amostras,
+                ultima_atualizacao = excluded.ultima_atualizacao
+        """, (hora, dia, media, m2, _desvio(n, m2), n))
+
+    return len(set(curvas) | set(chegadas))
 
 def executar_atualizacao(db_path="database/logistics.db"):
     """Executa o script SQL de atualização V2"""
@@ -81,10 +627,15 @@ def executar_atualizacao(db_path="database/logistics.db"):
             chegadas_desvio_padrao REAL NOT NULL DEFAULT 0,
             total_amostras INTEGER NOT NULL DEFAULT 0,
             ultima_atualizacao DATETIME DEFAULT CURRENT_TIMESTAMP,
+            colheita_m2 REAL NOT NULL DEFAULT 0,
+            moagem_m2 REAL NOT NULL DEFAULT 0,
+            chegadas_m2 REAL NOT NULL DEFAULT 0,
+            chegadas_amostras INTEGER NOT NULL DEFAULT 0,
             UNIQUE(hora_dia, dia_semana)
         )
         """)
-        print("   ✅ Tabela: padroes_horarios")
+        criar_padroes_incrementais(cursor)
+        print("   ✅ Tabela: padroes_horarios (acumuladores incrementais por hora/dia)")
         
         # Tabela de predições
         cursor.execute("""
@@ -141,6 +692,11 @@ def executar_atualizacao(db_path="database/logistics.db"):
         """)
         print("   ✅ Tabela: eventos_sistema")
         
+        # Quarentena do filtro de qualidade
+        from data_quality import garantir_tabela_quarentena
+        garantir_tabela_quarentena(cursor)
+        print("   ✅ Tabela: quarentena_qualidade")
+        
         # 3. Inserir dados padrão
         print("\n📈 Inserindo dados padrão...")
         
@@ -155,6 +711,11 @@ def executar_atualizacao(db_path="database/logistics.db"):
         """)
         print("   ✅ Limites operacionais definidos")
         
+        # Eventos de limite do gerador antigo (antes do índice de abertos: marca a migração)
+        fechados = resolver_eventos_legados(cursor)
+        if fechados:
+            print(f"   ✅ {fechados} eventos de limite antigos marcados como resolvidos")
+        
         # 4. Criar índices
         print("\n🔍 Criando índices...")
         indices = [
@@ -162,7 +723,11 @@ def executar_atualizacao(db_path="database/logistics.db"):
             "CREATE INDEX IF NOT EXISTS idx_predicoes_hora ON predicoes_estoque_patio(hora_futura)",
             "CREATE INDEX IF NOT EXISTS idx_eventos_timestamp ON eventos_sistema(timestamp)",
             "CREATE INDEX IF NOT EXISTS idx_eventos_tipo ON eventos_sistema(tipo_evento)",
-            "CREATE INDEX IF NOT EXISTS idx_transporte_status_timestamp ON transporte_detalhado(status_caminhao, timestamp)",
+            # Alertas abertos: ciclo de vida por tipo (alert_state, statements) e contagem por severidade
+            "DROP INDEX IF EXISTS idx_eventos_abertos",
+            "CREATE INDEX IF NOT EXISTS idx_eventos_abertos_tipo ON eventos_sistema"
+            "(resolvido, tipo_evento, variavel_afetada, severidade, timestamp)",
+            "CREATE INDEX IF NOT EXISTS idx_eventos_abertos_severidade ON eventos_sistema(resolvido, severidade)",
             "CREATE INDEX IF NOT EXISTS idx_dados_estoque_patio ON dados_tempo_real(estoque_patio_ton, timestamp)"
         ]
         
@@ -170,10 +735,45 @@ def executar_atualizacao(db_path="database/logistics.db"):
             cursor.execute(idx)
         print("   ✅ Índices criados")
         
+        # 5. Chaves naturais (ingestão idempotente)
+        print("\n🔑 Aplicando chaves naturais...")
+        for tabela, quantidade in aplicar_chaves_naturais(cursor).items():
+            print(f"   ✅ {tabela}({', '.join(CHAVES_NATURAIS[tabela])})"
+                  f"{f' - {quantidade} duplicatas removidas' if quantidade else ''}")
+        
         # Commit das alterações
         conn.commit()
         
-        # 5. Verificar estrutura atualizada
+        # 6. Instantes em ms (ts_ms): colunas, índices e conversão em lotes do histórico
+        print("\n🕐 Instantes em ms (ts_ms)...")
+        criadas = garantir_colunas_epoca(cursor)
+        conn.commit()
+        convertidas = sum(migrar_epoca(conn, verboso=False).values())
+        print(f"   ✅ Coluna ts_ms + índice{f' criados em {len(criadas)} tabelas' if criadas else ' já existentes'}"
+              f"{f' - {convertidas} linhas convertidas' if convertidas else ''}")
+        
+        # 7. Estado atual por caminhão
+        print("\n🚛 Estado por caminhão...")
+        preenchidos = criar_estado_caminhao(cursor)
+        print(f"   ✅ Tabela: estado_caminhao (trigger + índice placa/ts_ms)"
+              f"{f' - {preenchidos} caminhões preenchidos' if preenchidos else ''}")
+        conn.commit()
+        
+        # 8. Distribuição da frota derivada dos caminhões
+        distribuicao = criar_distribuicao_frota(cursor)
+        resumo = ', '.join(f"{status}={quantidade}" for status, quantidade in distribuicao.items())
+        print(f"   ✅ Tabela: distribuicao_frota (triggers em estado_caminhao)"
+              f"{f' - {resumo}' if resumo else ''}")
+
+        # 9. Estoque do pátio consolidado (materializado por trigger)
+        print("\n🏭 Estoque do pátio consolidado...")
+        preenchidas = criar_estoque_patio_consolidado(cursor)
+        print(f"   ✅ Tabela: estoque_patio_consolidado (triggers em dados_tempo_real + view)"
+              f"{f' - {preenchidas} linhas preenchidas' if preenchidas else ''}")
+
+        conn.commit()
+
+        # 10. Verificar estrutura atualizada
         print("\n📋 Verificando estrutura atualizada...")
         
         # Contar tabelas
@@ -235,9 +835,34 @@ def verificar_estrutura(db_path="database/logistics.db"):
     except Exception as e:
         print(f"❌ Erro ao verificar: {e}")
 
+def executar_reconstrucao_padroes(db_path="database/logistics.db", dias=30):
+    """Job offline de reconstrução de padroes_horarios a partir do histórico"""
+    print(f"📐 Reconstruindo padroes_horarios ({f'últimos {dias} dias' if dias else 'todo o histórico'})")
+    
+    if not Path(db_path).exists():
+        print("❌ Erro: Banco não encontrado!")
+        return False
+    
+    conn = sqlite3.connect(db_path)
+    try:
+        horarios = reconstruir_padroes_horarios(conn.cursor(), dias)
+        conn.commit()
+    finally:
+        conn.close()
+    
+    print(f"   ✅ {horarios} combinações hora/dia da semana com amostras")
+    return True
+
 if __name__ == "__main__":
     if len(sys.argv) > 1 and sys.argv[1] == "--check":
         verificar_estrutura()
+    elif len(sys.argv) > 1 and sys.argv[1] == "--reconstruir-padroes":
+        try:
+            dias = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+        except ValueError:
+            print("❌ Erro: --reconstruir-padroes aceita um número de dias (0 = todo o histórico)")
+            sys.exit(1)
+        executar_reconstrucao_padroes(dias=dias or None)
     else:
         executar_atualizacao()
         verificar_estrutura()
\ No newline at end of file
@@ -0,0 +1,207 @@
+"""
+Comandos SQL de escrita nomeados - Sistema Logística JIT
+Registro único usado pelo gerador, pelo modelo de predição e pelo processo escritor
+"""
+
+import re
+
+from epoch import SQL_EPOCA_MS
+
+# Chaves naturais (índices únicos): reimportações e produtores "pelo menos uma vez"
+# não duplicam linhas. Os INSERTs abaixo usam ON CONFLICT DO NOTHING sem alvo,
+# que também funciona em bancos ainda sem os índices (nenhum conflito detectado)
+CHAVES_NATURAIS = {
+    'transporte_detalhado': ('NO_PLACA', 'HR_ENTRADA_PIMS'),
+    'colheitabilidade_detalhada': ('FAZENDA', 'SETOR', 'HORA_ELEVADOR_TIME'),
+    'moagem_detalhada': ('DATA', 'ORR_DESCRI'),
+}
+
+
+def _valores(quantidade, tempo=1):
+    """
+    VALUES com parâmetros numerados e o ts_ms calculado do parâmetro `tempo`
+    (o produtor continua mandando só o timestamp)
+    """
+    return f"({', '.join(f'?{i}' for i in range(1, quantidade + 1))}, {SQL_EPOCA_MS.format(f'?{tempo}')})"
+
+
+# Operação = (nome_do_comando, parametros). O processo escritor só aceita
+# nomes deste registro, então nenhum SQL arbitrário trafega pelo socket.
+COMANDOS_ESCRITA = {
+    'inserir_dados_tempo_real': f"""
+        INSERT INTO dados_tempo_real
+        (timestamp, colheitabilidade_ton_h, fazendas_ativas, moagem_ton_h,
+         capacidade_moagem, estoque_total_ton, estoque_voltando_ton,
+         estoque_indo_ton, estoque_patio_ton, estoque_patio_fisico_ton,
+         taxa_entrada_patio_ton_h, taxa_saida_patio_ton_h, ts_ms)
+        VALUES {_valores(12)}
+    """,
+
+    'inserir_estado_frota': f"""
+        INSERT INTO estado_frota
+        (timestamp, caminhoes_t1_voltando, caminhoes_t2_carregando,
+         caminhoes_t3_indo, caminhoes_t4_patio, carga_media_kg,
+         taxa_chegada_caminhoes_hora, previsao_chegadas_prox_hora, ts_ms)
+        VALUES {_valores(8)}
+    """,
+
+    'inserir_transporte_detalhado': f"""
+        INSERT INTO transporte_detalhado
+        (timestamp, HR_ENTRADA_PIMS, NO_PLACA, T_1, T_3, T_4,
+         QT_LIQUIDO_PESAGEM, DISTANCIA_PIMS_MEDIA, de_categ_oper,
+         ciclo_total, status_caminhao, velocidade_media_kmh,
+         tempo_descarga_min, hora_chegada_patio, ts_ms)
+        VALUES {_valores(14)}
+        ON CONFLICT DO NOTHING
+    """,
+
+    'inserir_colheitabilidade_detalhada': f"""
+        INSERT INTO colheitabilidade_detalhada
+        (timestamp, HORA_ELEVADOR_TIME, FAZENDA, SETOR, TON_HORA, data_origem, ts_ms)
+        VALUES {_valores(6)}
+        ON CONFLICT DO NOTHING
+    """,
+
+    'inserir_predicao_estoque_patio': f"""
+        INSERT INTO predicoes_estoque_patio
+        (timestamp_predicao, hora_futura, timestamp_previsto,
+         estoque_patio_previsto_ton, chegadas_previstas_ton,
+         moagem_prevista_ton, estoque_limite_superior_ton,
+         estoque_limite_inferior_ton, confiabilidade_percent,
+         ofensor_principal, ofensor_valor, modelo_usado, ts_ms)
+        VALUES {_valores(12)}
+    """,
+
+    # Mudança de status de um caminhão (estado_caminhao; os triggers mantêm
+    # distribuicao_frota). Evento fora de ordem não sobrescreve estado mais recente
+    'atualizar_status_caminhao': """
+        INSERT INTO estado_caminhao
+        (NO_PLACA, status_caminhao, QT_LIQUIDO_PESAGEM, de_categ_oper, ultimo_visto)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (NO_PLACA) DO UPDATE SET
+            status_caminhao = excluded.status_caminhao,
+            QT_LIQUIDO_PESAGEM = COALESCE(excluded.QT_LIQUIDO_PESAGEM, estado_caminhao.QT_LIQUIDO_PESAGEM),
+            de_categ_oper = COALESCE(excluded.de_categ_oper, estado_caminhao.de_categ_oper),
+            ultimo_visto = excluded.ultimo_visto
+        WHERE excluded.ultimo_visto >= estado_caminhao.ultimo_visto
+    """,
+
+    # Linhas rejeitadas pelo filtro de qualidade (data_quality.py); a mesma linha
+    # rejeitada de novo (reimportação, lote repetido) é ignorada pela chave natural
+    'inserir_quarentena': f"""
+        INSERT INTO quarentena_qualidade
+        (timestamp, tabela, regra, coluna, valor, registro, registro_hash, ts_ms)
+        VALUES {_valores(7)}
+        ON CONFLICT DO NOTHING
+    """,
+
+    # Ciclo de vida dos alertas de limite (alert_state.py)
+    'abrir_evento_limite': f"""
+        INSERT INTO eventos_sistema
+        (timestamp, tipo_evento, severidade, variavel_afetada,
+         valor_atual, limite_violado, descricao, ts_ms)
+        VALUES {_valores(7)}
+    """,
+
+    'atualizar_evento_limite': """
+        UPDATE eventos_sistema
+        SET valor_atual = ?, limite_violado = ?, descricao = ?
+        WHERE tipo_evento = ? AND variavel_afetada = ?
+          AND severidade = ? AND resolvido = 0
+    """,
+
+    'resolver_evento_limite': """
+        UPDATE eventos_sistema
+        SET resolvido = 1, resolvido_em = ?
+        WHERE tipo_evento = ? AND variavel_afetada = ?
+          AND severidade = ? AND resolvido = 0
+    """,
+}
+
+
+def _quantidade_parametros(sql):
+    """Parâmetros distintos: numerados (?1, ?2...) contam uma vez, '?' simples cada um"""
+    return len(set(re.findall(r'\?(\d+)', sql))) + len(re.findall(r'\?(?!\d)', sql))
+
+
+# Quantidade de parâmetros esperada por comando (validação no escritor)
+PARAMETROS_POR_COMANDO = {nome: _quantidade_parametros(sql) for nome, sql in COMANDOS_ESCRITA.items()}
+
+
+def _posicoes_chave(sql):
+    """Posições da chave natural nos parâmetros de um INSERT (None se a tabela não tem chave)"""
+    insert = re.search(r'INSERT INTO (\w+)\s*\(([^)]*)\)', sql)
+    if not insert or insert.group(1) not in CHAVES_NATURAIS:
+        return None
+    colunas = [coluna.strip() for coluna in insert.group(2).split(',')]
+    return tuple(colunas.index(coluna) for coluna in CHAVES_NATURAIS[insert.group(1)])
+
+
+# Comando -> posições da chave natural (só INSERTs em tabelas de CHAVES_NATURAIS)
+POSICOES_CHAVE = {nome: _posicoes_chave(sql) for nome, sql in COMANDOS_ESCRITA.items()
+                  if _posicoes_chave(sql) is not None}
+
+
+def chaves_duplicadas(operacoes):
+    """
+    Operações que repetem a chave natural de uma anterior da mesma lista
+    (o ON CONFLICT DO NOTHING descartaria essas linhas sem aviso)
+    """
+    vistas = set()
+    duplicadas = []
+    for nome, params in operacoes:
+        posicoes = POSICOES_CHAVE.get(nome)
+        if posicoes is None:
+            continue
+        chave = (nome,) + tuple(params[i] for i in posicoes)
+        if chave in vistas:
+            duplicadas.append((nome, params))
+        vistas.add(chave)
+    return duplicadas
+
+
+def validar_operacao(nome, params):
+    """Valida uma operação recebida de um produtor"""
+    if nome not in COMANDOS_ESCRITA:
+        raise ValueError(f"Comando desconhecido: {nome}")
+    if len(params) != PARAMETROS_POR_COMANDO[nome]:
+        raise ValueError(f"{nome}: esperado {PARAMETROS_POR_COMANDO[nome]} parâmetros, recebido {len(params)}")
+
+
+def executar_operacoes(cursor, operacoes):
+    """
+    Executa uma lista de operações em um cursor (sem commit)
+
+    Operações consecutivas com o mesmo comando viram um único executemany
+    """
+    total = 0
+    i = 0
+    while i < len(operacoes):
+        nome = operacoes[i][0]
+        j = i
+        while j < len(operacoes) and operacoes[j][0] == nome:
+            j += 1
+
+        sql = COMANDOS_ESCRITA[nome]
+        if j - i == 1:
+            cursor.execute(sql, operacoes[i][1])
+        else:
+            cursor.executemany(sql, [params for _, params in operacoes[i:j]])
+
+        total += j - i
+        i = j
+
+    return total
+
+
+def executar_lote(cursor, linhas):
+    """
+    Executa linhas já montadas em colunas (comando -> lista de tuplas), um
+    executemany por comando (sem commit). Usado pela geração em lote
+    """
+    total = 0
+    for nome, params in linhas.items():
+        if params:
+            cursor.executemany(COMANDOS_ESCRITA[nome], params)
+            total += len(params)
+    return total
@@ -21,6 +21,13 @@ ALTER TABLE dados_tempo_real ADD COLUMN estoque_patio_fisico_ton REAL DEFAULT 0;
 ALTER TABLE dados_tempo_real ADD COLUMN taxa_entrada_patio_ton_h REAL DEFAULT 0;
 ALTER TABLE dados_tempo_real ADD COLUMN taxa_saida_patio_ton_h REAL DEFAULT 0;
 
+-- Instante em ms desde a época (hora local): filtros e ordenações pelo índice inteiro
+-- Demais tabelas e preenchimento em lotes de bancos existentes: python database/epoch.py
+ALTER TABLE dados_tempo_real ADD COLUMN ts_ms INTEGER;
+ALTER TABLE estado_frota ADD COLUMN ts_ms INTEGER;
+ALTER TABLE transporte_detalhado ADD COLUMN ts_ms INTEGER;
+ALTER TABLE colheitabilidade_detalhada ADD COLUMN ts_ms INTEGER;
+
 -- 2. CRIAR TABELA DE PADRÕES HISTÓRICOS POR HORA
 -- ----------------------------------------------------------------------------
 CREATE TABLE IF NOT EXISTS padroes_horarios (
@@ -43,6 +50,12 @@ CREATE TABLE IF NOT EXISTS padroes_horarios (
     total_amostras INTEGER NOT NULL DEFAULT 0,
     ultima_atualizacao DATETIME DEFAULT CURRENT_TIMESTAMP,
     
+    -- Acumuladores incrementais (Welford): soma dos quadrados dos desvios
+    colheita_m2 REAL NOT NULL DEFAULT 0,
+    moagem_m2 REAL NOT NULL DEFAULT 0,
+    chegadas_m2 REAL NOT NULL DEFAULT 0,
+    chegadas_amostras INTEGER NOT NULL DEFAULT 0,
+    
     UNIQUE(hora_dia, dia_semana)
 );
 
@@ -117,44 +130,130 @@ CREATE TABLE IF NOT EXISTS eventos_sistema (
     INDEX idx_eventos_tipo (tipo_evento)
 );
 
--- 6. CRIAR VIEW CONSOLIDADA PARA O NOVO GRÁFICO
+-- 6. CRIAR ESTOQUE DO PÁTIO CONSOLIDADO (MATERIALIZADO) PARA O NOVO GRÁFICO
 -- ----------------------------------------------------------------------------
-CREATE VIEW IF NOT EXISTS view_estoque_patio_consolidado AS
-SELECT 
-    d.timestamp,
-    d.estoque_patio_ton as estoque_sobre_rodas_patio,
-    COALESCE(d.estoque_patio_fisico_ton, d.estoque_patio_ton * 0.7) as estoque_fisico_patio,
-    d.moagem_ton_h,
-    COALESCE(d.taxa_entrada_patio_ton_h, 
-        (SELECT COUNT(*) * 70 / 1000.0 
-         FROM transporte_detalhado t 
-         WHERE t.status_caminhao = 'T3' 
-         AND t.timestamp >= datetime(d.timestamp, '-1 hour')
-        )) as taxa_entrada_patio,
-    d.taxa_saida_patio_ton_h as taxa_saida_patio,
-    
-    -- Cálculo do balanço
-    COALESCE(d.taxa_entrada_patio_ton_h, 0) - d.moagem_ton_h as balanco_ton_h,
-    
-    -- Identificação de ofensores
-    CASE 
-        WHEN d.estoque_patio_ton > 1500 THEN 
-            CASE 
-                WHEN d.colheitabilidade_ton_h > 700 THEN 'COLHEITA_ALTA'
-                WHEN d.moagem_ton_h < 900 THEN 'MOAGEM_BAIXA'
-                ELSE 'CHEGADAS_EXCESSIVAS'
-            END
-        WHEN d.estoque_patio_ton < 800 THEN
-            CASE
-                WHEN d.colheitabilidade_ton_h < 500 THEN 'COLHEITA_BAIXA'
-                WHEN d.moagem_ton_h > 1050 THEN 'MOAGEM_ALTA'
-                ELSE 'POUCAS_CHEGADAS'
-            END
-        ELSE NULL
-    END as ofensor_principal
-    
-FROM dados_tempo_real d
-ORDER BY d.timestamp DESC;
+-- Uma linha por linha de dados_tempo_real, mantida por triggers: taxa de entrada
+-- (fallback: chegadas T3 da última hora até o instante da linha), balanço e
+-- ofensor são calculados na inserção; leituras por período usam o índice de ts_ms
+-- (ms desde a época, hora local; ver database/epoch.py).
+-- Preenchimento de bancos existentes: python database/run_database_update.py
+
+CREATE TABLE IF NOT EXISTS estoque_patio_consolidado (
+    dados_id INTEGER PRIMARY KEY,
+    timestamp DATETIME NOT NULL,
+    ts_ms INTEGER,
+    estoque_sobre_rodas_patio REAL,
+    estoque_fisico_patio REAL,
+    moagem_ton_h REAL,
+    colheitabilidade_ton_h REAL,
+    taxa_entrada_patio REAL,
+    taxa_saida_patio REAL,
+    balanco_ton_h REAL,
+    ofensor_principal TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_estoque_patio_consolidado_ts_ms ON estoque_patio_consolidado(ts_ms);
+
+CREATE INDEX IF NOT EXISTS idx_estoque_consolidado_ofensor_ts_ms
+ON estoque_patio_consolidado(ofensor_principal, ts_ms)
+WHERE ofensor_principal IS NOT NULL;
+
+CREATE TRIGGER IF NOT EXISTS estoque_patio_consolidado_inserir
+AFTER INSERT ON dados_tempo_real
+WHEN NEW.timestamp IS NOT NULL
+BEGIN
+    INSERT OR REPLACE INTO estoque_patio_consolidado (
+        dados_id, timestamp, ts_ms, estoque_sobre_rodas_patio, estoque_fisico_patio,
+        moagem_ton_h, colheitabilidade_ton_h, taxa_entrada_patio, taxa_saida_patio,
+        balanco_ton_h, ofensor_principal
+    )
+    VALUES (
+        NEW.id, NEW.timestamp, COALESCE(NEW.ts_ms, CAST(ROUND((julianday(NEW.timestamp, 'utc') - 2440587.5) * 86400000) AS INTEGER)), NEW.estoque_patio_ton,
+        COALESCE(NEW.estoque_patio_fisico_ton, NEW.estoque_patio_ton * 0.7),
+        NEW.moagem_ton_h, NEW.colheitabilidade_ton_h,
+        COALESCE(NEW.taxa_entrada_patio_ton_h, (
+            SELECT COUNT(*) * 70 / 1000.0
+            FROM transporte_detalhado t
+            WHERE t.status_caminhao = 'T3'
+              AND t.ts_ms >= COALESCE(NEW.ts_ms, CAST(ROUND((julianday(NEW.timestamp, 'utc') - 2440587.5) * 86400000) AS INTEGER)) - 3600000
+              AND t.ts_ms <= COALESCE(NEW.ts_ms, CAST(ROUND((julianday(NEW.timestamp, 'utc') - 2440587.5) * 86400000) AS INTEGER))
+        )),
+        NEW.taxa_saida_patio_ton_h,
+        COALESCE(NEW.taxa_entrada_patio_ton_h, 0) - NEW.moagem_ton_h,
+        CASE
+            WHEN NEW.estoque_patio_ton > 1500 THEN
+                CASE
+                    WHEN NEW.colheitabilidade_ton_h > 700 THEN 'COLHEITA_ALTA'
+                    WHEN NEW.moagem_ton_h < 900 THEN 'MOAGEM_BAIXA'
+                    ELSE 'CHEGADAS_EXCESSIVAS'
+                END
+            WHEN NEW.estoque_patio_ton < 800 THEN
+                CASE
+                    WHEN NEW.colheitabilidade_ton_h < 500 THEN 'COLHEITA_BAIXA'
+                    WHEN NEW.moagem_ton_h > 1050 THEN 'MOAGEM_ALTA'
+                    ELSE 'POUCAS_CHEGADAS'
+                END
+            ELSE NULL
+        END
+    );
+END;
+
+-- Só colunas de origem: o preenchimento de ts_ms (migração) não recalcula a linha
+CREATE TRIGGER IF NOT EXISTS estoque_patio_consolidado_atualizar
+AFTER UPDATE OF timestamp, estoque_patio_ton, estoque_patio_fisico_ton, moagem_ton_h,
+    colheitabilidade_ton_h, taxa_entrada_patio_ton_h, taxa_saida_patio_ton_h
+ON dados_tempo_real
+WHEN NEW.timestamp IS NOT NULL
+BEGIN
+    INSERT OR REPLACE INTO estoque_patio_consolidado (
+        dados_id, timestamp, ts_ms, estoque_sobre_rodas_patio, estoque_fisico_patio,
+        moagem_ton_h, colheitabilidade_ton_h, taxa_entrada_patio, taxa_saida_patio,
+        balanco_ton_h, ofensor_principal
+    )
+    VALUES (
+        NEW.id, NEW.timestamp, COALESCE(NEW.ts_ms, CAST(ROUND((julianday(NEW.timestamp, 'utc') - 2440587.5) * 86400000) AS INTEGER)), NEW.estoque_patio_ton,
+        COALESCE(NEW.estoque_patio_fisico_ton, NEW.estoque_patio_ton * 0.7),
+        NEW.moagem_ton_h, NEW.colheitabilidade_ton_h,
+        COALESCE(NEW.taxa_entrada_patio_ton_h, (
+            SELECT COUNT(*) * 70 / 1000.0
+            FROM transporte_detalhado t
+            WHERE t.status_caminhao = 'T3'
+              AND t.ts_ms >= COALESCE(NEW.ts_ms, CAST(ROUND((julianday(NEW.timestamp, 'utc') - 2440587.5) * 86400000) AS INTEGER)) - 3600000
+              AND t.ts_ms <= COALESCE(NEW.ts_ms, CAST(ROUND((julianday(NEW.timestamp, 'utc') - 2440587.5) * 86400000) AS INTEGER))
+        )),
+        NEW.taxa_saida_patio_ton_h,
+        COALESCE(NEW.taxa_entrada_patio_ton_h, 0) - NEW.moagem_ton_h,
+        CASE
+            WHEN NEW.estoque_patio_ton > 1500 THEN
+                CASE
+                    WHEN NEW.colheitabilidade_ton_h > 700 THEN 'COLHEITA_ALTA'
+                    WHEN NEW.moagem_ton_h < 900 THEN 'MOAGEM_BAIXA'
+                    ELSE 'CHEGADAS_EXCESSIVAS'
+                END
+            WHEN NEW.estoque_patio_ton < 800 THEN
+                CASE
+                    WHEN NEW.colheitabilidade_ton_h < 500 THEN 'COLHEITA_BAIXA'
+                    WHEN NEW.moagem_ton_h > 1050 THEN 'MOAGEM_ALTA'
+                    ELSE 'POUCAS_CHEGADAS'
+                END
+            ELSE NULL
+        END
+    );
+END;
+
+CREATE TRIGGER IF NOT EXISTS estoque_patio_consolidado_remover
+AFTER DELETE ON dados_tempo_real
+BEGIN
+    DELETE FROM estoque_patio_consolidado WHERE dados_id = OLD.id;
+END;
+
+DROP VIEW IF EXISTS view_estoque_patio_consolidado;
+
+CREATE VIEW view_estoque_patio_consolidado AS
+SELECT timestamp, estoque_sobre_rodas_patio, estoque_fisico_patio, moagem_ton_h,
+       taxa_entrada_patio, taxa_saida_patio, balanco_ton_h, ofensor_principal
+FROM estoque_patio_consolidado
+ORDER BY ts_ms DESC;
 
 -- 7. CRIAR TRIGGERS PARA CÁLCULOS AUTOMÁTICOS
 -- ----------------------------------------------------------------------------
@@ -171,61 +270,96 @@ BEGIN
     WHERE id = NEW.id;
 END;
 
--- Trigger para atualizar padrões históricos
-CREATE TRIGGER IF NOT EXISTS atualizar_padroes_horarios
+-- Padrões históricos por hora/dia da semana: acumuladores de Welford (n, média, M2),
+-- O(1) por inserção; desvio padrão = sqrt(M2 / (n - 1)).
+-- dia_semana segue datetime.weekday() do Python (0 = segunda)
+-- Reconstrução a partir do histórico: python database/run_database_update.py --reconstruir-padroes 30
+DROP TRIGGER IF EXISTS atualizar_padroes_horarios;
+
+CREATE TRIGGER IF NOT EXISTS acumular_padroes_horarios
 AFTER INSERT ON dados_tempo_real
+WHEN NEW.timestamp IS NOT NULL
+  AND NEW.colheitabilidade_ton_h IS NOT NULL
+  AND NEW.moagem_ton_h IS NOT NULL
 BEGIN
-    INSERT OR REPLACE INTO padroes_horarios (
-        hora_dia, 
-        dia_semana,
-        colheita_media_ton_h,
-        moagem_media_ton_h,
-        total_amostras
+    INSERT INTO padroes_horarios (
+        hora_dia, dia_semana, colheita_media_ton_h, moagem_media_ton_h,
+        total_amostras, ultima_atualizacao
+    )
+    VALUES (
+        CAST(strftime('%H', NEW.timestamp) AS INTEGER), (CAST(strftime('%w', NEW.timestamp) AS INTEGER) + 6) % 7,
+        NEW.colheitabilidade_ton_h, NEW.moagem_ton_h, 1, NEW.timestamp
+    )
+    ON CONFLICT (hora_dia, dia_semana) DO UPDATE SET
+        colheita_m2 = colheita_m2 + (excluded.colheita_media_ton_h - colheita_media_ton_h) * (excluded.colheita_media_ton_h - colheita_media_ton_h) * total_amostras / (total_amostras + 1.0),
+        colheita_desvio_padrao = CASE WHEN total_amostras >= 1 THEN sqrt((colheita_m2 + (excluded.colheita_media_ton_h - colheita_media_ton_h) * (excluded.colheita_media_ton_h - colheita_media_ton_h) * total_amostras / (total_amostras + 1.0)) / total_amostras) ELSE colheita_desvio_padrao END,
+        colheita_media_ton_h = colheita_media_ton_h + (excluded.colheita_media_ton_h - colheita_media_ton_h) / (total_amostras + 1.0),
+        moagem_m2 = moagem_m2 + (excluded.moagem_media_ton_h - moagem_media_ton_h) * (excluded.moagem_media_ton_h - moagem_media_ton_h) * total_amostras / (total_amostras + 1.0),
+        moagem_desvio_padrao = CASE WHEN total_amostras >= 1 THEN sqrt((moagem_m2 + (excluded.moagem_media_ton_h - moagem_media_ton_h) * (excluded.moagem_media_ton_h - moagem_media_ton_h) * total_amostras / (total_amostras + 1.0)) / total_amostras) ELSE moagem_desvio_padrao END,
+        moagem_media_ton_h = moagem_media_ton_h + (excluded.moagem_media_ton_h - moagem_media_ton_h) / (total_amostras + 1.0),
+        total_amostras = total_amostras + 1,
+        ultima_atualizacao = excluded.ultima_atualizacao;
+END;
+
+CREATE TRIGGER IF NOT EXISTS acumular_chegadas_horarias
+AFTER INSERT ON estado_frota
+WHEN NEW.timestamp IS NOT NULL
+  AND NEW.taxa_chegada_caminhoes_hora IS NOT NULL
+BEGIN
+    INSERT INTO padroes_horarios (
+        hora_dia, dia_semana, chegadas_media_caminhoes, chegadas_amostras, ultima_atualizacao
+    )
+    VALUES (
+        CAST(strftime('%H', NEW.timestamp) AS INTEGER), (CAST(strftime('%w', NEW.timestamp) AS INTEGER) + 6) % 7,
+        NEW.taxa_chegada_caminhoes_hora, 1, NEW.timestamp
     )
-    SELECT 
-        CAST(strftime('%H', NEW.timestamp) AS INTEGER),
-        CAST(strftime('%w', NEW.timestamp) AS INTEGER),
-        AVG(colheitabilidade_ton_h),
-        AVG(moagem_ton_h),
-        COUNT(*)
-    FROM dados_tempo_real
-    WHERE 
-        CAST(strftime('%H', timestamp) AS INTEGER) = CAST(strftime('%H', NEW.timestamp) AS INTEGER)
-        AND CAST(strftime('%w', timestamp) AS INTEGER) = CAST(strftime('%w', NEW.timestamp) AS INTEGER)
-        AND timestamp >= datetime('now', '-30 days');
+    ON CONFLICT (hora_dia, dia_semana) DO UPDATE SET
+        chegadas_m2 = chegadas_m2 + (excluded.chegadas_media_caminhoes - chegadas_media_caminhoes) * (excluded.chegadas_media_caminhoes - chegadas_media_caminhoes) * chegadas_amostras / (chegadas_amostras + 1.0),
+        chegadas_desvio_padrao = CASE WHEN chegadas_amostras >= 1 THEN sqrt((chegadas_m2 + (excluded.chegadas_media_caminhoes - chegadas_media_caminhoes) * (excluded.chegadas_media_caminhoes - chegadas_media_caminhoes) * chegadas_amostras / (chegadas_amostras + 1.0)) / chegadas_amostras) ELSE chegadas_desvio_padrao END,
+        chegadas_media_caminhoes = chegadas_media_caminhoes + (excluded.chegadas_media_caminhoes - chegadas_media_caminhoes) / (chegadas_amostras + 1.0),
+        chegadas_amostras = chegadas_amostras + 1,
+        ultima_atualizacao = excluded.ultima_atualizacao;
 END;
 
 -- 8. ÍNDICES PARA PERFORMANCE
 -- ----------------------------------------------------------------------------
-CREATE INDEX IF NOT EXISTS idx_transporte_status_timestamp ON transporte_detalhado(status_caminhao, timestamp);
+CREATE INDEX IF NOT EXISTS idx_dados_tempo_real_ts_ms ON dados_tempo_real(ts_ms);
+CREATE INDEX IF NOT EXISTS idx_estado_frota_ts_ms ON estado_frota(ts_ms);
+CREATE INDEX IF NOT EXISTS idx_transporte_detalhado_ts_ms ON transporte_detalhado(ts_ms);
+CREATE INDEX IF NOT EXISTS idx_colheitabilidade_detalhada_ts_ms ON colheitabilidade_detalhada(ts_ms);
+CREATE INDEX IF NOT EXISTS idx_transporte_status_ts_ms ON transporte_detalhado(status_caminhao, ts_ms);
 CREATE INDEX IF NOT EXISTS idx_transporte_velocidade ON transporte_detalhado(velocidade_media_kmh);
 CREATE INDEX IF NOT EXISTS idx_dados_estoque_patio ON dados_tempo_real(estoque_patio_ton, timestamp);
+CREATE INDEX IF NOT EXISTS idx_colheitabilidade_ts_ms_fazenda ON colheitabilidade_detalhada(ts_ms, FAZENDA, SETOR, TON_HORA, timestamp);
+DROP INDEX IF EXISTS idx_eventos_abertos;
+CREATE INDEX IF NOT EXISTS idx_eventos_abertos_tipo ON eventos_sistema(resolvido, tipo_evento, variavel_afetada, severidade, timestamp);
+CREATE INDEX IF NOT EXISTS idx_eventos_abertos_severidade ON eventos_sistema(resolvido, severidade);
 
 -- 9. POPULAR DADOS INICIAIS DE PADRÕES (baseado em observações típicas)
 -- ----------------------------------------------------------------------------
 
--- Inserir padrões típicos por hora (segunda a sexta)
+-- Inserir padrões típicos por hora (segunda-feira: dia_semana 0, convenção weekday())
 INSERT OR IGNORE INTO padroes_horarios (hora_dia, dia_semana, colheita_media_ton_h, moagem_media_ton_h, chegadas_media_caminhoes, velocidade_media_kmh, colheita_desvio_padrao, moagem_desvio_padrao, chegadas_desvio_padrao)
 VALUES
 -- Madrugada (0-5h) - Operação reduzida
-(0, 1, 450, 850, 18, 65, 50, 40, 3), (1, 1, 430, 840, 17, 65, 45, 35, 3),
-(2, 1, 420, 830, 16, 68, 40, 30, 2), (3, 1, 410, 820, 16, 70, 40, 30, 2),
-(4, 1, 420, 830, 17, 68, 45, 35, 3), (5, 1, 450, 850, 18, 65, 50, 40, 3),
+(0, 0, 450, 850, 18, 65, 50, 40, 3), (1, 0, 430, 840, 17, 65, 45, 35, 3),
+(2, 0, 420, 830, 16, 68, 40, 30, 2), (3, 0, 410, 820, 16, 70, 40, 30, 2),
+(4, 0, 420, 830, 17, 68, 45, 35, 3), (5, 0, 450, 850, 18, 65, 50, 40, 3),
 
 -- Manhã (6-11h) - Ramp up
-(6, 1, 500, 900, 22, 60, 60, 45, 4), (7, 1, 550, 950, 25, 58, 70, 50, 5),
-(8, 1, 600, 1000, 28, 55, 80, 55, 5), (9, 1, 650, 1050, 30, 52, 85, 60, 6),
-(10, 1, 680, 1080, 32, 50, 90, 65, 6), (11, 1, 700, 1100, 33, 48, 95, 70, 7),
+(6, 0, 500, 900, 22, 60, 60, 45, 4), (7, 0, 550, 950, 25, 58, 70, 50, 5),
+(8, 0, 600, 1000, 28, 55, 80, 55, 5), (9, 0, 650, 1050, 30, 52, 85, 60, 6),
+(10, 0, 680, 1080, 32, 50, 90, 65, 6), (11, 0, 700, 1100, 33, 48, 95, 70, 7),
 
 -- Tarde (12-17h) - Pico com queda
-(12, 1, 690, 1090, 32, 48, 90, 65, 6), (13, 1, 650, 1050, 30, 50, 85, 60, 6),
-(14, 1, 600, 1000, 28, 52, 80, 55, 5), (15, 1, 550, 950, 25, 55, 70, 50, 5),
-(16, 1, 520, 920, 23, 58, 65, 45, 4), (17, 1, 500, 900, 22, 60, 60, 45, 4),
+(12, 0, 690, 1090, 32, 48, 90, 65, 6), (13, 0, 650, 1050, 30, 50, 85, 60, 6),
+(14, 0, 600, 1000, 28, 52, 80, 55, 5), (15, 0, 550, 950, 25, 55, 70, 50, 5),
+(16, 0, 520, 920, 23, 58, 65, 45, 4), (17, 0, 500, 900, 22, 60, 60, 45, 4),
 
 -- Noite (18-23h) - Operação noturna
-(18, 1, 480, 880, 20, 62, 55, 40, 4), (19, 1, 470, 870, 19, 63, 50, 38, 3),
-(20, 1, 460, 860, 19, 64, 48, 36, 3), (21, 1, 450, 850, 18, 65, 45, 35, 3),
-(22, 1, 450, 850, 18, 65, 45, 35, 3), (23, 1, 450, 850, 18, 65, 45, 35, 3);
+(18, 0, 480, 880, 20, 62, 55, 40, 4), (19, 0, 470, 870, 19, 63, 50, 38, 3),
+(20, 0, 460, 860, 19, 64, 48, 36, 3), (21, 0, 450, 850, 18, 65, 45, 35, 3),
+(22, 0, 450, 850, 18, 65, 45, 35, 3), (23, 0, 450, 850, 18, 65, 45, 35, 3);
 
 -- Mensagem de conclusão
 SELECT 'Banco de dados atualizado com sucesso para V2!' as mensagem;
\ No newline at end of file
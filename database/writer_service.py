@@ -0,0 +1,307 @@
+"""
+Processo Escritor Único - Sistema Logística JIT
+Recebe lotes de escrita de todos os produtores (gerador, predição) por um
+socket Unix e grava em transações agrupadas (write-behind)
+"""
+
+import json
+import queue
+import signal
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+from connection import criar_conexao
+from statements import validar_operacao, executar_operacoes
+from epoch import garantir_colunas_epoca
+
+SOCKET_PADRAO = Path(__file__).parent / "escritor.sock"
+
+
+class ServicoEscritor:
+    """
+    Dono de todas as escritas no banco
+
+    - Cada mensagem é um lote atômico de operações (ex: um ciclo do gerador)
+    - Lotes de vários produtores são agrupados em uma transação até
+      `latencia_max_ms` ou `max_operacoes_transacao`
+    - Fila limitada: quando enche, o escritor para de ler os sockets e os
+      produtores ficam bloqueados no envio (backpressure)
+    """
+
+    def __init__(self, db_path=None, caminho_socket=None, latencia_max_ms=200,
+                 max_operacoes_transacao=5000, tamanho_fila=1000):
+        if db_path is None:
+            self.db_path = Path(__file__).parent / "logistics.db"
+        else:
+            self.db_path = Path(db_path)
+
+        if not self.db_path.exists():
+            raise FileNotFoundError(f"Banco não encontrado: {self.db_path}")
+
+        self.caminho_socket = Path(caminho_socket or SOCKET_PADRAO)
+        self.latencia_max = latencia_max_ms / 1000
+        self.max_operacoes_transacao = max_operacoes_transacao
+        self.fila = queue.Queue(maxsize=tamanho_fila)
+        self.executando = False
+        self.servidor = None
+
+        self.metricas = {
+            'lotes_recebidos': 0,
+            'operacoes_gravadas': 0,
+            'transacoes': 0,
+            'lotes_descartados': 0,
+            'bloqueios_fila_cheia': 0,
+        }
+        self.trava_metricas = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Recepção
+    # ------------------------------------------------------------------
+
+    def _receber(self, cliente):
+        """Lê lotes (JSON por linha) de um produtor e enfileira"""
+        with cliente, cliente.makefile('rb') as arquivo:
+            for linha in arquivo:
+                if not self.executando:
+                    break
+                try:
+                    mensagem = json.loads(linha)
+                    operacoes = [(nome, params) for nome, params in mensagem['operacoes']]
+                    for nome, params in operacoes:
+                        validar_operacao(nome, params)
+                except (ValueError, KeyError, TypeError) as e:
+                    print(f"⚠️ Lote inválido descartado: {e}")
+                    with self.trava_metricas:
+                        self.metricas['lotes_descartados'] += 1
+                    continue
+
+                if self.fila.full():
+                    with self.trava_metricas:
+                        self.metricas['bloqueios_fila_cheia'] += 1
+
+                # Bloqueia com a fila cheia: o produtor sente pelo socket
+                self.fila.put(operacoes)
+
+                with self.trava_metricas:
+                    self.metricas['lotes_recebidos'] += 1
+
+    def _aceitar(self):
+        """Aceita conexões de produtores (uma thread por produtor)"""
+        while self.executando:
+            try:
+                cliente, _ = self.servidor.accept()
+            except OSError:
+                break
+            threading.Thread(target=self._receber, args=(cliente,), daemon=True).start()
+
+    # ------------------------------------------------------------------
+    # Gravação
+    # ------------------------------------------------------------------
+
+    def _coletar_lotes(self):
+        """Agrupa lotes até a latência máxima ou o tamanho máximo da transação"""
+        try:
+            primeiro = self.fila.get(timeout=0.5)
+        except queue.Empty:
+            return []
+
+        lotes = [primeiro]
+        total = len(primeiro)
+        prazo = time.monotonic() + self.latencia_max
+
+        while total < self.max_operacoes_transacao:
+            restante = prazo - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                lote = self.fila.get(timeout=restante)
+            except queue.Empty:
+                break
+            lotes.append(lote)
+            total += len(lote)
+
+        return lotes
+
+    def _gravar_lotes(self, conn, lotes):
+        """Grava os lotes em uma transação; se falhar, isola o lote com problema"""
+        cursor = conn.cursor()
+        try:
+            total = sum(executar_operacoes(cursor, lote) for lote in lotes)
+            conn.commit()
+            gravadas = total
+            transacoes = 1
+        except Exception as e:
+            conn.rollback()
+            print(f"⚠️ Falha na transação agrupada ({e}), gravando lote a lote")
+            gravadas = 0
+            transacoes = 0
+            for lote in lotes:
+                try:
+                    gravadas += executar_operacoes(cursor, lote)
+                    conn.commit()
+                    transacoes += 1
+                except Exception as erro_lote:
+                    conn.rollback()
+                    print(f"❌ Lote descartado: {erro_lote}")
+                    with self.trava_metricas:
+                        self.metricas['lotes_descartados'] += 1
+
+        with self.trava_metricas:
+            self.metricas['operacoes_gravadas'] += gravadas
+            self.metricas['transacoes'] += transacoes
+
+    def _gravar(self):
+        """Loop do gravador: única conexão de escrita do sistema"""
+        conn = criar_conexao(self.db_path)
+        garantir_colunas_epoca(conn.cursor())  # Comandos gravam ts_ms
+        conn.commit()
+        try:
+            while self.executando or not self.fila.empty():
+                lotes = self._coletar_lotes()
+                if lotes:
+                    self._gravar_lotes(conn, lotes)
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------------
+
+    def iniciar(self):
+        """Abre o socket e inicia as threads de recepção e gravação"""
+        if self.caminho_socket.exists():
+            self.caminho_socket.unlink()  # Socket antigo de execução anterior
+
+        self.servidor = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.servidor.bind(str(self.caminho_socket))
+        self.servidor.listen()
+
+        self.executando = True
+        self.thread_gravador = threading.Thread(target=self._gravar)
+        self.thread_gravador.start()
+        threading.Thread(target=self._aceitar, daemon=True).start()
+
+    def parar(self):
+        """Para de aceitar lotes e grava o que ainda está na fila"""
+        self.executando = False
+        if self.servidor:
+            self.servidor.close()
+        self.thread_gravador.join()
+        if self.caminho_socket.exists():
+            self.caminho_socket.unlink()
+
+    def mostrar_metricas(self):
+        with self.trava_metricas:
+            m = dict(self.metricas)
+        print(f"   📥 Lotes recebidos: {m['lotes_recebidos']} | Na fila: {self.fila.qsize()}")
+        print(f"   💾 Operações gravadas: {m['operacoes_gravadas']} em {m['transacoes']} transações")
+        if m['transacoes']:
+            print(f"   📦 Média: {m['operacoes_gravadas'] / m['transacoes']:.1f} operações/transação")
+        print(f"   🚧 Fila cheia: {m['bloqueios_fila_cheia']} | Descartados: {m['lotes_descartados']}")
+
+    def executar(self, intervalo_metricas=30):
+        """Loop principal do serviço"""
+        self.iniciar()
+
+        print("✍️ Escritor único iniciado")
+        print(f"   Banco: {self.db_path}")
+        print(f"   Socket: {self.caminho_socket}")
+        print(f"   Latência máxima de flush: {self.latencia_max * 1000:.0f} ms")
+        print("💡 Pressione Ctrl+C para parar")
+        print("=" * 60)
+
+        def sinal_parada(signum, frame):
+            self.executando = False
+
+        signal.signal(signal.SIGINT, sinal_parada)
+        signal.signal(signal.SIGTERM, sinal_parada)
+
+        ultimo = time.monotonic()
+        while self.executando:
+            time.sleep(0.5)
+            if time.monotonic() - ultimo >= intervalo_metricas:
+                print(f"\n📊 Métricas do escritor ({time.strftime('%H:%M:%S')}):")
+                self.mostrar_metricas()
+                ultimo = time.monotonic()
+
+        print("\n⏹️ Parando escritor, gravando fila pendente...")
+        self.parar()
+        self.mostrar_metricas()
+        print("✅ Escritor finalizado")
+
+
+class ClienteEscritor:
+    """
+    Cliente usado pelos produtores para enviar lotes ao escritor
+
+    O envio é bloqueante: se o escritor estiver com a fila cheia,
+    o produtor espera (backpressure) em vez de acumular memória
+    """
+
+    def __init__(self, caminho_socket=None):
+        self.caminho_socket = Path(caminho_socket or SOCKET_PADRAO)
+        self.sock = None
+        self._conectar()
+
+    def _conectar(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(str(self.caminho_socket))
+
+    def enviar(self, operacoes):
+        """Envia um lote atômico de operações [(comando, params), ...]"""
+        if not operacoes:
+            return
+        linha = json.dumps({'operacoes': operacoes}, default=str).encode() + b"\n"
+        try:
+            self.sock.sendall(linha)
+        except (BrokenPipeError, ConnectionResetError):
+            # Escritor reiniciado: reconecta uma vez
+            self._conectar()
+            self.sock.sendall(linha)
+
+    def fechar(self):
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+
+
+def main():
+    """Função principal"""
+    args = sys.argv[1:]
+
+    if "--help" in args or "-h" in args:
+        print("""
+✍️ Processo Escritor Único - Sistema Logística JIT
+
+USO:
+  python writer_service.py                      # Socket padrão database/escritor.sock
+  python writer_service.py --socket /tmp/e.sock # Socket personalizado
+  python writer_service.py --latencia-ms 500    # Latência máxima de flush
+  python writer_service.py --fila 2000          # Tamanho da fila (backpressure)
+
+PRODUTORES:
+  python data_generator/scheduler_v2.py --escritor
+  python database/prediction_service.py --escritor
+""")
+        return
+
+    opcoes = {}
+    for flag, chave in [("--socket", "caminho_socket"), ("--latencia-ms", "latencia_max_ms"),
+                        ("--fila", "tamanho_fila"), ("--db", "db_path")]:
+        if flag in args:
+            try:
+                valor = args[args.index(flag) + 1]
+            except IndexError:
+                print(f"❌ Erro: {flag} precisa de um valor")
+                return
+            opcoes[chave] = int(valor) if chave in ("latencia_max_ms", "tamanho_fila") else valor
+
+    ServicoEscritor(**opcoes).executar()
+
+
+if __name__ == "__main__":
+    main()